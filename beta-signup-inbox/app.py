@@ -15,6 +15,12 @@ from google import genai
 from google.genai import types
 from sema_sdk import SemaClient, WebhookVerifier, WebhookVerificationError
 
+from admission import DEFAULT_LATENCY_TARGET_SECONDS, DEFAULT_MAX_IN_FLIGHT, DEFAULT_MIN_IN_FLIGHT
+from admission import AdmissionController
+from breaker import OPEN, CircuitBreaker, CircuitOpenError
+from breaker import health as breaker_health
+from webhook_guard import DEFAULT_MAX_BODY_BYTES, DEFAULT_TOLERANCE_SECONDS, WebhookGuard
+
 load_dotenv()
 
 app = Flask(__name__)
@@ -23,6 +29,23 @@ CORS(app, resources={r"/signup": {"origins": "*"}})
 DEV_MODE = os.environ.get("DEV_MODE", "").lower() == "true"
 
 verifier = WebhookVerifier(secret=os.environ["SEMA_WEBHOOK_SECRET"])
+webhook_guard = WebhookGuard(
+    max_body_bytes=int(os.environ.get("WEBHOOK_MAX_BODY_BYTES", DEFAULT_MAX_BODY_BYTES)),
+    tolerance_seconds=int(os.environ.get("WEBHOOK_TOLERANCE_SECONDS", DEFAULT_TOLERANCE_SECONDS)),
+)
+# Chunked bodies carry no Content-Length; Flask enforces the same cap while reading them
+app.config["MAX_CONTENT_LENGTH"] = webhook_guard.max_body_bytes
+# Load shedding: 503 + Retry-After when too many replies are in flight or latency is over target
+admission = AdmissionController(
+    max_in_flight=int(os.environ.get("ADMISSION_MAX_IN_FLIGHT", DEFAULT_MAX_IN_FLIGHT)),
+    min_in_flight=int(os.environ.get("ADMISSION_MIN_IN_FLIGHT", DEFAULT_MIN_IN_FLIGHT)),
+    latency_target=float(os.environ.get("ADMISSION_LATENCY_TARGET_MS", DEFAULT_LATENCY_TARGET_SECONDS * 1000)) / 1000,
+)
+
+# Circuit breakers: fail fast while an upstream is down (see "Circuit Breakers" in the README)
+sema_breaker = CircuitBreaker.from_env("sema")
+resend_breaker = CircuitBreaker.from_env("resend")
+gemini_breaker = CircuitBreaker.from_env("gemini")
 
 sema_client = SemaClient(
     api_key=os.environ["SEMA_API_KEY"],
@@ -52,7 +75,11 @@ if GENERATE_IMAGE:
 
 
 def generate_welcome_image() -> str | None:
-    """Generate a welcome image via Gemini and upload to S3. Returns a presigned URL."""
+    """Generate a welcome image via Gemini and upload to S3. Returns a presigned URL.
+
+    Returns None when images are disabled, on any error, and at once while
+    Gemini's breaker is open: the welcome reply then goes out without one.
+    """
     if not GENERATE_IMAGE or not gemini_client or not s3_client:
         return None
 
@@ -67,11 +94,12 @@ def generate_welcome_image() -> str | None:
     )
 
     try:
-        response = gemini_client.models.generate_content(
-            model="gemini-2.5-flash-image",
-            contents=prompt,
-            config=types.GenerateContentConfig(response_modalities=["Image"]),
-        )
+        with gemini_breaker.call():
+            response = gemini_client.models.generate_content(
+                model="gemini-2.5-flash-image",
+                contents=prompt,
+                config=types.GenerateContentConfig(response_modalities=["Image"]),
+            )
 
         image_bytes = None
         mime_type = "image/png"
@@ -98,6 +126,9 @@ def generate_welcome_image() -> str | None:
             Params={"Bucket": S3_BUCKET, "Key": image_key},
             ExpiresIn=PRESIGNED_URL_EXPIRY,
         )
+    except CircuitOpenError as e:
+        print(f"{e}; replying without an image", flush=True)
+        return None
     except Exception as e:
         print(f"Image generation error: {e}", flush=True)
         return None
@@ -132,20 +163,28 @@ def compose_reply_html(sender_name: str | None, image_url: str | None) -> str:
 
 
 def process_and_reply(sender_addr: str, sender_name: str | None, subject: str):
-    """Background task: generate welcome image and send reply via Resend."""
+    """Background task: generate welcome image and send reply via Resend.
+
+    The webhook handler turns deliveries away while Resend's breaker is open; if it
+    opens after this task was queued, no image is generated, since the reply couldn't be sent.
+    """
+    if resend_breaker.state == OPEN:
+        print(f"Resend circuit open, reply to {sender_addr} not sent", flush=True)
+        return
     image_url = generate_welcome_image()
     body_html = compose_reply_html(sender_name, image_url)
 
     try:
-        resend.Emails.send(
-            {
-                "from": RESEND_FROM_EMAIL,
-                "to": [sender_addr],
-                "subject": f"Re: {subject}",
-                "html": body_html,
-                "reply_to": RESEND_REPLY_TO,
-            }
-        )
+        with resend_breaker.call():
+            resend.Emails.send(
+                {
+                    "from": RESEND_FROM_EMAIL,
+                    "to": [sender_addr],
+                    "subject": f"Re: {subject}",
+                    "html": body_html,
+                    "reply_to": RESEND_REPLY_TO,
+                }
+            )
         print(f"Replied to {sender_addr}", flush=True)
     except Exception as e:
         print(f"Resend error: {e}", flush=True)
@@ -153,8 +192,17 @@ def process_and_reply(sender_addr: str, sender_name: str | None, subject: str):
 
 @app.route("/health", methods=["GET"])
 def health():
-    """Health check endpoint for load balancers and container orchestration."""
-    return {"status": "ok"}, 200
+    """Health check endpoint for load balancers and container orchestration, with upstream breaker state."""
+    return breaker_health(sema_breaker, resend_breaker, gemini_breaker), 200
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    """Webhook guard and admission state."""
+    return {
+        "webhook_guard": webhook_guard.snapshot(),
+        "admission": admission.snapshot(),
+    }, 200
 
 
 @app.route("/signup", methods=["POST"])
@@ -167,14 +215,20 @@ def signup():
 
     try:
         body = f"Beta signup request from landing page at {uuid.uuid4().hex}"
-        result = sema_client.upload_item(
-            inbox_id=SEMA_INBOX_ID,
-            file=io.BytesIO(body.encode()),
-            sender_address=email,
-            subject="I'd like API access",
-            content_type="text/plain",
-        )
+        with sema_breaker.call():
+            result = sema_client.upload_item(
+                inbox_id=SEMA_INBOX_ID,
+                file=io.BytesIO(body.encode()),
+                sender_address=email,
+                subject="I'd like API access",
+                content_type="text/plain",
+            )
         print(f"Signup uploaded: id={result.id} status={result.status} duplicate={result.is_duplicate} email={email}", flush=True)
+    except CircuitOpenError as e:
+        print(f"Signup not submitted: {e}", flush=True)
+        return jsonify({"error": "Signups are temporarily unavailable, please try again shortly"}), 503, {
+            "Retry-After": str(max(1, round(e.retry_after)))
+        }
     except Exception as e:
         print(f"Sema API error: {e}", flush=True)
         return jsonify({"error": "Failed to submit signup"}), 500
@@ -205,12 +259,29 @@ def test_signup():
 @app.route("/webhook", methods=["POST"])
 def handle_webhook():
     """Receive Sema webhook and reply with a personalized welcome email."""
+    rejection = webhook_guard.check(request.content_length, request.headers)
+    if rejection:
+        return rejection
     try:
-        event = verifier.verify(payload=request.data, headers=dict(request.headers))
+        event = verifier.verify(payload=request.data, headers=request.headers)
     except WebhookVerificationError as e:
-        print(f"Webhook verification failed: {e}", flush=True)
+        webhook_guard.log_failure(f"Webhook verification failed: {e}")
         return {"error": str(e)}, 400
 
+    # The webhook is acked before the reply is sent, so don't take one that couldn't be sent:
+    # a 503 makes Sema redeliver it once Resend's breaker has cooled down
+    resend = resend_breaker.snapshot()
+    if resend["state"] == OPEN:
+        retry_after = str(max(1, round(resend["retry_after_s"])))
+        return {"error": "Email delivery unavailable, retry later"}, 503, {"Retry-After": retry_after}
+
+    # The ticket is held until the reply is sent, so admission tracks the background work.
+    # A shed webhook isn't remembered, so Sema's retry goes through.
+    ticket = admission.admit()
+    if ticket is None:
+        return admission.rejection()
+    webhook_guard.remember(request.headers)
+
     deliverable = event.payload.deliverable
     sender = deliverable.sender
     content = deliverable.content_summary
@@ -218,15 +289,17 @@ def handle_webhook():
     sender_addr = sender.address if sender else None
     if not sender_addr:
         print("No sender address in webhook", flush=True)
+        ticket.done()
         return {"error": "No sender address"}, 400
 
     sender_name = sender.display_name if sender else None
     subject = content.subject if content and content.subject else "Beta Access"
 
-    thread = threading.Thread(
-        target=process_and_reply,
-        args=(sender_addr, sender_name, subject),
-    )
+    def reply() -> None:
+        with ticket:
+            process_and_reply(sender_addr, sender_name, subject)
+
+    thread = threading.Thread(target=reply)
     thread.start()
 
     return {"ok": True}, 200
@@ -0,0 +1,161 @@
+"""Circuit breakers around upstream calls: fail fast while an upstream is down.
+
+Without a breaker, every request keeps waiting out a call that is going
+to fail, and handler threads pile up behind a dead upstream. Each
+breaker guards one upstream and moves between three states:
+
+    closed     calls go through; failure_threshold failures in a row open it
+    open       calls fail at once with CircuitOpenError until reset_timeout passes
+    half_open  one trial call goes through; success closes, failure re-opens
+
+    with openai_breaker.call():
+        completion = client.chat.completions.create(...)
+
+Callers catch CircuitOpenError and take their app's degraded path (an
+image-less reply, a queued bug report). `is_failure` decides which
+exceptions count against the upstream: a 4xx or a validation error is
+the caller's fault, and the upstream answered, so it counts as success.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+DEFAULT_FAILURE_THRESHOLD = 5
+DEFAULT_RESET_TIMEOUT_SECONDS = 30.0
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling an upstream whose breaker is open."""
+
+    def __init__(self, name: str, retry_after: float) -> None:
+        super().__init__(f"{name} circuit is open, retry in {retry_after:.0f}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Closed/open/half-open breaker for one upstream."""
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+        reset_timeout: float = DEFAULT_RESET_TIMEOUT_SECONDS,
+        is_failure: Callable[[Exception], bool] | None = None,
+    ) -> None:
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.is_failure = is_failure or (lambda e: True)
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0  # Consecutive
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self.opened = 0
+        self.rejected = 0
+
+    @classmethod
+    def from_env(cls, name: str, **kwargs) -> CircuitBreaker:
+        """A breaker using BREAKER_FAILURE_THRESHOLD and BREAKER_RESET_SECONDS, if set."""
+        return cls(
+            name,
+            failure_threshold=int(os.environ.get("BREAKER_FAILURE_THRESHOLD", DEFAULT_FAILURE_THRESHOLD)),
+            reset_timeout=float(os.environ.get("BREAKER_RESET_SECONDS", DEFAULT_RESET_TIMEOUT_SECONDS)),
+            **kwargs,
+        )
+
+    def _current_state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = HALF_OPEN
+        return self._state
+
+    def _retry_after(self) -> float:
+        if self._state != OPEN:
+            return 0.0
+        return max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def allow(self) -> None:
+        """Claim permission for one call, or raise CircuitOpenError.
+
+        Every allowed call must be followed by record_success or
+        record_failure (call() does this for you).
+        """
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return
+            if state == HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return
+            self.rejected += 1
+            raise CircuitOpenError(self.name, self._retry_after() or self.reset_timeout)
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._trial_in_flight = False
+            self._state = CLOSED
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            was_trial, self._trial_in_flight = self._trial_in_flight, False
+            if was_trial or (self._state == CLOSED and self._failures >= self.failure_threshold):
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+                self.opened += 1
+
+    def _release(self) -> None:
+        with self._lock:
+            self._trial_in_flight = False
+
+    @contextmanager
+    def call(self) -> Iterator[None]:
+        """Guard one upstream call. Raises CircuitOpenError without running the body when open."""
+        self.allow()
+        try:
+            yield
+        except Exception as e:
+            if self.is_failure(e):
+                self.record_failure()
+            else:
+                self.record_success()
+            raise
+        except BaseException:
+            self._release()
+            raise
+        self.record_success()
+
+    def snapshot(self) -> dict:
+        """Current breaker state, for the /health endpoint."""
+        with self._lock:
+            return {
+                "state": self._current_state(),
+                "consecutive_failures": self._failures,
+                "opened": self.opened,
+                "rejected": self.rejected,
+                "retry_after_s": round(self._retry_after(), 1),
+            }
+
+
+def health(*breakers: CircuitBreaker) -> dict:
+    """The /health body: "degraded" while any breaker is not closed."""
+    states = {b.name: b.snapshot() for b in breakers}
+    degraded = any(s["state"] != CLOSED for s in states.values())
+    return {"status": "degraded" if degraded else "ok", "breakers": states}
@@ -13,7 +13,16 @@ os.environ.setdefault("RESEND_FROM_EMAIL", "test@example.com")
 
 import pytest
 
+import app as app_module
 from app import app as flask_app
+from breaker import CircuitBreaker
+
+
+@pytest.fixture(autouse=True)
+def reset_breakers(monkeypatch):
+    """Fresh circuit breakers per test, so failures in one test don't open them for the next."""
+    for name in ("sema", "resend", "gemini"):
+        monkeypatch.setattr(app_module, f"{name}_breaker", CircuitBreaker(name))
 
 
 @pytest.fixture()
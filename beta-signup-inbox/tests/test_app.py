@@ -1,9 +1,13 @@
 """Tests for Beta Signup Inbox."""
 
 import json
+import threading
+import time
+import uuid
 from unittest.mock import MagicMock, patch
 
 import app as app_module
+from admission import AdmissionController
 
 
 # ---------------------------------------------------------------------------
@@ -33,6 +37,15 @@ def make_mock_event(
     return event
 
 
+def webhook_headers(timestamp: int | None = None) -> dict[str, str]:
+    """Well-formed Sema webhook headers; the signature is unique per call."""
+    return {
+        "webhook-id": f"msg_{uuid.uuid4().hex}",
+        "webhook-timestamp": str(int(time.time()) if timestamp is None else timestamp),
+        "webhook-signature": f"v1,{uuid.uuid4().hex}",
+    }
+
+
 # ---------------------------------------------------------------------------
 # /health endpoint
 # ---------------------------------------------------------------------------
@@ -41,7 +54,8 @@ def make_mock_event(
 def test_health_returns_ok(client):
     resp = client.get("/health")
     assert resp.status_code == 200
-    assert resp.json == {"status": "ok"}
+    assert resp.json["status"] == "ok"
+    assert set(resp.json["breakers"]) == {"sema", "resend", "gemini"}
 
 
 # ---------------------------------------------------------------------------
@@ -203,7 +217,7 @@ def test_webhook_rejects_bad_signature(client):
     with patch.object(
         app_module.verifier, "verify", side_effect=WebhookVerificationError("bad sig")
     ):
-        resp = client.post("/webhook", data=b"{}", content_type="application/json")
+        resp = client.post("/webhook", data=b"{}", content_type="application/json", headers=webhook_headers())
 
     assert resp.status_code == 400
     assert b"bad sig" in resp.data
@@ -212,7 +226,7 @@ def test_webhook_rejects_bad_signature(client):
 def test_webhook_returns_400_when_no_sender(client):
     event = make_mock_event(sender_address=None)
     with patch.object(app_module.verifier, "verify", return_value=event):
-        resp = client.post("/webhook", data=b"{}", content_type="application/json")
+        resp = client.post("/webhook", data=b"{}", content_type="application/json", headers=webhook_headers())
 
     assert resp.status_code == 400
     assert b"No sender address" in resp.data
@@ -225,7 +239,7 @@ def test_webhook_success(client):
         patch.object(app_module, "generate_welcome_image", return_value=None),
         patch("resend.Emails.send") as mock_send,
     ):
-        resp = client.post("/webhook", data=b"{}", content_type="application/json")
+        resp = client.post("/webhook", data=b"{}", content_type="application/json", headers=webhook_headers())
 
     assert resp.status_code == 200
     assert resp.json == {"ok": True}
@@ -247,7 +261,7 @@ def test_webhook_success_with_image(client):
         ),
         patch("resend.Emails.send") as mock_send,
     ):
-        resp = client.post("/webhook", data=b"{}", content_type="application/json")
+        resp = client.post("/webhook", data=b"{}", content_type="application/json", headers=webhook_headers())
 
     assert resp.status_code == 200
     send_args = mock_send.call_args[0][0]
@@ -262,7 +276,148 @@ def test_webhook_returns_200_even_on_resend_error(client):
         patch.object(app_module, "generate_welcome_image", return_value=None),
         patch("resend.Emails.send", side_effect=Exception("Resend down")),
     ):
-        resp = client.post("/webhook", data=b"{}", content_type="application/json")
+        resp = client.post("/webhook", data=b"{}", content_type="application/json", headers=webhook_headers())
 
     assert resp.status_code == 200
     assert resp.json == {"ok": True}
+
+
+def test_webhook_guard_rejects_missing_headers_before_verify(client):
+    with patch.object(app_module.verifier, "verify") as mock_verify:
+        resp = client.post("/webhook", data=b"{}", content_type="application/json")
+
+    assert resp.status_code == 400
+    assert b"Missing webhook-id header" in resp.data
+    mock_verify.assert_not_called()
+
+
+def test_webhook_guard_rejects_replayed_signature(client):
+    headers = webhook_headers()
+    event = make_mock_event(sender_address=None)
+    with patch.object(app_module.verifier, "verify", return_value=event) as mock_verify:
+        client.post("/webhook", data=b"{}", content_type="application/json", headers=headers)
+        replay = client.post("/webhook", data=b"{}", content_type="application/json", headers=headers)
+
+    assert replay.status_code == 409
+    assert mock_verify.call_count == 1
+
+
+# ---------------------------------------------------------------------------
+# Admission control
+# ---------------------------------------------------------------------------
+
+
+def test_webhook_is_shed_with_retry_after_when_saturated(client, monkeypatch):
+    monkeypatch.setattr(app_module, "admission", AdmissionController(max_in_flight=1))
+    held = app_module.admission.admit()
+    headers = webhook_headers()
+    with (
+        patch.object(app_module.verifier, "verify", return_value=make_mock_event()),
+        patch.object(app_module, "process_and_reply") as mock_process,
+    ):
+        resp = client.post("/webhook", data=b"{}", content_type="application/json", headers=headers)
+        mock_process.assert_not_called()
+        held.done()
+        # The shed attempt wasn't remembered, so a retry with the same signature is handled
+        retry = client.post("/webhook", data=b"{}", content_type="application/json", headers=headers)
+
+    assert resp.status_code == 503
+    assert resp.headers["Retry-After"] == "1"
+    assert retry.status_code == 200
+    assert app_module.admission.snapshot()["rejected"] == 1
+
+
+def test_admission_slot_is_held_until_the_reply_finishes(client, monkeypatch):
+    monkeypatch.setattr(app_module, "admission", AdmissionController(max_in_flight=1))
+    release = threading.Event()
+    with (
+        patch.object(app_module.verifier, "verify", return_value=make_mock_event()),
+        patch.object(app_module, "process_and_reply", side_effect=lambda *args: release.wait(5)),
+    ):
+        first = client.post("/webhook", data=b"{}", content_type="application/json", headers=webhook_headers())
+        second = client.post("/webhook", data=b"{}", content_type="application/json", headers=webhook_headers())
+        release.set()
+        deadline = time.monotonic() + 5
+        while app_module.admission.snapshot()["in_flight"] and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    assert (first.status_code, second.status_code) == (200, 503)
+    assert app_module.admission.snapshot()["in_flight"] == 0
+
+
+def test_metrics_reports_admission(client):
+    resp = client.get("/metrics")
+    assert resp.status_code == 200
+    assert resp.json["admission"]["in_flight"] == 0
+    assert resp.json["webhook_guard"]["rejected"] >= 0
+
+
+# ---------------------------------------------------------------------------
+# Circuit breakers
+# ---------------------------------------------------------------------------
+
+
+def open_breaker(breaker) -> None:
+    for _ in range(breaker.failure_threshold):
+        breaker.allow()
+        breaker.record_failure()
+
+
+def test_open_gemini_breaker_sends_the_reply_without_an_image(client):
+    open_breaker(app_module.gemini_breaker)
+    mock_gemini = MagicMock()
+    with (
+        patch.object(app_module, "GENERATE_IMAGE", True),
+        patch.object(app_module, "gemini_client", mock_gemini),
+        patch.object(app_module, "s3_client", MagicMock()),
+        patch("resend.Emails.send") as mock_send,
+    ):
+        app_module.process_and_reply("user@example.com", "Jane", "Beta")
+
+    mock_gemini.models.generate_content.assert_not_called()
+    mock_send.assert_called_once()
+    assert "<img" not in mock_send.call_args[0][0]["html"]
+    health = client.get("/health").json
+    assert health["status"] == "degraded"
+    assert health["breakers"]["gemini"]["state"] == "open"
+
+
+def test_open_resend_breaker_turns_the_webhook_away(client):
+    open_breaker(app_module.resend_breaker)
+    headers = webhook_headers()
+    with (
+        patch.object(app_module.verifier, "verify", return_value=make_mock_event()),
+        patch.object(app_module, "process_and_reply"),
+    ):
+        resp = client.post("/webhook", data=b"{}", content_type="application/json", headers=headers)
+        app_module.resend_breaker.record_success()
+        # Not remembered, so the redelivery goes through once Resend is back
+        retry = client.post("/webhook", data=b"{}", content_type="application/json", headers=headers)
+
+    assert resp.status_code == 503
+    assert int(resp.headers["Retry-After"]) >= 1
+    assert retry.status_code == 200
+
+
+def test_open_resend_breaker_skips_the_image(client):
+    open_breaker(app_module.resend_breaker)
+    with (
+        patch.object(app_module, "generate_welcome_image") as mock_image,
+        patch("resend.Emails.send") as mock_send,
+    ):
+        app_module.process_and_reply("user@example.com", "Jane", "Beta")
+
+    mock_image.assert_not_called()
+    mock_send.assert_not_called()
+
+
+def test_signup_fails_fast_while_sema_is_down(client):
+    with patch.object(app_module.sema_client, "upload_item", side_effect=Exception("Sema down")) as mock_upload:
+        statuses = [
+            client.post("/signup", json={"email": "user@example.com"}).status_code for _ in range(6)
+        ]
+        resp = client.post("/signup", json={"email": "user@example.com"})
+
+    assert statuses == [500] * 5 + [503]
+    assert mock_upload.call_count == 5
+    assert int(resp.headers["Retry-After"]) >= 1
@@ -1,11 +1,14 @@
 """Bug Reporting Agent - User emails bug report → Create Linear issue."""
 
+import atexit
 import os
+from contextlib import nullcontext
+from pathlib import Path
 
 import html2text
 import httpx
 from dotenv import load_dotenv
-from flask import Flask, request
+from flask import Flask, request, send_from_directory
 
 from sema_sdk import (
     SemaClient,
@@ -15,6 +18,25 @@ from sema_sdk import (
     resolve_email_inline_images,
 )
 
+from admission import DEFAULT_LATENCY_TARGET_SECONDS, DEFAULT_MAX_IN_FLIGHT, DEFAULT_MIN_IN_FLIGHT
+from admission import AdmissionController
+from attachments import (
+    DEFAULT_MAX_ATTACHMENT_BYTES,
+    AttachmentMirror,
+    LocalAttachmentStore,
+    S3AttachmentStore,
+)
+from breaker import CircuitBreaker, CircuitOpenError
+from breaker import health as breaker_health
+from dedup import DuplicateIndex
+from description import DEFAULT_MAX_CHARS, OVERFLOW_FILENAME, DescriptionBuilder
+from linear import LINEAR_API_URL as DEFAULT_LINEAR_API_URL
+from linear import IssueBatcher, LinearError, comment_on_issue
+from ratelimit import AdaptiveLimiter
+from report_queue import DEFAULT_DRAIN_INTERVAL_SECONDS, ReportQueue
+from webhook_guard import DEFAULT_MAX_BODY_BYTES, DEFAULT_TOLERANCE_SECONDS, WebhookGuard
+from webhook_recorder import WebhookRecorder
+
 # Configure html2text for clean markdown output
 _h2t = html2text.HTML2Text()
 _h2t.body_width = 0  # Don't wrap lines
@@ -25,6 +47,24 @@ app = Flask(__name__)
 
 # Sema webhook verification and API client
 verifier = WebhookVerifier(secret=os.environ["SEMA_WEBHOOK_SECRET"])
+# Header-only checks (size, headers, timestamp, replay) that run before the HMAC
+webhook_guard = WebhookGuard(
+    max_body_bytes=int(os.environ.get("WEBHOOK_MAX_BODY_BYTES", DEFAULT_MAX_BODY_BYTES)),
+    tolerance_seconds=int(os.environ.get("WEBHOOK_TOLERANCE_SECONDS", DEFAULT_TOLERANCE_SECONDS)),
+)
+# Chunked bodies carry no Content-Length; Flask enforces the same cap while reading them
+app.config["MAX_CONTENT_LENGTH"] = webhook_guard.max_body_bytes
+# Load shedding: 503 + Retry-After when too many reports are in flight or latency is over target
+admission = AdmissionController(
+    max_in_flight=int(os.environ.get("ADMISSION_MAX_IN_FLIGHT", DEFAULT_MAX_IN_FLIGHT)),
+    min_in_flight=int(os.environ.get("ADMISSION_MIN_IN_FLIGHT", DEFAULT_MIN_IN_FLIGHT)),
+    latency_target=float(os.environ.get("ADMISSION_LATENCY_TARGET_MS", DEFAULT_LATENCY_TARGET_SECONDS * 1000)) / 1000,
+)
+# Optional: append verified webhooks to a gzip JSONL file for offline replay (replay.py)
+WEBHOOK_RECORD_PATH = os.environ.get("WEBHOOK_RECORD_PATH")
+webhook_recorder = WebhookRecorder(Path(WEBHOOK_RECORD_PATH)) if WEBHOOK_RECORD_PATH else None
+if webhook_recorder:
+    atexit.register(webhook_recorder.close)
 sema_client = SemaClient() if os.environ.get("SEMA_API_KEY") else None
 if not sema_client:
     print("WARNING: SEMA_API_KEY not set - attachment downloads will be disabled")
@@ -32,56 +72,149 @@ if not sema_client:
 # Linear API
 LINEAR_API_KEY = os.environ["LINEAR_API_KEY"]
 LINEAR_TEAM_ID = os.environ["LINEAR_TEAM_ID"]
+LINEAR_API_URL = os.environ.get("LINEAR_API_URL", DEFAULT_LINEAR_API_URL)
+LINEAR_DESCRIPTION_MAX_CHARS = int(os.environ.get("LINEAR_DESCRIPTION_MAX_CHARS", DEFAULT_MAX_CHARS))
 
+# Attachment mirror: "local", "s3", or unset to link Sema's presigned URLs directly
+ATTACHMENT_MIRROR = os.environ.get("ATTACHMENT_MIRROR", "").lower()
+ATTACHMENT_MIRROR_DIR = Path(os.environ.get("ATTACHMENT_MIRROR_DIR", "attachments"))
+MAX_ATTACHMENT_BYTES = int(os.environ.get("MAX_ATTACHMENT_BYTES", DEFAULT_MAX_ATTACHMENT_BYTES))
 
-class LinearError(Exception):
-    """Error from Linear API."""
-    pass
 
+def build_attachment_mirror() -> AttachmentMirror | None:
+    """Build the attachment mirror from env config, or None if disabled."""
+    if ATTACHMENT_MIRROR == "local":
+        store = LocalAttachmentStore(
+            ATTACHMENT_MIRROR_DIR,
+            base_url=os.environ.get("ATTACHMENT_MIRROR_BASE_URL", "http://localhost:5050/attachments"),
+        )
+    elif ATTACHMENT_MIRROR == "s3":
+        store = S3AttachmentStore(
+            os.environ["S3_BUCKET"],
+            public_base_url=os.environ["S3_PUBLIC_BASE_URL"],
+            prefix=os.environ.get("S3_PREFIX", "bug-attachments"),
+            endpoint_url=os.environ.get("S3_ENDPOINT_URL") or None,
+            region=os.environ.get("S3_REGION", "us-east-1"),
+        )
+    else:
+        return None
+    return AttachmentMirror(store, max_bytes=MAX_ATTACHMENT_BYTES)
 
-def create_linear_issue(title: str, description: str) -> tuple[str, str]:
-    """Create an issue in Linear. Returns (identifier, url)."""
-    query = """
-        mutation CreateIssue($title: String!, $description: String!, $teamId: String!) {
-            issueCreate(input: { title: $title, description: $description, teamId: $teamId }) {
-                success
-                issue { id identifier url }
-            }
-        }
-    """
-    variables = {
-        "title": title,
-        "description": description,
-        "teamId": LINEAR_TEAM_ID,
-    }
-    response = httpx.post(
-        "https://api.linear.app/graphql",
-        json={"query": query, "variables": variables},
-        headers={"Authorization": LINEAR_API_KEY, "Content-Type": "application/json"},
+
+attachment_mirror = build_attachment_mirror()
+
+# Near-duplicate detection: fold repeat reports into the existing issue as comments
+DEDUP_ENABLED = os.environ.get("DEDUP_ENABLED", "false").lower() == "true"
+duplicate_index = (
+    DuplicateIndex(
+        Path(os.environ.get("DEDUP_INDEX_PATH", "dedup_index.json")),
+        threshold=float(os.environ.get("DEDUP_THRESHOLD", "0.5")),
+        max_entries=int(os.environ.get("DEDUP_MAX_ENTRIES", "1000")),
+        window_seconds=float(os.environ.get("DEDUP_WINDOW_HOURS", "24")) * 60 * 60,
     )
-    response.raise_for_status()
-    data = response.json()
+    if DEDUP_ENABLED
+    else None
+)
+
+# Adaptive concurrency for Linear, driven by its X-RateLimit-* response headers
+linear_limiter = AdaptiveLimiter(
+    "linear",
+    initial=int(os.environ.get("LINEAR_CONCURRENCY", "2")),
+    max_limit=int(os.environ.get("LINEAR_MAX_CONCURRENCY", "8")),
+)
+
+# Micro-batch issueCreate mutations into one aliased GraphQL request
+issue_batcher = IssueBatcher(
+    api_key=LINEAR_API_KEY,
+    team_id=LINEAR_TEAM_ID,
+    url=LINEAR_API_URL,
+    window=float(os.environ.get("LINEAR_BATCH_WINDOW_MS", "50")) / 1000,
+    max_batch=int(os.environ.get("LINEAR_BATCH_MAX", "20")),
+    limiter=linear_limiter,
+)
+
+
+def _linear_outage(e: Exception) -> bool:
+    """Timeouts, connection errors and 5xx count against Linear; GraphQL and 4xx errors don't."""
+    if isinstance(e, httpx.HTTPStatusError):
+        return e.response.status_code >= 500
+    return isinstance(e, httpx.HTTPError)
 
-    # GraphQL can return 200 with errors in the response
-    if "errors" in data:
-        raise LinearError(data["errors"][0].get("message", "Unknown error"))
 
-    issue = data["data"]["issueCreate"]["issue"]
-    return issue["identifier"], issue["url"]
+# Circuit breakers: fail fast while an upstream is down (see "Circuit Breakers" in the README)
+linear_breaker = CircuitBreaker.from_env("linear", is_failure=_linear_outage)
+sema_breaker = CircuitBreaker.from_env("sema")
+
+# Reports that arrive while Linear's breaker is open wait here and are filed once it closes
+report_queue = ReportQueue(Path(os.environ.get("REPORT_QUEUE_PATH", "report_queue.jsonl")))
+
+
+def create_linear_issue(title: str, description: str) -> tuple[str, str, str]:
+    """Create an issue in Linear. Returns (id, identifier, url)."""
+    with linear_breaker.call():
+        return issue_batcher.create_issue(title, description)
+
+
+def comment_on_linear_issue(issue_id: str, body: str) -> str:
+    """Add a comment to an existing Linear issue. Returns the comment URL."""
+    with linear_breaker.call():
+        return comment_on_issue(
+            issue_id, body, api_key=LINEAR_API_KEY, url=LINEAR_API_URL, limiter=linear_limiter
+        )
+
+
+@app.route("/health", methods=["GET"])
+def health():
+    """Liveness plus upstream breaker state; "degraded" while any breaker is open."""
+    body = breaker_health(linear_breaker, sema_breaker)
+    body["report_queue"] = report_queue.snapshot()
+    return body, 200
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    """Current adaptive rate limits per upstream, guard and admission state."""
+    return {
+        "rate_limits": {"linear": linear_limiter.snapshot()},
+        "webhook_guard": webhook_guard.snapshot(),
+        "admission": admission.snapshot(),
+    }, 200
+
+
+@app.route("/attachments/<path:key>", methods=["GET"])
+def serve_attachment(key: str):
+    """Serve mirrored attachments when using the local mirror."""
+    if ATTACHMENT_MIRROR != "local":
+        return {"error": "Not found"}, 404
+    return send_from_directory(ATTACHMENT_MIRROR_DIR.resolve(), key)
 
 
 @app.route("/webhook", methods=["POST"])
 def handle_webhook():
     """Receive Sema webhook, create Linear issue."""
-    # Verify the webhook signature
+    # Cheap checks first, then verify the webhook signature
+    rejection = webhook_guard.check(request.content_length, request.headers)
+    if rejection:
+        return rejection
     try:
-        event = verifier.verify(payload=request.data, headers=dict(request.headers))
+        event = verifier.verify(payload=request.data, headers=request.headers)
     except WebhookVerificationError as e:
-        print(f"Webhook verification failed: {e}")
-        print(f"Headers: {dict(request.headers)}")
-        print(f"Payload: {request.data[:500]}")  # First 500 bytes
+        webhook_guard.log_failure(f"Webhook verification failed: {e}")
         return {"error": str(e)}, 400
 
+    # A shed webhook isn't remembered or recorded, so Sema's retry goes through
+    ticket = admission.admit()
+    if ticket is None:
+        return admission.rejection()
+    webhook_guard.remember(request.headers)
+    if webhook_recorder:
+        webhook_recorder.record(request.data, request.headers)
+    with ticket:
+        return report_bug(event)
+
+
+def report_bug(event) -> tuple[dict, int]:
+    """Create a Linear issue for a verified webhook, or comment on a near-duplicate."""
     # Extract from the webhook payload structure
     deliverable = event.payload.deliverable
     item_id = event.payload.item_id
@@ -95,46 +228,115 @@ def handle_webhook():
     attachments = []
     if sema_client and deliverable.attachments:
         try:
-            attachments = sema_client.get_item_attachments(item_id).attachments
+            with sema_breaker.call():
+                attachments = sema_client.get_item_attachments(item_id).attachments
+        except CircuitOpenError as e:
+            print(f"Skipping attachments: {e}")
         except Exception as e:
             print(f"Failed to fetch attachments: {e}")
 
-    # Build issue description
-    sender_addr = sender.address if sender else "unknown"
-    description = f"**Reported by:** {sender_addr}\n\n"
+    # Copy attachments to the mirror so the issue links don't expire
+    if attachment_mirror and attachments:
+        attachments = attachment_mirror.mirror_attachments(attachments)
 
-    # Prefer body_html with resolved inline images, fall back to body_preview
-    body_html = content.body_html if content else ""
-    if body_html:
-        resolved_html = resolve_email_inline_images(body_html, attachments)
-        description += _h2t.handle(resolved_html).strip()
-    elif content and content.body_preview:
-        description += content.body_preview
+    # Build issue description, bounded to what Linear accepts
+    sender_addr = sender.address if sender else "unknown"
+    builder = DescriptionBuilder(max_chars=LINEAR_DESCRIPTION_MAX_CHARS)
+    builder.write_header(f"**Reported by:** {sender_addr}\n\n")
 
     # Partition attachments: inline (embedded in HTML) vs non-inline (list separately)
+    body_html = content.body_html if content else ""
     _, non_inline = partition_email_attachments(body_html, attachments)
     if non_inline:
-        description += "\n\n**Attachments:**\n"
+        builder.write_footer("\n\n**Attachments:**\n")
         for att in non_inline:
             if att.download_url:
                 # Images: use ![](url) so Linear displays them
                 if att.content_type.startswith("image/"):
-                    description += f"![{att.filename}]({att.download_url})\n"
+                    builder.write_footer(f"![{att.filename}]({att.download_url})\n")
                 else:
-                    description += f"- [{att.filename}]({att.download_url}) ({att.content_type})\n"
+                    builder.write_footer(f"- [{att.filename}]({att.download_url}) ({att.content_type})\n")
             else:
-                description += f"- {att.filename} ({att.content_type})\n"
+                builder.write_footer(f"- {att.filename} ({att.content_type})\n")
+
+    # Prefer body_html with resolved inline images, fall back to body_preview.
+    # Quoted replies are collapsed; reply history, signatures and anything past the limit overflow.
+    body_text = ""
+    if body_html:
+        resolved_html = resolve_email_inline_images(body_html, attachments)
+        body_text = _h2t.handle(resolved_html).strip()
+    elif content and content.body_preview:
+        body_text = content.body_preview
+    builder.write_body(body_text)
+
+    # Store the overflow next to the mirrored attachments so the full report is one click away
+    overflow_url = None
+    overflow = builder.overflow_bytes()
+    if overflow and attachment_mirror:
+        try:
+            overflow_url = attachment_mirror.store_bytes(overflow, OVERFLOW_FILENAME, "text/plain")
+        except Exception as e:
+            print(f"Failed to store description overflow: {e}")
+    description = builder.build(overflow_url=overflow_url)
+    builder.close()
+
+    return submit_report({"title": title, "description": description, "text": f"{title}\n{body_text}"})
 
-    # Create the Linear issue
+
+def submit_report(report: dict) -> tuple[dict, int]:
+    """File a report in Linear, or queue it while Linear's breaker is open."""
     try:
-        issue_id, issue_url = create_linear_issue(title, description)
+        return file_report(report), 200
+    except CircuitOpenError as e:
+        report_queue.put(report)
+        print(f"{e}; queued the report ({len(report_queue)} waiting)")
+        return {"ok": True, "queued": True}, 202
     except (LinearError, httpx.HTTPError) as e:
-        print(f"Failed to create Linear issue: {e}")
+        print(f"Failed to file Linear issue: {e}")
         return {"error": "Failed to create issue"}, 500
 
+
+def file_report(report: dict) -> dict:
+    """Comment on a near-duplicate of a recent report, or create a new issue."""
+    # Held until the new issue is indexed, so a similar report arriving meanwhile comments on it
+    reservation = duplicate_index.reserve(report["text"]) if duplicate_index is not None else None
+    with reservation or nullcontext():
+        duplicate = reservation.duplicate if reservation else None
+        if duplicate:
+            comment_url = comment_on_linear_issue(duplicate.issue_id, report["description"])
+            print(f"Duplicate of {duplicate.identifier}, added comment → {comment_url}")
+            return {"ok": True, "issue": duplicate.identifier, "duplicate": True}
+
+        issue_uuid, issue_id, issue_url = create_linear_issue(report["title"], report["description"])
+        if reservation:
+            reservation.fill(issue_id=issue_uuid, identifier=issue_id, url=issue_url)
+
     print(f"Created Linear issue: {issue_id} → {issue_url}")
-    return {"ok": True, "issue": issue_id}, 200
+    return {"ok": True, "issue": issue_id}
+
 
+def deliver_queued_report(report: dict) -> None:
+    """Drain step for the report queue.
+
+    Outages raise, so the drain stops and retries later. Anything else
+    (a GraphQL error, a 4xx) will fail again on every pass, so the report
+    is dead-lettered and the drain moves on.
+    """
+    try:
+        file_report(report)
+    except CircuitOpenError:
+        raise
+    except Exception as e:
+        if _linear_outage(e):
+            raise
+        print(f"Dead-lettering queued report {report['title']!r}: {e}")
+        report_queue.dead_letter(report, str(e))
+
+
+report_queue.start(
+    deliver_queued_report,
+    interval=float(os.environ.get("REPORT_QUEUE_DRAIN_SECONDS", DEFAULT_DRAIN_INTERVAL_SECONDS)),
+)
 
 if __name__ == "__main__":
     print("Starting Bug Reporting Agent on http://localhost:5050/webhook")
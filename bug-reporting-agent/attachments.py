@@ -0,0 +1,189 @@
+"""Attachment mirroring — download once, store by content hash, link forever.
+
+Sema hands out presigned `download_url`s that expire, so issues that link
+them directly end up with broken images. The mirror copies each attachment
+into content-addressed storage (a local directory or an S3-compatible
+bucket) and rewrites the attachment to point at a stable URL. Identical
+bytes map to the same key, so a screenshot pasted into ten emails is
+stored once.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import mimetypes
+import os
+import re
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path, PurePosixPath
+from typing import Protocol, Sequence
+
+import httpx
+from sema_sdk.types import Attachment
+
+DEFAULT_MAX_ATTACHMENT_BYTES = 25 * 1024 * 1024  # 25 MB
+
+_SAFE_EXTENSION = re.compile(r"^\.[A-Za-z0-9]{1,10}$")
+
+
+class AttachmentTooLarge(Exception):
+    """Attachment exceeds the configured size cap."""
+    pass
+
+
+class AttachmentStore(Protocol):
+    """Content-addressed blob storage with stable public URLs."""
+
+    def exists(self, key: str) -> bool: ...
+
+    def put(self, key: str, data: bytes, content_type: str) -> None: ...
+
+    def url_for(self, key: str) -> str: ...
+
+
+class LocalAttachmentStore:
+    """Store attachments in a local directory, served by the app itself."""
+
+    def __init__(self, root: Path, base_url: str) -> None:
+        self.root = root
+        self.base_url = base_url.rstrip("/")
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def exists(self, key: str) -> bool:
+        return (self.root / key).exists()
+
+    def put(self, key: str, data: bytes, content_type: str) -> None:
+        path = self.root / key
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a temp file and rename so concurrent writers never expose a partial blob
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def url_for(self, key: str) -> str:
+        return f"{self.base_url}/{key}"
+
+
+class S3AttachmentStore:
+    """Store attachments in an S3-compatible bucket behind a public base URL."""
+
+    def __init__(
+        self,
+        bucket: str,
+        *,
+        public_base_url: str,
+        prefix: str = "",
+        endpoint_url: str | None = None,
+        region: str | None = None,
+    ) -> None:
+        import boto3  # Optional dependency, only needed for ATTACHMENT_MIRROR=s3
+        from botocore.exceptions import ClientError
+
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+        self.public_base_url = public_base_url.rstrip("/")
+        self._client_error = ClientError
+        self._s3 = boto3.client("s3", endpoint_url=endpoint_url, region_name=region)
+
+    def _object_key(self, key: str) -> str:
+        return f"{self.prefix}/{key}" if self.prefix else key
+
+    def exists(self, key: str) -> bool:
+        try:
+            self._s3.head_object(Bucket=self.bucket, Key=self._object_key(key))
+        except self._client_error as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+        return True
+
+    def put(self, key: str, data: bytes, content_type: str) -> None:
+        self._s3.put_object(
+            Bucket=self.bucket,
+            Key=self._object_key(key),
+            Body=data,
+            ContentType=content_type,
+        )
+
+    def url_for(self, key: str) -> str:
+        return f"{self.public_base_url}/{self._object_key(key)}"
+
+
+def content_key(digest: str, filename: str, content_type: str) -> str:
+    """Build the content-addressed key for a blob: `ab/abcdef....png`."""
+    ext = PurePosixPath(filename).suffix.lower()
+    if not _SAFE_EXTENSION.match(ext):
+        ext = mimetypes.guess_extension(content_type) or ""
+    return f"{digest[:2]}/{digest}{ext}"
+
+
+def download_capped(client: httpx.Client, url: str, max_bytes: int) -> bytes:
+    """Stream a download into memory, aborting once it exceeds max_bytes."""
+    with client.stream("GET", url) as response:
+        response.raise_for_status()
+        declared = response.headers.get("content-length")
+        if declared and declared.isdigit() and int(declared) > max_bytes:
+            raise AttachmentTooLarge(f"{declared} bytes exceeds cap of {max_bytes}")
+        buf = bytearray()
+        for chunk in response.iter_bytes():
+            buf += chunk
+            if len(buf) > max_bytes:
+                raise AttachmentTooLarge(f"download exceeds cap of {max_bytes} bytes")
+    return bytes(buf)
+
+
+class AttachmentMirror:
+    """Concurrently copy attachments into an AttachmentStore."""
+
+    def __init__(
+        self,
+        store: AttachmentStore,
+        *,
+        max_bytes: int = DEFAULT_MAX_ATTACHMENT_BYTES,
+        max_workers: int = 4,
+        timeout: float = 30.0,
+    ) -> None:
+        self.store = store
+        self.max_bytes = max_bytes
+        self._http = httpx.Client(timeout=timeout, follow_redirects=True)
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="attachment-mirror")
+
+    def mirror_one(self, att: Attachment) -> str:
+        """Download one attachment and store it. Returns the stable URL."""
+        if att.size_bytes > self.max_bytes:
+            raise AttachmentTooLarge(f"{att.size_bytes} bytes exceeds cap of {self.max_bytes}")
+        data = download_capped(self._http, att.download_url, self.max_bytes)
+        return self.store_bytes(data, att.filename, att.content_type)
+
+    def store_bytes(self, data: bytes, filename: str, content_type: str) -> str:
+        """Store a blob under its content hash (once). Returns the stable URL."""
+        key = content_key(hashlib.sha256(data).hexdigest(), filename, content_type)
+        if not self.store.exists(key):
+            self.store.put(key, data, content_type)
+        return self.store.url_for(key)
+
+    def mirror_attachments(self, attachments: Sequence[Attachment]) -> list[Attachment]:
+        """Return attachments with download_url rewritten to mirrored URLs.
+
+        Attachments that fail to mirror (too large, download error) keep
+        their original presigned URL so the report still goes out.
+        """
+        futures = {
+            self._pool.submit(self.mirror_one, att): att.id
+            for att in attachments
+            if att.download_url
+        }
+        mirrored: dict[str, str] = {}
+        for future in as_completed(futures):
+            att_id = futures[future]
+            try:
+                mirrored[att_id] = future.result()
+            except Exception as e:
+                print(f"Failed to mirror attachment {att_id}: {e}")
+
+        return [
+            att.model_copy(update={"download_url": mirrored[att.id]}) if att.id in mirrored else att
+            for att in attachments
+        ]
@@ -0,0 +1,115 @@
+"""Benchmark: issue description building on very large bug-report emails.
+
+Compares the old approach (`+=` over the full converted body, no cap)
+with DescriptionBuilder on two synthetic shapes: a thread with deep
+quoted history (mostly trimmed) and a huge pasted log (mostly overflow).
+
+Usage: python bench.py [--sizes 100000 1000000 5000000] [--repeat 3]
+"""
+
+from __future__ import annotations
+
+import argparse
+import html
+import time
+import tracemalloc
+
+import html2text
+
+from description import DEFAULT_MAX_CHARS, DescriptionBuilder
+
+_h2t = html2text.HTML2Text()
+_h2t.body_width = 0
+
+
+def synthetic_thread_html(target_bytes: int) -> str:
+    """An email thread: a short report followed by ever-deeper quoted replies."""
+    parts = ["<p>The export button crashes the app when the report has more than 50 rows.</p>"]
+    depth = 0
+    while sum(len(p) for p in parts) < target_bytes:
+        depth += 1
+        reply = html.escape(f"Reply {depth}: still seeing this on build {1000 + depth}. " * 20)
+        parts.append(f"<p>On Mon, Jan {depth % 28 + 1}, 2024 at 9:00 AM Dev {depth} wrote:</p>")
+        parts.append("<blockquote>" * min(depth, 20) + f"<p>{reply}</p>" + "</blockquote>" * min(depth, 20))
+    parts.append("<p>-- <br/>Jane Smith<br/>Sent from my iPhone</p>")
+    return "".join(parts)
+
+
+def synthetic_log_html(target_bytes: int) -> str:
+    """A report with a huge pasted log and no quoted history — nothing to trim."""
+    line = "<p>2024-01-01T09:00:00Z ERROR export.worker: row overflow in ReportTable.render()</p>"
+    return "<p>Export crashes, full log below.</p>" + line * (target_bytes // len(line) + 1)
+
+
+SHAPES = {"thread": synthetic_thread_html, "log": synthetic_log_html}
+
+
+def naive_description(body_html: str, attachment_count: int) -> str:
+    """The original description code path: unbounded string concatenation."""
+    description = "**Reported by:** user@example.com\n\n"
+    description += _h2t.handle(body_html).strip()
+    description += "\n\n**Attachments:**\n"
+    for n in range(attachment_count):
+        description += f"- [log-{n}.txt](https://files.example.com/{n}) (text/plain)\n"
+    return description
+
+
+def builder_description(body_html: str, attachment_count: int) -> tuple[str, int]:
+    builder = DescriptionBuilder(max_chars=DEFAULT_MAX_CHARS)
+    builder.write_header("**Reported by:** user@example.com\n\n")
+    builder.write_footer("\n\n**Attachments:**\n")
+    for n in range(attachment_count):
+        builder.write_footer(f"- [log-{n}.txt](https://files.example.com/{n}) (text/plain)\n")
+    builder.write_body(_h2t.handle(body_html).strip())
+    description = builder.build(overflow_url="https://files.example.com/overflow.txt")
+    overflow = builder.overflow_chars
+    builder.close()
+    return description, overflow
+
+
+def measure(fn, repeat: int):
+    """Best-of-N wall time plus peak traced memory of one run."""
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, best, peak
+
+
+def run(shape: str, body_html: str, args: argparse.Namespace) -> None:
+    naive, naive_t, naive_mem = measure(lambda: naive_description(body_html, args.attachments), args.repeat)
+    (built, overflow), built_t, built_mem = measure(
+        lambda: builder_description(body_html, args.attachments), args.repeat
+    )
+    label = f"{len(body_html) / 1e6:.1f} MB"
+    print(
+        f"{shape:<7} {label:>8}  {'naive':<8} {naive_t * 1000:>7.1f}ms "
+        f"{naive_mem / 1e6:>8.1f}MB {len(naive):>11,} {'-':>10}"
+    )
+    print(
+        f"{'':<7} {'':>8}  {'builder':<8} {built_t * 1000:>7.1f}ms "
+        f"{built_mem / 1e6:>8.1f}MB {len(built):>11,} {overflow:>10,}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000, 5_000_000])
+    parser.add_argument("--attachments", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'shape':<7} {'input':>8}  {'path':<8} {'time':>9} {'peak mem':>10} {'output':>11} {'overflow':>10}")
+    for shape, generate in SHAPES.items():
+        for size in args.sizes:
+            run(shape, generate(size), args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+"""Near-duplicate bug report detection with MinHash + LSH.
+
+During an outage dozens of people email about the same bug. Each report
+is reduced to a MinHash signature over word shingles; signatures are
+bucketed by LSH bands so lookups only compare against plausible
+candidates. The index is persisted to a local JSON file and bounded by
+both entry count and a time window.
+
+Looking up a report and indexing the issue created for it happen on
+either side of a Linear round trip, so two similar reports arriving
+together could both miss and open two issues. reserve() closes that gap:
+a report that misses holds a reservation until its issue is indexed, and
+similar reports arriving meanwhile wait for it and become comments.
+
+    with duplicate_index.reserve(text) as reservation:
+        if reservation.duplicate:
+            ...  # Comment on reservation.duplicate
+        else:
+            ...  # Create the issue, then reservation.fill(issue_id=..., ...)
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+NUM_PERM = 128
+BANDS = 32
+ROWS = NUM_PERM // BANDS  # LSH candidate threshold ~ (1/BANDS) ** (1/ROWS) ~ 0.42
+SHINGLE_SIZE = 2
+MAX_SIGNATURE_CHARS = 20_000  # Long threads: the start of the report is what matters
+DEFAULT_RESERVATION_WAIT_SECONDS = 120.0  # Longest a report waits on a similar one being filed
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+_WORD = re.compile(r"\w+")
+
+_rng = random.Random(0x5E4A)
+_PERMUTATIONS = [
+    (_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME)) for _ in range(NUM_PERM)
+]
+
+
+def shingles(text: str) -> set[str]:
+    """Word n-gram shingles of the normalized text."""
+    words = _WORD.findall(text[:MAX_SIGNATURE_CHARS].lower())
+    if len(words) < SHINGLE_SIZE:
+        return set(words)
+    return {" ".join(words[i : i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def minhash(text: str) -> list[int]:
+    """Compute the MinHash signature of a text."""
+    hashes = [
+        int.from_bytes(hashlib.blake2b(s.encode(), digest_size=8).digest(), "big") & _MAX_HASH
+        for s in shingles(text)
+    ]
+    if not hashes:
+        return [_MAX_HASH] * NUM_PERM
+    return [min((a * h + b) % _MERSENNE_PRIME & _MAX_HASH for h in hashes) for a, b in _PERMUTATIONS]
+
+
+def similarity(sig_a: list[int], sig_b: list[int]) -> float:
+    """Estimated Jaccard similarity of two signatures."""
+    return sum(1 for a, b in zip(sig_a, sig_b) if a == b) / NUM_PERM
+
+
+def _band_keys(signature: list[int]) -> list[tuple[int, int]]:
+    return [(band, hash(tuple(signature[band * ROWS : (band + 1) * ROWS]))) for band in range(BANDS)]
+
+
+@dataclass(frozen=True)
+class IndexedReport:
+    """A previously filed report that later reports can be folded into."""
+
+    issue_id: str
+    identifier: str
+    url: str
+    signature: list[int]
+    created_at: float
+
+
+class Reservation:
+    """One report's claim on the index, from DuplicateIndex.reserve().
+
+    `duplicate` is the recent report to fold this one into, if any.
+    Otherwise the caller files a new issue and calls fill(); leaving the
+    `with` block without filling releases the claim, and the reports
+    waiting on it look again.
+    """
+
+    def __init__(self, index: DuplicateIndex, signature: list[int], duplicate: IndexedReport | None) -> None:
+        self._index = index
+        self.signature = signature
+        self.duplicate = duplicate
+        self.done = threading.Event()
+
+    def fill(self, *, issue_id: str, identifier: str, url: str) -> None:
+        """Index the issue created for this report and wake the reports waiting on it."""
+        entry = IndexedReport(
+            issue_id=issue_id,
+            identifier=identifier,
+            url=url,
+            signature=self.signature,
+            created_at=time.time(),
+        )
+        self._index._complete(self, entry)
+
+    def __enter__(self) -> Reservation:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._index._release(self)
+
+
+class DuplicateIndex:
+    """Bounded, persistent MinHash LSH index over recent bug reports."""
+
+    def __init__(
+        self,
+        path: Path | None,
+        *,
+        threshold: float = 0.5,
+        max_entries: int = 1000,
+        window_seconds: float = 24 * 60 * 60,
+    ) -> None:
+        self.path = path
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.window_seconds = window_seconds
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, IndexedReport] = OrderedDict()
+        self._buckets: dict[tuple[int, int], set[str]] = {}
+        self._pending: list[Reservation] = []
+        if path and path.exists():
+            self._load()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def find(self, text: str) -> IndexedReport | None:
+        """Return the most similar recent report above the threshold, if any."""
+        signature = minhash(text)
+        with self._lock:
+            return self._best_match(signature)
+
+    def reserve(self, text: str, *, wait: float = DEFAULT_RESERVATION_WAIT_SECONDS) -> Reservation:
+        """Find a near-duplicate of `text`, or claim it as a new report.
+
+        If a similar report is being filed right now, wait up to `wait`
+        seconds for its issue and return that as the duplicate.
+        """
+        signature = minhash(text)
+        deadline = time.monotonic() + wait
+        while True:
+            with self._lock:
+                duplicate = self._best_match(signature)
+                if duplicate:
+                    return Reservation(self, signature, duplicate)
+                pending = self._similar_pending(signature)
+                if pending is None or time.monotonic() >= deadline:
+                    reservation = Reservation(self, signature, None)
+                    self._pending.append(reservation)
+                    return reservation
+            pending.done.wait(max(0.0, deadline - time.monotonic()))
+
+    def add(self, text: str, *, issue_id: str, identifier: str, url: str) -> None:
+        """Index a newly created issue and persist the index."""
+        entry = IndexedReport(
+            issue_id=issue_id,
+            identifier=identifier,
+            url=url,
+            signature=minhash(text),
+            created_at=time.time(),
+        )
+        with self._lock:
+            self._store(entry)
+
+    def _best_match(self, signature: list[int]) -> IndexedReport | None:
+        self._prune(time.time())
+        candidates: set[str] = set()
+        for key in _band_keys(signature):
+            candidates |= self._buckets.get(key, set())
+        best, best_score = None, self.threshold
+        for issue_id in candidates:
+            entry = self._entries[issue_id]
+            score = similarity(signature, entry.signature)
+            if score >= best_score:
+                best, best_score = entry, score
+        return best
+
+    def _similar_pending(self, signature: list[int]) -> Reservation | None:
+        # Only reports in flight, so a linear scan is fine
+        for reservation in self._pending:
+            if similarity(signature, reservation.signature) >= self.threshold:
+                return reservation
+        return None
+
+    def _complete(self, reservation: Reservation, entry: IndexedReport) -> None:
+        with self._lock:
+            self._store(entry)
+        self._release(reservation)
+
+    def _release(self, reservation: Reservation) -> None:
+        with self._lock:
+            if reservation in self._pending:
+                self._pending.remove(reservation)
+        reservation.done.set()
+
+    def _store(self, entry: IndexedReport) -> None:
+        self._insert(entry)
+        self._prune(entry.created_at)
+        self._save()
+
+    def _insert(self, entry: IndexedReport) -> None:
+        self._entries[entry.issue_id] = entry
+        for key in _band_keys(entry.signature):
+            self._buckets.setdefault(key, set()).add(entry.issue_id)
+
+    def _remove(self, issue_id: str) -> None:
+        entry = self._entries.pop(issue_id)
+        for key in _band_keys(entry.signature):
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.discard(issue_id)
+                if not bucket:
+                    del self._buckets[key]
+
+    def _prune(self, now: float) -> None:
+        """Drop entries outside the time window or beyond max_entries (oldest first)."""
+        cutoff = now - self.window_seconds
+        while self._entries:
+            oldest = next(iter(self._entries.values()))
+            if oldest.created_at >= cutoff and len(self._entries) <= self.max_entries:
+                break
+            self._remove(oldest.issue_id)
+
+    def _load(self) -> None:
+        try:
+            data = json.loads(self.path.read_text())
+            for raw in data.get("entries", []):
+                self._insert(IndexedReport(**raw))
+        except (OSError, ValueError, TypeError) as e:
+            print(f"Ignoring unreadable dedup index {self.path}: {e}")
+            self._entries.clear()
+            self._buckets.clear()
+        self._prune(time.time())
+
+    def _save(self) -> None:
+        if not self.path:
+            return
+        data = {"version": 1, "entries": [asdict(e) for e in self._entries.values()]}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.path.parent, prefix=".dedup-")
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp, self.path)
@@ -0,0 +1,202 @@
+"""Size-bounded Linear issue descriptions for huge bug-report emails.
+
+A long thread with quoted history converts to a multi-MB markdown body,
+which Linear rejects. The DescriptionBuilder streams the body line by
+line into a bounded buffer:
+
+- quoted replies (`>` lines) collapse to a single marker,
+- reply history (`On ... wrote:`, `-----Original Message-----`) and
+  signatures (`-- `, `Sent from my iPhone`) end the body, and that tail
+  is kept in the overflow file rather than dropped,
+- once the budget is spent, the rest spills into an overflow file that
+  the caller can attach to the issue.
+
+A forwarded message (`---------- Forwarded message ---------`) is the
+report itself, so it stays in the body. Without somewhere to store the
+overflow (no attachment mirror), the notice only says how much was
+omitted.
+
+The header and footer (reporter, attachment list) are bounded up front,
+so only the body is ever truncated and the attachment list survives.
+"""
+
+from __future__ import annotations
+
+import io
+import itertools
+import re
+import tempfile
+from collections.abc import Iterable, Iterator
+
+DEFAULT_MAX_CHARS = 100_000
+OVERFLOW_SPOOL_BYTES = 1024 * 1024  # Overflow stays in memory up to 1 MB, then spills to disk
+MAX_HEADER_FRACTION = 0.25  # Of max_chars
+MAX_FOOTER_FRACTION = 0.25
+NOTICE_RESERVE_CHARS = 500  # Truncation notice, including the overflow link
+FOOTER_OMISSION_RESERVE_CHARS = 50  # "...and N more not listed"
+
+OVERFLOW_FILENAME = "report-overflow.txt"
+QUOTED_MARKER = "> _[quoted text hidden]_\n"
+TRIMMED_SEPARATOR = "\n----- Reply history and signature (trimmed from the description) -----\n"
+
+_REPLY_HISTORY = re.compile(
+    r"^\s*(?:"
+    r"On .{1,200} wrote:\s*$"  # Gmail / Apple Mail
+    r"|-{2,}\s*Original Message\s*-{2,}"  # Outlook
+    r"|_{10,}\s*$"  # Outlook web separator
+    r")",
+    re.IGNORECASE,
+)
+_SIGNATURE = re.compile(r"^(?:--\s*|Sent from my \w+.*|Get Outlook for \w+.*)$", re.IGNORECASE)
+
+
+def _iter_lines(text: str) -> Iterator[str]:
+    """Yield lines (with newlines) without copying the whole text up front."""
+    start = 0
+    while start < len(text):
+        end = text.find("\n", start)
+        end = len(text) if end == -1 else end + 1
+        yield text[start:end]
+        start = end
+
+
+class DescriptionBuilder:
+    """Build a description that never exceeds max_chars."""
+
+    def __init__(self, max_chars: int = DEFAULT_MAX_CHARS) -> None:
+        self.max_chars = max_chars
+        self._header = io.StringIO()
+        self._header_chars = 0
+        self._body = io.StringIO()
+        self._body_chars = 0
+        self._budget: int | None = None
+        self._footer = io.StringIO()
+        self._footer_chars = 0
+        self.omitted_footer_entries = 0
+        self._overflow: tempfile.SpooledTemporaryFile | None = None
+        self.overflow_chars = 0
+        self._trimmed: tempfile.SpooledTemporaryFile | None = None
+        self.trimmed_chars = 0
+        self.trimmed_lines = 0
+
+    @property
+    def truncated(self) -> bool:
+        return self._overflow is not None
+
+    def write_header(self, text: str) -> None:
+        """Add to the header; anything past its share of max_chars is cut."""
+        text = text[: max(0, int(self.max_chars * MAX_HEADER_FRACTION) - self._header_chars)]
+        self._header.write(text)
+        self._header_chars += len(text)
+
+    def write_footer(self, text: str) -> None:
+        """Add one footer entry (e.g. an attachment line).
+
+        Entries past the footer's share of max_chars are counted and
+        summarized as "...and N more not listed" instead of kept.
+        """
+        limit = int(self.max_chars * MAX_FOOTER_FRACTION) - FOOTER_OMISSION_RESERVE_CHARS
+        if self.omitted_footer_entries or self._footer_chars + len(text) > limit:
+            self.omitted_footer_entries += 1
+            return
+        self._footer.write(text)
+        self._footer_chars += len(text)
+
+    def write_body(self, text: str) -> None:
+        """Stream email body text, trimming quoted replies and signatures."""
+        self.write_body_lines(_iter_lines(text))
+
+    def write_body_lines(self, lines: Iterable[str]) -> None:
+        """Stream body lines. Write the header and footer first so the budget is known."""
+        if self._budget is None:
+            self._budget = self._body_budget()
+        lines = iter(lines)
+        in_quote = False
+        for line in lines:
+            stripped = line.rstrip("\r\n")
+            if _REPLY_HISTORY.match(stripped) or _SIGNATURE.match(stripped):
+                # Everything after is history or signature: set it aside for the overflow file
+                self._trimmed = _spool()
+                for tail_line in itertools.chain([line], lines):
+                    self._trimmed.write(tail_line)
+                    self.trimmed_chars += len(tail_line)
+                    self.trimmed_lines += 1
+                break
+            if stripped.startswith(">"):
+                self.trimmed_lines += 1
+                if not in_quote:
+                    self._append(QUOTED_MARKER)
+                    in_quote = True
+                continue
+            in_quote = False
+            self._append(line if line.endswith("\n") else line + "\n")
+
+    def _body_budget(self) -> int:
+        # Reserve room for header, footer, and the truncation notice
+        reserved = self._header_chars + self._footer_chars + NOTICE_RESERVE_CHARS
+        if self.omitted_footer_entries:
+            reserved += FOOTER_OMISSION_RESERVE_CHARS
+        return max(0, self.max_chars - reserved)
+
+    def _append(self, text: str) -> None:
+        if self._overflow is None:
+            room = self._budget - self._body_chars
+            if len(text) <= room:
+                self._body.write(text)
+                self._body_chars += len(text)
+                return
+            # Cut on a line boundary so markdown isn't split mid-line, unless a
+            # single line is bigger than the whole budget
+            cut = text.rfind("\n", 0, room) + 1 if room > 0 else 0
+            if not cut and len(text) > self._budget:
+                cut = max(room, 0)
+            head = text[:cut]
+            self._body.write(head)
+            self._body_chars += len(head)
+            text = text[len(head):]
+            self._overflow = _spool()
+        self._overflow.write(text)
+        self.overflow_chars += len(text)
+
+    def overflow_bytes(self) -> bytes | None:
+        """The body text that didn't fit, then the trimmed reply history; None if there's neither."""
+        if self._overflow is None and self._trimmed is None:
+            return None
+        parts = []
+        if self._overflow is not None:
+            self._overflow.seek(0)
+            parts.append(self._overflow.read())
+        if self._trimmed is not None:
+            self._trimmed.seek(0)
+            parts.append(TRIMMED_SEPARATOR + self._trimmed.read())
+        return "".join(parts).encode("utf-8")
+
+    def build(self, overflow_url: str | None = None) -> str:
+        """Render the final description. Header, footer and notice fit in their reserved room."""
+        parts = [self._header.getvalue(), self._body.getvalue().rstrip("\n")]
+        if self.truncated:
+            notice = self._notice(overflow_url)
+            if len(notice) > NOTICE_RESERVE_CHARS:
+                notice = self._notice(None)  # A link too long to fit is left out
+            parts.append(notice)
+        elif self._trimmed is not None and overflow_url:
+            notice = f"\n\n_Reply history and signature in [{OVERFLOW_FILENAME}]({overflow_url})._"
+            if len(notice) <= NOTICE_RESERVE_CHARS:
+                parts.append(notice)
+        parts.append(self._footer.getvalue())
+        if self.omitted_footer_entries:
+            parts.append(f"_...and {self.omitted_footer_entries:,} more not listed._\n")
+        return "".join(parts)
+
+    def _notice(self, overflow_url: str | None) -> str:
+        notice = f"\n\n_Description truncated: {self.overflow_chars:,} more characters"
+        return notice + (f" in [{OVERFLOW_FILENAME}]({overflow_url})._" if overflow_url else " omitted._")
+
+    def close(self) -> None:
+        for spool in (self._overflow, self._trimmed):
+            if spool is not None:
+                spool.close()
+
+
+def _spool() -> tempfile.SpooledTemporaryFile:
+    return tempfile.SpooledTemporaryFile(max_size=OVERFLOW_SPOOL_BYTES, mode="w+", encoding="utf-8")
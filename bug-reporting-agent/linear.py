@@ -0,0 +1,240 @@
+"""Linear GraphQL client with micro-batched issue creation.
+
+Every bug report used to be its own HTTP round trip to Linear. The
+IssueBatcher collects issueCreate mutations queued within a short window
+and sends them as one aliased GraphQL request:
+
+    mutation BatchCreateIssues($input0: IssueCreateInput!, $input1: IssueCreateInput!) {
+        i0: issueCreate(input: $input0) { success issue { id identifier url } }
+        i1: issueCreate(input: $input1) { success issue { id identifier url } }
+    }
+
+Per-alias results and errors are mapped back to each caller's Future. An
+error for the whole request (no alias in its path) is retried one input at
+a time, so one invalid input doesn't fail the reports batched with it.
+"""
+
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+import httpx
+
+from ratelimit import AdaptiveLimiter
+
+LINEAR_API_URL = "https://api.linear.app/graphql"
+DEFAULT_RESULT_TIMEOUT_SECONDS = 120.0  # Covers the HTTP timeout plus rate-limit waits
+
+
+class LinearError(Exception):
+    """Error from Linear API."""
+    pass
+
+
+def _send(limiter: AdaptiveLimiter | None, send: Callable[[], httpx.Response]) -> httpx.Response:
+    """Send through the rate limiter when one is configured."""
+    return limiter.call(send) if limiter else send()
+
+
+def linear_request(
+    query: str,
+    variables: dict,
+    *,
+    api_key: str,
+    url: str = LINEAR_API_URL,
+    limiter: AdaptiveLimiter | None = None,
+) -> dict:
+    """POST a GraphQL operation to Linear. Returns the `data` object."""
+    response = _send(
+        limiter,
+        lambda: httpx.post(
+            url,
+            json={"query": query, "variables": variables},
+            headers={"Authorization": api_key, "Content-Type": "application/json"},
+        ),
+    )
+    response.raise_for_status()
+    data = response.json()
+
+    # GraphQL can return 200 with errors in the response
+    if "errors" in data:
+        raise LinearError(data["errors"][0].get("message", "Unknown error"))
+
+    return data["data"]
+
+
+def build_batch_mutation(count: int) -> str:
+    """Build an aliased mutation creating `count` issues in one request."""
+    params = ", ".join(f"$input{i}: IssueCreateInput!" for i in range(count))
+    fields = "\n".join(
+        f"    i{i}: issueCreate(input: $input{i}) {{ success issue {{ id identifier url }} }}"
+        for i in range(count)
+    )
+    return f"mutation BatchCreateIssues({params}) {{\n{fields}\n}}"
+
+
+class IssueBatcher:
+    """Collect issueCreate calls for `window` seconds and send them as one request."""
+
+    def __init__(
+        self,
+        *,
+        api_key: str,
+        team_id: str,
+        url: str = LINEAR_API_URL,
+        window: float = 0.05,
+        max_batch: int = 20,
+        limiter: AdaptiveLimiter | None = None,
+        result_timeout: float = DEFAULT_RESULT_TIMEOUT_SECONDS,
+    ) -> None:
+        self.api_key = api_key
+        self.team_id = team_id
+        self.url = url
+        self.window = window
+        self.max_batch = max_batch
+        self.limiter = limiter
+        self.result_timeout = result_timeout
+        self._pending: queue.Queue[tuple[dict, Future]] = queue.Queue()
+        self._http = httpx.Client(timeout=30.0)
+        self._worker: threading.Thread | None = None
+        self._worker_lock = threading.Lock()
+
+    def submit(self, title: str, description: str) -> Future:
+        """Queue an issue for creation. The Future resolves to (id, identifier, url)."""
+        self._ensure_worker()
+        future: Future = Future()
+        issue_input = {"title": title, "description": description, "teamId": self.team_id}
+        self._pending.put((issue_input, future))
+        return future
+
+    def create_issue(self, title: str, description: str) -> tuple[str, str, str]:
+        """Create an issue, waiting for its batch to be sent. Returns (id, identifier, url).
+
+        Raises httpx.TimeoutException if the batch hasn't resolved within result_timeout.
+        """
+        future = self.submit(title, description)
+        try:
+            return future.result(timeout=self.result_timeout)
+        except FutureTimeoutError:
+            future.cancel()  # Dropped from its batch if it hasn't been sent yet
+            raise httpx.TimeoutException(f"No response from Linear within {self.result_timeout:.0f}s") from None
+
+    def _ensure_worker(self) -> None:
+        with self._worker_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="linear-batcher", daemon=True)
+                self._worker.start()
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._pending.get()]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._pending.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._flush(batch)
+
+    def _flush(self, batch: list[tuple[dict, Future]]) -> None:
+        """Send one aliased mutation and resolve every caller's Future.
+
+        Nothing escapes: an unexpected error fails the batch's unresolved
+        Futures instead of killing the worker and leaving them pending.
+        """
+        live = [(issue_input, future) for issue_input, future in batch
+                if future.set_running_or_notify_cancel()]
+        if not live:
+            return
+        futures = [future for _, future in live]
+        try:
+            self._send_batch([issue_input for issue_input, _ in live], futures)
+        except Exception as e:
+            for future in futures:
+                if not future.done():
+                    future.set_exception(e)
+
+    def _send_batch(self, inputs: list[dict], futures: list[Future]) -> None:
+        request_body = {
+            "query": build_batch_mutation(len(inputs)),
+            "variables": {f"input{i}": issue_input for i, issue_input in enumerate(inputs)},
+        }
+        response = _send(
+            self.limiter,
+            lambda: self._http.post(
+                self.url,
+                json=request_body,
+                headers={"Authorization": self.api_key, "Content-Type": "application/json"},
+            ),
+        )
+        response.raise_for_status()
+        body = response.json()
+        if not isinstance(body, dict):
+            raise LinearError("Unexpected response from Linear")
+
+        # Errors carry the alias as the first path element; anything else fails the whole batch
+        alias_errors: dict[str, str] = {}
+        batch_error: str | None = None
+        for error in body.get("errors") or []:
+            path = error.get("path") or []
+            message = error.get("message", "Unknown error")
+            if path and isinstance(path[0], str):
+                alias_errors.setdefault(path[0], message)
+            elif batch_error is None:
+                batch_error = message
+
+        data = body.get("data") or {}
+        unresolved: list[tuple[dict, Future]] = []
+        for i, future in enumerate(futures):
+            alias = f"i{i}"
+            result = data.get(alias)
+            if alias in alias_errors:
+                future.set_exception(LinearError(alias_errors[alias]))
+            elif result and result.get("issue"):
+                issue = result["issue"]
+                future.set_result((issue["id"], issue["identifier"], issue["url"]))
+            else:
+                unresolved.append((inputs[i], future))
+
+        # A batch-level error (e.g. one input failing variable validation) rejects the
+        # whole request, so send each input on its own to find out which one it was
+        if batch_error and len(inputs) > 1:
+            for issue_input, future in unresolved:
+                try:
+                    self._send_batch([issue_input], [future])
+                except Exception as e:
+                    future.set_exception(e)
+            return
+        for _, future in unresolved:
+            future.set_exception(LinearError(batch_error or "Issue was not created"))
+
+
+def comment_on_issue(
+    issue_id: str,
+    body: str,
+    *,
+    api_key: str,
+    url: str = LINEAR_API_URL,
+    limiter: AdaptiveLimiter | None = None,
+) -> str:
+    """Add a comment to an existing Linear issue. Returns the comment URL."""
+    query = """
+        mutation CreateComment($issueId: String!, $body: String!) {
+            commentCreate(input: { issueId: $issueId, body: $body }) {
+                success
+                comment { id url }
+            }
+        }
+    """
+    data = linear_request(
+        query, {"issueId": issue_id, "body": body}, api_key=api_key, url=url, limiter=limiter
+    )
+    return data["commentCreate"]["comment"]["url"]
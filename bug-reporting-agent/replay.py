@@ -0,0 +1,125 @@
+"""Replay recorded webhooks through the bug reporter with every upstream stubbed.
+
+Record traffic with WEBHOOK_RECORD_PATH=webhooks.jsonl.gz, then:
+
+    python replay.py webhooks.jsonl.gz --speed 0 --report run.json
+    python replay.py webhooks.jsonl.gz --speed 0 --compare run.json
+
+Linear answers from a stub transport after --linear-latency-ms, so issue
+batching and the limiter run as they do in production. The Sema API
+client and the attachment mirror are off. The duplicate index lives in
+a temp file, so runs don't affect each other or the real index.
+
+Usage: python replay.py RECORDING [--speed 0] [--concurrency 16] [--report FILE] [--compare FILE]
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+
+import httpx
+
+from webhook_recorder import compare_reports, replay
+
+REPLAY_SECRET = "whsec_cmVwbGF5LXNlY3JldC1mb3ItbG9jYWwtcnVucw=="
+
+
+class StubLinear:
+    """Answers Linear GraphQL requests after a fixed latency and counts them."""
+
+    def __init__(self, latency: float) -> None:
+        self.latency = latency
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.issues = 0
+        self.comments = 0
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        time.sleep(self.latency)
+        variables = json.loads(request.content).get("variables", {})
+        data = {}
+        for alias, _ in sorted(variables.items()):
+            issue_id = uuid.uuid4().hex
+            data[f"i{alias.removeprefix('input')}"] = {
+                "success": True,
+                "issue": {"id": issue_id, "identifier": f"BUG-{issue_id[:6]}", "url": f"https://linear.test/{issue_id}"},
+            }
+        with self._lock:
+            self.requests += 1
+            self.issues += len(data)
+        return httpx.Response(200, json={"data": data})
+
+    def comment(self, issue_id: str, body: str) -> str:
+        time.sleep(self.latency)
+        with self._lock:
+            self.requests += 1
+            self.comments += 1
+        return f"https://linear.test/{issue_id}#comment-{uuid.uuid4().hex[:8]}"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("recording", type=Path)
+    parser.add_argument("--speed", type=float, default=0.0, help="1 = recorded pace, N = N times faster, 0 = max")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--limit", type=int, help="replay only the first N webhooks")
+    parser.add_argument("--linear-latency-ms", type=float, default=150)
+    parser.add_argument("--report", type=Path, help="write the JSON report here")
+    parser.add_argument("--compare", type=Path, help="print deltas against an earlier report")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="bug-replay-")
+    os.environ.update(
+        SEMA_WEBHOOK_SECRET=REPLAY_SECRET,
+        LINEAR_API_KEY="lin_api_replay",
+        LINEAR_TEAM_ID="REPLAY",
+        DEDUP_INDEX_PATH=str(Path(tmp) / "dedup_index.json"),
+    )
+    for name in ("SEMA_API_KEY", "ATTACHMENT_MIRROR", "WEBHOOK_RECORD_PATH"):
+        os.environ.pop(name, None)
+
+    import app  # Reads the environment above at import time
+
+    linear = StubLinear(args.linear_latency_ms / 1000)
+    app.issue_batcher._http = httpx.Client(transport=httpx.MockTransport(linear.handle))
+    app.comment_on_linear_issue = linear.comment
+    client = app.app.test_client()
+
+    # The handler's per-issue log lines would drown the report
+    with open(os.devnull, "w") as quiet, contextlib.redirect_stdout(quiet):
+        report = replay(
+            args.recording,
+            lambda payload, headers: client.post("/webhook", data=payload, headers=headers).status_code,
+            secret=REPLAY_SECRET,
+            speed=args.speed,
+            concurrency=args.concurrency,
+            limit=args.limit,
+        )
+    report["app"] = "bug-reporting-agent"
+    report["upstream"] = {
+        "linear_latency_ms": args.linear_latency_ms,
+        "linear_requests": linear.requests,
+        "issues_created": linear.issues,
+        "comments": linear.comments,
+    }
+
+    print(json.dumps(report, indent=2))
+    if args.report:
+        args.report.write_text(json.dumps(report, indent=2) + "\n")
+    if args.compare:
+        print(f"\nvs {args.compare}:", file=sys.stderr)
+        for line in compare_reports(json.loads(args.compare.read_text()), report):
+            print(f"  {line}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
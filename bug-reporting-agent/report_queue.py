@@ -0,0 +1,105 @@
+"""Bug reports waiting for Linear, kept on disk until they can be filed.
+
+While Linear's circuit breaker is open, /webhook queues the report and
+answers 202 instead of making Sema redeliver into a dead upstream. The
+queue is a JSONL file, one report per line, so a restart keeps it. A
+background thread drains it oldest first whenever the breaker lets a
+call through, and stops at the first report that fails, leaving it and
+everything after it for the next pass. A report that can never be filed
+is moved to a dead-letter file (`<path>.failed`) by the deliver
+callback, so it doesn't block the reports behind it.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+from collections.abc import Callable
+from pathlib import Path
+
+DEFAULT_DRAIN_INTERVAL_SECONDS = 5.0
+
+
+class ReportQueue:
+    """FIFO of reports persisted as JSONL. Safe to use from several threads."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.failed_path = path.with_name(path.name + ".failed")
+        self._lock = threading.Lock()
+        self._drain_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._reports: list[dict] = []
+        if path.exists():
+            for line in path.read_text().splitlines():
+                try:
+                    self._reports.append(json.loads(line))
+                except ValueError:
+                    break  # A line cut short by a crash mid-write
+        self.delivered = 0
+        self.failed = 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._reports)
+
+    def put(self, report: dict) -> None:
+        """Append a report, on disk before returning."""
+        with self._lock:
+            self._reports.append(report)
+            with self.path.open("a") as f:
+                f.write(json.dumps(report) + "\n")
+
+    def dead_letter(self, report: dict, error: str) -> None:
+        """Set aside a report that will never be filed, with the reason."""
+        with self._lock:
+            with self.failed_path.open("a") as f:
+                f.write(json.dumps({**report, "error": error}) + "\n")
+            self.failed += 1
+
+    def _pop(self) -> None:
+        with self._lock:
+            self._reports.pop(0)
+            tmp = self.path.with_name(self.path.name + ".tmp")
+            tmp.write_text("".join(json.dumps(r) + "\n" for r in self._reports))
+            os.replace(tmp, self.path)
+
+    def drain(self, deliver: Callable[[dict], object]) -> int:
+        """Deliver reports oldest first until one raises. Returns how many were delivered."""
+        delivered = 0
+        with self._drain_lock:
+            while True:
+                with self._lock:
+                    if not self._reports:
+                        return delivered
+                    report = self._reports[0]
+                try:
+                    deliver(report)
+                except Exception as e:
+                    print(f"Queued report not delivered ({len(self)} waiting): {e}")
+                    return delivered
+                self._pop()
+                delivered += 1
+                self.delivered += 1
+
+    def start(self, deliver: Callable[[dict], object], interval: float = DEFAULT_DRAIN_INTERVAL_SECONDS) -> None:
+        """Drain every `interval` seconds on a daemon thread."""
+
+        def run() -> None:
+            while not self._stop.wait(interval):
+                if len(self):
+                    self.drain(deliver)
+
+        self._thread = threading.Thread(target=run, name="report-queue", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def snapshot(self) -> dict:
+        """Queue depth, delivered and dead-lettered counts, for the /health endpoint."""
+        return {"queued": len(self), "delivered": self.delivered, "failed": self.failed}
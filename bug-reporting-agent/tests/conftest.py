@@ -0,0 +1,22 @@
+"""Pytest configuration: set required env vars before importing app."""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+os.environ.setdefault("SEMA_WEBHOOK_SECRET", "whsec_test")
+os.environ.setdefault("LINEAR_API_KEY", "lin_api_test")
+os.environ.setdefault("LINEAR_TEAM_ID", "TEAM-123")
+os.environ.setdefault("DEDUP_ENABLED", "false")
+
+import pytest
+
+from app import app as flask_app
+
+
+@pytest.fixture()
+def client():
+    flask_app.config["TESTING"] = True
+    with flask_app.test_client() as c:
+        yield c
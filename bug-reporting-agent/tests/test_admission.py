@@ -0,0 +1,70 @@
+"""Tests for the webhook admission controller."""
+
+import pytest
+
+import admission as admission_module
+from admission import AdmissionController
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(admission_module.time, "monotonic", lambda: now[0])
+    return now
+
+
+def finish_after(controller: AdmissionController, clock: list[float], seconds: float) -> None:
+    ticket = controller.admit()
+    clock[0] += seconds
+    ticket.done()
+
+
+def test_sheds_at_max_in_flight():
+    controller = AdmissionController(max_in_flight=2)
+    first, second = controller.admit(), controller.admit()
+
+    assert controller.admit() is None
+    first.done()
+    first.done()  # A second finish does not free another slot
+    assert controller.admit() is not None
+    assert controller.admit() is None
+    second.done()
+    snapshot = controller.snapshot()
+    assert snapshot["in_flight"] == 1
+    assert (snapshot["admitted"], snapshot["rejected"]) == (3, 2)
+
+
+def test_limit_shrinks_with_latency_and_recovers(clock):
+    controller = AdmissionController(max_in_flight=40, min_in_flight=4, latency_target=1.0)
+    finish_after(controller, clock, 0.5)
+    assert controller.snapshot()["limit"] == 40
+
+    for _ in range(30):
+        finish_after(controller, clock, 8.0)
+    assert controller.snapshot()["latency_ewma_ms"] > 4000
+    assert 4 <= controller.snapshot()["limit"] < 10
+
+    for _ in range(60):
+        finish_after(controller, clock, 0.2)
+    assert controller.snapshot()["limit"] == 40
+
+
+def test_limit_never_drops_below_min_in_flight(clock):
+    controller = AdmissionController(max_in_flight=10, min_in_flight=3, latency_target=0.1)
+    finish_after(controller, clock, 100.0)
+
+    tickets = [controller.admit() for _ in range(4)]
+    assert [t is not None for t in tickets] == [True, True, True, False]
+
+
+def test_rejection_is_503_with_retry_after(clock):
+    controller = AdmissionController(max_retry_after=30)
+    body, status, headers = controller.rejection()
+    assert status == 503
+    assert headers == {"Retry-After": "1"}  # No samples yet
+
+    finish_after(controller, clock, 4.2)
+    assert controller.rejection()[2] == {"Retry-After": "5"}
+    for _ in range(100):
+        finish_after(controller, clock, 600.0)
+    assert controller.rejection()[2] == {"Retry-After": "30"}
@@ -0,0 +1,191 @@
+"""Tests for attachment mirroring: content keys, capped downloads, and stores."""
+
+import hashlib
+from datetime import datetime, timezone
+
+import httpx
+import pytest
+from sema_sdk.types import Attachment
+
+import attachments
+from attachments import (
+    AttachmentMirror,
+    AttachmentTooLarge,
+    LocalAttachmentStore,
+    content_key,
+    download_capped,
+)
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 64
+DIGEST = hashlib.sha256(PNG).hexdigest()
+
+
+def make_attachment(att_id: str, url: str, size: int = len(PNG), filename: str = "screenshot.png") -> Attachment:
+    return Attachment(
+        id=att_id,
+        filename=filename,
+        content_type="image/png",
+        size_bytes=size,
+        download_url=url,
+        created_at=datetime(2026, 1, 1, tzinfo=timezone.utc),
+    )
+
+
+def serve(routes: dict[str, bytes], headers: dict[str, str] | None = None) -> httpx.Client:
+    """An httpx client answering each path in `routes` with its bytes, 404 otherwise."""
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path not in routes:
+            return httpx.Response(404)
+        return httpx.Response(200, content=routes[request.url.path], headers=headers)
+
+    return httpx.Client(transport=httpx.MockTransport(handler))
+
+
+class FailingStore:
+    def exists(self, key: str) -> bool:
+        return False
+
+    def put(self, key: str, data: bytes, content_type: str) -> None:
+        raise OSError("disk full")
+
+    def url_for(self, key: str) -> str:
+        return f"https://files.example.com/{key}"
+
+
+# ---------------------------------------------------------------------------
+# content_key
+# ---------------------------------------------------------------------------
+
+
+def test_content_key_shards_by_digest_prefix_and_keeps_extension():
+    assert content_key(DIGEST, "Screen Shot.PNG", "image/png") == f"{DIGEST[:2]}/{DIGEST}.png"
+
+
+def test_content_key_falls_back_to_content_type_for_unsafe_extension():
+    assert content_key(DIGEST, "evil.png/../../x", "image/png") == f"{DIGEST[:2]}/{DIGEST}.png"
+    assert content_key(DIGEST, "report.tar-gz!", "application/pdf") == f"{DIGEST[:2]}/{DIGEST}.pdf"
+    assert content_key(DIGEST, "noextension", "application/x-unknown") == f"{DIGEST[:2]}/{DIGEST}"
+
+
+# ---------------------------------------------------------------------------
+# download_capped
+# ---------------------------------------------------------------------------
+
+
+def test_download_capped_returns_body_under_cap():
+    with serve({"/a.png": PNG}) as client:
+        assert download_capped(client, "https://sema.test/a.png", max_bytes=len(PNG)) == PNG
+
+
+def test_download_capped_rejects_declared_size_over_cap():
+    # The declared Content-Length is enough to refuse before reading the body
+    with serve({"/a.png": PNG}, headers={"Content-Length": "10000000"}) as client:
+        with pytest.raises(AttachmentTooLarge, match="10000000 bytes exceeds cap"):
+            download_capped(client, "https://sema.test/a.png", max_bytes=1024)
+
+
+def test_download_capped_rejects_streamed_size_over_cap():
+    def handler(request: httpx.Request) -> httpx.Response:
+        # No Content-Length: only the streamed byte count can catch it
+        return httpx.Response(200, content=iter([b"x" * 600, b"x" * 600]))
+
+    with httpx.Client(transport=httpx.MockTransport(handler)) as client:
+        with pytest.raises(AttachmentTooLarge, match="download exceeds cap of 1000"):
+            download_capped(client, "https://sema.test/big", max_bytes=1000)
+
+
+def test_download_capped_raises_on_http_error():
+    with serve({}) as client:
+        with pytest.raises(httpx.HTTPStatusError):
+            download_capped(client, "https://sema.test/missing", max_bytes=1024)
+
+
+# ---------------------------------------------------------------------------
+# LocalAttachmentStore
+# ---------------------------------------------------------------------------
+
+
+def test_local_store_writes_via_temp_file_and_rename(tmp_path, monkeypatch):
+    store = LocalAttachmentStore(tmp_path, "http://localhost:5000/attachments/")
+    key = content_key(DIGEST, "a.png", "image/png")
+    renames = []
+    real_replace = attachments.os.replace
+
+    def replace(src, dst):
+        renames.append((src, dst))
+        assert not store.exists(key)  # Nothing visible under the key until the rename
+        real_replace(src, dst)
+
+    monkeypatch.setattr(attachments.os, "replace", replace)
+    store.put(key, PNG, "image/png")
+
+    [(src, dst)] = renames
+    assert src != str(dst) and str(src).startswith(str(tmp_path / DIGEST[:2] / ".tmp-"))
+    assert (tmp_path / key).read_bytes() == PNG
+    assert [p.name for p in (tmp_path / DIGEST[:2]).iterdir()] == [f"{DIGEST}.png"]
+    assert store.url_for(key) == f"http://localhost:5000/attachments/{key}"
+
+
+def test_local_store_failed_rename_exposes_no_partial_blob(tmp_path, monkeypatch):
+    store = LocalAttachmentStore(tmp_path, "http://localhost:5000/attachments")
+    key = content_key(DIGEST, "a.png", "image/png")
+
+    def replace(src, dst):
+        raise OSError("interrupted")
+
+    monkeypatch.setattr(attachments.os, "replace", replace)
+    with pytest.raises(OSError):
+        store.put(key, PNG, "image/png")
+    assert not store.exists(key)
+
+
+def test_identical_bytes_are_stored_once(tmp_path, monkeypatch):
+    store = LocalAttachmentStore(tmp_path, "http://localhost:5000/attachments")
+    puts = []
+    real_put = store.put
+    monkeypatch.setattr(store, "put", lambda key, data, ct: (puts.append(key), real_put(key, data, ct)))
+    mirror = AttachmentMirror(store)
+
+    first = mirror.store_bytes(PNG, "one.png", "image/png")
+    second = mirror.store_bytes(PNG, "two.png", "image/png")
+
+    assert first == second
+    assert len(puts) == 1
+
+
+# ---------------------------------------------------------------------------
+# AttachmentMirror
+# ---------------------------------------------------------------------------
+
+
+def test_mirror_rewrites_download_urls(tmp_path):
+    mirror = AttachmentMirror(LocalAttachmentStore(tmp_path, "http://localhost:5000/attachments"))
+    mirror._http = serve({"/a.png": PNG})
+
+    [att] = mirror.mirror_attachments([make_attachment("att_1", "https://sema.test/a.png?sig=abc")])
+
+    assert att.download_url == f"http://localhost:5000/attachments/{DIGEST[:2]}/{DIGEST}.png"
+
+
+def test_mirror_keeps_presigned_url_when_download_fails(tmp_path):
+    mirror = AttachmentMirror(LocalAttachmentStore(tmp_path, "http://localhost:5000/attachments"), max_bytes=1024)
+    mirror._http = serve({"/a.png": PNG})
+    ok = make_attachment("att_ok", "https://sema.test/a.png")
+    missing = make_attachment("att_404", "https://sema.test/gone.png")
+    too_big = make_attachment("att_big", "https://sema.test/a.png", size=10_000)
+
+    result = {att.id: att.download_url for att in mirror.mirror_attachments([ok, missing, too_big])}
+
+    assert result["att_ok"].startswith("http://localhost:5000/attachments/")
+    assert result["att_404"] == "https://sema.test/gone.png"
+    assert result["att_big"] == "https://sema.test/a.png"
+
+
+def test_mirror_keeps_presigned_url_when_store_fails():
+    mirror = AttachmentMirror(FailingStore())
+    mirror._http = serve({"/a.png": PNG})
+
+    [att] = mirror.mirror_attachments([make_attachment("att_1", "https://sema.test/a.png")])
+
+    assert att.download_url == "https://sema.test/a.png"
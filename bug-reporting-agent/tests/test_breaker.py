@@ -0,0 +1,90 @@
+"""Tests for the upstream circuit breaker."""
+
+import pytest
+
+import breaker as breaker_module
+from breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, health
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(breaker_module.time, "monotonic", lambda: now[0])
+    return now
+
+
+def fail(breaker: CircuitBreaker, exc: Exception | None = None) -> None:
+    with pytest.raises(type(exc) if exc else RuntimeError):
+        with breaker.call():
+            raise exc or RuntimeError("upstream down")
+
+
+def test_opens_after_consecutive_failures_and_fails_fast(clock):
+    breaker = CircuitBreaker("linear", failure_threshold=3, reset_timeout=30)
+    fail(breaker)
+    fail(breaker)
+    with breaker.call():
+        pass  # A success resets the count
+    for _ in range(3):
+        fail(breaker)
+    assert breaker.state == OPEN
+
+    ran = []
+    with pytest.raises(CircuitOpenError) as excinfo:
+        with breaker.call():
+            ran.append(True)
+    assert ran == []
+    assert excinfo.value.name == "linear" and excinfo.value.retry_after == 30
+    assert breaker.snapshot()["rejected"] == 1
+
+
+def test_half_open_allows_one_trial(clock):
+    breaker = CircuitBreaker("sema", failure_threshold=1, reset_timeout=10)
+    fail(breaker)
+    clock[0] += 10
+    assert breaker.state == HALF_OPEN
+
+    breaker.allow()  # The trial
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN  # A failed trial re-opens at once
+    assert breaker.snapshot()["opened"] == 2
+
+    clock[0] += 10
+    with breaker.call():
+        pass
+    assert breaker.state == CLOSED
+
+
+def test_non_failures_count_as_success(clock):
+    breaker = CircuitBreaker("linear", failure_threshold=1, is_failure=lambda e: not isinstance(e, ValueError))
+    fail(breaker, ValueError("bad input"))
+    assert breaker.state == CLOSED
+
+
+def test_interrupted_trial_frees_the_slot(clock):
+    breaker = CircuitBreaker("openai", failure_threshold=1, reset_timeout=1)
+    fail(breaker)
+    clock[0] += 1
+    with pytest.raises(KeyboardInterrupt):
+        with breaker.call():
+            raise KeyboardInterrupt
+    assert breaker.state == HALF_OPEN
+    breaker.allow()
+
+
+def test_health_is_degraded_while_any_breaker_is_open(clock):
+    ok, down = CircuitBreaker("resend"), CircuitBreaker("gemini", failure_threshold=1, reset_timeout=5)
+    assert health(ok, down)["status"] == "ok"
+    fail(down)
+
+    body = health(ok, down)
+    assert body["status"] == "degraded"
+    assert body["breakers"]["gemini"] == {
+        "state": OPEN,
+        "consecutive_failures": 1,
+        "opened": 1,
+        "rejected": 0,
+        "retry_after_s": 5.0,
+    }
@@ -0,0 +1,250 @@
+"""Tests for the MinHash + LSH duplicate index."""
+
+import json
+import threading
+import time
+
+import pytest
+
+import dedup
+from dedup import DuplicateIndex, minhash, shingles, similarity
+
+CRASH = (
+    "Login crash on iOS\nThe app crashes as soon as I tap the login button after entering "
+    "my email and password. This started after the latest update this morning."
+)
+CRASH_AGAIN = (
+    "Login crash on iOS\nThe app crashes as soon as I tap the login button after entering "
+    "my email and password. It started after the latest update today."
+)
+BILLING = (
+    "Invoice shows the wrong currency\nOur March invoice was billed in euros although the "
+    "workspace is set to US dollars, and the PDF download link returns an error."
+)
+
+
+@pytest.fixture()
+def clock(monkeypatch):
+    """Controls time.time() as seen by dedup.py."""
+    now = [1_000_000.0]
+    monkeypatch.setattr(dedup.time, "time", lambda: now[0])
+    return now
+
+
+def add(index: DuplicateIndex, text: str, n: int) -> None:
+    index.add(text, issue_id=f"uuid-{n}", identifier=f"ENG-{n}", url=f"https://linear.app/ENG-{n}")
+
+
+# ---------------------------------------------------------------------------
+# Signatures
+# ---------------------------------------------------------------------------
+
+
+def test_shingles_are_lowercased_word_pairs():
+    assert shingles("Crash on LOGIN, again!") == {"crash on", "on login", "login again"}
+    assert shingles("Crash") == {"crash"}
+    assert shingles("") == set()
+
+
+def test_shingles_only_cover_the_start_of_long_reports():
+    long_report = CRASH + " quoted" * dedup.MAX_SIGNATURE_CHARS + " invoice currency"
+    assert "login crash" in shingles(long_report)
+    assert "invoice currency" not in shingles(long_report)
+
+
+def test_similarity_estimates_jaccard():
+    assert similarity(minhash(CRASH), minhash(CRASH)) == 1.0
+    assert similarity(minhash(CRASH), minhash(CRASH_AGAIN)) >= 0.5
+    assert similarity(minhash(CRASH), minhash(BILLING)) < 0.2
+
+
+# ---------------------------------------------------------------------------
+# Lookup
+# ---------------------------------------------------------------------------
+
+
+def test_find_returns_near_duplicate_from_lsh_candidates():
+    index = DuplicateIndex(None)
+    add(index, CRASH, 1)
+    add(index, BILLING, 2)
+
+    assert index.find(CRASH_AGAIN).identifier == "ENG-1"
+    assert index.find(BILLING).identifier == "ENG-2"
+    assert index.find("Dark mode toggle does nothing on the settings page") is None
+
+
+def test_find_respects_threshold():
+    score = similarity(minhash(CRASH), minhash(CRASH_AGAIN))
+    strict = DuplicateIndex(None, threshold=score + 0.01)
+    add(strict, CRASH, 1)
+
+    assert strict.find(CRASH_AGAIN) is None
+    assert strict.find(CRASH).identifier == "ENG-1"
+
+
+def test_find_prefers_the_most_similar_report():
+    index = DuplicateIndex(None, threshold=0.3)
+    add(index, CRASH_AGAIN, 1)
+    add(index, CRASH, 2)
+
+    assert index.find(CRASH).identifier == "ENG-2"
+
+
+# ---------------------------------------------------------------------------
+# Bounds
+# ---------------------------------------------------------------------------
+
+
+def test_entries_outside_the_window_are_evicted(clock):
+    index = DuplicateIndex(None, window_seconds=60)
+    add(index, CRASH, 1)
+
+    clock[0] += 59
+    assert index.find(CRASH_AGAIN) is not None
+
+    clock[0] += 2
+    assert index.find(CRASH_AGAIN) is None
+    assert len(index) == 0
+
+
+def test_oldest_entries_are_evicted_past_max_entries(clock):
+    index = DuplicateIndex(None, max_entries=2)
+    for n, text in enumerate([CRASH, BILLING, "Dark mode toggle does nothing on the settings page"]):
+        clock[0] += 1
+        add(index, text, n)
+
+    assert len(index) == 2
+    assert index.find(CRASH) is None
+    assert index.find(BILLING).identifier == "ENG-1"
+
+
+# ---------------------------------------------------------------------------
+# Persistence
+# ---------------------------------------------------------------------------
+
+
+def test_index_round_trips_through_json(tmp_path):
+    path = tmp_path / "dedup_index.json"
+    index = DuplicateIndex(path)
+    add(index, CRASH, 1)
+    add(index, BILLING, 2)
+
+    saved = json.loads(path.read_text())
+    assert saved["version"] == 1
+    assert [e["identifier"] for e in saved["entries"]] == ["ENG-1", "ENG-2"]
+
+    reloaded = DuplicateIndex(path)
+    assert len(reloaded) == 2
+    assert reloaded.find(CRASH_AGAIN).url == "https://linear.app/ENG-1"
+
+
+def test_reload_drops_entries_outside_the_window(tmp_path, clock):
+    path = tmp_path / "dedup_index.json"
+    add(DuplicateIndex(path, window_seconds=60), CRASH, 1)
+
+    clock[0] += 120
+    assert len(DuplicateIndex(path, window_seconds=60)) == 0
+
+
+def test_unreadable_index_starts_empty(tmp_path):
+    path = tmp_path / "dedup_index.json"
+    path.write_text('{"entries": [{"issue_id": "uuid-1"')
+
+    index = DuplicateIndex(path)
+
+    assert len(index) == 0
+    add(index, CRASH, 1)
+    assert len(DuplicateIndex(path)) == 1
+
+
+# ---------------------------------------------------------------------------
+# Reservations
+# ---------------------------------------------------------------------------
+
+
+def test_reserve_returns_existing_duplicate():
+    index = DuplicateIndex(None)
+    add(index, CRASH, 1)
+
+    with index.reserve(CRASH_AGAIN) as reservation:
+        assert reservation.duplicate.identifier == "ENG-1"
+
+
+def test_similar_report_waits_for_the_issue_being_filed():
+    index = DuplicateIndex(None)
+    first = index.reserve(CRASH)
+    assert first.duplicate is None
+
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(index.reserve(CRASH_AGAIN)))
+    waiter.start()
+    time.sleep(0.1)
+    assert waiter.is_alive()  # Blocked on the first report, not filing its own
+
+    with first:
+        first.fill(issue_id="uuid-1", identifier="ENG-1", url="https://linear.app/ENG-1")
+    waiter.join(timeout=5)
+
+    assert results[0].duplicate.identifier == "ENG-1"
+
+
+def test_released_reservation_lets_the_waiter_file_its_own():
+    index = DuplicateIndex(None)
+    first = index.reserve(CRASH)
+
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(index.reserve(CRASH_AGAIN)))
+    waiter.start()
+    with pytest.raises(RuntimeError):
+        with first:
+            raise RuntimeError("Linear is down")
+    waiter.join(timeout=5)
+
+    [second] = results
+    assert second.duplicate is None
+    with second:
+        second.fill(issue_id="uuid-2", identifier="ENG-2", url="https://linear.app/ENG-2")
+    assert index.find(CRASH).identifier == "ENG-2"
+
+
+def test_dissimilar_reports_do_not_wait():
+    index = DuplicateIndex(None)
+    with index.reserve(CRASH):
+        started = time.monotonic()
+        with index.reserve(BILLING) as other:
+            assert other.duplicate is None
+        assert time.monotonic() - started < 1
+
+
+def test_wait_on_a_similar_report_is_bounded():
+    index = DuplicateIndex(None)
+    with index.reserve(CRASH):
+        started = time.monotonic()
+        with index.reserve(CRASH_AGAIN, wait=0.1) as other:
+            assert other.duplicate is None
+        assert time.monotonic() - started < 1
+
+
+def test_concurrent_similar_reports_open_one_issue(monkeypatch):
+    import app
+
+    created, comments = [], []
+
+    def create_linear_issue(title, description):
+        time.sleep(0.2)  # A Linear round trip
+        created.append(title)
+        return "uuid-1", "ENG-1", "https://linear.app/ENG-1"
+
+    monkeypatch.setattr(app, "duplicate_index", DuplicateIndex(None))
+    monkeypatch.setattr(app, "create_linear_issue", create_linear_issue)
+    monkeypatch.setattr(app, "comment_on_linear_issue", lambda issue_id, body: comments.append(issue_id))
+
+    reports = [{"title": "Login crash", "description": "...", "text": text} for text in (CRASH, CRASH_AGAIN)]
+    threads = [threading.Thread(target=app.file_report, args=(report,)) for report in reports]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5)
+
+    assert created == ["Login crash"]
+    assert comments == ["uuid-1"]
@@ -0,0 +1,120 @@
+"""Tests for the size-bounded description builder."""
+
+from description import QUOTED_MARKER, DescriptionBuilder
+
+
+def build(body: str, max_chars: int = 10_000, footer: str = "") -> DescriptionBuilder:
+    builder = DescriptionBuilder(max_chars=max_chars)
+    builder.write_header("**Reported by:** user@example.com\n\n")
+    builder.write_footer(footer)
+    builder.write_body(body)
+    return builder
+
+
+def test_small_body_is_unchanged():
+    builder = build("The app crashes on login.\nSteps: click login.")
+    assert builder.build() == (
+        "**Reported by:** user@example.com\n\nThe app crashes on login.\nSteps: click login."
+    )
+    assert not builder.truncated
+
+
+def test_quoted_reply_lines_collapse_to_marker():
+    builder = build("New detail.\n> old line 1\n> old line 2\nMore detail.")
+    description = builder.build()
+    assert description.count(QUOTED_MARKER.strip()) == 1
+    assert "old line" not in description
+    assert "More detail." in description
+    assert builder.trimmed_lines == 2
+
+
+def test_reply_history_and_signature_end_the_body():
+    body = "It broke again.\n\nOn Mon, Jan 1, 2024 at 9:00 AM Jane <jane@example.com> wrote:\nold thread\n"
+    assert "old thread" not in build(body).build()
+    assert "Thanks" not in build("Bug here.\n-- \nThanks\nJane").build()
+    assert "iPhone" not in build("Bug here.\nSent from my iPhone").build()
+
+
+def test_long_body_truncates_and_overflows():
+    body = "".join(f"line {n}\n" for n in range(10_000))
+    builder = build(body, max_chars=2_000, footer="\n\n**Attachments:**\n- log.txt (text/plain)\n")
+
+    description = builder.build(overflow_url="https://files.example.com/overflow.txt")
+
+    assert len(description) <= 2_000
+    assert builder.truncated
+    assert description.endswith("- log.txt (text/plain)\n")
+    assert "https://files.example.com/overflow.txt" in description
+    overflow = builder.overflow_bytes().decode()
+    assert overflow.startswith("line ")
+    assert overflow.endswith("line 9999\n")
+    assert len(overflow) == builder.overflow_chars
+    builder.close()
+
+
+def test_truncation_without_overflow_url_notes_omission():
+    builder = build("x" * 5_000, max_chars=1_000)
+    description = builder.build()
+    assert len(description) <= 1_000
+    assert "omitted" in description
+
+
+def test_long_attachment_list_is_bounded_and_body_is_what_gets_cut():
+    builder = DescriptionBuilder(max_chars=2_000)
+    builder.write_header("**Reported by:** user@example.com\n\n")
+    builder.write_footer("\n\n**Attachments:**\n")
+    for n in range(200):
+        builder.write_footer(f"- [log-{n}.txt](https://files.example.com/log-{n}.txt) (text/plain)\n")
+    builder.write_body("".join(f"line {n}\n" for n in range(1_000)))
+
+    description = builder.build(overflow_url="https://files.example.com/overflow.txt")
+
+    assert len(description) <= 2_000
+    assert description.startswith("**Reported by:** user@example.com\n\nline 0\n")
+    assert "**Attachments:**\n- [log-0.txt]" in description
+    assert description.endswith(f"_...and {builder.omitted_footer_entries} more not listed._\n")
+    assert "https://files.example.com/overflow.txt" in description
+    builder.close()
+
+
+def test_long_overflow_url_never_cuts_the_footer():
+    footer = "\n\n**Attachments:**\n- crash.log (text/plain)\n"
+    builder = build("x\n" * 5_000, max_chars=1_000, footer=footer)
+
+    description = builder.build(overflow_url="https://files.example.com/" + "a" * 2_000)
+
+    assert len(description) <= 1_000
+    assert description.endswith(footer)
+    assert "omitted" in description
+    builder.close()
+
+
+def test_forwarded_message_stays_in_the_body():
+    body = (
+        "See below, this keeps happening.\n\n"
+        "---------- Forwarded message ---------\n"
+        "From: Jane <jane@example.com>\n"
+        "Export fails with a 500 on the reports page.\n"
+    )
+    builder = build(body)
+
+    description = builder.build()
+
+    assert "Export fails with a 500 on the reports page." in description
+    assert builder.trimmed_lines == 0
+    assert builder.overflow_bytes() is None
+
+
+def test_trimmed_reply_history_goes_to_the_overflow():
+    body = "It broke again.\n\nOn Mon, Jan 1, 2024 at 9:00 AM Jane <jane@example.com> wrote:\nold thread\n"
+    builder = build(body)
+
+    description = builder.build(overflow_url="https://files.example.com/overflow.txt")
+
+    assert "old thread" not in description
+    assert not builder.truncated
+    assert "https://files.example.com/overflow.txt" in description
+    overflow = builder.overflow_bytes().decode()
+    assert overflow.endswith("wrote:\nold thread\n")
+    assert builder.trimmed_lines == 2
+    builder.close()
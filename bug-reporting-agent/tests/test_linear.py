@@ -0,0 +1,231 @@
+"""Tests for the batched Linear client, against a local GraphQL stub."""
+
+import json
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+
+from linear import IssueBatcher, LinearError, build_batch_mutation
+
+
+# ---------------------------------------------------------------------------
+# Local GraphQL stub
+# ---------------------------------------------------------------------------
+
+_ALIAS = re.compile(r"(i\d+): issueCreate\(input: \$(input\d+)\)")
+
+
+class LinearStub:
+    """Minimal stand-in for api.linear.app/graphql that understands aliased issueCreate."""
+
+    def __init__(self):
+        self.requests: list[dict] = []
+        self.status = 200
+        self.top_level_error: str | None = None
+        self.raw_body: object | None = None
+        self.delay = 0.0
+        self._counter = 0
+        self._lock = threading.Lock()
+
+    def respond(self, body: dict) -> tuple[int, object]:
+        with self._lock:
+            self.requests.append(body)
+        time.sleep(self.delay)
+        if self.raw_body is not None:
+            return 200, self.raw_body
+        if self.status != 200:
+            return self.status, {"error": "stub failure"}
+        if self.top_level_error:
+            return 200, {"errors": [{"message": self.top_level_error}], "data": None}
+        invalid = [var for _, var in _ALIAS.findall(body["query"])
+                   if body["variables"][var]["title"].startswith("invalid")]
+        if invalid:
+            # Variable validation fails the whole request, with no alias in the path
+            return 200, {"errors": [{"message": f"Variable \"${invalid[0]}\" got invalid value"}], "data": None}
+
+        data, errors = {}, []
+        for alias, var in _ALIAS.findall(body["query"]):
+            issue_input = body["variables"][var]
+            if issue_input["title"].startswith("reject"):
+                data[alias] = None
+                errors.append({"message": f"rejected {issue_input['title']}", "path": [alias]})
+                continue
+            with self._lock:
+                self._counter += 1
+                n = self._counter
+            data[alias] = {
+                "success": True,
+                "issue": {"id": f"uuid-{n}", "identifier": f"ENG-{n}", "url": f"https://linear.app/ENG-{n}"},
+            }
+        response = {"data": data}
+        if errors:
+            response["errors"] = errors
+        return 200, response
+
+
+@pytest.fixture()
+def linear_stub():
+    stub = LinearStub()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            length = int(self.headers["Content-Length"])
+            status, body = stub.respond(json.loads(self.rfile.read(length)))
+            payload = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+    stub.url = f"http://127.0.0.1:{server.server_address[1]}/graphql"
+    yield stub
+    server.shutdown()
+    server.server_close()
+
+
+def make_batcher(url: str, window: float = 0.2, max_batch: int = 20, **kwargs) -> IssueBatcher:
+    return IssueBatcher(
+        api_key="lin_api_test", team_id="TEAM-123", url=url, window=window, max_batch=max_batch, **kwargs
+    )
+
+
+# ---------------------------------------------------------------------------
+# build_batch_mutation
+# ---------------------------------------------------------------------------
+
+
+def test_build_batch_mutation_aliases_each_input():
+    query = build_batch_mutation(3)
+    assert "$input0: IssueCreateInput!, $input1: IssueCreateInput!, $input2: IssueCreateInput!" in query
+    assert _ALIAS.findall(query) == [("i0", "input0"), ("i1", "input1"), ("i2", "input2")]
+
+
+# ---------------------------------------------------------------------------
+# IssueBatcher
+# ---------------------------------------------------------------------------
+
+
+def test_single_issue_round_trip(linear_stub):
+    batcher = make_batcher(linear_stub.url, window=0.01)
+
+    issue_id, identifier, url = batcher.create_issue("Crash on login", "Steps...")
+
+    assert (issue_id, identifier, url) == ("uuid-1", "ENG-1", "https://linear.app/ENG-1")
+    assert linear_stub.requests[0]["variables"]["input0"] == {
+        "title": "Crash on login",
+        "description": "Steps...",
+        "teamId": "TEAM-123",
+    }
+
+
+def test_concurrent_issues_share_one_request(linear_stub):
+    batcher = make_batcher(linear_stub.url)
+
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        results = list(pool.map(lambda n: batcher.create_issue(f"Bug {n}", "body"), range(5)))
+
+    assert len(linear_stub.requests) == 1
+    assert len({identifier for _, identifier, _ in results}) == 5
+
+
+def test_results_map_back_to_callers(linear_stub):
+    batcher = make_batcher(linear_stub.url)
+
+    futures = [batcher.submit(f"Bug {n}", "body") for n in range(3)]
+    results = [f.result(timeout=5) for f in futures]
+
+    variables = linear_stub.requests[0]["variables"]
+    for n, (_, identifier, _) in enumerate(results):
+        alias_index = int(identifier.split("-")[1]) - 1
+        assert variables[f"input{alias_index}"]["title"] == f"Bug {n}"
+
+
+def test_alias_error_fails_only_that_caller(linear_stub):
+    batcher = make_batcher(linear_stub.url)
+
+    ok = batcher.submit("Bug", "body")
+    bad = batcher.submit("reject me", "body")
+
+    assert ok.result(timeout=5)[1] == "ENG-1"
+    with pytest.raises(LinearError, match="rejected reject me"):
+        bad.result(timeout=5)
+
+
+def test_top_level_error_fails_whole_batch(linear_stub):
+    linear_stub.top_level_error = "Authentication required"
+    batcher = make_batcher(linear_stub.url)
+
+    futures = [batcher.submit(f"Bug {n}", "body") for n in range(2)]
+
+    for future in futures:
+        with pytest.raises(LinearError, match="Authentication required"):
+            future.result(timeout=5)
+
+
+def test_batch_error_retries_each_input_alone(linear_stub):
+    batcher = make_batcher(linear_stub.url)
+
+    futures = [batcher.submit(title, "body") for title in ("Bug 1", "invalid bug", "Bug 3")]
+
+    assert futures[0].result(timeout=5)[1].startswith("ENG-")
+    with pytest.raises(LinearError, match="got invalid value"):
+        futures[1].result(timeout=5)
+    assert futures[2].result(timeout=5)[1].startswith("ENG-")
+    assert [len(r["variables"]) for r in linear_stub.requests] == [3, 1, 1, 1]
+
+
+def test_http_error_fails_whole_batch(linear_stub):
+    linear_stub.status = 500
+    batcher = make_batcher(linear_stub.url)
+
+    futures = [batcher.submit(f"Bug {n}", "body") for n in range(2)]
+
+    for future in futures:
+        with pytest.raises(httpx.HTTPStatusError):
+            future.result(timeout=5)
+
+
+def test_max_batch_splits_requests(linear_stub):
+    batcher = make_batcher(linear_stub.url, max_batch=2)
+
+    futures = [batcher.submit(f"Bug {n}", "body") for n in range(5)]
+    for future in futures:
+        future.result(timeout=5)
+
+    assert [len(r["variables"]) for r in linear_stub.requests] == [2, 2, 1]
+
+
+def test_malformed_response_fails_batch_and_worker_keeps_going(linear_stub):
+    linear_stub.raw_body = ["not", "an", "object"]
+    batcher = make_batcher(linear_stub.url, window=0.01)
+
+    futures = [batcher.submit(f"Bug {n}", "body") for n in range(2)]
+    for future in futures:
+        with pytest.raises(LinearError, match="Unexpected response"):
+            future.result(timeout=5)
+
+    linear_stub.raw_body = {"data": {"i0": "not an object"}}
+    with pytest.raises(AttributeError):
+        batcher.submit("Bug", "body").result(timeout=5)
+
+    linear_stub.raw_body = None
+    assert batcher.create_issue("Bug", "body")[1] == "ENG-1"
+
+
+def test_create_issue_gives_up_after_result_timeout(linear_stub):
+    linear_stub.delay = 1.0
+    batcher = make_batcher(linear_stub.url, window=0.01, result_timeout=0.1)
+
+    with pytest.raises(httpx.TimeoutException):
+        batcher.create_issue("Bug", "body")
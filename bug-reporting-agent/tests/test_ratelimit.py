@@ -0,0 +1,161 @@
+"""Tests for the adaptive rate limiter."""
+
+import asyncio
+import threading
+import time
+
+import httpx
+
+from ratelimit import (
+    AdaptiveLimiter,
+    parse_duration,
+    parse_linear_headers,
+    parse_openai_headers,
+    parse_rate_limit_headers,
+)
+
+
+# ---------------------------------------------------------------------------
+# Header parsing
+# ---------------------------------------------------------------------------
+
+
+def test_parse_duration_openai_formats():
+    assert parse_duration("20ms") == 0.02
+    assert parse_duration("1s") == 1.0
+    assert parse_duration("6m0s") == 360.0
+    assert parse_duration("") is None
+
+
+def test_parse_openai_headers_picks_tightest_quota():
+    info = parse_openai_headers(
+        httpx.Headers(
+            {
+                "x-ratelimit-limit-requests": "500",
+                "x-ratelimit-remaining-requests": "499",
+                "x-ratelimit-reset-requests": "120ms",
+                "x-ratelimit-limit-tokens": "200000",
+                "x-ratelimit-remaining-tokens": "1000",
+                "x-ratelimit-reset-tokens": "6m0s",
+            }
+        )
+    )
+    assert info.remaining == 1000
+    assert info.reset_after == 360.0
+
+
+def test_parse_linear_headers_reset_is_epoch_ms():
+    reset_ms = int((time.time() + 30) * 1000)
+    info = parse_linear_headers(
+        httpx.Headers(
+            {
+                "X-RateLimit-Requests-Limit": "1500",
+                "X-RateLimit-Requests-Remaining": "10",
+                "X-RateLimit-Requests-Reset": str(reset_ms),
+            }
+        )
+    )
+    assert info.remaining == 10
+    assert 28 < info.reset_after <= 30
+
+
+def test_parse_rate_limit_headers_without_headers():
+    assert parse_rate_limit_headers({}).remaining is None
+
+
+# ---------------------------------------------------------------------------
+# AIMD behaviour
+# ---------------------------------------------------------------------------
+
+
+def test_healthy_responses_increase_limit():
+    limiter = AdaptiveLimiter("test", initial=2, max_limit=3)
+    for _ in range(10):
+        limiter.observe(200, {})
+    assert limiter.snapshot()["limit"] == 3
+
+
+def test_429_halves_limit_and_pauses():
+    limiter = AdaptiveLimiter("test", initial=8)
+    limiter.observe(429, {"Retry-After": "5"})
+    snapshot = limiter.snapshot()
+    assert snapshot["limit"] == 4
+    assert snapshot["paused_for"] > 4
+    assert snapshot["throttled"] == 1
+
+
+def test_low_remaining_quota_decreases_limit():
+    limiter = AdaptiveLimiter("test", initial=8)
+    limiter.observe(200, {"x-ratelimit-limit-requests": "100", "x-ratelimit-remaining-requests": "5"})
+    assert limiter.snapshot()["limit"] == 4
+
+
+def test_acquire_waits_for_free_slot():
+    limiter = AdaptiveLimiter("test", initial=1)
+    limiter.acquire()
+    acquired = threading.Event()
+
+    def worker():
+        with limiter.slot():
+            acquired.set()
+
+    threading.Thread(target=worker, daemon=True).start()
+    assert not acquired.wait(0.1)
+    assert limiter.snapshot()["waiting"] == 1
+    limiter.release()
+    assert acquired.wait(1)
+
+
+def test_call_waits_out_429_and_retries():
+    limiter = AdaptiveLimiter("test")
+    responses = [
+        httpx.Response(429, headers={"Retry-After": "0.1"}),
+        httpx.Response(200),
+    ]
+
+    start = time.monotonic()
+    response = limiter.call(lambda: responses.pop(0))
+
+    assert response.status_code == 200
+    assert time.monotonic() - start >= 0.1
+
+
+def test_async_slots_share_the_limit_with_threads():
+    limiter = AdaptiveLimiter("test", initial=2)
+    peak = 0
+
+    async def call():
+        nonlocal peak
+        async with limiter.aslot():
+            peak = max(peak, limiter.snapshot()["in_flight"])
+            await asyncio.sleep(0.01)
+
+    async def main():
+        limiter.acquire()  # A thread holds one of the two slots
+        tasks = [asyncio.create_task(call()) for _ in range(10)]
+        await asyncio.sleep(0.005)
+        assert limiter.snapshot()["waiting"] == 9
+        limiter.release()
+        await asyncio.gather(*tasks)
+
+    asyncio.run(main())
+    assert peak == 2
+    assert limiter.snapshot()["in_flight"] == 0
+
+
+def test_cancelled_async_waiter_does_not_strand_others():
+    limiter = AdaptiveLimiter("test", initial=1)
+
+    async def main():
+        limiter.acquire()
+        first = asyncio.create_task(limiter.aacquire())
+        second = asyncio.create_task(limiter.aacquire())
+        await asyncio.sleep(0.01)
+        limiter.release()  # Wakes `first`, which is cancelled before it runs
+        first.cancel()
+        await asyncio.wait_for(second, timeout=1)
+        limiter.release()
+
+    asyncio.run(main())
+    assert limiter.snapshot()["waiting"] == 0
+    assert limiter.snapshot()["in_flight"] == 0
@@ -0,0 +1,106 @@
+"""Tests for the Linear report queue and the app's degraded paths."""
+
+import json
+
+import httpx
+import pytest
+
+import app as app_module
+from breaker import CircuitBreaker
+from linear import LinearError
+from report_queue import ReportQueue
+
+REPORT = {"title": "Crash on save", "description": "**Reported by:** a@b.c", "text": "Crash on save\nboom"}
+
+
+def test_queue_persists_and_drains_in_order(tmp_path):
+    path = tmp_path / "queue.jsonl"
+    queue = ReportQueue(path)
+    for i in range(3):
+        queue.put({"title": str(i)})
+
+    reloaded = ReportQueue(path)
+    assert len(reloaded) == 3
+    delivered, outage = [], [True]
+
+    def deliver(report):
+        if report["title"] == "1" and outage:
+            outage.pop()
+            raise httpx.ConnectError("down")
+        delivered.append(report["title"])
+
+    assert reloaded.drain(deliver) == 1
+    assert len(ReportQueue(path)) == 2  # The failed report stays at the head
+    assert reloaded.drain(deliver) == 2
+    assert delivered == ["0", "1", "2"]
+    assert path.read_text() == ""
+
+
+def test_queue_ignores_a_partial_last_line(tmp_path):
+    path = tmp_path / "queue.jsonl"
+    path.write_text('{"title": "a"}\n{"title": "b')
+
+    assert len(ReportQueue(path)) == 1
+
+
+@pytest.fixture
+def linear_down(monkeypatch, tmp_path):
+    breaker = CircuitBreaker("linear", failure_threshold=1, is_failure=app_module._linear_outage)
+    monkeypatch.setattr(app_module, "linear_breaker", breaker)
+    monkeypatch.setattr(app_module, "report_queue", ReportQueue(tmp_path / "queue.jsonl"))
+
+    def create_issue(title, description):
+        raise httpx.ConnectTimeout("timed out")
+
+    monkeypatch.setattr(app_module.issue_batcher, "create_issue", create_issue)
+    return breaker
+
+
+def test_reports_queue_while_linear_is_down(linear_down, client, monkeypatch):
+    assert app_module.submit_report(REPORT) == ({"error": "Failed to create issue"}, 500)
+    assert app_module.submit_report(REPORT) == ({"ok": True, "queued": True}, 202)
+    assert len(app_module.report_queue) == 1
+
+    health = client.get("/health").get_json()
+    assert health["status"] == "degraded"
+    assert health["breakers"]["linear"]["state"] == "open"
+    assert health["report_queue"] == {"queued": 1, "delivered": 0, "failed": 0}
+
+    # Linear is back: the next pass past the reset timeout files the queued report
+    monkeypatch.setattr(app_module.issue_batcher, "create_issue", lambda t, d: ("uuid", "BUG-1", "https://x"))
+    linear_down.reset_timeout = 0
+    assert app_module.report_queue.drain(app_module.deliver_queued_report) == 1
+    assert client.get("/health").get_json()["status"] == "ok"
+
+
+def test_linear_validation_errors_do_not_open_the_breaker(linear_down, monkeypatch):
+    def create_issue(title, description):
+        raise LinearError("title too long")
+
+    monkeypatch.setattr(app_module.issue_batcher, "create_issue", create_issue)
+    for _ in range(3):
+        assert app_module.submit_report(REPORT)[1] == 500
+    assert linear_down.state == "closed"
+
+
+def test_rejected_report_is_dead_lettered_and_the_drain_continues(linear_down, monkeypatch):
+    queue = app_module.report_queue
+    for title in ("bad", "good"):
+        queue.put({**REPORT, "title": title})
+    created = []
+
+    def create_issue(title, description):
+        if title == "bad":
+            request = httpx.Request("POST", "https://api.linear.app/graphql")
+            raise httpx.HTTPStatusError("400", request=request, response=httpx.Response(400, request=request))
+        created.append(title)
+        return "uuid", "BUG-2", "https://x"
+
+    monkeypatch.setattr(app_module.issue_batcher, "create_issue", create_issue)
+
+    assert queue.drain(app_module.deliver_queued_report) == 2
+    assert created == ["good"]
+    assert len(queue) == 0
+    failed = [json.loads(line) for line in queue.failed_path.read_text().splitlines()]
+    assert [(r["title"], r["error"]) for r in failed] == [("bad", "400")]
+    assert linear_down.state == "closed"
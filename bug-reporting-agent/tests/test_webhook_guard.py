@@ -0,0 +1,82 @@
+"""Tests for the pre-verification webhook guard."""
+
+import time
+
+from webhook_guard import RateLimitedLogger, ReplayCache, WebhookGuard
+
+
+def headers(timestamp: int | None = None, signature: str = "v1,abc") -> dict[str, str]:
+    return {
+        "webhook-id": "msg_1",
+        "webhook-timestamp": str(int(time.time()) if timestamp is None else timestamp),
+        "webhook-signature": signature,
+    }
+
+
+def make_guard(**kwargs) -> tuple[WebhookGuard, list[str]]:
+    logged: list[str] = []
+    guard = WebhookGuard(logger=RateLimitedLogger(burst=100, emit=logged.append), **kwargs)
+    return guard, logged
+
+
+def test_well_formed_request_passes():
+    guard, logged = make_guard()
+    assert guard.check(100, headers()) is None
+    assert logged == []
+
+
+def test_oversized_body_is_rejected_first():
+    guard, _ = make_guard(max_body_bytes=1000)
+    assert guard.check(1001, {})[1] == 413
+    assert guard.check(None, headers()) is None  # Unknown length falls through to Flask's cap
+
+
+def test_missing_and_invalid_headers():
+    guard, logged = make_guard()
+    body, status = guard.check(10, {"webhook-id": "msg_1"})
+    assert status == 400
+    assert body == {"error": "Missing webhook-timestamp header"}
+    assert guard.check(10, headers() | {"webhook-timestamp": "soon"})[1] == 400
+    assert guard.rejected == 2
+    assert len(logged) == 2
+
+
+def test_stale_and_future_timestamps_are_rejected():
+    guard, _ = make_guard(tolerance_seconds=300)
+    assert guard.check(10, headers(timestamp=int(time.time()) - 301))[1] == 400
+    assert guard.check(10, headers(timestamp=int(time.time()) + 301))[1] == 400
+    assert guard.check(10, headers(timestamp=int(time.time()) - 200)) is None
+
+
+def test_only_remembered_signatures_are_replays():
+    guard, _ = make_guard()
+    assert guard.check(10, headers(signature="v1,first")) is None
+    guard.remember(headers(signature="v1,first"))
+    assert guard.check(10, headers(signature="v1,first"))[1] == 409
+    assert guard.check(10, headers(signature="v1,second")) is None
+
+
+def test_replay_cache_expires_and_stays_bounded():
+    cache = ReplayCache(ttl=0.05, max_entries=3)
+    for n in range(5):
+        cache.add(f"sig{n}")
+    assert len(cache) == 3
+    assert not cache.seen("sig0")
+    assert cache.seen("sig4")
+    time.sleep(0.06)
+    assert not cache.seen("sig4")
+    assert len(cache) == 0
+
+
+def test_logger_suppresses_floods_and_reports_count():
+    logged: list[str] = []
+    logger = RateLimitedLogger(burst=2, interval=0.1, emit=logged.append)
+    for n in range(50):
+        logger.log(f"failure {n}")
+    assert logged == ["failure 0", "failure 1"]
+    assert logger.suppressed == 48
+
+    time.sleep(0.06)  # Refills one token
+    logger.log("after")
+    assert logged[-1] == "after (48 similar messages suppressed)"
+    assert logger.suppressed == 0
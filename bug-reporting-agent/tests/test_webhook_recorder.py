@@ -0,0 +1,131 @@
+"""Tests for webhook recording and replay."""
+
+import base64
+import gzip
+import hashlib
+import hmac
+import json
+import multiprocessing
+import threading
+import time
+
+from webhook_recorder import WebhookRecorder, compare_reports, read_recording, replay
+
+SECRET = "whsec_" + base64.b64encode(b"recorder-test-secret").decode()
+
+
+def record(path, payloads, gap=0.0):
+    recorder = WebhookRecorder(path)
+    for i, payload in enumerate(payloads):
+        recorder.record(payload, {"webhook-id": f"msg_{i}"})
+        time.sleep(gap)
+    recorder.close()
+
+
+def test_recording_round_trips_and_appends_across_recorders(tmp_path):
+    path = tmp_path / "webhooks.jsonl.gz"
+    record(path, [b'{"n": 1}', b'{"n": 2}'])
+    record(path, [b'{"n": 3}'])
+
+    entries = list(read_recording(path))
+
+    assert [e["payload"] for e in entries] == ['{"n": 1}', '{"n": 2}', '{"n": 3}']
+    assert [e["webhook_id"] for e in entries] == ["msg_0", "msg_1", "msg_0"]
+    assert entries[0]["received_at"] <= entries[1]["received_at"] <= entries[2]["received_at"]
+
+
+def test_truncated_recording_yields_complete_lines(tmp_path):
+    path = tmp_path / "webhooks.jsonl.gz"
+    record(path, [json.dumps({"n": i}).encode() for i in range(200)])
+    data = path.read_bytes()
+    path.write_bytes(data[: len(data) - 20])  # As if the process died mid-write
+
+    entries = list(read_recording(path))
+
+    assert 0 < len(entries) < 200
+    assert [json.loads(e["payload"])["n"] for e in entries] == list(range(len(entries)))
+
+
+def _record_from_process(path: str, worker: int, count: int) -> None:
+    recorder = WebhookRecorder(path, flush_interval=0)  # Flush every record, to interleave as much as possible
+    for i in range(count):
+        recorder.record(json.dumps({"worker": worker, "i": i}).encode(), {"webhook-id": f"msg_{worker}_{i}"})
+    recorder.close()
+
+
+def test_processes_share_one_recording(tmp_path):
+    path = tmp_path / "webhooks.jsonl.gz"
+    context = multiprocessing.get_context("spawn")
+    workers = [context.Process(target=_record_from_process, args=(str(path), w, 200)) for w in range(4)]
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join()
+
+    payloads = [json.loads(e["payload"]) for e in read_recording(path)]
+
+    assert len(payloads) == 800
+    for w in range(4):
+        assert [p["i"] for p in payloads if p["worker"] == w] == list(range(200))
+
+
+def test_replay_re_signs_each_payload(tmp_path):
+    path = tmp_path / "webhooks.jsonl.gz"
+    record(path, [b'{"n": 1}', b'{"n": 2}', b'not json'])
+    key = base64.b64decode(SECRET.removeprefix("whsec_"))
+    seen = []
+    lock = threading.Lock()
+
+    def post(payload, headers):
+        signed = f"{headers['webhook-id']}.{headers['webhook-timestamp']}.".encode() + payload
+        expected = base64.b64encode(hmac.new(key, signed, hashlib.sha256).digest()).decode()
+        with lock:
+            seen.append(payload)
+        return 200 if headers["webhook-signature"] == f"v1,{expected}" and payload != b"not json" else 400
+
+    report = replay(path, post, secret=SECRET, concurrency=2)
+
+    assert sorted(seen) == [b'not json', b'{"n": 1}', b'{"n": 2}']
+    assert report["webhooks"] == 3
+    assert report["speed"] == "max"
+    assert report["status"] == {"200": 2, "400": 1}
+    assert set(report["latency_ms"]) == {"p50", "p90", "p99", "max", "mean"}
+
+
+def test_replay_keeps_recorded_pace_scaled_by_speed(tmp_path):
+    path = tmp_path / "webhooks.jsonl.gz"
+    record(path, [b"{}"] * 3, gap=0.2)  # About 0.4s between the first and last
+
+    at_pace = replay(path, lambda payload, headers: 200, secret=SECRET, speed=1)
+    sped_up = replay(path, lambda payload, headers: 200, secret=SECRET, speed=4)
+
+    assert at_pace["recorded_seconds"] >= 0.4
+    assert at_pace["wall_seconds"] >= 0.4
+    assert sped_up["wall_seconds"] < 0.25
+
+
+def test_replay_limit(tmp_path):
+    path = tmp_path / "webhooks.jsonl.gz"
+    record(path, [b"{}"] * 5)
+
+    assert replay(path, lambda payload, headers: 200, secret=SECRET, limit=2)["webhooks"] == 2
+
+
+def test_compare_reports_lists_shared_numeric_fields():
+    baseline = {"app": "x", "speed": "max", "wall_seconds": 2.0, "latency_ms": {"p50": 100.0, "p99": 0}}
+    current = {"app": "x", "speed": "max", "wall_seconds": 1.0, "latency_ms": {"p50": 150.0, "p99": 5}}
+
+    lines = compare_reports(baseline, current)
+
+    assert len(lines) == 3
+    assert lines[0].startswith("latency_ms.p50") and lines[0].endswith("(+50.0%)")
+    assert lines[1].startswith("latency_ms.p99") and lines[1].endswith("(n/a)")
+    assert lines[2].startswith("wall_seconds") and lines[2].endswith("(-50.0%)")
+
+
+def test_recording_is_gzip(tmp_path):
+    path = tmp_path / "webhooks.jsonl.gz"
+    record(path, [b"{}"])
+
+    with gzip.open(path, "rt") as f:
+        assert json.loads(f.readline())["payload"] == "{}"
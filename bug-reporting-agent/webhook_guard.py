@@ -0,0 +1,160 @@
+"""Cheap pre-verification checks for Sema webhooks.
+
+`WebhookVerifier.verify()` decodes the body and computes an HMAC, so a
+flood of forged requests costs real CPU — and logging each failure costs
+log I/O. The guard runs first and rejects what it can from headers alone:
+
+- bodies larger than max_body_bytes (413, before the body is read)
+- missing Standard Webhooks headers (400)
+- timestamps outside the tolerance window (400)
+- exact replays of an already-verified signature (409)
+
+Failures are logged through a rate-limited logger.
+
+    rejection = webhook_guard.check(request.content_length, request.headers)
+    if rejection:
+        return rejection
+    event = verifier.verify(...)
+    ...  # admit the webhook (see admission.py), then
+    webhook_guard.remember(request.headers)
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Mapping
+
+REQUIRED_HEADERS = ("webhook-id", "webhook-timestamp", "webhook-signature")
+DEFAULT_MAX_BODY_BYTES = 10 * 1024 * 1024  # 10 MB: full-mode payloads carry body_html
+DEFAULT_TOLERANCE_SECONDS = 300  # Matches WebhookVerifier's default
+
+
+class RateLimitedLogger:
+    """Print at most `burst` messages per `interval` seconds; count the rest."""
+
+    def __init__(
+        self,
+        *,
+        burst: int = 10,
+        interval: float = 60.0,
+        emit: Callable[[str], None] = lambda msg: print(msg, flush=True),
+    ) -> None:
+        self.burst = burst
+        self.interval = interval
+        self._emit = emit
+        self._lock = threading.Lock()
+        self._tokens = float(burst)
+        self._last = time.monotonic()
+        self.suppressed = 0
+
+    def log(self, message: str) -> None:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.burst / self.interval)
+            self._last = now
+            if self._tokens < 1:
+                self.suppressed += 1
+                return
+            self._tokens -= 1
+            suppressed, self.suppressed = self.suppressed, 0
+        if suppressed:
+            message += f" ({suppressed} similar messages suppressed)"
+        self._emit(message)
+
+
+class ReplayCache:
+    """Signatures seen within the last `ttl` seconds, bounded to max_entries."""
+
+    def __init__(self, *, ttl: float, max_entries: int = 100_000) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._seen: OrderedDict[str, float] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._seen)
+
+    def _prune(self, now: float) -> None:
+        while self._seen:
+            key, expires = next(iter(self._seen.items()))
+            if expires > now and len(self._seen) <= self.max_entries:
+                break
+            del self._seen[key]
+
+    def seen(self, key: str) -> bool:
+        with self._lock:
+            self._prune(time.monotonic())
+            return key in self._seen
+
+    def add(self, key: str) -> None:
+        with self._lock:
+            now = time.monotonic()
+            self._seen[key] = now + self.ttl
+            self._seen.move_to_end(key)
+            self._prune(now)
+
+
+class WebhookGuard:
+    """Header-only checks that run before signature verification."""
+
+    def __init__(
+        self,
+        *,
+        max_body_bytes: int = DEFAULT_MAX_BODY_BYTES,
+        tolerance_seconds: int = DEFAULT_TOLERANCE_SECONDS,
+        logger: RateLimitedLogger | None = None,
+    ) -> None:
+        self.max_body_bytes = max_body_bytes
+        self.tolerance_seconds = tolerance_seconds
+        self.logger = logger or RateLimitedLogger()
+        # Anything older than the tolerance window is rejected on timestamp anyway
+        self.replays = ReplayCache(ttl=2 * tolerance_seconds)
+        self.rejected = 0
+
+    def _reject(self, message: str, status: int) -> tuple[dict, int]:
+        self.rejected += 1
+        self.logger.log(f"Webhook rejected ({status}): {message}")
+        return {"error": message}, status
+
+    def check(self, content_length: int | None, headers: Mapping[str, str]) -> tuple[dict, int] | None:
+        """Return an error response if the request can be rejected cheaply, else None."""
+        if content_length is not None and content_length > self.max_body_bytes:
+            return self._reject(f"Payload too large (max {self.max_body_bytes} bytes)", 413)
+
+        for name in REQUIRED_HEADERS:
+            if not headers.get(name):
+                return self._reject(f"Missing {name} header", 400)
+
+        try:
+            timestamp = int(headers["webhook-timestamp"])
+        except ValueError:
+            return self._reject("Invalid webhook-timestamp header", 400)
+        if abs(time.time() - timestamp) > self.tolerance_seconds:
+            return self._reject(f"Webhook timestamp too old (tolerance: {self.tolerance_seconds}s)", 400)
+
+        if self.replays.seen(headers["webhook-signature"]):
+            return self._reject("Webhook already received", 409)
+        return None
+
+    def remember(self, headers: Mapping[str, str]) -> None:
+        """Record a verified signature so an exact replay is rejected before HMAC work.
+
+        Call it only after the webhook is admitted. A delivery retry may
+        carry the same signature as an attempt that was shed with a 503,
+        and that retry must not be turned away as a replay.
+        """
+        self.replays.add(headers["webhook-signature"])
+
+    def log_failure(self, message: str) -> None:
+        """Count and log a failure found after the guard, e.g. a bad signature."""
+        self.rejected += 1
+        self.logger.log(message)
+
+    def snapshot(self) -> dict:
+        return {
+            "rejected": self.rejected,
+            "replay_cache_size": len(self.replays),
+            "suppressed_logs": self.logger.suppressed,
+        }
@@ -1,17 +1,28 @@
 """Docs Q&A Agent - Email a question → Get an answer from Sema docs."""
 
+import atexit
 import html
 import os
 import threading
+from pathlib import Path
 
 import html2text
 import httpx
+import openai
 import resend
 from dotenv import load_dotenv
 from flask import Flask, request
-from openai import OpenAI
+from openai import DefaultHttpxClient, OpenAI
 from sema_sdk import WebhookVerifier, WebhookVerificationError
 
+from admission import DEFAULT_LATENCY_TARGET_SECONDS, DEFAULT_MAX_IN_FLIGHT, DEFAULT_MIN_IN_FLIGHT
+from admission import AdmissionController
+from breaker import OPEN, CircuitBreaker, CircuitOpenError
+from breaker import health as breaker_health
+from ratelimit import AdaptiveLimiter
+from webhook_guard import DEFAULT_MAX_BODY_BYTES, DEFAULT_TOLERANCE_SECONDS, WebhookGuard
+from webhook_recorder import WebhookRecorder
+
 _h2t = html2text.HTML2Text()
 _h2t.body_width = 0
 
@@ -23,15 +34,58 @@ DEV_MODE = os.environ.get("DEV_MODE", "").lower() == "true"
 
 # Sema webhook verification
 verifier = WebhookVerifier(secret=os.environ["SEMA_WEBHOOK_SECRET"])
+webhook_guard = WebhookGuard(
+    max_body_bytes=int(os.environ.get("WEBHOOK_MAX_BODY_BYTES", DEFAULT_MAX_BODY_BYTES)),
+    tolerance_seconds=int(os.environ.get("WEBHOOK_TOLERANCE_SECONDS", DEFAULT_TOLERANCE_SECONDS)),
+)
+# Chunked bodies carry no Content-Length; Flask enforces the same cap while reading them
+app.config["MAX_CONTENT_LENGTH"] = webhook_guard.max_body_bytes
+# Load shedding: 503 + Retry-After when too many replies are in flight or latency is over target
+admission = AdmissionController(
+    max_in_flight=int(os.environ.get("ADMISSION_MAX_IN_FLIGHT", DEFAULT_MAX_IN_FLIGHT)),
+    min_in_flight=int(os.environ.get("ADMISSION_MIN_IN_FLIGHT", DEFAULT_MIN_IN_FLIGHT)),
+    latency_target=float(os.environ.get("ADMISSION_LATENCY_TARGET_MS", DEFAULT_LATENCY_TARGET_SECONDS * 1000)) / 1000,
+)
+# Optional: append verified webhooks to a gzip JSONL file for offline replay (replay.py)
+WEBHOOK_RECORD_PATH = os.environ.get("WEBHOOK_RECORD_PATH")
+webhook_recorder = WebhookRecorder(Path(WEBHOOK_RECORD_PATH)) if WEBHOOK_RECORD_PATH else None
+if webhook_recorder:
+    atexit.register(webhook_recorder.close)
+
+# OpenAI client, with adaptive concurrency driven by its x-ratelimit-* response headers
+openai_limiter = AdaptiveLimiter(
+    "openai",
+    initial=int(os.environ.get("OPENAI_CONCURRENCY", "4")),
+    max_limit=int(os.environ.get("OPENAI_MAX_CONCURRENCY", "32")),
+)
+openai_client = OpenAI(
+    http_client=DefaultHttpxClient(event_hooks={"response": [openai_limiter.observe_response]})
+)
 
-# OpenAI client
-openai_client = OpenAI()
+
+def _openai_outage(e: Exception) -> bool:
+    """Connection errors, timeouts and 5xx count against OpenAI; a rejected request doesn't."""
+    if isinstance(e, openai.APIStatusError):
+        return e.status_code >= 500
+    return True
+
+
+# Circuit breakers: fail fast while an upstream is down (see "Circuit Breakers" in the README)
+openai_breaker = CircuitBreaker.from_env("openai", is_failure=_openai_outage)
+resend_breaker = CircuitBreaker.from_env("resend")
 
 # Resend
 resend.api_key = os.environ["RESEND_API_KEY"]
 RESEND_FROM_EMAIL = os.environ["RESEND_FROM_EMAIL"]
 RESEND_REPLY_TO = os.environ.get("RESEND_REPLY_TO", "docs-qa@in.withsema.com")
 
+# Sent instead of an answer while OpenAI's breaker is open
+FALLBACK_ANSWER = (
+    "Sorry, we can't answer questions automatically right now. "
+    "In the meantime, the Sema docs are at https://docs.withsema.com/. "
+    "Please try again later."
+)
+
 # Docs context: fetch at startup, cache in memory
 DOCS_CONTEXT_URL = os.environ.get(
     "DOCS_CONTEXT_URL", "https://docs.withsema.com/llm-context.json"
@@ -76,20 +130,32 @@ def answer_question(question: str) -> str:
         "If unsure or the answer isn't in the docs, say so.\n\n"
         f"{docs}"
     )
-    completion = openai_client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": question},
-        ],
-    )
+    # Fail fast while OpenAI is down, then queue behind the limiter instead of collecting 429s
+    with openai_breaker.call(), openai_limiter.slot():
+        completion = openai_client.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": question},
+            ],
+        )
     return completion.choices[0].message.content or ""
 
 
 @app.route("/health", methods=["GET"])
 def health():
-    """Health check endpoint for load balancers and container orchestration."""
-    return {"status": "ok"}, 200
+    """Health check endpoint for load balancers and container orchestration, with upstream breaker state."""
+    return breaker_health(openai_breaker, resend_breaker), 200
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    """Current adaptive rate limits per upstream, guard and admission state."""
+    return {
+        "rate_limits": {"openai": openai_limiter.snapshot()},
+        "webhook_guard": webhook_guard.snapshot(),
+        "admission": admission.snapshot(),
+    }, 200
 
 
 @app.route("/ask", methods=["GET"])
@@ -104,6 +170,8 @@ def ask():
 
     try:
         answer = answer_question(question)
+    except CircuitOpenError as e:
+        return {"error": str(e)}, 503, {"Retry-After": str(max(1, round(e.retry_after)))}
     except Exception as e:
         print(f"OpenAI error: {e}")
         return {"error": "Failed to get answer"}, 500
@@ -112,9 +180,21 @@ def ask():
 
 
 def process_and_reply(sender_addr: str, subject: str, question: str):
-    """Background task: get answer from OpenAI and send reply via Resend."""
+    """Background task: get answer from OpenAI and send reply via Resend.
+
+    While OpenAI's breaker is open the reply is FALLBACK_ANSWER. The
+    webhook handler turns deliveries away while Resend's is open; if it
+    opens after this task was queued, no answer is generated, since it
+    couldn't be sent.
+    """
+    if resend_breaker.state == OPEN:
+        print(f"Resend circuit open, reply to {sender_addr} not sent")
+        return
     try:
         answer = answer_question(question)
+    except CircuitOpenError as e:
+        print(f"{e}; sending the fallback reply")
+        answer = FALLBACK_ANSWER
     except Exception as e:
         print(f"OpenAI error: {e}")
         return
@@ -131,7 +211,8 @@ def process_and_reply(sender_addr: str, subject: str, question: str):
             "text": answer,
             "reply_to": RESEND_REPLY_TO,
         }
-        resend.Emails.send(send_params)
+        with resend_breaker.call():
+            resend.Emails.send(send_params)
         print(f"Replied to {sender_addr}")
     except Exception as e:
         print(f"Resend error: {e}")
@@ -140,12 +221,31 @@ def process_and_reply(sender_addr: str, subject: str, question: str):
 @app.route("/webhook", methods=["POST"])
 def handle_webhook():
     """Receive Sema webhook, answer question from docs, reply via email."""
+    rejection = webhook_guard.check(request.content_length, request.headers)
+    if rejection:
+        return rejection
     try:
-        event = verifier.verify(payload=request.data, headers=dict(request.headers))
+        event = verifier.verify(payload=request.data, headers=request.headers)
     except WebhookVerificationError as e:
-        print(f"Webhook verification failed: {e}")
+        webhook_guard.log_failure(f"Webhook verification failed: {e}")
         return {"error": str(e)}, 400
 
+    # The webhook is acked before the reply is sent, so don't take one that couldn't be sent:
+    # a 503 makes Sema redeliver it once Resend's breaker has cooled down
+    resend = resend_breaker.snapshot()
+    if resend["state"] == OPEN:
+        retry_after = str(max(1, round(resend["retry_after_s"])))
+        return {"error": "Email delivery unavailable, retry later"}, 503, {"Retry-After": retry_after}
+
+    # The ticket is held until the reply is sent, so admission tracks the background work.
+    # A shed webhook isn't remembered or recorded, so Sema's retry goes through.
+    ticket = admission.admit()
+    if ticket is None:
+        return admission.rejection()
+    webhook_guard.remember(request.headers)
+    if webhook_recorder:
+        webhook_recorder.record(request.data, request.headers)
+
     deliverable = event.payload.deliverable
     content = deliverable.content_summary
     sender = deliverable.sender
@@ -153,6 +253,7 @@ def handle_webhook():
     sender_addr = sender.address if sender else None
     if not sender_addr:
         print("No sender address in webhook")
+        ticket.done()
         return {"error": "No sender address"}, 400
 
     subject = content.subject if content and content.subject else "Question"
@@ -164,13 +265,15 @@ def handle_webhook():
     question = f"{subject}\n\n{body_text}".strip()
     if not question:
         print("Empty question")
+        ticket.done()
         return {"error": "Empty question"}, 400
 
+    def reply() -> None:
+        with ticket:
+            process_and_reply(sender_addr, subject, question)
+
     # Process in background to respond immediately and avoid webhook retries
-    thread = threading.Thread(
-        target=process_and_reply,
-        args=(sender_addr, subject, question),
-    )
+    thread = threading.Thread(target=reply)
     thread.start()
 
     return {"ok": True}, 200
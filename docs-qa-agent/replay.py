@@ -0,0 +1,139 @@
+"""Replay recorded webhooks through the docs Q&A agent with every upstream stubbed.
+
+Record traffic with WEBHOOK_RECORD_PATH=webhooks.jsonl.gz, then:
+
+    python replay.py webhooks.jsonl.gz --speed 0 --report run.json
+    python replay.py webhooks.jsonl.gz --speed 0 --compare run.json
+
+OpenAI answers after --openai-latency-ms behind the real adaptive limiter,
+Resend only counts sends, and the docs context is a fixed placeholder.
+The webhook acks before the reply goes out, so the report also times
+the background replies (`reply_ms`) and waits for them to finish.
+
+Usage: python replay.py RECORDING [--speed 0] [--concurrency 16] [--report FILE] [--compare FILE]
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+from webhook_recorder import compare_reports, percentiles, replay
+
+REPLAY_SECRET = "whsec_cmVwbGF5LXNlY3JldC1mb3ItbG9jYWwtcnVucw=="
+
+
+class StubOpenAI:
+    """chat.completions.create() after a fixed latency, no network."""
+
+    def __init__(self, latency: float) -> None:
+        self.latency = latency
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, **kwargs):
+        time.sleep(self.latency)
+        with self._lock:
+            self.calls += 1
+        content = "See: https://docs.withsema.com/ (replayed answer)"
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+class ReplyTracker:
+    """Wraps process_and_reply to time background replies and wait for them."""
+
+    def __init__(self, process_and_reply) -> None:
+        self._process_and_reply = process_and_reply
+        self._done = threading.Condition()
+        self.finished = 0
+        self.sent = 0
+        self.durations: list[float] = []
+
+    def __call__(self, *args) -> None:
+        start = time.perf_counter()
+        try:
+            self._process_and_reply(*args)
+        finally:
+            with self._done:
+                self.durations.append((time.perf_counter() - start) * 1000)
+                self.finished += 1
+                self._done.notify_all()
+
+    def send(self, params: dict) -> dict:
+        with self._done:
+            self.sent += 1
+        return {"id": "replay"}
+
+    def wait(self, expected: int) -> None:
+        """Block until `expected` replies (one per accepted webhook) have finished."""
+        with self._done:
+            self._done.wait_for(lambda: self.finished >= expected)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("recording", type=Path)
+    parser.add_argument("--speed", type=float, default=0.0, help="1 = recorded pace, N = N times faster, 0 = max")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--limit", type=int, help="replay only the first N webhooks")
+    parser.add_argument("--openai-latency-ms", type=float, default=800)
+    parser.add_argument("--report", type=Path, help="write the JSON report here")
+    parser.add_argument("--compare", type=Path, help="print deltas against an earlier report")
+    args = parser.parse_args()
+
+    os.environ.update(
+        SEMA_WEBHOOK_SECRET=REPLAY_SECRET,
+        OPENAI_API_KEY="sk-replay",
+        RESEND_API_KEY="re_replay",
+        RESEND_FROM_EMAIL="replay@example.com",
+    )
+    os.environ.pop("WEBHOOK_RECORD_PATH", None)
+
+    import app  # Reads the environment above at import time
+
+    openai = StubOpenAI(args.openai_latency_ms / 1000)
+    app.openai_client = openai
+    app._DOCS_CONTEXT = "## Replay\nURL: https://docs.withsema.com/\n\nPlaceholder docs for replay runs."
+    replies = ReplyTracker(app.process_and_reply)
+    app.process_and_reply = replies
+    app.resend.Emails.send = replies.send
+    client = app.app.test_client()
+
+    # The handler's per-reply log lines would drown the report
+    with open(os.devnull, "w") as quiet, contextlib.redirect_stdout(quiet):
+        report = replay(
+            args.recording,
+            lambda payload, headers: client.post("/webhook", data=payload, headers=headers).status_code,
+            secret=REPLAY_SECRET,
+            speed=args.speed,
+            concurrency=args.concurrency,
+            limit=args.limit,
+        )
+        replies.wait(report["status"].get("200", 0))
+    report["app"] = "docs-qa-agent"
+    report["reply_ms"] = percentiles(replies.durations)
+    report["upstream"] = {
+        "openai_latency_ms": args.openai_latency_ms,
+        "openai_calls": openai.calls,
+        "emails_sent": replies.sent,
+    }
+
+    print(json.dumps(report, indent=2))
+    if args.report:
+        args.report.write_text(json.dumps(report, indent=2) + "\n")
+    if args.compare:
+        print(f"\nvs {args.compare}:", file=sys.stderr)
+        for line in compare_reports(json.loads(args.compare.read_text()), report):
+            print(f"  {line}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -11,6 +11,7 @@ import pytest
 
 import app as app_module
 from app import app as flask_app
+from breaker import CircuitBreaker
 
 
 @pytest.fixture(autouse=True)
@@ -21,6 +22,13 @@ def reset_docs_cache():
     app_module._DOCS_CONTEXT = None
 
 
+@pytest.fixture(autouse=True)
+def reset_breakers(monkeypatch):
+    """Fresh circuit breakers per test, so failures in one test don't open them for the next."""
+    monkeypatch.setattr(app_module, "openai_breaker", CircuitBreaker("openai", is_failure=app_module._openai_outage))
+    monkeypatch.setattr(app_module, "resend_breaker", CircuitBreaker("resend"))
+
+
 @pytest.fixture()
 def client():
     flask_app.config["TESTING"] = True
@@ -1,10 +1,14 @@
 """Tests for Docs Q&A Agent."""
 
+import threading
+import time
+import uuid
 from unittest.mock import MagicMock, patch
 
 import pytest
 
 import app as app_module
+from admission import AdmissionController
 
 
 # ---------------------------------------------------------------------------
@@ -47,6 +51,15 @@ def make_mock_event(
     return event
 
 
+def webhook_headers(timestamp: int | None = None) -> dict[str, str]:
+    """Well-formed Sema webhook headers; the signature is unique per call."""
+    return {
+        "webhook-id": f"msg_{uuid.uuid4().hex}",
+        "webhook-timestamp": str(int(time.time()) if timestamp is None else timestamp),
+        "webhook-signature": f"v1,{uuid.uuid4().hex}",
+    }
+
+
 def mock_httpx_get(records: list = SAMPLE_DOCS):
     """Return a mock httpx response with the given records."""
     response = MagicMock()
@@ -71,7 +84,8 @@ def mock_openai_completion(answer: str = "Here is your answer."):
 def test_health_returns_ok(client):
     resp = client.get("/health")
     assert resp.status_code == 200
-    assert resp.json == {"status": "ok"}
+    assert resp.json["status"] == "ok"
+    assert {name: b["state"] for name, b in resp.json["breakers"].items()} == {"openai": "closed", "resend": "closed"}
 
 
 # ---------------------------------------------------------------------------
@@ -167,7 +181,7 @@ def test_webhook_rejects_bad_signature(client):
     from sema_sdk import WebhookVerificationError
 
     with patch.object(app_module.verifier, "verify", side_effect=WebhookVerificationError("bad sig")):
-        resp = client.post("/webhook", data=b"{}", content_type="application/json")
+        resp = client.post("/webhook", data=b"{}", content_type="application/json", headers=webhook_headers())
 
     assert resp.status_code == 400
     assert b"bad sig" in resp.data
@@ -176,7 +190,7 @@ def test_webhook_rejects_bad_signature(client):
 def test_webhook_returns_400_when_no_sender(client):
     event = make_mock_event(sender_address=None)
     with patch.object(app_module.verifier, "verify", return_value=event):
-        resp = client.post("/webhook", data=b"{}", content_type="application/json")
+        resp = client.post("/webhook", data=b"{}", content_type="application/json", headers=webhook_headers())
 
     assert resp.status_code == 400
     assert b"No sender address" in resp.data
@@ -194,7 +208,7 @@ def test_webhook_success(client):
         ),
         patch("resend.Emails.send") as mock_send,
     ):
-        resp = client.post("/webhook", data=b"{}", content_type="application/json")
+        resp = client.post("/webhook", data=b"{}", content_type="application/json", headers=webhook_headers())
 
     assert resp.status_code == 200
     assert resp.json == {"ok": True}
@@ -218,7 +232,7 @@ def test_webhook_returns_200_even_on_openai_error(client):
             side_effect=Exception("OpenAI down"),
         ),
     ):
-        resp = client.post("/webhook", data=b"{}", content_type="application/json")
+        resp = client.post("/webhook", data=b"{}", content_type="application/json", headers=webhook_headers())
 
     assert resp.status_code == 200
     assert resp.json == {"ok": True}
@@ -237,7 +251,213 @@ def test_webhook_returns_200_even_on_resend_error(client):
         ),
         patch("resend.Emails.send", side_effect=Exception("Resend down")),
     ):
-        resp = client.post("/webhook", data=b"{}", content_type="application/json")
+        resp = client.post("/webhook", data=b"{}", content_type="application/json", headers=webhook_headers())
 
     assert resp.status_code == 200
     assert resp.json == {"ok": True}
+
+
+def test_webhook_guard_rejects_missing_headers_before_verify(client):
+    with patch.object(app_module.verifier, "verify") as mock_verify:
+        resp = client.post("/webhook", data=b"{}", content_type="application/json")
+
+    assert resp.status_code == 400
+    assert b"Missing webhook-id header" in resp.data
+    mock_verify.assert_not_called()
+
+
+def test_webhook_guard_rejects_stale_timestamp_before_verify(client):
+    headers = webhook_headers(timestamp=int(time.time()) - 3600)
+    with patch.object(app_module.verifier, "verify") as mock_verify:
+        resp = client.post("/webhook", data=b"{}", content_type="application/json", headers=headers)
+
+    assert resp.status_code == 400
+    assert b"timestamp too old" in resp.data
+    mock_verify.assert_not_called()
+
+
+def test_webhook_guard_rejects_oversized_body_before_verify(client):
+    body = b"x" * (app_module.webhook_guard.max_body_bytes + 1)
+    with patch.object(app_module.verifier, "verify") as mock_verify:
+        resp = client.post("/webhook", data=body, content_type="application/json", headers=webhook_headers())
+
+    assert resp.status_code == 413
+    mock_verify.assert_not_called()
+
+
+def test_webhook_guard_rejects_replayed_signature(client):
+    headers = webhook_headers()
+    event = make_mock_event(sender_address=None)
+    with patch.object(app_module.verifier, "verify", return_value=event) as mock_verify:
+        first = client.post("/webhook", data=b"{}", content_type="application/json", headers=headers)
+        replay = client.post("/webhook", data=b"{}", content_type="application/json", headers=headers)
+
+    assert first.status_code == 400  # Verified, then rejected for having no sender
+    assert replay.status_code == 409
+    assert mock_verify.call_count == 1
+
+
+def test_webhook_guard_does_not_remember_failed_signatures(client):
+    from sema_sdk import WebhookVerificationError
+
+    headers = webhook_headers()
+    with patch.object(app_module.verifier, "verify", side_effect=WebhookVerificationError("bad sig")):
+        client.post("/webhook", data=b"{}", content_type="application/json", headers=headers)
+        resp = client.post("/webhook", data=b"{}", content_type="application/json", headers=headers)
+
+    assert resp.status_code == 400
+    assert b"bad sig" in resp.data
+
+
+def test_webhook_recorder_keeps_only_verified_payloads(client, tmp_path, monkeypatch):
+    from sema_sdk import WebhookVerificationError
+
+    from webhook_recorder import WebhookRecorder, read_recording
+
+    recorder = WebhookRecorder(tmp_path / "webhooks.jsonl.gz")
+    monkeypatch.setattr(app_module, "webhook_recorder", recorder)
+    headers = webhook_headers()
+    with patch.object(app_module.verifier, "verify", side_effect=WebhookVerificationError("bad sig")):
+        client.post("/webhook", data=b'{"forged": true}', content_type="application/json", headers=webhook_headers())
+    with patch.object(app_module.verifier, "verify", return_value=make_mock_event(sender_address=None)):
+        client.post("/webhook", data=b'{"n": 1}', content_type="application/json", headers=headers)
+    recorder.close()
+
+    entries = list(read_recording(tmp_path / "webhooks.jsonl.gz"))
+    assert [(e["webhook_id"], e["payload"]) for e in entries] == [(headers["webhook-id"], '{"n": 1}')]
+
+
+# ---------------------------------------------------------------------------
+# /metrics endpoint
+# ---------------------------------------------------------------------------
+
+
+def test_metrics_reports_openai_rate_limit(client):
+    resp = client.get("/metrics")
+    assert resp.status_code == 200
+    openai = resp.json["rate_limits"]["openai"]
+    assert openai["limit"] >= 1
+    assert openai["in_flight"] == 0
+    assert resp.json["webhook_guard"]["rejected"] >= 0
+    assert resp.json["admission"]["in_flight"] == 0
+
+
+def test_openai_responses_feed_limiter():
+    hooks = app_module.openai_client._client.event_hooks["response"]
+    assert app_module.openai_limiter.observe_response in hooks
+
+
+# ---------------------------------------------------------------------------
+# Admission control
+# ---------------------------------------------------------------------------
+
+
+def test_webhook_is_shed_with_retry_after_when_saturated(client, monkeypatch):
+    monkeypatch.setattr(app_module, "admission", AdmissionController(max_in_flight=1))
+    held = app_module.admission.admit()
+    headers = webhook_headers()
+    with (
+        patch.object(app_module.verifier, "verify", return_value=make_mock_event()),
+        patch.object(app_module, "process_and_reply") as mock_process,
+    ):
+        resp = client.post("/webhook", data=b"{}", content_type="application/json", headers=headers)
+        mock_process.assert_not_called()
+        held.done()
+        # The shed attempt wasn't remembered, so a retry with the same signature is handled
+        retry = client.post("/webhook", data=b"{}", content_type="application/json", headers=headers)
+
+    assert resp.status_code == 503
+    assert resp.headers["Retry-After"] == "1"
+    assert retry.status_code == 200
+    assert app_module.admission.snapshot()["rejected"] == 1
+
+
+def test_admission_slot_is_held_until_the_reply_finishes(client, monkeypatch):
+    monkeypatch.setattr(app_module, "admission", AdmissionController(max_in_flight=1))
+    release = threading.Event()
+    with (
+        patch.object(app_module.verifier, "verify", return_value=make_mock_event()),
+        patch.object(app_module, "process_and_reply", side_effect=lambda *args: release.wait(5)),
+    ):
+        first = client.post("/webhook", data=b"{}", content_type="application/json", headers=webhook_headers())
+        second = client.post("/webhook", data=b"{}", content_type="application/json", headers=webhook_headers())
+        release.set()
+        deadline = time.monotonic() + 5
+        while app_module.admission.snapshot()["in_flight"] and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    assert (first.status_code, second.status_code) == (200, 503)
+    assert app_module.admission.snapshot()["in_flight"] == 0
+
+
+# ---------------------------------------------------------------------------
+# Circuit breakers
+# ---------------------------------------------------------------------------
+
+
+def open_breaker(breaker) -> None:
+    for _ in range(breaker.failure_threshold):
+        breaker.allow()
+        breaker.record_failure()
+
+
+def test_open_openai_breaker_sends_the_fallback_reply(client):
+    open_breaker(app_module.openai_breaker)
+    with (
+        patch("httpx.get", return_value=mock_httpx_get()),
+        patch.object(app_module.openai_client.chat.completions, "create") as mock_create,
+        patch("resend.Emails.send") as mock_send,
+    ):
+        app_module.process_and_reply("user@example.com", "Webhooks?", "How do webhooks work?")
+
+    mock_create.assert_not_called()
+    assert mock_send.call_args[0][0]["text"] == app_module.FALLBACK_ANSWER
+    health = client.get("/health").json
+    assert health["status"] == "degraded"
+    assert health["breakers"]["openai"]["state"] == "open"
+
+
+def test_open_resend_breaker_turns_the_webhook_away(client):
+    open_breaker(app_module.resend_breaker)
+    headers = webhook_headers()
+    with (
+        patch.object(app_module.verifier, "verify", return_value=make_mock_event()),
+        patch.object(app_module, "process_and_reply"),
+    ):
+        resp = client.post("/webhook", data=b"{}", content_type="application/json", headers=headers)
+        app_module.resend_breaker.record_success()
+        # Not remembered, so the redelivery goes through once Resend is back
+        retry = client.post("/webhook", data=b"{}", content_type="application/json", headers=headers)
+
+    assert resp.status_code == 503
+    assert int(resp.headers["Retry-After"]) >= 1
+    assert retry.status_code == 200
+
+
+def test_open_resend_breaker_skips_the_answer(client):
+    open_breaker(app_module.resend_breaker)
+    with (
+        patch.object(app_module.openai_client.chat.completions, "create") as mock_create,
+        patch("resend.Emails.send") as mock_send,
+    ):
+        app_module.process_and_reply("user@example.com", "Webhooks?", "How do webhooks work?")
+
+    mock_create.assert_not_called()
+    mock_send.assert_not_called()
+
+
+def test_openai_failures_open_the_breaker_and_ask_fails_fast(client):
+    with (
+        patch.object(app_module, "DEV_MODE", True),
+        patch("httpx.get", return_value=mock_httpx_get()),
+        patch.object(
+            app_module.openai_client.chat.completions, "create", side_effect=Exception("OpenAI down")
+        ) as mock_create,
+    ):
+        statuses = [client.get("/ask?q=hello").status_code for _ in range(6)]
+        resp = client.get("/ask?q=hello")
+
+    assert statuses == [500] * 5 + [503]
+    assert mock_create.call_count == 5
+    assert resp.status_code == 503
+    assert int(resp.headers["Retry-After"]) >= 1
@@ -0,0 +1,220 @@
+"""Record verified Sema webhooks and replay them offline.
+
+With WEBHOOK_RECORD_PATH set, every webhook that passes signature
+verification is appended to a gzip-compressed JSONL file, with its
+arrival time:
+
+    {"received_at": 1767225600.123, "webhook_id": "msg_...", "payload": "<raw JSON body>"}
+
+Recordings hold raw payloads, including sender addresses and message
+bodies. Treat them like production data.
+
+`replay()` feeds a recording back through an app's /webhook handler:
+at the original pace (speed=1), sped up (speed=10), or as fast as
+possible (speed=0). Each payload is re-signed with the replay secret
+at send time, so the guard and verifier run as they do in production.
+The returned report is a plain dict, so two runs can be diffed with
+`compare_reports()`.
+"""
+
+from __future__ import annotations
+
+import base64
+import fcntl
+import gzip
+import hashlib
+import hmac
+import json
+import os
+import statistics
+import threading
+import time
+import uuid
+import zlib
+from collections import Counter
+from collections.abc import Callable, Iterator, Mapping
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+DEFAULT_FLUSH_INTERVAL = 1.0
+
+Post = Callable[[bytes, dict[str, str]], int]
+
+
+class WebhookRecorder:
+    """Append verified payloads to a gzip JSONL file.
+
+    Lines are buffered and written at most once per flush_interval, each
+    flush as one complete gzip member under an exclusive flock. Several
+    processes (gunicorn workers, restarts) can share one path: members
+    never interleave, and a reader sees their concatenation as one
+    stream. A crash loses at most one flush_interval of traffic.
+    """
+
+    def __init__(self, path: Path, *, flush_interval: float = DEFAULT_FLUSH_INTERVAL) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._fd: int | None = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+        self._pending: list[str] = []
+        self._last_flush = time.monotonic()
+        self.recorded = 0
+
+    def record(self, payload: bytes, headers: Mapping[str, str]) -> None:
+        line = json.dumps(
+            {
+                "received_at": time.time(),
+                "webhook_id": headers.get("webhook-id"),
+                "payload": payload.decode("utf-8"),
+            }
+        )
+        with self._lock:
+            if self._fd is None:
+                return
+            self._pending.append(line + "\n")
+            self.recorded += 1
+            now = time.monotonic()
+            if now - self._last_flush >= self.flush_interval:
+                self._flush()
+                self._last_flush = now
+
+    def _flush(self) -> None:
+        if not self._pending:
+            return
+        member = gzip.compress("".join(self._pending).encode("utf-8"))
+        self._pending.clear()
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            view = memoryview(member)
+            while view:
+                view = view[os.write(self._fd, view):]
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._fd is None:
+                return
+            self._flush()
+            os.close(self._fd)
+            self._fd = None
+
+
+def read_recording(path: Path) -> Iterator[dict]:
+    """Recorded webhooks in file order. A truncated or corrupt tail (e.g. after a crash) is skipped."""
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        try:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        except (EOFError, gzip.BadGzipFile, zlib.error, json.JSONDecodeError):
+            return
+
+
+def sign_webhook(secret: str, payload: bytes) -> dict[str, str]:
+    """Standard Webhooks headers for payload, as Sema signs deliveries."""
+    webhook_id, timestamp = f"msg_{uuid.uuid4().hex}", str(int(time.time()))
+    key = base64.b64decode(secret.removeprefix("whsec_"))
+    signature = hmac.new(key, f"{webhook_id}.{timestamp}.".encode() + payload, hashlib.sha256).digest()
+    return {
+        "webhook-id": webhook_id,
+        "webhook-timestamp": timestamp,
+        "webhook-signature": f"v1,{base64.b64encode(signature).decode()}",
+    }
+
+
+def percentiles(samples: list[float]) -> dict[str, float]:
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def pct(p: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))], 3)
+
+    return {
+        "p50": pct(50),
+        "p90": pct(90),
+        "p99": pct(99),
+        "max": round(ordered[-1], 3),
+        "mean": round(statistics.fmean(ordered), 3),
+    }
+
+
+def replay(
+    recording: Path,
+    post: Post,
+    *,
+    secret: str,
+    speed: float = 0.0,
+    concurrency: int = 16,
+    limit: int | None = None,
+) -> dict:
+    """Send every recorded webhook through `post` and return a performance report.
+
+    speed=1 keeps the recorded inter-arrival gaps, speed=N divides them
+    by N, and speed=0 sends as fast as `concurrency` allows. `lag_ms`
+    reports how far sends fell behind the schedule. A large lag means
+    the run was bound by concurrency, not by the recorded pace.
+    """
+    entries = list(read_recording(recording))[:limit]
+    latencies: list[float] = []
+    lags: list[float] = []
+    statuses: Counter[str] = Counter()
+    lock = threading.Lock()
+
+    def send(entry: dict, due: float) -> None:
+        now = time.perf_counter()
+        if due > now:
+            time.sleep(due - now)
+        lag = max(0.0, time.perf_counter() - due)
+        payload = entry["payload"].encode("utf-8")
+        start = time.perf_counter()
+        status = post(payload, sign_webhook(secret, payload))
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed * 1000)
+            lags.append(lag * 1000)
+            statuses[str(status)] += 1
+
+    start = time.perf_counter()
+    first = entries[0]["received_at"] if entries else 0.0
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for entry in entries:
+            offset = (entry["received_at"] - first) / speed if speed > 0 else 0.0
+            due = start + offset
+            # Don't queue far ahead of schedule: keep submission close to each webhook's due time
+            while speed > 0 and due - time.perf_counter() > 0.05:
+                time.sleep(min(due - time.perf_counter() - 0.05, 0.5))
+            pool.submit(send, entry, due)
+    wall = time.perf_counter() - start
+
+    recorded_span = entries[-1]["received_at"] - first if entries else 0.0
+    return {
+        "recording": str(recording),
+        "webhooks": len(entries),
+        "speed": speed or "max",
+        "concurrency": concurrency,
+        "recorded_seconds": round(recorded_span, 3),
+        "wall_seconds": round(wall, 3),
+        "throughput_per_s": round(len(entries) / wall, 2) if wall else None,
+        "status": dict(sorted(statuses.items())),
+        "latency_ms": percentiles(latencies),
+        "lag_ms": percentiles(lags),
+    }
+
+
+def compare_reports(baseline: dict, current: dict) -> list[str]:
+    """Human-readable deltas for the numeric fields two reports share."""
+    lines = []
+
+    def walk(prefix: str, a: object, b: object) -> None:
+        if isinstance(a, dict) and isinstance(b, dict):
+            for key in a.keys() & b.keys():
+                walk(f"{prefix}.{key}" if prefix else key, a[key], b[key])
+        elif isinstance(a, (int, float)) and isinstance(b, (int, float)) and not isinstance(a, bool):
+            change = f"{(b - a) / a * 100:+.1f}%" if a else "n/a"
+            lines.append(f"{prefix:<28} {a:>12,.3f} -> {b:>12,.3f}  ({change})")
+
+    walk("", baseline, current)
+    return sorted(lines)
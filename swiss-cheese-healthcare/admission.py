@@ -0,0 +1,127 @@
+"""Admission control for webhook handlers: shed load before it queues.
+
+Without a limit, a burst of webhooks is all accepted at once and every
+request slows down until upstream timeouts cascade. The controller
+counts admitted work still in flight and keeps an EWMA of how long each
+unit took. It admits new work while in_flight is under the limit:
+
+    limit = max_in_flight                                          latency <= target
+    limit = max(min_in_flight, max_in_flight * target / latency)   latency > target
+
+The limit shrinks as latency climbs past the target and recovers as it
+falls; min_in_flight keeps samples coming in while it is tight. Shed
+requests get 503 with a Retry-After of about one recent latency, and
+Sema redelivers them later.
+
+    ticket = admission.admit()
+    if ticket is None:
+        return admission.rejection()
+    with ticket:
+        ...  # handle the webhook
+
+Admit after signature verification, so forged requests never hold a
+slot or skew the latency, but before remembering the signature in the
+replay cache or recording the webhook. A retry may carry the same
+signature as the shed attempt, and it must not be turned away as a
+replay of a webhook that was never handled. Work that outlives the
+request (a reply sent from a background thread) hands the ticket to the
+thread, which finishes it with `with ticket:`.
+"""
+
+from __future__ import annotations
+
+import math
+import threading
+import time
+
+DEFAULT_MAX_IN_FLIGHT = 64
+DEFAULT_MIN_IN_FLIGHT = 4
+DEFAULT_LATENCY_TARGET_SECONDS = 10.0
+DEFAULT_MAX_RETRY_AFTER_SECONDS = 60
+EWMA_ALPHA = 0.1
+
+
+class AdmissionTicket:
+    """One admitted unit of work. Finishing it twice is a no-op."""
+
+    def __init__(self, controller: AdmissionController) -> None:
+        self._controller = controller
+        self._start = time.monotonic()
+        self._open = True
+
+    def done(self) -> None:
+        """Release the slot and record how long the work took."""
+        if self._open:
+            self._open = False
+            self._controller._release(time.monotonic() - self._start)
+
+    def __enter__(self) -> AdmissionTicket:
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.done()
+
+
+class AdmissionController:
+    """In-flight limit that tightens when recent latency exceeds a target."""
+
+    def __init__(
+        self,
+        *,
+        max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+        min_in_flight: int = DEFAULT_MIN_IN_FLIGHT,
+        latency_target: float = DEFAULT_LATENCY_TARGET_SECONDS,
+        max_retry_after: int = DEFAULT_MAX_RETRY_AFTER_SECONDS,
+    ) -> None:
+        self.max_in_flight = max(1, max_in_flight)
+        self.min_in_flight = max(1, min(min_in_flight, self.max_in_flight))
+        self.latency_target = latency_target
+        self.max_retry_after = max_retry_after
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._latency: float | None = None  # EWMA in seconds; None until the first sample
+        self.admitted = 0
+        self.rejected = 0
+
+    def _limit(self) -> int:
+        if self._latency is None or self._latency <= self.latency_target:
+            return self.max_in_flight
+        return max(self.min_in_flight, int(self.max_in_flight * self.latency_target / self._latency))
+
+    def admit(self) -> AdmissionTicket | None:
+        """A ticket for new work, or None if the handler should shed it."""
+        with self._lock:
+            if self._in_flight >= self._limit():
+                self.rejected += 1
+                return None
+            self._in_flight += 1
+            self.admitted += 1
+        return AdmissionTicket(self)
+
+    def _release(self, latency: float) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            previous = latency if self._latency is None else self._latency
+            self._latency = EWMA_ALPHA * latency + (1 - EWMA_ALPHA) * previous
+
+    def retry_after(self) -> int:
+        """Seconds a shed client should wait: about one recent latency, at least 1."""
+        latency = self._latency or 0.0
+        return min(self.max_retry_after, max(1, math.ceil(latency)))
+
+    def rejection(self) -> tuple[dict, int, dict[str, str]]:
+        """The 503 response for shed work."""
+        return {"error": "Overloaded, retry later"}, 503, {"Retry-After": str(self.retry_after())}
+
+    def snapshot(self) -> dict:
+        """Current admission state, for the /metrics endpoint."""
+        with self._lock:
+            return {
+                "in_flight": self._in_flight,
+                "limit": self._limit(),
+                "max_in_flight": self.max_in_flight,
+                "latency_ewma_ms": round(self._latency * 1000, 1) if self._latency is not None else None,
+                "latency_target_ms": round(self.latency_target * 1000, 1),
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+            }
@@ -7,11 +7,20 @@ not forked into the library, because PII policy is application-level concern.
 
 from __future__ import annotations
 
+import asyncio
+import contextvars
+import hashlib
 import json
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from dataclasses import dataclass
 from pathlib import Path
 from typing import Any
 
-from openai import OpenAI
+import openai
+from openai import AsyncOpenAI, OpenAI
 
 from agent_registry_router import (
     AgentRegistration,
@@ -22,6 +31,12 @@ from agent_registry_router import (
     validate_route_decision,
 )
 
+from breaker import CircuitBreaker, CircuitOpenError
+from docs_index import DEFAULT_TOKEN_BUDGET, SectionIndex
+from local_router import LocalRouter, training_examples
+from ratelimit import AdaptiveLimiter
+from tracing import span
+
 AGENT_CONFIGS: list[dict[str, Any]] = [
     {
         "name": "receptionist",
@@ -83,35 +98,99 @@ MOCK_RESPONSES: dict[str, str] = {
     ),
 }
 
+# Sent for general questions while OpenAI's circuit breaker is open
+DOCS_UNAVAILABLE_RESPONSE = (
+    "I can't look that up right now. Please call the front desk, or ask again in a few minutes."
+)
+
+# Shared by every OpenAI call site; pipeline.init feeds it response headers
+openai_limiter = AdaptiveLimiter("openai")
+
+
+def _openai_outage(e: Exception) -> bool:
+    """Connection errors, timeouts and 5xx count against OpenAI; a rejected request doesn't."""
+    if isinstance(e, openai.APIStatusError):
+        return e.status_code >= 500
+    return True
+
+
+# Also shared by every OpenAI call site; pipeline.init replaces it with the configured one
+openai_breaker = CircuitBreaker("openai", is_failure=_openai_outage)
+
+
+def set_openai_breaker(*, failure_threshold: int, reset_timeout: float) -> None:
+    """Replace the OpenAI circuit breaker (see breaker.py)."""
+    global openai_breaker
+    openai_breaker = CircuitBreaker(
+        "openai", failure_threshold=failure_threshold, reset_timeout=reset_timeout, is_failure=_openai_outage
+    )
+
+
 _CLINIC_DOCS: str | None = None
+_CLINIC_DOCS_VERSION: str | None = None
+_CLINIC_DOCS_INDEX: SectionIndex | None = None
+_docs_token_budget = DEFAULT_TOKEN_BUDGET
 
 
 def _load_clinic_docs() -> str:
-    global _CLINIC_DOCS
+    global _CLINIC_DOCS, _CLINIC_DOCS_VERSION, _CLINIC_DOCS_INDEX
     if _CLINIC_DOCS is None:
         path = Path(__file__).parent / "clinic_policies.md"
         _CLINIC_DOCS = path.read_text()
+        _CLINIC_DOCS_VERSION = hashlib.sha256(_CLINIC_DOCS.encode()).hexdigest()[:12]
+        _CLINIC_DOCS_INDEX = SectionIndex(_CLINIC_DOCS)
     return _CLINIC_DOCS
 
 
+def clinic_docs_version() -> str:
+    """Short hash of the clinic documentation used to answer general questions."""
+    _load_clinic_docs()
+    return _CLINIC_DOCS_VERSION
+
+
+def set_docs_token_budget(tokens: int) -> None:
+    """Cap the documentation sent with each general question (see docs_index.py)."""
+    global _docs_token_budget
+    _docs_token_budget = tokens
+
+
+def _docs_context(query: str) -> str:
+    """The clinic documentation to send with a question: its best sections within the token budget."""
+    _load_clinic_docs()
+    docs, _ = _CLINIC_DOCS_INDEX.select(query, _docs_token_budget)
+    return docs
+
+
+def _docs_messages(query: str) -> list[dict[str, str]]:
+    docs = _docs_context(query)
+    return [
+        {
+            "role": "system",
+            "content": (
+                "You are a helpful clinic assistant. Answer the patient's question "
+                "using only the clinic documentation below. Be brief and direct — "
+                "2-3 sentences max. If the answer isn't in the docs, say so.\n\n"
+                f"{docs}"
+            ),
+        },
+        {"role": "user", "content": query},
+    ]
+
+
 def _answer_from_docs(query: str, openai_client: OpenAI) -> str:
     """Generate a contextual answer using clinic documentation."""
-    docs = _load_clinic_docs()
-    completion = openai_client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {
-                "role": "system",
-                "content": (
-                    "You are a helpful clinic assistant. Answer the patient's question "
-                    "using only the clinic documentation below. Be brief and direct — "
-                    "2-3 sentences max. If the answer isn't in the docs, say so.\n\n"
-                    f"{docs}"
-                ),
-            },
-            {"role": "user", "content": query},
-        ],
-    )
+    messages = _docs_messages(query)
+    with span("openai.docs_answer", model="gpt-4o-mini"), openai_breaker.call(), openai_limiter.slot():
+        completion = openai_client.chat.completions.create(model="gpt-4o-mini", messages=messages)
+    return completion.choices[0].message.content or "I couldn't find that information."
+
+
+async def _aanswer_from_docs(query: str, openai_client: AsyncOpenAI) -> str:
+    """_answer_from_docs for AsyncOpenAI."""
+    messages = _docs_messages(query)
+    with span("openai.docs_answer", model="gpt-4o-mini"), openai_breaker.call():
+        async with openai_limiter.aslot():
+            completion = await openai_client.chat.completions.create(model="gpt-4o-mini", messages=messages)
     return completion.choices[0].message.content or "I couldn't find that information."
 
 
@@ -152,55 +231,458 @@ _CLASSIFIER_EXTRA_INSTRUCTIONS = (
 )
 
 
-def classify(
-    query: str,
-    *,
-    pii_detected: bool,
-    openai_client: OpenAI,
-) -> tuple[ValidatedRouteDecision, str]:
-    """Classify a query and return the validated decision + agent response.
+@dataclass(frozen=True)
+class ClassifierSetup:
+    """Registry, default agent, and rendered classifier prompt for one routing mode."""
 
-    When PII is detected, the classifier only sees PII-safe agents.
+    registry: AgentRegistry
+    routable: frozenset[str]
+    default_agent: str
+    system_prompt: str
+    config_version: str
+
+
+# Memoized per (pii_detected, config version). AGENT_CONFIGS is static, so
+# every query used to rebuild identical registries and prompts.
+_CLASSIFIER_SETUPS: dict[tuple[bool, str], ClassifierSetup] = {}
+
+
+def agent_config_version() -> str:
+    """Short hash of AGENT_CONFIGS and the classifier instructions.
+
+    Hashed from the contents on every call (about 20µs for a few agents), so
+    reassigning AGENT_CONFIGS and editing it in place are both picked up.
     """
+    payload = json.dumps([AGENT_CONFIGS, _CLASSIFIER_EXTRA_INSTRUCTIONS], sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()[:12]
+
+
+def invalidate_agent_cache() -> None:
+    """Drop memoized registries, prompts and the local router (they are rebuilt on the next query)."""
+    global _LOCAL_ROUTER
+    _LOCAL_ROUTER = None
+    _CLASSIFIER_SETUPS.clear()
+
+
+def _build_classifier_setup(pii_detected: bool, version: str) -> ClassifierSetup:
     if pii_detected:
         registry = build_pii_filtered_registry()
         default = "receptionist"
     else:
         registry = build_full_registry()
         default = "general"
-
     system_prompt = build_classifier_system_prompt(
         registry,
         default_agent=default,
         extra_instructions=_CLASSIFIER_EXTRA_INSTRUCTIONS,
     )
+    return ClassifierSetup(registry, frozenset(registry.routable_names()), default, system_prompt, version)
+
+
+def classifier_setup(pii_detected: bool) -> ClassifierSetup:
+    """The memoized registry and prompt for a routing mode.
+
+    When PII is detected, the classifier only sees PII-safe agents.
+    """
+    version = agent_config_version()
+    setup = _CLASSIFIER_SETUPS.get((pii_detected, version))
+    if setup is None:
+        # Concurrent misses build the same value twice, which is harmless
+        setup = _build_classifier_setup(pii_detected, version)
+        for key in [k for k in _CLASSIFIER_SETUPS if k[1] != version]:
+            _CLASSIFIER_SETUPS.pop(key, None)
+        _CLASSIFIER_SETUPS[(pii_detected, version)] = setup
+    return setup
+
+
+_LOCAL_ROUTER: tuple[str, LocalRouter] | None = None
+
+
+def local_router() -> LocalRouter:
+    """The local router trained on the current AGENT_CONFIGS (retrained when they change)."""
+    global _LOCAL_ROUTER
+    version = agent_config_version()
+    cached = _LOCAL_ROUTER
+    if cached is None or cached[0] != version:
+        cached = (version, LocalRouter(training_examples(AGENT_CONFIGS)))
+        _LOCAL_ROUTER = cached
+    return cached[1]
+
+
+class SpeculationStats:
+    """How often a speculative docs answer was used vs thrown away."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.started = 0
+        self.used = 0
+        self.wasted = 0  # Completed (or in flight) for a route that wasn't general
+        self.cancelled = 0  # Discarded before it started, so it cost nothing
+
+    def record(self, outcome: str) -> None:
+        with self._lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+
+    def snapshot(self) -> dict:
+        decided = self.used + self.wasted
+        return {
+            "started": self.started,
+            "used": self.used,
+            "wasted": self.wasted,
+            "cancelled": self.cancelled,
+            "waste_rate": self.wasted / decided if decided else 0.0,
+        }
+
+
+speculation_stats = SpeculationStats()
+
+
+class FusedStats:
+    """How often a fused classify-and-answer call answered a general route itself."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.answered = 0
+        self.missing = 0  # Routed to general without an answer: the docs call ran after all
+
+    def record(self, outcome: str) -> None:
+        with self._lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+
+    def snapshot(self) -> dict:
+        general = self.answered + self.missing
+        return {
+            "calls": self.calls,
+            "answered": self.answered,
+            "missing": self.missing,
+            "fallback_rate": self.missing / general if general else 0.0,
+        }
+
+
+fused_stats = FusedStats()
+
+_FUSED_INSTRUCTIONS = (
+    'Also include an "answer" field. If you route to "general", "answer" must answer the '
+    "user's question using only the clinic documentation below. Be brief and direct — "
+    "2-3 sentences max. If the answer isn't in the docs, say so. For any other agent, "
+    'set "answer" to null.'
+)
+_SPECULATION_POOL = ThreadPoolExecutor(max_workers=8, thread_name_prefix="speculative-docs")
+
+
+def classify(
+    query: str,
+    *,
+    pii_detected: bool,
+    openai_client: OpenAI,
+    local_threshold: float | None = None,
+    speculate_docs: bool = False,
+    fused: bool = False,
+    timeout: float | None = None,
+) -> tuple[ValidatedRouteDecision, str, str]:
+    """Classify a query and return the validated decision, agent response, and route path.
+
+    When PII is detected, the classifier only sees PII-safe agents. With a
+    local_threshold, the local router decides when it is at least that
+    confident (route path "local"); otherwise the LLM does ("llm").
+
+    With speculate_docs, a non-PII query that goes to the LLM router also
+    starts its docs answer right away, in parallel with routing. The
+    answer is used if the route is general and discarded otherwise (see
+    speculation_stats). PII queries never speculate: general is not in
+    their registry. With a timeout (the classifier's budget in seconds),
+    the answer is awaited for at most what is left of it after routing;
+    if it is still running then, it is discarded and TimeoutError raised.
 
-    completion = openai_client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": system_prompt},
+    With fused, a non-PII query that goes to the LLM router gets one JSON
+    completion holding both the route and, for general, the docs answer
+    (route path "fused"). The route is validated as usual. If it ends up
+    general without an answer, the docs call runs after all (see
+    fused_stats). Fused calls replace speculation.
+
+    While OpenAI's circuit breaker is open, the query is routed by
+    _degraded instead (route path "degraded").
+    """
+    setup = classifier_setup(pii_detected)
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    try:
+        return _classify(
+            query, setup, pii_detected, openai_client, local_threshold, speculate_docs, fused, deadline
+        )
+    except CircuitOpenError:
+        return _degraded(query, setup)
+
+
+def _classify(
+    query: str,
+    setup: ClassifierSetup,
+    pii_detected: bool,
+    openai_client: OpenAI,
+    local_threshold: float | None,
+    speculate_docs: bool,
+    fused: bool,
+    deadline: float | None,
+) -> tuple[ValidatedRouteDecision, str, str]:
+    local = _local_decision(query, setup, local_threshold)
+    if local is not None:
+        return _finish(query, local, setup, openai_client) + ("local",)
+
+    if fused and not pii_detected:
+        with span("openai.route_answer", model="gpt-4o-mini"), openai_breaker.call(), openai_limiter.slot():
+            completion = openai_client.chat.completions.create(**_fused_request(query, setup))
+        decision, answer = _parse_fused(completion, setup)
+        validated, response = _finish(query, decision, setup, openai_client, fused_answer=answer)
+        _record_fused(validated, answer)
+        return validated, response, "fused"
+
+    speculative = None
+    if speculate_docs and not pii_detected:
+        speculative = _SPECULATION_POOL.submit(
+            contextvars.copy_context().run, _answer_from_docs, query, openai_client
+        )
+        speculation_stats.record("started")
+
+    try:
+        with span("openai.route", model="gpt-4o-mini"), openai_breaker.call(), openai_limiter.slot():
+            completion = openai_client.chat.completions.create(**_route_request(query, setup))
+        decision = _parse_route(completion, setup)
+    except BaseException:
+        if speculative is not None:
+            _discard(speculative)
+        raise
+
+    return _finish(query, decision, setup, openai_client, speculative, deadline=deadline) + ("llm",)
+
+
+async def aclassify(
+    query: str,
+    *,
+    pii_detected: bool,
+    openai_client: AsyncOpenAI,
+    local_threshold: float | None = None,
+    speculate_docs: bool = False,
+    fused: bool = False,
+) -> tuple[ValidatedRouteDecision, str, str]:
+    """classify() for AsyncOpenAI: same routing, validation and route paths.
+
+    A speculative docs answer is a task on the running loop. When the
+    route isn't general it is cancelled, which also aborts its request
+    if it is in flight.
+    """
+    setup = classifier_setup(pii_detected)
+    try:
+        return await _aclassify(query, setup, pii_detected, openai_client, local_threshold, speculate_docs, fused)
+    except CircuitOpenError:
+        return _degraded(query, setup)
+
+
+async def _aclassify(
+    query: str,
+    setup: ClassifierSetup,
+    pii_detected: bool,
+    openai_client: AsyncOpenAI,
+    local_threshold: float | None,
+    speculate_docs: bool,
+    fused: bool,
+) -> tuple[ValidatedRouteDecision, str, str]:
+    local = _local_decision(query, setup, local_threshold)
+    if local is not None:
+        return await _afinish(query, local, setup, openai_client) + ("local",)
+
+    if fused and not pii_detected:
+        with span("openai.route_answer", model="gpt-4o-mini"), openai_breaker.call():
+            async with openai_limiter.aslot():
+                completion = await openai_client.chat.completions.create(**_fused_request(query, setup))
+        decision, answer = _parse_fused(completion, setup)
+        validated, response = await _afinish(query, decision, setup, openai_client, fused_answer=answer)
+        _record_fused(validated, answer)
+        return validated, response, "fused"
+
+    speculative = None
+    if speculate_docs and not pii_detected:
+        speculative = asyncio.create_task(_aanswer_from_docs(query, openai_client))
+        speculation_stats.record("started")
+
+    try:
+        with span("openai.route", model="gpt-4o-mini"), openai_breaker.call():
+            async with openai_limiter.aslot():
+                completion = await openai_client.chat.completions.create(**_route_request(query, setup))
+        decision = _parse_route(completion, setup)
+    except BaseException:
+        if speculative is not None:
+            _adiscard(speculative)
+        raise
+
+    return await _afinish(query, decision, setup, openai_client, speculative) + ("llm",)
+
+
+def _local_decision(query: str, setup: ClassifierSetup, local_threshold: float | None) -> RouteDecision | None:
+    """The local router's decision, if it is enabled and confident enough."""
+    if local_threshold is None:
+        return None
+    with span("local_router"):
+        local = local_router().route(query, setup.routable)
+    if local is None or local[1] < local_threshold:
+        return None
+    agent, confidence = local
+    return RouteDecision(
+        agent=agent,
+        confidence=confidence,
+        reasoning=f"Local router: {confidence:.2f} >= {local_threshold:.2f}",
+    )
+
+
+def _degraded(query: str, setup: ClassifierSetup) -> tuple[ValidatedRouteDecision, str, str]:
+    """Route without OpenAI: the local router's best guess at any confidence, and no docs answer."""
+    with span("local_router", degraded=True):
+        local = local_router().route(query, setup.routable)
+    agent, confidence = local if local is not None else (setup.default_agent, 0.0)
+    validated = _validate(
+        RouteDecision(agent=agent, confidence=confidence, reasoning="OpenAI unavailable: local router fallback"),
+        setup,
+    )
+    if validated.agent == "general":
+        response = DOCS_UNAVAILABLE_RESPONSE
+    else:
+        response = MOCK_RESPONSES.get(validated.agent, f"[{validated.agent}] handled the query.")
+    return validated, response, "degraded"
+
+
+def _route_request(query: str, setup: ClassifierSetup) -> dict[str, Any]:
+    return {
+        "model": "gpt-4o-mini",
+        "messages": [
+            {"role": "system", "content": setup.system_prompt},
             {"role": "user", "content": query},
         ],
-        response_format={"type": "json_object"},
-    )
+        "response_format": {"type": "json_object"},
+    }
+
+
+def _fused_request(query: str, setup: ClassifierSetup) -> dict[str, Any]:
+    # The docs go last, so the memoized routing prompt stays a stable prefix
+    request = _route_request(query, setup)
+    request["messages"][0] = {
+        "role": "system",
+        "content": f"{setup.system_prompt}\n\n{_FUSED_INSTRUCTIONS}\n\n{_docs_context(query)}",
+    }
+    return request
+
 
-    raw = completion.choices[0].message.content or "{}"
-    parsed = json.loads(raw)
-    decision = RouteDecision(
-        agent=parsed.get("agent", default),
+def _parse_route(completion: Any, setup: ClassifierSetup) -> RouteDecision:
+    return _route_decision(json.loads(completion.choices[0].message.content or "{}"), setup)
+
+
+def _parse_fused(completion: Any, setup: ClassifierSetup) -> tuple[RouteDecision, str | None]:
+    """The routing decision and its answer, kept only if the model itself chose general."""
+    parsed = json.loads(completion.choices[0].message.content or "{}")
+    decision = _route_decision(parsed, setup)
+    answer = parsed.get("answer")
+    if decision.agent != "general" or not isinstance(answer, str) or not answer.strip():
+        return decision, None
+    return decision, answer.strip()
+
+
+def _route_decision(parsed: dict[str, Any], setup: ClassifierSetup) -> RouteDecision:
+    return RouteDecision(
+        agent=parsed.get("agent", setup.default_agent),
         confidence=float(parsed.get("confidence", 0.5)),
         reasoning=parsed.get("reasoning"),
     )
 
+
+def _record_fused(validated: ValidatedRouteDecision, answer: str | None) -> None:
+    fused_stats.record("calls")
+    if validated.agent == "general":
+        fused_stats.record("answered" if answer is not None else "missing")
+
+
+def _discard(speculative: Future[str]) -> None:
+    speculation_stats.record("cancelled" if speculative.cancel() else "wasted")
+
+
+def _adiscard(speculative: asyncio.Task[str]) -> None:
+    # Counted as wasted: unlike a queued thread-pool future, the task may already have sent its request
+    speculation_stats.record("wasted")
+    speculative.cancel()
+
+
+def revalidate_route(decision: ValidatedRouteDecision, *, pii_detected: bool) -> bool:
+    """Whether a previously validated decision still routes to the same agent today."""
+    setup = classifier_setup(pii_detected)
     validated = validate_route_decision(
-        decision,
-        registry=registry,
-        default_agent=default,
+        RouteDecision(agent=decision.agent, confidence=decision.confidence, reasoning=decision.reasoning),
+        registry=setup.registry,
+        default_agent=setup.default_agent,
         allow_fallback=True,
     )
+    return validated.agent == decision.agent
+
+
+def _finish(
+    query: str,
+    decision: RouteDecision,
+    setup: ClassifierSetup,
+    openai_client: OpenAI,
+    speculative: Future[str] | None = None,
+    fused_answer: str | None = None,
+    deadline: float | None = None,
+) -> tuple[ValidatedRouteDecision, str]:
+    """Validate a decision against the registry and produce the agent's response."""
+    validated = _validate(decision, setup)
 
     if validated.agent == "general":
-        response = _answer_from_docs(query, openai_client)
+        if fused_answer is not None:
+            response = fused_answer
+        elif speculative is not None:
+            remaining = max(0.0, deadline - time.monotonic()) if deadline is not None else None
+            try:
+                response = speculative.result(timeout=remaining)
+            except FutureTimeoutError:
+                # Don't hold the stage past its budget; the OpenAI client's own timeout ends the call
+                _discard(speculative)
+                raise TimeoutError("Speculative docs answer outlasted the classifier budget") from None
+            speculation_stats.record("used")
+        else:
+            response = _answer_from_docs(query, openai_client)
     else:
+        if speculative is not None:
+            _discard(speculative)
         response = MOCK_RESPONSES.get(validated.agent, f"[{validated.agent}] handled the query.")
     return validated, response
+
+
+async def _afinish(
+    query: str,
+    decision: RouteDecision,
+    setup: ClassifierSetup,
+    openai_client: AsyncOpenAI,
+    speculative: asyncio.Task[str] | None = None,
+    fused_answer: str | None = None,
+) -> tuple[ValidatedRouteDecision, str]:
+    """_finish for AsyncOpenAI."""
+    validated = _validate(decision, setup)
+
+    if validated.agent == "general":
+        if fused_answer is not None:
+            response = fused_answer
+        elif speculative is not None:
+            speculation_stats.record("used")
+            response = await speculative
+        else:
+            response = await _aanswer_from_docs(query, openai_client)
+    else:
+        if speculative is not None:
+            _adiscard(speculative)
+        response = MOCK_RESPONSES.get(validated.agent, f"[{validated.agent}] handled the query.")
+    return validated, response
+
+
+def _validate(decision: RouteDecision, setup: ClassifierSetup) -> ValidatedRouteDecision:
+    return validate_route_decision(
+        decision,
+        registry=setup.registry,
+        default_agent=setup.default_agent,
+        allow_fallback=True,
+    )
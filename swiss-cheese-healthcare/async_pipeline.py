@@ -0,0 +1,294 @@
+"""The webhook pipeline on asyncio, as an ASGI app.
+
+In pipeline.py, every webhook holds a server thread, and a stage pool
+thread for the classifier, for as long as OpenAI takes to answer. So
+in-flight webhooks are capped by thread counts. Here a webhook is a
+coroutine on one event loop:
+
+- the classifier awaits `AsyncOpenAI` through `agents.aclassify`
+  (and the classification cache, when enabled);
+- the interceptor is CPU-light and runs inline, except in full-text
+  mode, where it downloads attachments on a worker thread;
+- both run in an `asyncio.TaskGroup`, each with the same timeout as in
+  pipeline.py.
+
+Everything else is shared with pipeline.py: its settings, guard,
+verifier, recorder, stage functions and `event_hub`. The events are
+therefore the same, and `cli.render_event` renders them unchanged. A
+timed-out or failed stage publishes `error` and contributes None to the
+aggregate, as under the StageScheduler.
+
+The app serves POST /webhook, GET /health and GET /metrics; SSE clients
+use the Flask app. Serve it with `python cli.py --async` or, after
+init(), with any ASGI server (`uvicorn` is optional).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+from collections.abc import Awaitable, Callable, Mapping
+from typing import Any
+
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+from sema_sdk import WebhookVerificationError
+
+import pipeline
+import tracing
+from agents import aclassify, openai_limiter
+from pipeline import DEFAULT_CLASSIFIER_TIMEOUT, DEFAULT_INTERCEPTOR_TIMEOUT
+from scheduler import StageOutcome
+
+AsyncStageFn = Callable[[Mapping[str, Any]], Awaitable[Any]]
+
+_openai_client: AsyncOpenAI | None = None
+_classifier_timeout = DEFAULT_CLASSIFIER_TIMEOUT
+_interceptor_timeout = DEFAULT_INTERCEPTOR_TIMEOUT
+
+
+class _BodyTooLarge(Exception):
+    pass
+
+
+class _Disconnected(Exception):
+    pass
+
+
+class StageStats:
+    """Per-stage outcome counts and in-flight webhooks, for /metrics."""
+
+    def __init__(self) -> None:
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.counts: dict[str, dict[str, int]] = {"pii": {}, "classifier": {}, "interceptor": {}}
+
+    def started(self) -> None:
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def finished(self) -> None:
+        self.in_flight -= 1
+
+    def record(self, stage: str, outcome: StageOutcome) -> None:
+        counts = self.counts[stage]
+        counts[outcome.status] = counts.get(outcome.status, 0) + 1
+
+    def snapshot(self) -> dict:
+        return {"in_flight": self.in_flight, "peak_in_flight": self.peak_in_flight, "counts": self.counts}
+
+
+stage_stats = StageStats()
+
+
+def init(
+    webhook_secret: str,
+    openai_api_key: str,
+    *,
+    classifier_timeout: float = DEFAULT_CLASSIFIER_TIMEOUT,
+    interceptor_timeout: float = DEFAULT_INTERCEPTOR_TIMEOUT,
+    openai_client: AsyncOpenAI | None = None,
+    **options: Any,
+) -> None:
+    """Initialize pipeline.py with `options` (see pipeline.init), then the async OpenAI client.
+
+    openai_client replaces the real AsyncOpenAI (bench_async.py passes
+    an AsyncStubOpenAI).
+    """
+    global _openai_client, _classifier_timeout, _interceptor_timeout
+    pipeline.init(
+        webhook_secret,
+        openai_api_key,
+        classifier_timeout=classifier_timeout,
+        interceptor_timeout=interceptor_timeout,
+        **options,
+    )
+    _classifier_timeout = classifier_timeout
+    _interceptor_timeout = interceptor_timeout
+    _openai_client = openai_client or AsyncOpenAI(
+        api_key=openai_api_key,
+        timeout=classifier_timeout,
+        max_retries=0,
+        http_client=DefaultAsyncHttpxClient(event_hooks={"response": [openai_limiter.aobserve_response]}),
+    )
+
+
+async def app(scope: dict, receive: Callable, send: Callable) -> None:
+    """ASGI entry point."""
+    if scope["type"] == "lifespan":
+        await _lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        return
+    route = (scope["method"], scope["path"])
+    extra_headers: dict[str, str] = {}
+    if route == ("GET", "/health"):
+        body, status = pipeline.health()
+    elif route == ("GET", "/metrics"):
+        body, status = metrics()
+    elif route == ("POST", "/webhook"):
+        headers = {name.decode("latin-1").lower(): value.decode("latin-1") for name, value in scope["headers"]}
+        try:
+            body, status, *rest = await handle_webhook(headers, receive)
+            extra_headers = rest[0] if rest else {}
+        except _Disconnected:
+            return
+    elif scope["path"] in ("/health", "/metrics", "/webhook"):
+        body, status = {"error": "Method not allowed"}, 405
+    else:
+        body, status = {"error": "Not found"}, 404
+    await _send_json(send, status, body, extra_headers)
+
+
+async def _lifespan(receive: Callable, send: Callable) -> None:
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            close = getattr(_openai_client, "close", None)
+            if close is not None:
+                await close()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def _send_json(
+    send: Callable, status: int, body: dict, extra_headers: Mapping[str, str] | None = None
+) -> None:
+    extra_headers = extra_headers or {}
+    data = json.dumps(body).encode()
+    headers = [(b"content-type", b"application/json"), (b"content-length", str(len(data)).encode())]
+    headers += [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in extra_headers.items()]
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": data})
+
+
+async def _read_body(receive: Callable, max_bytes: int) -> bytes:
+    """The request body; chunked bodies carry no Content-Length, so the cap is checked as they arrive."""
+    chunks: list[bytes] = []
+    size = 0
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            raise _Disconnected
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        if size > max_bytes:
+            raise _BodyTooLarge
+        chunks.append(chunk)
+        if not message.get("more_body"):
+            return b"".join(chunks)
+
+
+def metrics() -> tuple[dict, int]:
+    body, status = pipeline.metrics()
+    return {**body, "stages": stage_stats.snapshot()}, status
+
+
+async def handle_webhook(
+    headers: Mapping[str, str], receive: Callable
+) -> tuple[dict, int] | tuple[dict, int, dict[str, str]]:
+    """Receive a Sema ITEM_READY webhook and run the pipeline. Headers are lower-cased."""
+    pipeline_start = time.perf_counter_ns()
+    guard = pipeline.webhook_guard
+
+    content_length = headers.get("content-length", "")
+    rejection = guard.check(int(content_length) if content_length.isdigit() else None, headers)
+    if rejection:
+        return rejection
+    try:
+        payload = await _read_body(receive, guard.max_body_bytes)
+    except _BodyTooLarge:
+        return {"error": f"Payload too large (max {guard.max_body_bytes} bytes)"}, 413
+    try:
+        event = pipeline._verifier.verify(payload=payload, headers=headers)
+    except WebhookVerificationError as e:
+        guard.log_failure(f"Webhook verification failed: {e}")
+        return {"error": str(e)}, 400
+
+    # A shed webhook isn't remembered or recorded, so Sema's retry goes through
+    ticket = pipeline.admission.admit()
+    if ticket is None:
+        return pipeline.admission.rejection()
+    guard.remember(headers)
+    if pipeline.webhook_recorder:
+        pipeline.webhook_recorder.record(payload, headers)
+
+    item_id = event.payload.item_id
+    stage_stats.started()
+    try:
+        with ticket, tracing.start_trace("webhook", trace_id=item_id, start_ns=pipeline_start):
+            tracing.record_span("verify", pipeline_start, time.perf_counter_ns())
+            pipeline._emit("webhook_received", item_id, pipeline_start)
+            return await _run_stages({"event": event, "item_id": item_id, "start": pipeline_start})
+    finally:
+        stage_stats.finished()
+
+
+async def _run_stages(ctx: dict[str, Any]) -> tuple[dict, int]:
+    pii = await _run_stage("pii", _extract_pii, ctx, None)
+    if not pii.ok:
+        return {"error": pii.error}, 400
+    ctx["pii"] = pii.value
+    async with asyncio.TaskGroup() as tg:
+        classifier = tg.create_task(_run_stage("classifier", _run_classifier, ctx, _classifier_timeout))
+        interceptor = tg.create_task(_run_stage("interceptor", _run_interceptor, ctx, _interceptor_timeout))
+    ctx["classifier"] = classifier.result().value
+    ctx["interceptor"] = interceptor.result().value
+    with tracing.span("aggregate"):
+        pipeline._aggregate(ctx)
+    return {"ok": True}, 200
+
+
+async def _run_stage(name: str, fn: AsyncStageFn, ctx: Mapping[str, Any], timeout: float | None) -> StageOutcome:
+    """Run one stage in a span, as StageScheduler does. Never raises on the stage's behalf."""
+    started = time.perf_counter()
+    deadline = asyncio.timeout(timeout)
+    try:
+        with tracing.span(name):
+            async with deadline:
+                value = await fn(ctx)
+    except Exception as e:
+        if deadline.expired():
+            outcome = StageOutcome("timeout", None, f"{name} timed out after {timeout:g}s", time.perf_counter() - started)
+        else:
+            outcome = StageOutcome("error", None, str(e) or type(e).__name__, time.perf_counter() - started)
+        pipeline._emit("error", ctx["item_id"], ctx["start"], source=name, message=outcome.error)
+    else:
+        outcome = StageOutcome("ok", value, elapsed=time.perf_counter() - started)
+    stage_stats.record(name, outcome)
+    return outcome
+
+
+async def _extract_pii(ctx: Mapping[str, Any]) -> dict[str, Any]:
+    return pipeline._extract_pii(ctx)
+
+
+async def _run_classifier(ctx: Mapping[str, Any]) -> dict[str, Any]:
+    pipeline._emit("classifier_started", ctx["item_id"], ctx["start"])
+    cache = pipeline.classification_cache
+    classify_fn = cache.aclassify if cache else aclassify
+    decision, response, route_path = await classify_fn(
+        ctx["pii"]["query_text"],
+        pii_detected=ctx["pii"]["pii_detected"],
+        openai_client=_openai_client,
+        local_threshold=pipeline._local_router_threshold,
+        speculate_docs=pipeline._speculate_docs,
+        fused=pipeline._fused_classify,
+    )
+    return pipeline._classifier_result(ctx, decision, response, route_path)
+
+
+async def _run_interceptor(ctx: Mapping[str, Any]) -> dict[str, Any]:
+    if pipeline._interceptor_full_text:
+        # Attachment downloads block; a timeout abandons the thread, as under the scheduler
+        return await asyncio.to_thread(pipeline._run_interceptor, ctx)
+    return pipeline._run_interceptor(ctx)
+
+
+def serve(host: str = "127.0.0.1", port: int = 5050) -> None:
+    """Serve the app with uvicorn (an optional dependency) until the process exits."""
+    import uvicorn
+
+    uvicorn.run(app, host=host, port=port, log_level="error")
@@ -0,0 +1,106 @@
+"""Benchmark: clinical signal detection on long texts and large term lists.
+
+Compares the original per-term regex scan (one `re.search` per term —
+first hit only — and `re.finditer` per term for every hit) with the
+single-pass Aho-Corasick SignalMatcher, scanning the whole text at once
+and streaming it through a SignalStream in 64k-character chunks (which
+also builds a ClinicalSignal, with context, for every hit).
+
+Usage: python bench.py [--sizes 1000 10000 100000 1000000] [--terms 38 1000] [--repeat 3]
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import re
+import time
+
+from interceptor import SIGNAL_PATTERNS, SignalMatcher, SignalStream, iter_chunks
+
+_FILLER = (
+    "the patient called about an appointment and asked whether the clinic is open on "
+    "weekends she also mentioned her pharmacy and insurance questions"
+).split()
+
+
+def synthetic_terms(count: int) -> list[tuple[str, str]]:
+    """The real terms plus made-up drug-like names up to `count`."""
+    terms = [(t, term) for t, group in SIGNAL_PATTERNS.items() for term in group]
+    rng = random.Random(7)
+    while len(terms) < count:
+        name = "".join(rng.choice("bcdfgklmnprstvz") + rng.choice("aeiou") for _ in range(4))
+        terms.append(("medication", name + rng.choice(["ol", "in", "ide", "ate"])))
+    return terms[:count]
+
+
+def synthetic_text(chars: int, terms: list[tuple[str, str]]) -> str:
+    """Filler prose with a term every ~40 words."""
+    rng = random.Random(11)
+    words: list[str] = []
+    size = 0
+    while size < chars:
+        word = rng.choice(terms)[1] if rng.random() < 0.025 else rng.choice(_FILLER)
+        words.append(word)
+        size += len(word) + 1
+    return " ".join(words)[:chars]
+
+
+def regex_first(compiled: list[re.Pattern[str]], text: str) -> int:
+    return sum(1 for pattern in compiled if pattern.search(text))
+
+
+def regex_all(compiled: list[re.Pattern[str]], text: str) -> int:
+    return sum(1 for pattern in compiled for _ in pattern.finditer(text))
+
+
+def automaton_all(matcher: SignalMatcher, text: str) -> int:
+    return sum(1 for _ in matcher.iter_matches(text))
+
+
+def streamed_all(matcher: SignalMatcher, text: str) -> int:
+    stream = SignalStream(matcher)
+    for chunk in iter_chunks(text):
+        stream.feed(chunk)
+    return len(stream.close())
+
+
+def best_of(fn, repeat: int) -> tuple[int, float]:
+    best = float("inf")
+    result = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000, 1_000_000])
+    parser.add_argument("--terms", type=int, nargs="+", default=[38, 1_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(
+        f"{'terms':>6} {'chars':>10}  {'regex first':>12} {'regex all':>12} {'automaton':>12} "
+        f"{'streamed':>12} {'hits':>8}"
+    )
+    for count in args.terms:
+        terms = synthetic_terms(count)
+        compiled = [re.compile(re.escape(term), re.IGNORECASE) for _, term in terms]
+        matcher = SignalMatcher(terms)
+        for size in args.sizes:
+            text = synthetic_text(size, terms)
+            _, first_t = best_of(lambda: regex_first(compiled, text), args.repeat)
+            _, all_t = best_of(lambda: regex_all(compiled, text), args.repeat)
+            hits, ac_t = best_of(lambda: automaton_all(matcher, text), args.repeat)
+            _, stream_t = best_of(lambda: streamed_all(matcher, text), args.repeat)
+            print(
+                f"{count:>6} {size:>10,}  {first_t * 1000:>10.2f}ms {all_t * 1000:>10.2f}ms "
+                f"{ac_t * 1000:>10.2f}ms {stream_t * 1000:>10.2f}ms {hits:>8,}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""Benchmark: concurrent in-flight webhooks, threaded Flask pipeline vs asyncio pipeline.
+
+At each concurrency level, that many signed ITEM_READY webhooks are
+posted at once, and every one pays a stub OpenAI routing call of
+--latency seconds. The rate limiter is wide open and the local router
+and cache are off, so the only cap is the pipeline itself:
+
+- threads: pipeline.app via its test client, one client thread per
+  request up to --server-threads (a threaded server's pool), and the
+  classifier on the StageScheduler's --max-concurrency pool threads
+- asyncio: async_pipeline.app via httpx.ASGITransport, every request
+  a coroutine on one event loop
+
+"in flight" is the mean number of webhooks being handled at once over
+the run (total handling time / wall time).
+
+Usage: python bench_async.py [--levels 16 64 256 1024] [--latency 0.2]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+from sema_sdk import WebhookVerifier
+
+import agents
+import async_pipeline
+import pipeline
+from admission import AdmissionController
+from ratelimit import AdaptiveLimiter
+from standins import AsyncStubOpenAI, StubOpenAI, item_ready_payload, new_webhook_secret, sign_webhook
+
+SECRET = new_webhook_secret()
+
+
+def signed_requests(count: int) -> list[tuple[bytes, dict[str, str]]]:
+    requests = []
+    for i in range(count):
+        payload = item_ready_payload(f"item_{i}_{time.monotonic_ns()}", "bench", "Refund my copay", "", {})
+        requests.append((payload, sign_webhook(SECRET, payload)))
+    return requests
+
+
+def run_threads(requests: list[tuple[bytes, dict[str, str]]], server_threads: int) -> tuple[float, list[float], int]:
+    client = pipeline.app.test_client()
+    latencies: list[float] = []
+    peak_threads = threading.active_count()
+    lock = threading.Lock()
+
+    def send(request: tuple[bytes, dict[str, str]]) -> None:
+        nonlocal peak_threads
+        start = time.perf_counter()
+        response = client.post("/webhook", data=request[0], headers=request[1])
+        elapsed = time.perf_counter() - start
+        assert response.status_code == 200, response.get_json()
+        with lock:
+            latencies.append(elapsed)
+            peak_threads = max(peak_threads, threading.active_count())
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=min(server_threads, len(requests))) as pool:
+        list(pool.map(send, requests))
+    return time.perf_counter() - start, latencies, peak_threads
+
+
+def run_asyncio(requests: list[tuple[bytes, dict[str, str]]]) -> tuple[float, list[float], int]:
+    latencies: list[float] = []
+
+    async def send(client: httpx.AsyncClient, request: tuple[bytes, dict[str, str]]) -> None:
+        start = time.perf_counter()
+        response = await client.post("/webhook", content=request[0], headers=request[1])
+        assert response.status_code == 200, response.json()
+        latencies.append(time.perf_counter() - start)
+
+    async def run() -> float:
+        transport = httpx.ASGITransport(app=async_pipeline.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            start = time.perf_counter()
+            await asyncio.gather(*(send(client, request) for request in requests))
+            return time.perf_counter() - start
+
+    elapsed = asyncio.run(run())
+    return elapsed, latencies, threading.active_count()
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--levels", type=int, nargs="+", default=[16, 64, 256, 1024])
+    parser.add_argument("--latency", type=float, default=0.2, help="stub routing latency (s)")
+    parser.add_argument("--server-threads", type=int, default=64, help="threaded server's request threads")
+    parser.add_argument("--max-concurrency", type=int, default=16, help="StageScheduler pool size")
+    args = parser.parse_args()
+
+    pipeline._verifier = WebhookVerifier(secret=SECRET)
+    pipeline._local_router_threshold = None
+    pipeline.classification_cache = None
+    pipeline.stage_scheduler = pipeline.build_scheduler(classifier_timeout=60, max_concurrency=args.max_concurrency)
+    pipeline._openai_client = StubOpenAI(args.latency, jitter=0)
+    async_pipeline._openai_client = AsyncStubOpenAI(args.latency, jitter=0)
+    async_pipeline._classifier_timeout = 60
+    limit = max(args.levels)
+    agents.openai_limiter = AdaptiveLimiter("bench", initial=limit, max_limit=limit)
+    pipeline.admission = AdmissionController(max_in_flight=limit)  # Measure the pipelines, not load shedding
+
+    print(
+        f"{args.latency * 1000:.0f}ms stub latency; threads: {args.server_threads} request threads, "
+        f"{args.max_concurrency} stage threads"
+    )
+    print(f"  {'webhooks':>8} {'version':<8} {'req/s':>8} {'in flight':>10} {'p50':>9} {'p99':>9} {'threads':>8}")
+    for level in args.levels:
+        for label in ("threads", "asyncio"):
+            pipeline.event_hub = pipeline.EventHub()
+            requests = signed_requests(level)
+            if label == "threads":
+                elapsed, latencies, threads = run_threads(requests, args.server_threads)
+            else:
+                elapsed, latencies, threads = run_asyncio(requests)
+            print(
+                f"  {level:>8} {label:<8} {level / elapsed:>8.0f} {sum(latencies) / elapsed:>10.1f}"
+                f" {percentile(latencies, 50) * 1000:>7.0f}ms {percentile(latencies, 99) * 1000:>7.0f}ms"
+                f" {threads:>8}"
+            )
+    pipeline.stage_scheduler.shutdown()
+
+
+if __name__ == "__main__":
+    main()
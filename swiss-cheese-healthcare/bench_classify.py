@@ -0,0 +1,67 @@
+"""Micro-benchmark: per-query classification overhead, excluding the network.
+
+The OpenAI client is replaced by a stub that answers instantly, so the
+numbers are the local work in `agents.classify`: registry + prompt setup,
+the limiter slot, JSON parsing, and route validation. "rebuild" drops the
+memoized setup before every query, which is what classify used to do.
+"local" forces the local router fast path (threshold 0) instead of the
+stubbed LLM call.
+
+Usage: python bench_classify.py [--queries 20000]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import time
+from types import SimpleNamespace
+
+import agents
+
+
+class StubOpenAI:
+    def __init__(self, agent: str) -> None:
+        message = SimpleNamespace(content=json.dumps({"agent": agent, "confidence": 0.9, "reasoning": "stub"}))
+        completion = SimpleNamespace(choices=[SimpleNamespace(message=message)])
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=lambda **kwargs: completion))
+
+
+def time_queries(pii_detected: bool, queries: int, *, rebuild: bool, local: bool = False) -> list[float]:
+    # Route to an agent with a canned response so no second completion is made
+    client = StubOpenAI("receptionist" if pii_detected else "billing")
+    samples = []
+    for _ in range(queries):
+        if rebuild:
+            agents._CLASSIFIER_SETUPS.clear()  # Keep the config hash; only the builds are timed
+        start = time.perf_counter_ns()
+        agents.classify(
+            "Can I reschedule my appointment?",
+            pii_detected=pii_detected,
+            openai_client=client,
+            local_threshold=0.0 if local else None,
+        )
+        samples.append((time.perf_counter_ns() - start) / 1000)
+    return samples
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--queries", type=int, default=20_000)
+    args = parser.parse_args()
+
+    print(f"{'pii':<6} {'setup':<10} {'mean':>9} {'p50':>9} {'p99':>9}")
+    agents.local_router()  # Train outside the timed loop
+    for pii_detected in (False, True):
+        for label, rebuild, local in (("rebuild", True, False), ("memoized", False, False), ("local", False, True)):
+            samples = sorted(time_queries(pii_detected, args.queries, rebuild=rebuild, local=local))
+            p99 = samples[int(len(samples) * 0.99) - 1]
+            print(
+                f"{str(pii_detected):<6} {label:<10} "
+                f"{statistics.fmean(samples):>7.1f}us {statistics.median(samples):>7.1f}us {p99:>7.1f}us"
+            )
+
+
+if __name__ == "__main__":
+    main()
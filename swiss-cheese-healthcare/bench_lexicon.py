@@ -0,0 +1,134 @@
+"""Benchmark: startup time and memory for a large clinical lexicon.
+
+Each scenario runs in a fresh subprocess so startup time and peak RSS
+are measured from a clean interpreter:
+
+- baseline: import the interceptor (built-in terms only)
+- compile:  compile the vocabulary in memory, no artifact
+- cold:     load_lexicon() with an empty cache (compile + write + mmap)
+- warm:     load_lexicon() with the artifact already on disk (mmap only)
+
+Then it compares scan time on a long text for the in-memory matcher
+(dict vocabulary, array tables) and the mmapped one.
+
+Usage: python bench_lexicon.py [--terms 100000] [--text-chars 100000]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+_SYLLABLES = [c + v for c in "bcdfgklmnprstvxz" for v in "aeiou"]
+_SUFFIXES = ["ol", "in", "ide", "ate", "ine", "mab", "pril", "sartan", "statin", "zole"]
+_CONDITION_WORDS = ["chronic", "acute", "syndrome", "disease", "disorder", "deficiency"]
+
+
+def write_vocabulary(path: Path, count: int) -> None:
+    """Unique drug-like names plus multi-word conditions, ~1 in 5 multi-word."""
+    rng = random.Random(3)
+    seen: set[str] = set()
+    with open(path, "w", encoding="utf-8") as f:
+        while len(seen) < count:
+            name = "".join(rng.choice(_SYLLABLES) for _ in range(rng.randint(2, 4))) + rng.choice(_SUFFIXES)
+            if rng.random() < 0.2:
+                line = f"condition\t{rng.choice(_CONDITION_WORDS)} {name} {rng.choice(_CONDITION_WORDS)}"
+            else:
+                line = f"medication\t{name.capitalize()}"
+            if line not in seen:
+                seen.add(line)
+                f.write(line + "\n")
+
+
+def peak_rss_mb() -> float:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def child(mode: str, vocab: Path, cache: Path) -> None:
+    start = time.perf_counter()
+    import interceptor
+    from lexicon import load_lexicon, merge_terms, read_vocabulary
+
+    if mode == "compile":
+        matcher = interceptor.SignalMatcher(merge_terms(interceptor.BUILTIN_TERMS, read_vocabulary(vocab)))
+    elif mode in ("cold", "warm"):
+        matcher = load_lexicon(vocab, cache_dir=cache)
+    else:
+        matcher = interceptor.current_matcher()
+    elapsed = time.perf_counter() - start
+    print(json.dumps({"seconds": elapsed, "rss_mb": peak_rss_mb(), "terms": len(matcher.terms)}))
+
+
+def run_child(mode: str, vocab: Path, cache: Path) -> dict:
+    out = subprocess.run(
+        [sys.executable, __file__, "--child", mode, str(vocab), str(cache)],
+        check=True,
+        capture_output=True,
+        text=True,
+        cwd=Path(__file__).parent,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def scan_comparison(vocab: Path, cache: Path, text_chars: int) -> None:
+    from interceptor import BUILTIN_TERMS, SignalMatcher
+    from lexicon import load_lexicon, merge_terms, read_vocabulary
+
+    terms = merge_terms(BUILTIN_TERMS, read_vocabulary(vocab))
+    in_memory = SignalMatcher(terms)
+    mapped = load_lexicon(vocab, cache_dir=cache)
+
+    rng = random.Random(5)
+    words = []
+    size = 0
+    while size < text_chars:
+        word = rng.choice(terms)[1] if rng.random() < 0.02 else rng.choice(["the", "patient", "reports", "taking", "daily"])
+        words.append(word)
+        size += len(word) + 1
+    text = " ".join(words)
+
+    for label, matcher in (("in-memory", in_memory), ("mmapped", mapped)):
+        best = float("inf")
+        for _ in range(3):
+            start = time.perf_counter()
+            hits = sum(1 for _ in matcher.iter_matches(text))
+            best = min(best, time.perf_counter() - start)
+        print(f"  scan {len(text):,} chars  {label:<10} {best * 1000:>8.1f}ms  {hits:,} hits")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--terms", type=int, default=100_000)
+    parser.add_argument("--text-chars", type=int, default=100_000)
+    parser.add_argument("--child", nargs=3, metavar=("MODE", "VOCAB", "CACHE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        mode, vocab, cache = args.child
+        child(mode, Path(vocab), Path(cache))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        vocab = Path(tmp) / "lexicon.txt"
+        cache = Path(tmp) / "cache"
+        write_vocabulary(vocab, args.terms)
+        print(f"{args.terms:,} terms, {vocab.stat().st_size / 1e6:.1f} MB vocabulary file")
+        print(f"  {'scenario':<10} {'startup':>10} {'peak RSS':>10} {'terms':>9}")
+        for mode in ("baseline", "compile", "cold", "warm"):
+            result = run_child(mode, vocab, cache)
+            print(f"  {mode:<10} {result['seconds'] * 1000:>8.0f}ms {result['rss_mb']:>8.1f}MB {result['terms']:>9,}")
+        artifact = next(cache.iterdir())
+        print(f"  artifact {artifact.name}: {artifact.stat().st_size / 1e6:.1f} MB")
+        scan_comparison(vocab, cache, args.text_chars)
+
+
+if __name__ == "__main__":
+    main()
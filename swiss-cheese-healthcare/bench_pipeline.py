@@ -0,0 +1,162 @@
+"""Benchmark: webhook throughput and latency, per-request pool vs shared scheduler.
+
+Signed ITEM_READY webhooks are posted to the Flask app from concurrent
+client threads. The OpenAI client is a stub with a fixed latency, and in
+the "stalls" scenario a fraction of routing calls hang for much longer.
+
+- per-request: the old handler, a new ThreadPoolExecutor(max_workers=2)
+  per webhook that waits on the classifier for as long as it takes
+- scheduler:   the shared StageScheduler with per-stage timeouts
+
+Usage: python bench_pipeline.py [--requests 400] [--clients 16]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from types import SimpleNamespace
+
+from sema_sdk import WebhookVerifier
+
+import agents
+import pipeline
+from admission import AdmissionController
+from scheduler import StageOutcome
+from standins import item_ready_payload, new_webhook_secret, sign_webhook
+
+SECRET = new_webhook_secret()
+QUERIES = [
+    ("Refund my copay", "I was charged twice last month"),
+    ("Reschedule my appointment", "I take warfarin and have chest pain"),
+    ("Billing question", "Why is there a charge on my statement?"),
+]
+
+
+class StubOpenAI:
+    """Routes to billing after `latency` seconds; `stall_rate` of calls take `stall` seconds."""
+
+    def __init__(self, latency: float, stall_rate: float = 0.0, stall: float = 0.0, seed: int = 7) -> None:
+        self.latency = latency
+        self.stall_rate = stall_rate
+        self.stall = stall
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        content = json.dumps({"agent": "billing", "confidence": 0.9, "reasoning": "stub"})
+        self._completion = SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, **kwargs):
+        with self._lock:
+            stalled = self._rng.random() < self.stall_rate
+        time.sleep(self.stall if stalled else self.latency)
+        return self._completion
+
+
+class PerRequestPool:
+    """The pre-scheduler handler body: a fresh two-thread pool per webhook, no timeouts."""
+
+    def run(self, inputs, *, on_degraded=None):
+        context = dict(inputs)
+        outcomes = {}
+        try:
+            context["pii"] = pipeline._extract_pii(context)
+        except ValueError as e:
+            outcomes["pii"] = StageOutcome("error", error=str(e))
+            return outcomes
+        outcomes["pii"] = StageOutcome("ok", context["pii"])
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            futures = {
+                pool.submit(pipeline._run_classifier, context): "classifier",
+                pool.submit(pipeline._run_interceptor, context): "interceptor",
+            }
+            for future in as_completed(futures):
+                context[futures[future]] = future.result()
+        pipeline._aggregate(context)
+        return outcomes
+
+    def shutdown(self) -> None:
+        pass
+
+
+def signed_request(item_id: str, subject: str, body: str) -> tuple[bytes, dict[str, str]]:
+    payload = item_ready_payload(item_id, "bench", subject, body, {"pii_detected": False})
+    return payload, sign_webhook(SECRET, payload)
+
+
+def run_load(requests: int, clients: int) -> tuple[float, list[float], int]:
+    client = pipeline.app.test_client()
+    latencies: list[float] = []
+    peak_threads = threading.active_count()
+    lock = threading.Lock()
+
+    def send(i: int) -> None:
+        nonlocal peak_threads
+        subject, body = QUERIES[i % len(QUERIES)]
+        payload, headers = signed_request(f"item_{i}", subject, body)
+        start = time.perf_counter()
+        response = client.post("/webhook", data=payload, headers=headers)
+        elapsed = time.perf_counter() - start
+        assert response.status_code == 200, response.get_json()
+        with lock:
+            latencies.append(elapsed)
+            peak_threads = max(peak_threads, threading.active_count())
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as load:
+        list(load.map(send, range(requests)))
+    return time.perf_counter() - start, latencies, peak_threads
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.02, help="stub routing latency (s)")
+    parser.add_argument("--classifier-timeout", type=float, default=0.5)
+    args = parser.parse_args()
+
+    pipeline._verifier = WebhookVerifier(secret=SECRET)
+    pipeline._local_router_threshold = None  # Every query pays the (stubbed) LLM call
+    pipeline.classification_cache = None
+    pipeline.admission = AdmissionController(max_in_flight=args.clients)  # Measure dispatch, not load shedding
+    # The stub sends no rate-limit headers; start the limiter where healthy responses would take it
+    agents.openai_limiter._limit = agents.openai_limiter.max_limit
+
+    scenarios = {
+        "steady": StubOpenAI(args.latency),
+        "stalls": StubOpenAI(args.latency, stall_rate=0.05, stall=2.0),
+    }
+    print(f"{args.requests} webhooks, {args.clients} concurrent clients, {args.latency * 1000:.0f}ms stub latency")
+    print(f"  {'scenario':<8} {'dispatch':<12} {'req/s':>8} {'p50':>9} {'p99':>9} {'max':>9} {'threads':>8}")
+    for scenario, stub in scenarios.items():
+        pipeline._openai_client = stub
+        for label in ("per-request", "scheduler"):
+            pipeline.event_hub = pipeline.EventHub()
+            dispatch = (
+                PerRequestPool()
+                if label == "per-request"
+                else pipeline.build_scheduler(classifier_timeout=args.classifier_timeout)
+            )
+            pipeline.stage_scheduler = dispatch
+            elapsed, latencies, threads = run_load(args.requests, args.clients)
+            dispatch.shutdown()
+            print(
+                f"  {scenario:<8} {label:<12} {args.requests / elapsed:>8.0f}"
+                f" {percentile(latencies, 50) * 1000:>7.0f}ms {percentile(latencies, 99) * 1000:>7.0f}ms"
+                f" {max(latencies) * 1000:>7.0f}ms {threads:>8}"
+            )
+    print(f"  scheduler runs time the classifier out after {args.classifier_timeout:g}s (partial result)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""Cache classifier decisions and responses for repeated queries.
+
+Patients send the same questions over and over ("How do I book an
+appointment?"), and each one costs a routing call plus, for `general`,
+a docs-answer call. The cache is a bounded LRU with a TTL, keyed on:
+
+- the normalized query text (case, punctuation and whitespace folded),
+- the pii_detected flag,
+- agents.agent_config_version() and agents.clinic_docs_version(),
+
+so editing the agents or the clinic docs starts from a clean slate.
+Degraded results (OpenAI's circuit breaker was open) are never stored. Keys
+are SHA-256 digests, so raw query text (which may contain PII) is never
+held by the cache. Every hit is re-checked with validate_route_decision
+against the current registry, and a hit that no longer validates is
+dropped and reclassified.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import dataclass
+
+from agent_registry_router import ValidatedRouteDecision
+from openai import AsyncOpenAI, OpenAI
+
+from agents import aclassify, agent_config_version, classify, clinic_docs_version, revalidate_route
+
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_TTL_SECONDS = 3600.0
+
+_NON_WORD = re.compile(r"[^\w]+")
+
+
+def normalize_query(text: str) -> str:
+    """Fold case, punctuation and whitespace: "How do I book?!" == "how do i  book"."""
+    return _NON_WORD.sub(" ", text.casefold()).strip()
+
+
+def cache_key(query: str, *, pii_detected: bool) -> str:
+    parts = (normalize_query(query), str(pii_detected), agent_config_version(), clinic_docs_version())
+    return hashlib.sha256("\0".join(parts).encode()).hexdigest()
+
+
+@dataclass(frozen=True)
+class CachedClassification:
+    decision: ValidatedRouteDecision
+    response: str
+    route_path: str
+    expires_at: float
+
+
+class ClassificationCache:
+    """Bounded LRU + TTL cache in front of agents.classify."""
+
+    def __init__(
+        self,
+        *,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        ttl: float = DEFAULT_TTL_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, CachedClassification] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _get(self, key: str) -> CachedClassification | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires_at <= self._clock():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def _put(self, key: str, decision: ValidatedRouteDecision, response: str, route_path: str) -> None:
+        with self._lock:
+            self._entries[key] = CachedClassification(decision, response, route_path, self._clock() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def classify(
+        self,
+        query: str,
+        *,
+        pii_detected: bool,
+        openai_client: OpenAI,
+        local_threshold: float | None = None,
+        speculate_docs: bool = False,
+        fused: bool = False,
+        timeout: float | None = None,
+    ) -> tuple[ValidatedRouteDecision, str, str]:
+        """agents.classify with caching. Hits report route path "cache"."""
+        key = cache_key(query, pii_detected=pii_detected)
+        hit = self._lookup(key, pii_detected=pii_detected)
+        if hit is not None:
+            return hit
+
+        decision, response, route_path = classify(
+            query,
+            pii_detected=pii_detected,
+            openai_client=openai_client,
+            local_threshold=local_threshold,
+            speculate_docs=speculate_docs,
+            fused=fused,
+            timeout=timeout,
+        )
+        if route_path != "degraded":
+            self._put(key, decision, response, route_path)
+        return decision, response, route_path
+
+    async def aclassify(
+        self,
+        query: str,
+        *,
+        pii_detected: bool,
+        openai_client: AsyncOpenAI,
+        local_threshold: float | None = None,
+        speculate_docs: bool = False,
+        fused: bool = False,
+    ) -> tuple[ValidatedRouteDecision, str, str]:
+        """agents.aclassify with caching."""
+        key = cache_key(query, pii_detected=pii_detected)
+        hit = self._lookup(key, pii_detected=pii_detected)
+        if hit is not None:
+            return hit
+
+        decision, response, route_path = await aclassify(
+            query,
+            pii_detected=pii_detected,
+            openai_client=openai_client,
+            local_threshold=local_threshold,
+            speculate_docs=speculate_docs,
+            fused=fused,
+        )
+        if route_path != "degraded":
+            self._put(key, decision, response, route_path)
+        return decision, response, route_path
+
+    def _lookup(self, key: str, *, pii_detected: bool) -> tuple[ValidatedRouteDecision, str, str] | None:
+        entry = self._get(key)
+        if entry is not None:
+            if revalidate_route(entry.decision, pii_detected=pii_detected):
+                self.hits += 1
+                return entry.decision, entry.response, "cache"
+            with self._lock:
+                self._entries.pop(key, None)
+            self.stale += 1
+        self.misses += 1
+        return None
+
+    def snapshot(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+        }
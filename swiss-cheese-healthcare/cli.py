@@ -2,27 +2,51 @@
 
 Starts a local webhook listener, submits a healthcare query to Sema,
 and streams pipeline events to the terminal as they happen.
+
+`--bench` runs many queries concurrently against local Sema and OpenAI
+stand-ins instead, and prints per-stage latency percentiles. `--async`
+serves the asyncio pipeline (async_pipeline.py) with uvicorn in place of
+the threaded Flask one. `--workers N` runs it under gunicorn with N
+worker processes instead, following their events through the shared
+event log (event_log.py). `--triage FILE` classifies a JSONL backlog
+offline, without Sema (triage.py), resuming from its output file.
 """
 
 from __future__ import annotations
 
 import argparse
+import atexit
 import io
+import json
 import logging
 import os
-import queue
+import subprocess
 import sys
 import threading
 import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import httpx
 
 from dotenv import load_dotenv
 from rich.console import Console
 from rich.panel import Panel
 from rich.rule import Rule
+from rich.table import Table
 from rich.text import Text
 from sema_sdk import SemaClient
 
 import pipeline
+from admission import DEFAULT_LATENCY_TARGET_SECONDS, DEFAULT_MAX_IN_FLIGHT, DEFAULT_MIN_IN_FLIGHT
+from breaker import DEFAULT_FAILURE_THRESHOLD, DEFAULT_RESET_TIMEOUT_SECONDS
+from classify_cache import DEFAULT_MAX_ENTRIES, DEFAULT_TTL_SECONDS
+from event_log import LogEventHub
+from local_router import DEFAULT_THRESHOLD
+from scheduler import DEFAULT_MAX_CONCURRENCY
+from standins import LocalSema, StubOpenAI, new_webhook_secret
+from triage import parse_messages, read_checkpoint
 
 load_dotenv()
 
@@ -30,6 +54,8 @@ logging.getLogger("sema_sdk").setLevel(logging.ERROR)
 
 console = Console()
 
+DEFAULT_EVENT_LOG = "events.db"
+
 QUERIES = {
     1: "How do I book an appointment?",
     2: (
@@ -63,8 +89,15 @@ def select_query(args: argparse.Namespace) -> str:
         sys.exit(1)
 
 
-def start_server() -> None:
-    """Start Flask in a daemon thread with all output suppressed."""
+def start_server(use_async: bool = False) -> None:
+    """Start Flask (or, with use_async, the ASGI app) in a daemon thread with all output suppressed."""
+    if use_async:
+        import async_pipeline
+
+        threading.Thread(target=lambda: async_pipeline.serve(port=5050), daemon=True).start()
+        time.sleep(0.3)
+        return
+
     logging.getLogger("werkzeug").setLevel(logging.ERROR)
 
     import flask.cli
@@ -79,6 +112,27 @@ def start_server() -> None:
     time.sleep(0.3)
 
 
+def start_workers(workers: int) -> None:
+    """Run wsgi.py under gunicorn with `workers` processes; follow their events through the event log."""
+    # Absolute, since the workers run from this directory and the CLI may not
+    log_path = str(Path(os.environ.get("EVENT_LOG_PATH") or DEFAULT_EVENT_LOG).resolve())
+    os.environ["EVENT_LOG_PATH"] = log_path
+    pipeline.event_hub = LogEventHub(log_path)
+    command = [sys.executable, "-m", "gunicorn", "wsgi:app", "--workers", str(workers), "--worker-class", "gthread"]
+    command += ["--threads", "16", "--bind", "127.0.0.1:5050", "--log-level", "warning"]
+    server = subprocess.Popen(command, cwd=Path(__file__).parent)
+    atexit.register(server.terminate)
+    deadline = time.monotonic() + 15
+    while time.monotonic() < deadline and server.poll() is None:
+        try:
+            httpx.get("http://127.0.0.1:5050/health", timeout=1).raise_for_status()
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    console.print("[red]gunicorn did not start (is it installed? pip install gunicorn)[/red]")
+    sys.exit(1)
+
+
 def submit_to_sema(query: str) -> str:
     """Upload the query to a Sema inbox. Returns the item ID."""
     client = SemaClient(
@@ -129,9 +183,15 @@ def render_event(evt: pipeline.PipelineEvent) -> None:
         agent = d.get("agent", "?")
         confidence = d.get("confidence", 0)
         pii_flag = "[yellow]PII-filtered[/yellow]" if d.get("pii_filtered") else "[dim]full registry[/dim]"
+        path = {
+            "local": "[magenta]local[/magenta]",
+            "cache": "[green]cache[/green]",
+            "fused": "[cyan]fused[/cyan]",
+            "degraded": "[red]degraded[/red]",
+        }.get(d.get("route_path"), "[dim]llm[/dim]")
         console.print(
             f"  [green]>[/green] Classifier -> [bold cyan]{agent}[/bold cyan] "
-            f"(confidence: {confidence:.2f})   {elapsed}"
+            f"(confidence: {confidence:.2f}, {path})   {elapsed}"
         )
         console.print(f"    {pii_flag}  |  {d.get('reasoning', '')}")
 
@@ -158,6 +218,17 @@ def render_event(evt: pipeline.PipelineEvent) -> None:
         console.print(f"  [red]![/red] Error: {d.get('message', 'unknown')}   {elapsed}")
 
 
+def local_router_threshold() -> float | None:
+    """LOCAL_ROUTER_THRESHOLD from the environment; the local fast path is off unless set.
+
+    "on" uses the default threshold.
+    """
+    value = os.environ.get("LOCAL_ROUTER_THRESHOLD", "off").strip().lower()
+    if value in ("", "off", "none"):
+        return None
+    return DEFAULT_THRESHOLD if value == "on" else float(value)
+
+
 def render_summary(data: dict, total_elapsed: float) -> None:
     """Render the final aggregated summary panel."""
     console.print()
@@ -167,9 +238,12 @@ def render_summary(data: dict, total_elapsed: float) -> None:
 
     lines = Text()
 
+    if data.get("degraded"):
+        lines.append(f"Partial result: {', '.join(data['degraded'])} did not finish\n\n", style="bold red")
+
     lines.append("Classifier", style="bold")
     lines.append(f"  ->  {classifier.get('agent', '?')}", style="cyan")
-    lines.append(f"  (confidence: {classifier.get('confidence', 0):.2f})\n")
+    lines.append(f"  (confidence: {classifier.get('confidence', 0):.2f}, via {classifier.get('route_path', 'llm')})\n")
     if classifier.get("pii_filtered"):
         lines.append("  Registry: PII-filtered (general excluded)\n", style="yellow")
     else:
@@ -183,13 +257,23 @@ def render_summary(data: dict, total_elapsed: float) -> None:
         signals = interceptor.get("signals", [])
         for s in signals:
             lines.append(f"  [{s['type']}] ", style="yellow")
-            lines.append(f"{s['term']}\n")
+            lines.append(s["term"])
+            if s.get("source") and s["source"] != "body":
+                lines.append(f"  (in {s['source']})", style="dim")
+            lines.append("\n")
         if interceptor.get("response"):
             lines.append(f"\n  {interceptor['response']}\n", style="dim")
     else:
         lines.append("Interceptor", style="bold")
         lines.append("  ->  no clinical signals\n", style="dim")
 
+    timings = data.get("timings", [])
+    if timings:
+        lines.append("\nStage timings\n", style="bold")
+        for row in timings:
+            label = "  " * (row["depth"] + 1) + row["name"]
+            lines.append(f"{label:<28}{row['ms']:>10.1f}ms\n", style="dim" if row["depth"] else None)
+
     title = f"Results  ({total_elapsed:.1f}s total)"
     console.print(Panel(lines, title=title, border_style="green", padding=(1, 2)))
 
@@ -211,36 +295,228 @@ def run_query(query: str) -> None:
 
     console.print(f"  [green]>[/green] Submitted to Swiss Cheese Healthcare Sema Inbox   [dim]{time.time() - t0:.1f}s[/dim]")
 
-    with console.status("[dim]Waiting for Sema to process...[/dim]", spinner="dots"):
-        try:
-            first_evt = pipeline.event_queue.get(timeout=60)
-        except queue.Empty:
+    # Events published before this point are replayed from the item's buffer
+    with pipeline.event_hub.subscribe(item_id) as events:
+        with console.status("[dim]Waiting for Sema to process...[/dim]", spinner="dots"):
+            evt = events.get(timeout=60)
+        if evt is None:
             console.print("  [red]Timed out waiting for webhook (60s)[/red]")
             sys.exit(1)
+        render_event(evt)
+
+        while evt.stage != "aggregated":
+            evt = events.get(timeout=60)
+            if evt is None:
+                console.print("  [red]Timed out waiting for pipeline (60s)[/red]")
+                sys.exit(1)
+            render_event(evt)
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+
+def run_bench(requests: int, concurrency: int, latency: float) -> None:
+    """Drive `requests` queries through pipeline.app, `concurrency` at a time, with no network.
+
+    Each query is uploaded to a LocalSema, which posts a signed ITEM_READY
+    webhook to the app's test client; the OpenAI client is a StubOpenAI.
+    Per-stage durations come from each run's span timings.
+    """
+    secret = new_webhook_secret()
+    stub = StubOpenAI(latency)
+    options = pipeline_options()
+    # Admit every delivery: the bench measures the pipeline, not load shedding
+    options["admission_max_in_flight"] = max(options["admission_max_in_flight"], concurrency)
+    pipeline.init(webhook_secret=secret, openai_api_key="", openai_client=stub, **options)
+    sema = LocalSema(
+        secret,
+        deliver=lambda payload, headers: pipeline.app.test_client()
+        .post("/webhook", data=payload, headers=headers)
+        .status_code,
+        max_deliveries=concurrency,
+    )
+    queries = list(QUERIES.values())
+
+    def one(i: int) -> tuple[float, pipeline.PipelineEvent] | None:
+        query = queries[i % len(queries)]
+        start = time.perf_counter()
+        item = sema.upload_item(
+            inbox_id=sema.inbox_id,
+            file=io.BytesIO(f"[bench-{i:05d}] {query}".encode()),
+            sender_address="bench@swiss-cheese.local",
+            subject=query[:100],
+            content_type="text/plain",
+        )
+        with pipeline.event_hub.subscribe(item.id) as events:
+            while (evt := events.get(timeout=60)) is not None and evt.stage != "aggregated":
+                pass
+        return None if evt is None else (time.perf_counter() - start, evt)
+
+    console.print(
+        f"Bench: {requests} queries, concurrency {concurrency}, stub OpenAI {latency * 1000:.0f}ms"
+    )
+    start = time.perf_counter()
+    with console.status("[dim]Running...[/dim]", spinner="dots"), ThreadPoolExecutor(concurrency) as pool:
+        results = list(pool.map(one, range(requests)))
+    wall = time.perf_counter() - start
+    sema.close()
+
+    finished = [r for r in results if r is not None]
+    samples: dict[str, list[float]] = {"end-to-end": [], "webhook -> aggregated": []}
+    depths: dict[str, int] = {}
+    routes: Counter[str] = Counter()
+    degraded = 0
+    for total, evt in finished:
+        samples["end-to-end"].append(total * 1000)
+        samples["webhook -> aggregated"].append(evt.elapsed * 1000)
+        for row in evt.data.get("timings", []):
+            samples.setdefault(row["name"], []).append(row["ms"])
+            depths.setdefault(row["name"], row["depth"])
+        routes[evt.data.get("classifier", {}).get("route_path", "none")] += 1
+        degraded += bool(evt.data.get("degraded"))
+
+    table = Table(title="Latency by stage (ms)", title_justify="left")
+    table.add_column("stage")
+    for column in ("n", "p50", "p90", "p99", "max"):
+        table.add_column(column, justify="right")
+    for name, values in samples.items():
+        if not values:
+            continue
+        label = "  " * depths.get(name, 0) + name
+        stats = [f"{percentile(values, pct):.1f}" for pct in (50, 90, 99)]
+        table.add_row(label, str(len(values)), *stats, f"{max(values):.1f}")
+    console.print(table)
+    console.print(
+        f"{len(finished)}/{requests} completed in {wall:.2f}s ({len(finished) / wall:.1f} queries/s), "
+        f"{degraded} partial, {requests - len(finished)} timed out, {stub.calls} OpenAI calls"
+    )
+    console.print("Route paths: " + ", ".join(f"{path} {count}" for path, count in routes.most_common()))
 
-    render_event(first_evt)
-    if first_evt.stage == "aggregated":
-        return
 
-    while True:
+def run_triage(input_path: Path, output_path: Path, concurrency: int) -> None:
+    """Triage a JSONL backlog into output_path, skipping messages it already holds."""
+    try:
+        with input_path.open(encoding="utf-8") as f:
+            messages = parse_messages(f)
+    except (OSError, ValueError) as e:
+        console.print(f"[red]{input_path}: {e}[/red]")
+        sys.exit(1)
+    done = read_checkpoint(output_path)
+    todo = [m for m in messages if m.id not in done]
+    console.print(
+        f"Triage: {len(messages)} messages, {len(messages) - len(todo)} already in {output_path}, "
+        f"concurrency {concurrency}"
+    )
+    pipeline.init(
+        webhook_secret=new_webhook_secret(),  # No webhooks arrive in this mode
+        openai_api_key=os.environ["OPENAI_API_KEY"],
+        **pipeline_options(),
+    )
+
+    agents: Counter[str] = Counter()
+    alerts = errors = 0
+    start = time.perf_counter()
+    try:
+        with output_path.open("a", encoding="utf-8") as out, console.status("", spinner="dots") as status:
+            for n, result in enumerate(pipeline.triage(todo, concurrency=concurrency), 1):
+                out.write(json.dumps(result) + "\n")
+                out.flush()
+                alerts += result["interceptor"]["clinical_alert"]
+                errors += result["classifier"] is None
+                agents[(result["classifier"] or {}).get("agent", "error")] += 1
+                status.update(f"[dim]{n}/{len(todo)} triaged, {alerts} clinical alerts, {errors} errors[/dim]")
+    except KeyboardInterrupt:
+        console.print(f"[yellow]Interrupted: {sum(agents.values())} written. Run again to resume.[/yellow]")
+        sys.exit(130)
+    wall = time.perf_counter() - start
+    console.print(
+        f"{len(todo)} triaged in {wall:.1f}s ({len(todo) / wall if wall else 0:.1f}/s), "
+        f"{alerts} clinical alerts, {errors} errors"
+    )
+    console.print("Agents: " + ", ".join(f"{agent} {count}" for agent, count in agents.most_common()))
+
+
+def pipeline_options() -> dict:
+    """pipeline.init() settings read from the environment (everything but credentials)."""
+    return {
+        "clinical_lexicon_path": os.environ.get("CLINICAL_LEXICON_PATH"),
+        "lexicon_cache_dir": os.environ.get("CLINICAL_LEXICON_CACHE_DIR"),
+        "local_router_threshold": local_router_threshold(),
+        "classify_cache_size": int(os.environ.get("CLASSIFY_CACHE_SIZE", DEFAULT_MAX_ENTRIES)),
+        "classify_cache_ttl": float(os.environ.get("CLASSIFY_CACHE_TTL", DEFAULT_TTL_SECONDS)),
+        "speculate_docs": os.environ.get("SPECULATIVE_DOCS_ANSWER", "").lower() == "true",
+        "fused_classify": os.environ.get("FUSED_CLASSIFY", "").lower() == "true",
+        "classifier_timeout": float(os.environ.get("CLASSIFIER_TIMEOUT", pipeline.DEFAULT_CLASSIFIER_TIMEOUT)),
+        "interceptor_timeout": float(os.environ.get("INTERCEPTOR_TIMEOUT", pipeline.DEFAULT_INTERCEPTOR_TIMEOUT)),
+        "max_concurrency": int(os.environ.get("PIPELINE_MAX_CONCURRENCY", DEFAULT_MAX_CONCURRENCY)),
+        "trace_file": os.environ.get("TRACE_FILE"),
+        "record_path": os.environ.get("WEBHOOK_RECORD_PATH"),
+        "event_log_path": os.environ.get("EVENT_LOG_PATH"),
+        "interceptor_full_text": os.environ.get("INTERCEPTOR_FULL_TEXT", "").lower() == "true",
+        "docs_token_budget": int(os.environ.get("DOCS_TOKEN_BUDGET", pipeline.DEFAULT_DOCS_TOKEN_BUDGET)),
+        "admission_max_in_flight": int(os.environ.get("ADMISSION_MAX_IN_FLIGHT", DEFAULT_MAX_IN_FLIGHT)),
+        "admission_min_in_flight": int(os.environ.get("ADMISSION_MIN_IN_FLIGHT", DEFAULT_MIN_IN_FLIGHT)),
+        "admission_latency_target": float(
+            os.environ.get("ADMISSION_LATENCY_TARGET_MS", DEFAULT_LATENCY_TARGET_SECONDS * 1000)
+        ) / 1000,
+        "breaker_failure_threshold": int(os.environ.get("BREAKER_FAILURE_THRESHOLD", DEFAULT_FAILURE_THRESHOLD)),
+        "breaker_reset_timeout": float(os.environ.get("BREAKER_RESET_SECONDS", DEFAULT_RESET_TIMEOUT_SECONDS)),
+        "events_include_query": os.environ.get("EVENTS_INCLUDE_QUERY", "").lower() == "true",
+    }
+
+
+def start_pipeline(use_async: bool) -> None:
+    """Initialize the pipeline from the environment and serve it in this process."""
+    if use_async:
         try:
-            evt = pipeline.event_queue.get(timeout=60)
-        except queue.Empty:
-            console.print("  [red]Timed out waiting for pipeline (60s)[/red]")
+            import uvicorn  # noqa: F401
+        except ImportError:
+            console.print("[red]--async needs uvicorn: pip install uvicorn[/red]")
             sys.exit(1)
+        import async_pipeline
 
-        render_event(evt)
-
-        if evt.stage == "aggregated":
-            break
+        init = async_pipeline.init
+    else:
+        init = pipeline.init
+    init(
+        webhook_secret=os.environ["SEMA_WEBHOOK_SECRET"],
+        openai_api_key=os.environ["OPENAI_API_KEY"],
+        api_token=os.environ.get("PIPELINE_API_TOKEN"),
+        sema_client=SemaClient(
+            api_key=os.environ["SEMA_API_KEY"],
+            base_url=os.environ.get("SEMA_BASE_URL", "https://dev-api.withsema.com"),
+        ),
+        **pipeline_options(),
+    )
+    start_server(use_async)
 
 
 def main() -> None:
     parser = argparse.ArgumentParser(description="Swiss Cheese Healthcare Demo")
     parser.add_argument("--query", type=int, choices=[1, 2], help="Query number (1=safe, 2=full)")
     parser.add_argument("--demo", action="store_true", help="Run both queries back-to-back")
+    parser.add_argument("--bench", action="store_true", help="Load test against local Sema/OpenAI stand-ins")
+    parser.add_argument("--requests", type=int, default=200, help="Queries to run in --bench mode")
+    parser.add_argument("--concurrency", type=int, default=16, help="Queries in flight in --bench and --triage modes")
+    parser.add_argument("--latency-ms", type=float, default=300, help="Stub OpenAI latency in --bench mode")
+    parser.add_argument("--async", dest="use_async", action="store_true", help="Serve the asyncio pipeline")
+    parser.add_argument("--workers", type=int, default=0, help="Serve the pipeline with N gunicorn workers")
+    parser.add_argument("--triage", type=Path, metavar="FILE", help="Classify a JSONL backlog of messages offline")
+    parser.add_argument("--output", type=Path, default=Path("triage.jsonl"), help="Results file for --triage")
     args = parser.parse_args()
 
+    if args.bench:
+        run_bench(args.requests, args.concurrency, args.latency_ms / 1000)
+        return
+    if args.triage:
+        if not os.environ.get("OPENAI_API_KEY"):
+            console.print("[red]Missing env var: OPENAI_API_KEY[/red]")
+            sys.exit(1)
+        run_triage(args.triage, args.output, args.concurrency)
+        return
+
     required_vars = ["SEMA_WEBHOOK_SECRET", "SEMA_API_KEY", "SEMA_INBOX_ID", "OPENAI_API_KEY"]
     missing = [v for v in required_vars if not os.environ.get(v)]
     if missing:
@@ -248,11 +524,10 @@ def main() -> None:
         console.print("Copy .env.example to .env and fill in your values.")
         sys.exit(1)
 
-    pipeline.init(
-        webhook_secret=os.environ["SEMA_WEBHOOK_SECRET"],
-        openai_api_key=os.environ["OPENAI_API_KEY"],
-    )
-    start_server()
+    if args.workers:
+        start_workers(args.workers)
+    else:
+        start_pipeline(args.use_async)
 
     if args.demo:
         run_query(QUERIES[1])
@@ -0,0 +1,119 @@
+"""Heading-aware section index over the clinic documentation.
+
+General questions are answered from clinic_policies.md. A short guide
+fits in the prompt whole; a long handbook does not. SectionIndex splits
+the Markdown on `##` headings (each section keeps its heading, and any
+text before the first heading is the preamble) and scores sections
+against the query with BM25 over lowercased words. Heading words count
+twice, since a heading names what its section is about.
+
+`select` returns the best-scoring sections that fit a token budget, in
+document order, after the preamble. Its fallback is the full document,
+used when the document fits the budget or when no section shares a
+word with the query. Tokens are estimated at four characters each.
+"""
+
+from __future__ import annotations
+
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass
+
+DEFAULT_TOKEN_BUDGET = 1500
+CHARS_PER_TOKEN = 4
+
+_HEADING = re.compile(r"^##(?!#)\s*(.+?)\s*$", re.MULTILINE)
+_WORD = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are at be by can do for from how i in is it me my of on or our should the to we what when "
+    "where which who will with you your".split()
+)
+
+
+def estimate_tokens(text: str) -> int:
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def _terms(text: str) -> list[str]:
+    """Lowercased words minus stopwords, with plural endings stripped ("refills" matches "refill")."""
+    terms = []
+    for word in _WORD.findall(text.lower()):
+        if word in _STOPWORDS:
+            continue
+        if len(word) > 4 and word.endswith("ies"):
+            word = word[:-3] + "y"
+        elif len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us")):
+            word = word[:-1]
+        terms.append(word)
+    return terms
+
+
+@dataclass(frozen=True)
+class Section:
+    heading: str
+    text: str  # Including the heading line
+    tokens: int
+
+
+class SectionIndex:
+    """BM25 over the `##` sections of one Markdown document."""
+
+    def __init__(self, document: str, *, k1: float = 1.2, b: float = 0.75) -> None:
+        self.document = document
+        self.tokens = estimate_tokens(document)
+        self.k1 = k1
+        self.b = b
+        starts = [m.start() for m in _HEADING.finditer(document)]
+        self.preamble = document[: starts[0] if starts else len(document)].strip()
+        self.sections: list[Section] = []
+        for start, end in zip(starts, starts[1:] + [len(document)]):
+            text = document[start:end].strip()
+            heading = _HEADING.match(document, start).group(1)
+            self.sections.append(Section(heading, text, estimate_tokens(text)))
+
+        self._freqs = [Counter(_terms(s.text) + _terms(s.heading)) for s in self.sections]
+        self._lengths = [sum(freqs.values()) for freqs in self._freqs]
+        self._avg_length = sum(self._lengths) / len(self._lengths) if self._lengths else 0.0
+        doc_freq: Counter[str] = Counter()
+        for freqs in self._freqs:
+            doc_freq.update(freqs.keys())
+        n = len(self.sections)
+        self._idf = {term: math.log(1 + (n - df + 0.5) / (df + 0.5)) for term, df in doc_freq.items()}
+
+    def scores(self, query: str) -> list[float]:
+        """BM25 score of every section for the query, in document order."""
+        terms = [t for t in set(_terms(query)) if t in self._idf]
+        scores = []
+        for freqs, length in zip(self._freqs, self._lengths):
+            norm = self.k1 * (1 - self.b + self.b * length / self._avg_length)
+            scores.append(
+                sum(self._idf[t] * freqs[t] * (self.k1 + 1) / (freqs[t] + norm) for t in terms if t in freqs)
+            )
+        return scores
+
+    def select(self, query: str, token_budget: int = DEFAULT_TOKEN_BUDGET) -> tuple[str, list[str]]:
+        """Documentation for the prompt, and the headings of the sections chosen.
+
+        The headings list is empty when the full document is returned.
+        The best section is always included, even if it alone is over
+        the budget.
+        """
+        if self.tokens <= token_budget or not self.sections:
+            return self.document, []
+        ranked = sorted(
+            ((score, i) for i, score in enumerate(self.scores(query)) if score > 0),
+            key=lambda pair: (-pair[0], pair[1]),
+        )
+        if not ranked:
+            return self.document, []
+        used = estimate_tokens(self.preamble)
+        chosen: list[int] = []
+        for _, i in ranked:
+            if chosen and used + self.sections[i].tokens > token_budget:
+                continue
+            chosen.append(i)
+            used += self.sections[i].tokens
+        chosen.sort()
+        parts = ([self.preamble] if self.preamble else []) + [self.sections[i].text for i in chosen]
+        return "\n\n".join(parts), [self.sections[i].heading for i in chosen]
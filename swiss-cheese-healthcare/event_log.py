@@ -0,0 +1,162 @@
+"""Pipeline events across processes, over a SQLite append log.
+
+EventHub delivers events within one process. Under gunicorn, a webhook
+lands in one of several worker processes, while the CLI, or an SSE
+client connected to another worker, is elsewhere. LogEventHub keeps
+EventHub's interface, with a different transport:
+
+- `publish()` appends the event to a SQLite table in WAL mode. SQLite
+  assigns `seq`, so events from every worker share one order, and
+  an SSE client's Last-Event-ID is valid against any worker.
+- A process that subscribes starts a follower thread. It tails the table
+  and feeds new rows through the usual per-item buffers and bounded
+  subscriber queues. The first subscription backfills the last
+  `backfill` events, so a subscriber arriving after the webhook still
+  sees it. Publishing wakes the local follower at once; other processes
+  see the event within `poll_interval`.
+
+Rows older than `retention` seconds are pruned as new ones arrive.
+Connections are opened lazily per process, so a hub created before
+gunicorn forks its workers is safe to use in them.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+from events import ALL_ITEMS, EventHub, PipelineEvent, Subscription
+
+DEFAULT_POLL_INTERVAL = 0.02
+DEFAULT_BACKFILL = 1024
+DEFAULT_RETENTION_SECONDS = 3600.0
+PRUNE_EVERY = 1024  # Publishes between retention sweeps
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    item_id TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    elapsed REAL NOT NULL,
+    data TEXT NOT NULL,
+    created REAL NOT NULL
+)
+"""
+
+
+def _connect(path: Path) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, timeout=5.0, isolation_level=None, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")  # Durable across process crashes, not power loss
+    conn.execute(_SCHEMA)
+    return conn
+
+
+class LogEventHub(EventHub):
+    """An EventHub whose events go through a SQLite file shared by every process."""
+
+    def __init__(
+        self,
+        path: str | Path,
+        *,
+        poll_interval: float = DEFAULT_POLL_INTERVAL,
+        backfill: int = DEFAULT_BACKFILL,
+        retention: float = DEFAULT_RETENTION_SECONDS,
+        **hub_options: Any,
+    ) -> None:
+        super().__init__(**hub_options)
+        self.path = Path(path)
+        self.poll_interval = poll_interval
+        self.backfill = backfill
+        self.retention = retention
+        self._pid: int | None = None
+        self._writer: sqlite3.Connection | None = None
+        self._write_lock = threading.Lock()
+        self._follow_lock = threading.Lock()
+        self._follower: threading.Thread | None = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._cursor = 0
+        self.followed = 0
+        _connect(self.path).close()  # Create the file and table up front
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._pid != os.getpid():
+            # First use in this process (possibly a forked worker): state from the parent is stale
+            self._pid = os.getpid()
+            self._writer = _connect(self.path)
+            self._follower = None
+        return self._writer
+
+    def publish(self, stage: str, item_id: str, elapsed: float = 0.0, **data: Any) -> PipelineEvent:
+        encoded = json.dumps(data, default=str)
+        with self._write_lock:
+            conn = self._connection()
+            cursor = conn.execute(
+                "INSERT INTO events (item_id, stage, elapsed, data, created) VALUES (?, ?, ?, ?, ?)",
+                (item_id, stage, elapsed, encoded, time.time()),
+            )
+            self.published += 1
+            if self.published % PRUNE_EVERY == 0:
+                conn.execute("DELETE FROM events WHERE created < ?", (time.time() - self.retention,))
+        self._wake.set()
+        return PipelineEvent(stage=stage, data=data, elapsed=elapsed, item_id=item_id, seq=cursor.lastrowid)
+
+    def subscribe(self, item_id: str | None = ALL_ITEMS, *, after_seq: int = 0) -> Subscription:
+        self._ensure_following()
+        return super().subscribe(item_id, after_seq=after_seq)
+
+    def _ensure_following(self) -> None:
+        with self._follow_lock:
+            self._connection()
+            if self._follower is not None:
+                return
+            reader = _connect(self.path)
+            (last,) = reader.execute("SELECT COALESCE(MAX(seq), 0) FROM events").fetchone()
+            self._cursor = max(0, last - self.backfill)
+            self._poll(reader)  # Backfill before the first subscription registers
+            self._stop.clear()
+            self._follower = threading.Thread(target=self._follow, args=(reader,), daemon=True, name="event-log")
+            self._follower.start()
+
+    def _follow(self, reader: sqlite3.Connection) -> None:
+        try:
+            while not self._stop.is_set():
+                if not self._poll(reader):
+                    self._wake.wait(self.poll_interval)
+                    self._wake.clear()
+        finally:
+            reader.close()
+
+    def _poll(self, reader: sqlite3.Connection) -> int:
+        rows = reader.execute(
+            "SELECT seq, item_id, stage, elapsed, data FROM events WHERE seq > ? ORDER BY seq LIMIT 1000",
+            (self._cursor,),
+        ).fetchall()
+        if not rows:
+            return 0
+        with self._lock:
+            for seq, item_id, stage, elapsed, data in rows:
+                self._deliver(PipelineEvent(stage, json.loads(data), elapsed, item_id, seq))
+            self.followed += len(rows)
+        self._cursor = rows[-1][0]
+        return len(rows)
+
+    def snapshot(self) -> dict:
+        return {**super().snapshot(), "log": str(self.path), "followed": self.followed, "cursor": self._cursor}
+
+    def close(self) -> None:
+        """Stop following and close this process's connections."""
+        self._stop.set()
+        self._wake.set()
+        if self._follower is not None and self._pid == os.getpid():
+            self._follower.join()
+        self._follower = None
+        if self._writer is not None and self._pid == os.getpid():
+            self._writer.close()
+        self._pid = self._writer = None
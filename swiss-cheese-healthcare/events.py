@@ -0,0 +1,165 @@
+"""Item-scoped pipeline events with a non-blocking pub/sub hub.
+
+Every PipelineEvent carries the Sema item_id it belongs to. `EventHub`
+keeps a bounded replay buffer per item and fans each event out to the
+subscribers of that item (and to subscribers of all items):
+
+    with event_hub.subscribe(item_id) as events:
+        while (evt := events.get(timeout=60)) and evt.stage != "aggregated":
+            ...
+
+Subscribing after the webhook already arrived is fine: the item's buffer
+is replayed first. `publish()` never blocks. Each subscriber has its own
+bounded queue, and a subscriber that falls behind loses its oldest
+events (counted in `dropped`) instead of holding up the pipeline.
+"""
+
+from __future__ import annotations
+
+import itertools
+import json
+import threading
+from collections import OrderedDict, deque
+from dataclasses import asdict, dataclass, field
+from typing import Any
+
+DEFAULT_BUFFER_SIZE = 64  # Events kept per item for late subscribers; a pipeline emits ~10
+DEFAULT_MAX_ITEMS = 1024
+DEFAULT_SUBSCRIBER_BUFFER = 256
+
+ALL_ITEMS = None
+
+
+@dataclass(frozen=True)
+class PipelineEvent:
+    """An event pushed from the pipeline to the CLI for rendering."""
+
+    stage: str
+    data: dict[str, Any] = field(default_factory=dict)
+    elapsed: float = 0.0
+    item_id: str = ""
+    seq: int = 0
+
+    def to_sse(self) -> str:
+        """Server-Sent Events frame; `seq` doubles as the event id for Last-Event-ID."""
+        return f"id: {self.seq}\nevent: {self.stage}\ndata: {json.dumps(asdict(self), default=str)}\n\n"
+
+
+class Subscription:
+    """A subscriber's bounded queue. Oldest events are dropped when it is full."""
+
+    def __init__(self, hub: EventHub, item_id: str | None, maxlen: int) -> None:
+        self.hub = hub
+        self.item_id = item_id
+        self._events: deque[PipelineEvent] = deque(maxlen=maxlen)
+        self._ready = threading.Condition()
+        self.dropped = 0
+        self.closed = False
+
+    def _push(self, event: PipelineEvent) -> None:
+        with self._ready:
+            if len(self._events) == self._events.maxlen:
+                self.dropped += 1
+            self._events.append(event)
+            self._ready.notify()
+
+    def get(self, timeout: float | None = None) -> PipelineEvent | None:
+        """Next event, or None on timeout or once the subscription is closed."""
+        with self._ready:
+            if not self._ready.wait_for(lambda: self._events or self.closed, timeout):
+                return None
+            return self._events.popleft() if self._events else None
+
+    def close(self) -> None:
+        self.hub._unsubscribe(self)
+        with self._ready:
+            self.closed = True
+            self._ready.notify_all()
+
+    def __enter__(self) -> Subscription:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class EventHub:
+    """Fan pipeline events out to per-item and all-item subscribers."""
+
+    def __init__(
+        self,
+        *,
+        buffer_size: int = DEFAULT_BUFFER_SIZE,
+        max_items: int = DEFAULT_MAX_ITEMS,
+        subscriber_buffer: int = DEFAULT_SUBSCRIBER_BUFFER,
+    ) -> None:
+        self.buffer_size = buffer_size
+        self.max_items = max_items
+        self.subscriber_buffer = subscriber_buffer
+        self._lock = threading.Lock()
+        self._seq = itertools.count(1)
+        self._buffers: OrderedDict[str, deque[PipelineEvent]] = OrderedDict()
+        self._subscribers: dict[str | None, set[Subscription]] = {}
+        self.published = 0
+        self._dropped_closed = 0
+
+    def publish(self, stage: str, item_id: str, elapsed: float = 0.0, **data: Any) -> PipelineEvent:
+        with self._lock:
+            event = PipelineEvent(stage=stage, data=data, elapsed=elapsed, item_id=item_id, seq=next(self._seq))
+            self.published += 1
+            self._deliver(event)
+        return event
+
+    def _deliver(self, event: PipelineEvent) -> None:
+        """Buffer an event and push it to its subscribers. Called with the hub lock held."""
+        buffer = self._buffers.get(event.item_id)
+        if buffer is None:
+            buffer = self._buffers[event.item_id] = deque(maxlen=self.buffer_size)
+            while len(self._buffers) > self.max_items:
+                self._buffers.popitem(last=False)
+        else:
+            self._buffers.move_to_end(event.item_id)
+        buffer.append(event)
+        # Pushing under the hub lock keeps every subscriber's events in seq order;
+        # _push only appends to a bounded deque, so it never waits on a reader
+        for subscription in (*self._subscribers.get(event.item_id, ()), *self._subscribers.get(ALL_ITEMS, ())):
+            subscription._push(event)
+
+    def subscribe(self, item_id: str | None = ALL_ITEMS, *, after_seq: int = 0) -> Subscription:
+        """Subscribe to one item, or to every item with item_id=None.
+
+        Buffered events newer than after_seq are replayed first, so a
+        subscriber that arrives after the webhook still sees the whole
+        pipeline, and a reconnecting SSE client resumes where it left off.
+        """
+        subscription = Subscription(self, item_id, self.subscriber_buffer)
+        with self._lock:
+            if item_id is ALL_ITEMS:
+                backlog = [e for buffer in self._buffers.values() for e in buffer if e.seq > after_seq]
+                backlog.sort(key=lambda e: e.seq)
+            else:
+                backlog = [e for e in self._buffers.get(item_id, ()) if e.seq > after_seq]
+            for event in backlog:
+                subscription._push(event)
+            self._subscribers.setdefault(item_id, set()).add(subscription)
+        return subscription
+
+    def _unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.item_id)
+            if subscribers is not None:
+                if subscription in subscribers:
+                    subscribers.discard(subscription)
+                    self._dropped_closed += subscription.dropped
+                if not subscribers:
+                    del self._subscribers[subscription.item_id]
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            subscriptions = [s for subs in self._subscribers.values() for s in subs]
+            return {
+                "published": self.published,
+                "buffered_items": len(self._buffers),
+                "subscribers": len(subscriptions),
+                "dropped": self._dropped_closed + sum(s.dropped for s in subscriptions),
+            }
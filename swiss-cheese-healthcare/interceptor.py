@@ -8,7 +8,12 @@ in the application layer, not the infrastructure layer.
 from __future__ import annotations
 
 import re
-from dataclasses import dataclass
+from array import array
+from bisect import bisect_left
+from collections import deque
+from collections.abc import Iterable, Iterator, Mapping, Sequence
+from dataclasses import dataclass, field
+from typing import Any
 
 
 @dataclass(frozen=True)
@@ -18,6 +23,9 @@ class ClinicalSignal:
     type: str
     term: str
     context: str
+    start: int = 0  # Character span of the match in the scanned text
+    end: int = 0
+    source: str = ""  # Which document was scanned, when there are several (e.g. an attachment name)
 
 
 SIGNAL_PATTERNS: dict[str, list[str]] = {
@@ -69,24 +77,368 @@ SIGNAL_PATTERNS: dict[str, list[str]] = {
     ],
 }
 
-_COMPILED_PATTERNS: dict[str, list[tuple[str, re.Pattern[str]]]] = {
-    signal_type: [(term, re.compile(re.escape(term), re.IGNORECASE)) for term in terms]
-    for signal_type, terms in SIGNAL_PATTERNS.items()
-}
+_TOKEN = re.compile(r"\w+|[^\w\s]")
+_FOLD = str.maketrans({"\u2019": "'", "\u2018": "'"})  # Curly apostrophes, e.g. "can’t"
+_CONTEXT_CHARS = 30
+_TRAILING_WORD = re.compile(r"\w+\Z")
+_LEADING_WORD = re.compile(r"\w*")
+DEFAULT_CHUNK_CHARS = 64 * 1024
+# Streaming bounds: a longer word can't be a term, and terms whose words are
+# this far apart (e.g. separated by a run of whitespace) aren't carried over
+_MAX_WORD_CHARS = 256
+_MAX_CARRY_CHARS = 4096
+
+
+def _fold(text: str) -> str:
+    """Lowercase text without changing its length, so offsets map back to the original."""
+    folded = text.lower()
+    if len(folded) != len(text):
+        # Rare: a non-ASCII character lowercases to several characters
+        folded = "".join(c.lower() if len(c.lower()) == 1 else c for c in text)
+    return folded.translate(_FOLD)
+
+
+class SignalMatcher:
+    """Aho-Corasick automaton over word tokens.
+
+    Terms and text are split into word and punctuation tokens, so a term
+    only matches on word boundaries ("cardiac" does not fire inside
+    "noncardiac"). A text word that ends in "s" or "es" also matches the
+    singular term word ("headaches", "strokes"). One pass over the text
+    reports every occurrence of every term, so cost grows with text
+    length, not with terms × text length.
+
+    The automaton is stored in flat integer arrays:
+    - state s has edges edge_word/edge_target[edge_start[s]:edge_start[s + 1]],
+      sorted by word id so transitions are a bisect,
+    - fail[s] is the longest proper suffix state,
+    - out_pattern[out_start[s]:out_start[s + 1]] are the terms ending at s.
+
+    lexicon.py serializes these arrays so large lexicons can be mmapped
+    instead of recompiled; see SignalMatcher.from_tables.
+    """
+
+    TABLES = ("pattern_len", "fail", "edge_start", "edge_word", "edge_target", "out_start", "out_pattern")
+
+    def __init__(self, terms: Sequence[tuple[str, str]]) -> None:
+        self.types: Sequence[str] = [signal_type for signal_type, _ in terms]
+        self.terms: Sequence[str] = [term for _, term in terms]
+        self.vocab: Mapping[str, int] = {}
+        token_ids = []
+        for term in self.terms:
+            tokens = _TOKEN.findall(_fold(term))
+            if not tokens:
+                raise ValueError(f"Empty clinical term: {term!r}")
+            token_ids.append([self.vocab.setdefault(tok, len(self.vocab)) for tok in tokens])
+        self.pattern_len = array("i", (len(ids) for ids in token_ids))
+        self.max_len = max(self.pattern_len, default=0)
+        self._compile(token_ids)
+
+    @classmethod
+    def from_tables(
+        cls,
+        *,
+        types: Sequence[str],
+        terms: Sequence[str],
+        vocab: Mapping[str, int],
+        tables: Mapping[str, Sequence[int]],
+    ) -> SignalMatcher:
+        """Rebuild a compiled matcher from its tables without recompiling.
+
+        Any read-only sequences work, e.g. memoryviews over an mmapped file.
+        """
+        matcher = cls.__new__(cls)
+        matcher.types, matcher.terms, matcher.vocab = types, terms, vocab
+        for name in cls.TABLES:
+            setattr(matcher, name, tables[name])
+        matcher.max_len = max(matcher.pattern_len, default=0)
+        return matcher
+
+    def _compile(self, token_ids: list[list[int]]) -> None:
+        # Build the trie with dicts, then flatten it
+        goto: list[dict[int, int]] = [{}]
+        outputs: list[list[int]] = [[]]
+        for pattern, ids in enumerate(token_ids):
+            state = 0
+            for wid in ids:
+                if wid not in goto[state]:
+                    goto[state][wid] = len(goto)
+                    goto.append({})
+                    outputs.append([])
+                state = goto[state][wid]
+            outputs[state].append(pattern)
+
+        # Breadth-first: a state's fail link is always shallower, so its outputs are final
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for wid, child in goto[state].items():
+                link = fail[state]
+                while link and wid not in goto[link]:
+                    link = fail[link]
+                fail[child] = goto[link].get(wid, 0)
+                outputs[child].extend(outputs[fail[child]])
+                queue.append(child)
+
+        self.fail = array("i", fail)
+        self.edge_start = array("i", [0])
+        self.edge_word = array("i")
+        self.edge_target = array("i")
+        self.out_start = array("i", [0])
+        self.out_pattern = array("i")
+        for state, edges in enumerate(goto):
+            for wid in sorted(edges):
+                self.edge_word.append(wid)
+                self.edge_target.append(edges[wid])
+            self.edge_start.append(len(self.edge_word))
+            # Report shorter (suffix) terms first, then by pattern order
+            self.out_pattern.extend(sorted(outputs[state], key=lambda p: (self.pattern_len[p], p)))
+            self.out_start.append(len(self.out_pattern))
+
+    def _word_id(self, token: str) -> int | None:
+        wid = self.vocab.get(token)
+        if wid is None and token[-1:] == "s":
+            wid = self.vocab.get(token[:-1])
+            if wid is None and token[-2:] == "es":
+                wid = self.vocab.get(token[:-2])
+        return wid
+
+    def iter_matches(
+        self,
+        text: str,
+        *,
+        pos: int = 0,
+        endpos: int | None = None,
+        offset: int = 0,
+        cursor: ScanCursor | None = None,
+    ) -> Iterator[tuple[int, int, int]]:
+        """Yield (pattern index, start, end) for every occurrence, in order of end offset.
+
+        Only text[pos:endpos] is tokenized, and offsets are shifted by
+        `offset`. A cursor carries the automaton across calls, so a text
+        can be scanned in pieces (see SignalStream); exhaust the iterator
+        before the next call.
+        """
+        vocab_get = self._word_id
+        fail, edge_start, edge_word, edge_target = self.fail, self.edge_start, self.edge_word, self.edge_target
+        out_start, out_pattern, pattern_len = self.out_start, self.out_pattern, self.pattern_len
+        if cursor is None:
+            cursor = ScanCursor(self)
+        starts = cursor.starts  # Start offsets of the current token run
+        state = cursor.state
+        folded = _fold(text)
+        for token in _TOKEN.finditer(folded, pos, len(folded) if endpos is None else endpos):
+            wid = vocab_get(token.group())
+            if wid is None:
+                state = 0
+                starts.clear()
+                continue
+            starts.append(token.start() + offset)
+            while True:
+                lo, hi = edge_start[state], edge_start[state + 1]
+                i = bisect_left(edge_word, wid, lo, hi)
+                if i < hi and edge_word[i] == wid:
+                    state = edge_target[i]
+                    break
+                if state == 0:
+                    break
+                state = fail[state]
+            for k in range(out_start[state], out_start[state + 1]):
+                pattern = out_pattern[k]
+                yield pattern, starts[-pattern_len[pattern]], token.end() + offset
+        cursor.state = state
+
+
+@dataclass
+class ScanCursor:
+    """Automaton position between two pieces of a text: state and the current token run."""
+
+    matcher: SignalMatcher
+    state: int = 0
+    starts: deque[int] = field(init=False)
+
+    def __post_init__(self) -> None:
+        self.starts = deque(maxlen=max(self.matcher.max_len, 1))
+
+    def reset(self) -> None:
+        self.state = 0
+        self.starts.clear()
+
+
+BUILTIN_TERMS: list[tuple[str, str]] = [
+    (signal_type, term) for signal_type, terms in SIGNAL_PATTERNS.items() for term in terms
+]
+
+_MATCHER = SignalMatcher(BUILTIN_TERMS)
+
+# Optional external lexicon (lexicon.ReloadingLexicon); see use_lexicon()
+_lexicon: Any = None
+
+
+def use_lexicon(lexicon: Any) -> None:
+    """Match against a lexicon's current matcher instead of SIGNAL_PATTERNS alone.
+
+    `lexicon` is anything with a `.matcher` attribute. Pass None to go back
+    to the built-in terms.
+    """
+    global _lexicon
+    _lexicon = lexicon
+
+
+def current_matcher() -> SignalMatcher:
+    return _lexicon.matcher if _lexicon is not None else _MATCHER
+
+
+def _signal(matcher: SignalMatcher, text: str, pattern: int, start: int, end: int) -> ClinicalSignal:
+    context = text[max(0, start - _CONTEXT_CHARS) : min(len(text), end + _CONTEXT_CHARS)].strip()
+    return ClinicalSignal(
+        type=matcher.types[pattern], term=matcher.terms[pattern], context=context, start=start, end=end
+    )
+
+
+class SignalStream:
+    """Clinical signals in a text that arrives in pieces, e.g. chunks of a long body or attachment.
+
+    feed() the pieces in order, then close(). The result is what
+    find_clinical_signals() (or, with first_only, detect_clinical_signals())
+    returns for the concatenated text, with the same contexts and offsets.
+    Between pieces only the trailing unfinished word, the current token
+    run and enough text for match contexts are kept, so memory does not
+    grow with the length of the text.
+    """
+
+    def __init__(self, matcher: SignalMatcher | None = None, *, first_only: bool = False, source: str = "") -> None:
+        self.matcher = matcher or current_matcher()
+        self.first_only = first_only
+        self.source = source
+        self._cursor = ScanCursor(self.matcher)
+        self._buf = ""  # Text from offset _base on: context for recent matches, then unscanned text
+        self._base = 0
+        self._pos = 0  # Offset up to which tokens have been scanned
+        self._in_long_word = False  # The previous piece ended inside a word too long to be a term
+        self._pending: list[tuple[int, int, int]] = []  # Matches still waiting for their right context
+        self._signals: list[tuple[int, ClinicalSignal]] = []  # (pattern, signal)
+        self._seen: set[int] = set()
+        self.chars = 0
+
+    def feed(self, piece: str) -> None:
+        self.chars += len(piece)
+        self._scan(self._buf + piece, final=False)
+
+    def close(self) -> list[ClinicalSignal]:
+        """Finish the scan and return the signals, in pattern order with first_only, else in text order."""
+        self._scan(self._buf, final=True)
+        if self.first_only:
+            return [signal for _, signal in sorted(self._signals, key=lambda item: item[0])]
+        return sorted((signal for _, signal in self._signals), key=lambda s: (s.start, s.end))
+
+    def _scan(self, buf: str, *, final: bool) -> None:
+        base = self._base
+        pos, limit = self._pos - base, len(buf)
+        if self._in_long_word:
+            pos = _LEADING_WORD.match(buf, pos).end()
+            self._in_long_word = pos == len(buf) and not final
+        if not final:
+            # The last word may continue in the next piece
+            word = _TRAILING_WORD.search(buf, pos)
+            if word:
+                limit = word.start()
+                self._in_long_word = word.end() - word.start() > _MAX_WORD_CHARS
+
+        for match in self.matcher.iter_matches(buf, pos=pos, endpos=limit, offset=base, cursor=self._cursor):
+            if self.first_only:
+                if match[0] in self._seen:
+                    continue
+                self._seen.add(match[0])
+            self._pending.append(match)
+        if self._in_long_word:
+            # Skip it like any unknown word, including the rest of it in the next piece
+            self._cursor.reset()
+            limit = len(buf)
+        self._pos = base + limit
+
+        available = base + len(buf)
+        waiting = []
+        for pattern, start, end in self._pending:
+            if final or end + _CONTEXT_CHARS <= available:
+                context = buf[max(0, start - _CONTEXT_CHARS - base) : end + _CONTEXT_CHARS - base].strip()
+                signal = ClinicalSignal(
+                    type=self.matcher.types[pattern],
+                    term=self.matcher.terms[pattern],
+                    context=context,
+                    start=start,
+                    end=end,
+                    source=self.source,
+                )
+                self._signals.append((pattern, signal))
+            else:
+                waiting.append((pattern, start, end))
+        self._pending = waiting
+
+        starts = self._cursor.starts
+        if starts and self._pos - starts[0] > _MAX_CARRY_CHARS:
+            self._cursor.reset()
+        earliest = min(self._pos, starts[0] if starts else self._pos, *(start for _, start, _ in self._pending))
+        keep_from = max(base, earliest - _CONTEXT_CHARS)
+        self._buf = buf[keep_from - base :]
+        self._base = keep_from
+
+
+def iter_chunks(text: str, chunk_chars: int = DEFAULT_CHUNK_CHARS) -> Iterator[str]:
+    """Fixed-size slices of a text that is already in memory."""
+    for i in range(0, len(text), chunk_chars):
+        yield text[i : i + chunk_chars]
+
+
+def scan_chunks(chunks: Iterable[str], *, first_only: bool = True, source: str = "") -> list[ClinicalSignal]:
+    """Clinical signals in a text given as consecutive chunks (see SignalStream)."""
+    stream = SignalStream(first_only=first_only, source=source)
+    for chunk in chunks:
+        stream.feed(chunk)
+    return stream.close()
+
+
+def find_clinical_signals(text: str) -> list[ClinicalSignal]:
+    """Every occurrence of every clinical term, in text order."""
+    # Take one matcher for the whole call, so a hot reload can't change it midway
+    matcher = current_matcher()
+    matches = sorted(matcher.iter_matches(text), key=lambda m: (m[1], m[2]))
+    return [_signal(matcher, text, pattern, start, end) for pattern, start, end in matches]
 
 
 def detect_clinical_signals(text: str) -> list[ClinicalSignal]:
-    """Scan text for clinical signals. Returns all matches."""
-    signals: list[ClinicalSignal] = []
-    for signal_type, patterns in _COMPILED_PATTERNS.items():
-        for term, pattern in patterns:
-            match = pattern.search(text)
-            if match:
-                start = max(0, match.start() - 30)
-                end = min(len(text), match.end() + 30)
-                context = text[start:end].strip()
-                signals.append(ClinicalSignal(type=signal_type, term=term, context=context))
-    return signals
+    """Scan text for clinical signals. Returns the first match of each term, in pattern order."""
+    matcher = current_matcher()
+    first: dict[int, tuple[int, int]] = {}
+    for pattern, start, end in matcher.iter_matches(text):
+        first.setdefault(pattern, (start, end))
+    return [_signal(matcher, text, pattern, *first[pattern]) for pattern in sorted(first)]
+
+
+_BATCH_SEPARATOR = "\n\x00\n"  # A token no term contains: no match spans two texts
+
+
+def detect_clinical_signals_batch(texts: Sequence[str]) -> list[list[ClinicalSignal]]:
+    """detect_clinical_signals() for each text, in one pass of the automaton over all of them.
+
+    The texts are joined and scanned once, then matches are mapped back
+    to their text, with offsets and contexts relative to it.
+    """
+    matcher = current_matcher()
+    starts = []
+    offset = 0
+    for text in texts:
+        starts.append(offset)
+        offset += len(text) + len(_BATCH_SEPARATOR)
+    first: list[dict[int, tuple[int, int]]] = [{} for _ in texts]
+    for pattern, start, end in matcher.iter_matches(_BATCH_SEPARATOR.join(texts)):
+        i = bisect_left(starts, start + 1) - 1
+        first[i].setdefault(pattern, (start - starts[i], end - starts[i]))
+    return [
+        [_signal(matcher, text, pattern, *hits[pattern]) for pattern in sorted(hits)]
+        for text, hits in zip(texts, first)
+    ]
 
 
 DECISION_SUPPORT_RESPONSE = (
@@ -0,0 +1,318 @@
+"""Large clinical lexicons, compiled once and mmapped on every later start.
+
+Compiling an automaton over tens of thousands of medication and condition
+names takes seconds and a lot of heap. `load_lexicon()` compiles the
+built-in SIGNAL_PATTERNS plus an external vocabulary file once, writes
+the matcher tables to an artifact named by the lexicon's hash, and every
+later process mmaps that artifact instead: startup is a file open, and
+the tables are shared page cache rather than per-process heap.
+
+Vocabulary file: one term per line, optionally prefixed by its signal
+type and a tab (`medication<TAB>Apixaban`). Blank lines and `#` comments
+are skipped.
+
+`ReloadingLexicon` watches the file and swaps in a freshly loaded matcher
+when it changes. In-flight scans keep the matcher they started with.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from array import array
+from collections.abc import Sequence
+from pathlib import Path
+
+from interceptor import BUILTIN_TERMS, SignalMatcher
+
+ARTIFACT_VERSION = 1
+ARTIFACT_SUFFIX = ".clx"
+DEFAULT_SIGNAL_TYPE = "medication"
+
+_MAGIC = b"CLXA"
+_HEADER = struct.Struct("<4sII")  # magic, version, section count
+_SECTION = struct.Struct("<QQ")  # offset, length in bytes
+_ALIGN = 8
+
+# Integer sections hold native int32 arrays; the artifact hash covers byte order
+_INT_SECTIONS = SignalMatcher.TABLES + ("vocab_slots", "vocab_offsets", "term_offsets", "type_offsets")
+_BLOB_SECTIONS = ("vocab_blob", "term_blob", "type_blob")
+_SECTIONS = _INT_SECTIONS + _BLOB_SECTIONS
+
+
+class LexiconError(Exception):
+    """The lexicon file or its compiled artifact is unusable."""
+    pass
+
+
+class _StringTable(Sequence[str]):
+    """Strings packed into one UTF-8 blob, decoded on access."""
+
+    def __init__(self, blob: memoryview, offsets: Sequence[int]) -> None:
+        self._blob = blob
+        self._offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index):  # type: ignore[override]
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        return str(self._blob[self._offsets[index] : self._offsets[index + 1]], "utf-8")
+
+
+class _MappedVocab:
+    """Token -> word id via an open-addressing hash table stored in the artifact.
+
+    Lookups read the mmapped table directly, so no per-process dict of
+    every vocabulary word is ever built.
+    """
+
+    def __init__(self, slots: Sequence[int], blob: memoryview, offsets: Sequence[int]) -> None:
+        self._slots = slots
+        self._mask = len(slots) - 1
+        self._blob = blob
+        self._offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def get(self, token: str, default: int | None = None) -> int | None:
+        key = token.encode("utf-8")
+        slot = zlib.crc32(key) & self._mask
+        while True:
+            wid = self._slots[slot]
+            if wid < 0:
+                return default
+            if self._blob[self._offsets[wid] : self._offsets[wid + 1]] == key:
+                return wid
+            slot = (slot + 1) & self._mask
+
+
+def read_vocabulary(path: Path, default_type: str = DEFAULT_SIGNAL_TYPE) -> list[tuple[str, str]]:
+    """Parse a vocabulary file into (signal type, term) pairs."""
+    terms = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            signal_type, sep, term = line.partition("\t")
+            if not sep:
+                signal_type, term = default_type, line
+            terms.append((signal_type.strip(), term.strip()))
+    return terms
+
+
+def merge_terms(*groups: Sequence[tuple[str, str]]) -> list[tuple[str, str]]:
+    """Concatenate term lists, keeping the first entry of case-insensitive duplicates."""
+    seen: set[str] = set()
+    merged = []
+    for group in groups:
+        for signal_type, term in group:
+            key = term.lower()
+            if term and key not in seen:
+                seen.add(key)
+                merged.append((signal_type, term))
+    return merged
+
+
+def lexicon_hash(path: Path, builtin: Sequence[tuple[str, str]] = BUILTIN_TERMS) -> str:
+    """Hash of everything that determines the compiled artifact."""
+    digest = hashlib.sha256()
+    digest.update(f"v{ARTIFACT_VERSION}:{sys.byteorder}:{array('i').itemsize}\n".encode())
+    digest.update(json.dumps(list(builtin)).encode())
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _pack_strings(strings: Sequence[str]) -> tuple[bytes, array]:
+    offsets = array("i", [0])
+    parts = []
+    size = 0
+    for s in strings:
+        encoded = s.encode("utf-8")
+        parts.append(encoded)
+        size += len(encoded)
+        offsets.append(size)
+    return b"".join(parts), offsets
+
+
+def _hash_slots(words: Sequence[bytes]) -> array:
+    size = 1
+    while size < 2 * max(len(words), 1):  # Load factor <= 0.5 keeps probe runs short
+        size *= 2
+    slots = array("i", [-1]) * size
+    for wid, word in enumerate(words):
+        slot = zlib.crc32(word) & (size - 1)
+        while slots[slot] >= 0:
+            slot = (slot + 1) & (size - 1)
+        slots[slot] = wid
+    return slots
+
+
+def write_artifact(matcher: SignalMatcher, path: Path) -> None:
+    """Serialize a compiled matcher. Written to a temp file and renamed into place."""
+    words = sorted(matcher.vocab, key=matcher.vocab.__getitem__)
+    vocab_blob, vocab_offsets = _pack_strings(words)
+    term_blob, term_offsets = _pack_strings(matcher.terms)
+    type_blob, type_offsets = _pack_strings(matcher.types)
+    sections: dict[str, bytes] = {name: getattr(matcher, name).tobytes() for name in SignalMatcher.TABLES}
+    sections.update(
+        vocab_slots=_hash_slots([w.encode("utf-8") for w in words]).tobytes(),
+        vocab_offsets=vocab_offsets.tobytes(),
+        term_offsets=term_offsets.tobytes(),
+        type_offsets=type_offsets.tobytes(),
+        vocab_blob=vocab_blob,
+        term_blob=term_blob,
+        type_blob=type_blob,
+    )
+
+    offset = _HEADER.size + _SECTION.size * len(_SECTIONS)
+    table = []
+    for name in _SECTIONS:
+        offset += -offset % _ALIGN
+        table.append((offset, len(sections[name])))
+        offset += len(sections[name])
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+    with os.fdopen(fd, "wb") as f:
+        f.write(_HEADER.pack(_MAGIC, ARTIFACT_VERSION, len(_SECTIONS)))
+        for entry in table:
+            f.write(_SECTION.pack(*entry))
+        for name, (start, _) in zip(_SECTIONS, table):
+            f.write(b"\0" * (start - f.tell()))
+            f.write(sections[name])
+    os.replace(tmp, path)
+
+
+def load_artifact(path: Path) -> SignalMatcher:
+    """Map a compiled artifact and wrap it as a SignalMatcher, without copying the tables."""
+    with open(path, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    # The memoryviews below keep the mapping alive for as long as the matcher is referenced
+    view = memoryview(mapped)
+    magic, version, count = _HEADER.unpack_from(view)
+    if magic != _MAGIC or version != ARTIFACT_VERSION or count != len(_SECTIONS):
+        raise LexiconError(f"{path} is not a version {ARTIFACT_VERSION} lexicon artifact")
+
+    sections: dict[str, memoryview] = {}
+    for i, name in enumerate(_SECTIONS):
+        start, length = _SECTION.unpack_from(view, _HEADER.size + i * _SECTION.size)
+        section = view[start : start + length]
+        sections[name] = section.cast("i") if name in _INT_SECTIONS else section
+
+    return SignalMatcher.from_tables(
+        types=_StringTable(sections["type_blob"], sections["type_offsets"]),
+        terms=_StringTable(sections["term_blob"], sections["term_offsets"]),
+        vocab=_MappedVocab(sections["vocab_slots"], sections["vocab_blob"], sections["vocab_offsets"]),
+        tables={name: sections[name] for name in SignalMatcher.TABLES},
+    )
+
+
+def artifact_path(path: Path, cache_dir: Path, digest: str) -> Path:
+    return cache_dir / f"{path.stem}-{digest[:16]}{ARTIFACT_SUFFIX}"
+
+
+def load_lexicon(
+    path: Path,
+    *,
+    cache_dir: Path | None = None,
+    builtin: Sequence[tuple[str, str]] = BUILTIN_TERMS,
+) -> SignalMatcher:
+    """Matcher for builtin + vocabulary terms, compiling the artifact only if it's missing."""
+    path = Path(path)
+    cache_dir = Path(cache_dir) if cache_dir else path.parent / ".lexicon-cache"
+    digest = lexicon_hash(path, builtin)
+    target = artifact_path(path, cache_dir, digest)
+    if not target.exists():
+        start = time.perf_counter()
+        terms = merge_terms(builtin, read_vocabulary(path))
+        write_artifact(SignalMatcher(terms), target)
+        print(f"Compiled {len(terms):,} clinical terms to {target} in {time.perf_counter() - start:.2f}s")
+        # Older artifacts for this file are stale; processes still mapping them keep their pages
+        for stale in cache_dir.glob(f"{path.stem}-*{ARTIFACT_SUFFIX}"):
+            if stale != target:
+                stale.unlink(missing_ok=True)
+    return load_artifact(target)
+
+
+class ReloadingLexicon:
+    """A lexicon matcher that follows changes to its vocabulary file.
+
+    `matcher` is a plain attribute, swapped in one assignment once a new
+    artifact is loaded. Callers that grabbed the old matcher finish with
+    it; the old mapping is released when the last reference goes away.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        *,
+        cache_dir: Path | None = None,
+        poll_interval: float = 5.0,
+        builtin: Sequence[tuple[str, str]] = BUILTIN_TERMS,
+    ) -> None:
+        self.path = Path(path)
+        self.cache_dir = cache_dir
+        self.poll_interval = poll_interval
+        self.builtin = builtin
+        self._lock = threading.Lock()
+        self._stamp = self._file_stamp()
+        self.matcher: SignalMatcher = load_lexicon(self.path, cache_dir=cache_dir, builtin=builtin)
+        self.reloads = 0
+        self._stop = threading.Event()
+        self._watcher: threading.Thread | None = None
+
+    def _file_stamp(self) -> tuple[int, int]:
+        stat = self.path.stat()
+        return stat.st_mtime_ns, stat.st_size
+
+    def reload_if_changed(self) -> bool:
+        """Load a new matcher if the file changed. Returns True if one was swapped in."""
+        if not self._lock.acquire(blocking=False):
+            return False  # Another thread is already reloading
+        try:
+            stamp = self._file_stamp()
+            if stamp == self._stamp:
+                return False
+            matcher = load_lexicon(self.path, cache_dir=self.cache_dir, builtin=self.builtin)
+            self.matcher = matcher
+            self._stamp = stamp
+            self.reloads += 1
+            return True
+        except (OSError, ValueError, LexiconError) as e:
+            print(f"Lexicon reload failed, keeping the current one: {e}")
+            return False
+        finally:
+            self._lock.release()
+
+    def start(self) -> ReloadingLexicon:
+        """Poll the file in a background thread."""
+        if self._watcher is None:
+            self._watcher = threading.Thread(target=self._watch, name="lexicon-watcher", daemon=True)
+            self._watcher.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop polling, waiting for a reload in progress to finish."""
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self.poll_interval):
+            self.reload_if_changed()
@@ -0,0 +1,145 @@
+"""Local TF-IDF + softmax router for obvious queries.
+
+"How do I book an appointment?" does not need a gpt-4o-mini call to be
+routed to `general`. The LocalRouter is a multinomial logistic regression
+over TF-IDF unigram + bigram features, trained with NumPy at startup
+from the labelled ROUTING_EXAMPLES plus each routable agent's
+description in AGENT_CONFIGS. Training takes a few milliseconds.
+
+`agents.classify` takes the local route when its probability clears a
+threshold and asks the LLM otherwise. Probabilities come from a softmax
+over *all* routable agents, and the pick is restricted to the agents
+in the (possibly PII-filtered) registry afterwards, without
+renormalizing. A PII query that looks like a `general` question therefore
+has low confidence for every allowed agent and goes to the LLM, instead
+of being forced onto the most likely PII-safe agent.
+"""
+
+from __future__ import annotations
+
+import math
+import re
+from collections import Counter
+from collections.abc import Collection, Sequence
+
+import numpy as np
+
+DEFAULT_THRESHOLD = 0.8
+
+ROUTING_EXAMPLES: list[tuple[str, str]] = [
+    ("How do I book an appointment?", "general"),
+    ("What are your office hours?", "general"),
+    ("Are you open on Saturdays?", "general"),
+    ("Where is the clinic located?", "general"),
+    ("Is there parking at the clinic?", "general"),
+    ("Do you accept my insurance?", "general"),
+    ("Which insurance plans do you take?", "general"),
+    ("What is your cancellation policy?", "general"),
+    ("How does booking work?", "general"),
+    ("How do I get a prescription refill?", "general"),
+    ("What should I bring to my first visit?", "general"),
+    ("Do you offer telehealth visits?", "general"),
+    ("Book an appointment for Jane Smith next Tuesday", "receptionist"),
+    ("Please reschedule my appointment to Friday", "receptionist"),
+    ("Cancel my appointment tomorrow", "receptionist"),
+    ("Schedule a follow-up for John Doe", "receptionist"),
+    ("I need to move my visit with Dr. Patel to next week", "receptionist"),
+    ("Can you book me in for a checkup on Monday morning?", "receptionist"),
+    ("Schedule a follow-up visit for my mother", "receptionist"),
+    ("Please cancel and rebook my physical", "receptionist"),
+    ("I was charged twice for my last visit", "billing"),
+    ("What is my outstanding balance?", "billing"),
+    ("I want to dispute an insurance claim", "billing"),
+    ("Can I get a refund for my copay?", "billing"),
+    ("How do I pay my bill?", "billing"),
+    ("My insurance claim was denied, please review my account", "billing"),
+    ("Why is there a charge on my statement?", "billing"),
+    ("Set up a payment plan for my balance", "billing"),
+]
+
+_TOKEN = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+
+def _terms(text: str) -> list[str]:
+    """Unigrams and bigrams of the lowercased text."""
+    tokens = _TOKEN.findall(text.lower())
+    return tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+
+
+def _softmax(logits: np.ndarray) -> np.ndarray:
+    shifted = np.exp(logits - logits.max(axis=-1, keepdims=True))
+    return shifted / shifted.sum(axis=-1, keepdims=True)
+
+
+class LocalRouter:
+    """Multinomial logistic regression over TF-IDF features."""
+
+    def __init__(
+        self,
+        examples: Sequence[tuple[str, str]],
+        *,
+        l2: float = 1e-3,
+        learning_rate: float = 2.0,
+        epochs: int = 400,
+    ) -> None:
+        if not examples:
+            raise ValueError("LocalRouter needs at least one labelled example")
+        texts = [text for text, _ in examples]
+        self.labels = sorted({label for _, label in examples})
+        label_index = {label: i for i, label in enumerate(self.labels)}
+
+        doc_freq: Counter[str] = Counter()
+        for text in texts:
+            doc_freq.update(set(_terms(text)))
+        self.vocab = {term: i for i, term in enumerate(sorted(doc_freq))}
+        n = len(texts)
+        self.idf = np.array(
+            [math.log((1 + n) / (1 + doc_freq[term])) + 1 for term in sorted(doc_freq)], dtype=np.float64
+        )
+
+        x = np.vstack([self.vectorize(text) for text in texts])
+        y = np.zeros((n, len(self.labels)))
+        y[np.arange(n), [label_index[label] for _, label in examples]] = 1.0
+
+        # Full-batch gradient descent on the L2-regularized cross-entropy
+        self.weights = np.zeros((len(self.vocab), len(self.labels)))
+        self.bias = np.zeros(len(self.labels))
+        for _ in range(epochs):
+            error = _softmax(x @ self.weights + self.bias) - y
+            self.weights -= learning_rate * (x.T @ error / n + l2 * self.weights)
+            self.bias -= learning_rate * error.mean(axis=0)
+
+    def vectorize(self, text: str) -> np.ndarray:
+        """Sublinear TF-IDF vector, L2-normalized. Unknown terms are ignored."""
+        vector = np.zeros(len(self.vocab))
+        for term, count in Counter(_terms(text)).items():
+            index = self.vocab.get(term)
+            if index is not None:
+                vector[index] = (1 + math.log(count)) * self.idf[index]
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def predict_proba(self, text: str) -> dict[str, float]:
+        """Probability per label. A query with no known terms gets the bias-only prior."""
+        probs = _softmax(self.vectorize(text) @ self.weights + self.bias)
+        return dict(zip(self.labels, probs.tolist()))
+
+    def route(self, text: str, allowed: Collection[str]) -> tuple[str, float] | None:
+        """Most likely allowed agent and its (unrenormalized) probability."""
+        vector = self.vectorize(text)
+        if not vector.any():
+            return None
+        probs = _softmax(vector @ self.weights + self.bias)
+        candidates = [(probs[i], label) for i, label in enumerate(self.labels) if label in allowed]
+        if not candidates:
+            return None
+        confidence, agent = max(candidates)
+        return agent, float(confidence)
+
+
+def training_examples(agent_configs: Sequence[dict]) -> list[tuple[str, str]]:
+    """ROUTING_EXAMPLES for routable agents plus each routable agent's description."""
+    routable = {cfg["name"] for cfg in agent_configs if cfg["routable"]}
+    examples = [(text, label) for text, label in ROUTING_EXAMPLES if label in routable]
+    examples += [(cfg["description"], cfg["name"]) for cfg in agent_configs if cfg["routable"]]
+    return examples
@@ -0,0 +1,124 @@
+"""A message's full text as fixed-size chunks, for the streaming interceptor.
+
+The webhook's `body_preview` is a short excerpt. For full-text scanning,
+the body comes from `body_html`, converted to text by an incremental
+HTML parser. Text attachments are streamed from their presigned
+download URLs and decoded incrementally. Neither is ever held in memory
+as a whole text or a parsed tree: each source yields chunks of about
+`chunk_chars` characters, which `interceptor.SignalStream` scans as
+they arrive.
+"""
+
+from __future__ import annotations
+
+import codecs
+from collections.abc import Iterable, Iterator
+from html.parser import HTMLParser
+
+import httpx
+from sema_sdk import SemaClient
+
+from interceptor import DEFAULT_CHUNK_CHARS
+
+DEFAULT_MAX_ATTACHMENT_BYTES = 20 * 1024 * 1024
+TEXT_CONTENT_TYPES = ("text/", "application/json", "application/xml", "application/csv")
+
+_SKIP_TAGS = {"script", "style", "head", "title"}
+_BLOCK_TAGS = {"p", "div", "br", "li", "tr", "td", "th", "h1", "h2", "h3", "h4", "h5", "h6", "blockquote", "pre"}
+
+
+class _TextExtractor(HTMLParser):
+    """Collects the text of fed HTML; script and style contents are dropped."""
+
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.pieces: list[str] = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag: str, attrs: list) -> None:
+        if tag in _SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag in _BLOCK_TAGS:
+            self.pieces.append("\n")
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag in _SKIP_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag in _BLOCK_TAGS:
+            self.pieces.append("\n")
+
+    def handle_data(self, data: str) -> None:
+        if not self._skip_depth:
+            self.pieces.append(data)
+
+
+def html_text_chunks(html_chunks: Iterable[str]) -> Iterator[str]:
+    """Text of an HTML document given in chunks, one text chunk per HTML chunk."""
+    parser = _TextExtractor()
+    for chunk in html_chunks:
+        parser.feed(chunk)
+        if parser.pieces:
+            yield "".join(parser.pieces)
+            parser.pieces.clear()
+    parser.close()
+    if parser.pieces:
+        yield "".join(parser.pieces)
+
+
+def rechunk(pieces: Iterable[str], chunk_chars: int = DEFAULT_CHUNK_CHARS) -> Iterator[str]:
+    """Regroup text pieces of any size into chunks of chunk_chars (the last may be shorter)."""
+    buffer: list[str] = []
+    size = 0
+    for piece in pieces:
+        buffer.append(piece)
+        size += len(piece)
+        if size >= chunk_chars:
+            text = "".join(buffer)
+            for i in range(0, len(text) - chunk_chars + 1, chunk_chars):
+                yield text[i : i + chunk_chars]
+            rest = text[len(text) - len(text) % chunk_chars :]
+            buffer, size = ([rest], len(rest)) if rest else ([], 0)
+    if size:
+        yield "".join(buffer)
+
+
+def is_text_attachment(content_type: str) -> bool:
+    return content_type.split(";")[0].strip().lower().startswith(TEXT_CONTENT_TYPES)
+
+
+def stream_text(
+    client: httpx.Client,
+    url: str,
+    *,
+    chunk_chars: int = DEFAULT_CHUNK_CHARS,
+    max_bytes: int = DEFAULT_MAX_ATTACHMENT_BYTES,
+) -> Iterator[str]:
+    """Download url as UTF-8 text, chunk by chunk. Text past max_bytes is not scanned."""
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+    def decoded() -> Iterator[str]:
+        received = 0
+        with client.stream("GET", url) as response:
+            response.raise_for_status()
+            for data in response.iter_bytes(chunk_chars):
+                received += len(data)
+                if received > max_bytes:
+                    break
+                yield decoder.decode(data)
+        yield decoder.decode(b"", final=True)
+
+    yield from rechunk(decoded(), chunk_chars)
+
+
+def attachment_sources(
+    sema: SemaClient,
+    http: httpx.Client,
+    item_id: str,
+    *,
+    chunk_chars: int = DEFAULT_CHUNK_CHARS,
+    max_bytes: int = DEFAULT_MAX_ATTACHMENT_BYTES,
+) -> Iterator[tuple[str, Iterator[str]]]:
+    """(filename, text chunks) for every text attachment of an item, downloaded lazily."""
+    for att in sema.get_item_attachments(item_id).attachments:
+        if att.download_url and is_text_attachment(att.content_type):
+            yield att.filename, stream_text(http, att.download_url, chunk_chars=chunk_chars, max_bytes=max_bytes)
@@ -1,89 +1,369 @@
 """Webhook listener and pipeline orchestration.
 
 Receives ITEM_READY webhooks from Sema, extracts PII enrichment,
-dispatches to classifier and interceptor in parallel, and streams
-events to the CLI via a shared queue.
+runs classifier and interceptor in parallel on the shared stage
+scheduler (each with its own timeout), and publishes
+item-scoped events to the EventHub. The CLI subscribes to the item it
+uploaded; other clients with the API token can watch over
+Server-Sent Events at /events.
+Under gunicorn (wsgi.py), the hub is a LogEventHub shared by every
+worker process. POST /classify/batch triages a JSONL backlog without
+Sema (triage.py).
 """
 
 from __future__ import annotations
 
-import queue
+import atexit
+import hmac
+import itertools
+import json
 import time
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from dataclasses import dataclass, field
+from pathlib import Path
+from collections.abc import Iterator, Mapping
 from typing import Any
 
-from flask import Flask, request
-from openai import OpenAI
-from sema_sdk import WebhookVerifier, WebhookVerificationError
-
-from agents import classify
-from interceptor import DECISION_SUPPORT_RESPONSE, detect_clinical_signals
-
-
-@dataclass(frozen=True)
-class PipelineEvent:
-    """An event pushed from the pipeline to the CLI for rendering."""
-
-    stage: str
-    data: dict[str, Any] = field(default_factory=dict)
-    elapsed: float = 0.0
+import httpx
+
+from agent_registry_router import ValidatedRouteDecision
+from flask import Flask, Response, request, stream_with_context
+from openai import DefaultHttpxClient, OpenAI
+from sema_sdk import SemaClient, WebhookVerifier, WebhookVerificationError
+
+from admission import DEFAULT_LATENCY_TARGET_SECONDS, DEFAULT_MAX_IN_FLIGHT, DEFAULT_MIN_IN_FLIGHT
+from admission import AdmissionController
+import agents
+from agents import classify, fused_stats, openai_limiter, set_docs_token_budget, set_openai_breaker, speculation_stats
+from breaker import DEFAULT_FAILURE_THRESHOLD, DEFAULT_RESET_TIMEOUT_SECONDS, CircuitBreaker
+from breaker import health as breaker_health
+from classify_cache import ClassificationCache
+from docs_index import DEFAULT_TOKEN_BUDGET as DEFAULT_DOCS_TOKEN_BUDGET
+from event_log import LogEventHub
+from events import EventHub, PipelineEvent  # noqa: F401 (PipelineEvent is re-exported for cli.py)
+from interceptor import DECISION_SUPPORT_RESPONSE, ClinicalSignal, detect_clinical_signals, iter_chunks, scan_chunks
+from interceptor import use_lexicon
+from lexicon import ReloadingLexicon
+from message_text import attachment_sources, html_text_chunks, rechunk
+import tracing
+from scheduler import DEFAULT_MAX_CONCURRENCY, Stage, StageOutcome, StageScheduler
+from triage import DEFAULT_CONCURRENCY as DEFAULT_TRIAGE_CONCURRENCY
+from triage import MAX_CONCURRENCY as MAX_TRIAGE_CONCURRENCY
+from triage import TriageMessage, parse_messages, run_batch
+from webhook_guard import RateLimitedLogger, WebhookGuard
+from webhook_recorder import WebhookRecorder
 
 
 app = Flask(__name__)
 
-event_queue: queue.Queue[PipelineEvent] = queue.Queue()
+event_hub = EventHub()
+SSE_HEARTBEAT_SECONDS = 15.0
+DEFAULT_CLASSIFIER_TIMEOUT = 30.0  # Routing plus, for general, a second completion
+DEFAULT_INTERCEPTOR_TIMEOUT = 5.0
 
 _openai_client: OpenAI | None = None
 _verifier: WebhookVerifier | None = None
-
-
-def init(webhook_secret: str, openai_api_key: str) -> None:
-    """Initialize the pipeline (called from cli.py before starting Flask)."""
-    global _openai_client, _verifier
+_local_router_threshold: float | None = None
+classification_cache: ClassificationCache | None = None
+_speculate_docs = False
+_fused_classify = False
+_classifier_timeout = DEFAULT_CLASSIFIER_TIMEOUT
+_interceptor_full_text = False
+_lexicon: ReloadingLexicon | None = None
+_sema_client: SemaClient | None = None
+# Bearer token for /events and /classify/batch; None turns them off. The listener is exposed through ngrok
+_api_token: str | None = None
+_events_include_query = False
+_attachment_http = httpx.Client(timeout=30.0, follow_redirects=True)
+webhook_recorder: WebhookRecorder | None = None
+# The CLI owns the terminal, so rejections are counted on /metrics instead of printed
+webhook_guard = WebhookGuard(logger=RateLimitedLogger(emit=lambda msg: None))
+# Chunked bodies carry no Content-Length; Flask enforces the same cap while reading them
+app.config["MAX_CONTENT_LENGTH"] = webhook_guard.max_body_bytes
+# Load shedding for /webhook: 503 + Retry-After when saturated (replaced by init())
+admission = AdmissionController()
+# Fails attachment listing fast while Sema is down (replaced by init()); OpenAI's is agents.openai_breaker
+sema_breaker = CircuitBreaker("sema")
+
+
+def init(
+    webhook_secret: str,
+    openai_api_key: str,
+    clinical_lexicon_path: str | None = None,
+    lexicon_cache_dir: str | None = None,
+    local_router_threshold: float | None = None,
+    classify_cache_size: int = 0,
+    classify_cache_ttl: float = 0.0,
+    speculate_docs: bool = False,
+    fused_classify: bool = False,
+    classifier_timeout: float = DEFAULT_CLASSIFIER_TIMEOUT,
+    interceptor_timeout: float = DEFAULT_INTERCEPTOR_TIMEOUT,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    trace_file: str | None = None,
+    record_path: str | None = None,
+    event_log_path: str | None = None,
+    interceptor_full_text: bool = False,
+    docs_token_budget: int = DEFAULT_DOCS_TOKEN_BUDGET,
+    admission_max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+    admission_min_in_flight: int = DEFAULT_MIN_IN_FLIGHT,
+    admission_latency_target: float = DEFAULT_LATENCY_TARGET_SECONDS,
+    breaker_failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+    breaker_reset_timeout: float = DEFAULT_RESET_TIMEOUT_SECONDS,
+    events_include_query: bool = False,
+    api_token: str | None = None,
+    sema_client: SemaClient | None = None,
+    openai_client: OpenAI | None = None,
+) -> None:
+    """Initialize the pipeline (called from cli.py before starting Flask).
+
+    local_router_threshold enables the local classifier fast path; None
+    sends every query to the LLM router. A positive classify_cache_size
+    and classify_cache_ttl enable the classification cache. speculate_docs
+    starts the docs answer for non-PII queries in parallel with routing;
+    fused_classify asks for the route and the docs answer in one call.
+    The timeouts bound each stage, and classifier_timeout also bounds each
+    OpenAI request; max_concurrency caps stage work across all in-flight
+    webhooks. trace_file, if set, receives every span in
+    trace-event format. record_path, if set, receives every verified
+    webhook for replay.py. event_log_path, if set, sends events through a
+    SQLite log that other processes can follow (see event_log.py), for
+    running under a multi-worker server. interceptor_full_text makes the interceptor
+    stream the whole body instead of the preview, plus the item's text
+    attachments when a sema_client is given. docs_token_budget caps the
+    clinic documentation sent with each general question. The admission
+    settings bound webhooks in flight, tightening when their latency
+    passes the target (see admission.py). The breaker settings apply to
+    the OpenAI and Sema circuit breakers (see breaker.py).
+    events_include_query adds the raw query text to `aggregated` events.
+    api_token, if set, enables the SSE and batch endpoints for requests
+    that send it as a bearer token. openai_client replaces the real client (the
+    CLI's --bench mode passes a stub).
+    """
+    global _openai_client, _verifier, _local_router_threshold, classification_cache, _speculate_docs
+    global _fused_classify, event_hub, stage_scheduler, webhook_recorder, _interceptor_full_text, _sema_client
+    global admission, sema_breaker, _api_token, _events_include_query, _classifier_timeout, _lexicon
+    tracing.configure(trace_file)
+    if isinstance(event_hub, LogEventHub):
+        event_hub.close()
+        event_hub = EventHub()
+    if event_log_path:
+        event_hub = LogEventHub(event_log_path)
+    if webhook_recorder:
+        webhook_recorder.close()
+    webhook_recorder = WebhookRecorder(Path(record_path)) if record_path else None
+    if webhook_recorder:
+        atexit.register(webhook_recorder.close)
+    stage_scheduler.shutdown()
+    stage_scheduler = build_scheduler(
+        classifier_timeout=classifier_timeout,
+        interceptor_timeout=interceptor_timeout,
+        max_concurrency=max_concurrency,
+    )
+    admission = AdmissionController(
+        max_in_flight=admission_max_in_flight,
+        min_in_flight=admission_min_in_flight,
+        latency_target=admission_latency_target,
+    )
+    set_openai_breaker(failure_threshold=breaker_failure_threshold, reset_timeout=breaker_reset_timeout)
+    sema_breaker = CircuitBreaker(
+        "sema", failure_threshold=breaker_failure_threshold, reset_timeout=breaker_reset_timeout
+    )
+    _local_router_threshold = local_router_threshold
+    _speculate_docs = speculate_docs
+    _fused_classify = fused_classify
+    _classifier_timeout = classifier_timeout
+    _interceptor_full_text = interceptor_full_text
+    _sema_client = sema_client
+    _api_token = api_token or None
+    _events_include_query = events_include_query
+    set_docs_token_budget(docs_token_budget)
+    classification_cache = (
+        ClassificationCache(max_entries=classify_cache_size, ttl=classify_cache_ttl)
+        if classify_cache_size > 0 and classify_cache_ttl > 0
+        else None
+    )
+    if _lexicon:
+        _lexicon.stop()
+    _lexicon = None
+    if clinical_lexicon_path:
+        # Extends SIGNAL_PATTERNS; the compiled artifact is reused across restarts
+        _lexicon = ReloadingLexicon(
+            Path(clinical_lexicon_path),
+            cache_dir=Path(lexicon_cache_dir) if lexicon_cache_dir else None,
+        ).start()
+    use_lexicon(_lexicon)
     _verifier = WebhookVerifier(secret=webhook_secret)
-    _openai_client = OpenAI(api_key=openai_api_key)
+    # Capped at the stage budget with no retries, so a call the scheduler
+    # has given up on stops holding its pool thread soon after
+    _openai_client = openai_client or OpenAI(
+        api_key=openai_api_key,
+        timeout=classifier_timeout,
+        max_retries=0,
+        http_client=DefaultHttpxClient(event_hooks={"response": [openai_limiter.observe_response]}),
+    )
 
 
-def _emit(stage: str, start_time: float, **data: Any) -> None:
-    event_queue.put(PipelineEvent(stage=stage, data=data, elapsed=time.time() - start_time))
+def _emit(stage: str, item_id: str, start_ns: int, **data: Any) -> None:
+    event_hub.publish(stage, item_id, elapsed=(time.perf_counter_ns() - start_ns) / 1e9, **data)
 
 
 @app.route("/health", methods=["GET"])
 def health():
-    return {"status": "ok"}, 200
+    """Liveness plus upstream breaker state; "degraded" while any breaker is open."""
+    return breaker_health(agents.openai_breaker, sema_breaker), 200
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    return {
+        "rate_limits": {"openai": openai_limiter.snapshot()},
+        "webhook_guard": webhook_guard.snapshot(),
+        "admission": admission.snapshot(),
+        "classify_cache": classification_cache.snapshot() if classification_cache else None,
+        "speculative_docs": speculation_stats.snapshot(),
+        "fused_classify": fused_stats.snapshot(),
+        "events": event_hub.snapshot(),
+        "stages": stage_scheduler.snapshot(),
+    }, 200
+
+
+def _require_token() -> tuple[dict, int] | tuple[dict, int, dict[str, str]] | None:
+    """None if the request carries the API token; otherwise 404 (no token configured) or 401."""
+    if _api_token is None:
+        return {"error": "Not found"}, 404
+    supplied = request.headers.get("Authorization", "").removeprefix("Bearer ")
+    if not hmac.compare_digest(supplied.encode(), _api_token.encode()):
+        return {"error": "Unauthorized"}, 401, {"WWW-Authenticate": "Bearer"}
+    return None
+
+
+def _sse_stream(item_id: str | None, after_seq: int):
+    """Yield SSE frames until the item's pipeline finishes (or forever for all items)."""
+    with event_hub.subscribe(item_id, after_seq=after_seq) as events:
+        while True:
+            evt = events.get(timeout=SSE_HEARTBEAT_SECONDS)
+            if evt is None:
+                yield ": keep-alive\n\n"  # Comment frame; also surfaces disconnected clients
+                continue
+            yield evt.to_sse()
+            if item_id is not None and evt.stage == "aggregated":
+                return
+
+
+def _sse_response(item_id: str | None) -> Response:
+    after_seq = request.headers.get("Last-Event-ID", "0")
+    stream = _sse_stream(item_id, int(after_seq) if after_seq.isdigit() else 0)
+    return Response(
+        stream_with_context(stream),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.route("/events", methods=["GET"])
+def events_all():
+    """Server-Sent Events for every pipeline run."""
+    return _require_token() or _sse_response(None)
+
+
+@app.route("/events/<item_id>", methods=["GET"])
+def events_for_item(item_id: str):
+    """Server-Sent Events for one item; the stream ends after `aggregated`."""
+    return _require_token() or _sse_response(item_id)
 
 
 @app.route("/webhook", methods=["POST"])
 def handle_webhook():
     """Receive Sema ITEM_READY webhook and run the pipeline."""
-    pipeline_start = time.time()
+    pipeline_start = time.perf_counter_ns()
 
+    rejection = webhook_guard.check(request.content_length, request.headers)
+    if rejection:
+        return rejection
     try:
-        event = _verifier.verify(payload=request.data, headers=dict(request.headers))
+        event = _verifier.verify(payload=request.data, headers=request.headers)
     except WebhookVerificationError as e:
+        webhook_guard.log_failure(f"Webhook verification failed: {e}")
         return {"error": str(e)}, 400
 
-    _emit("webhook_received", pipeline_start, item_id=event.payload.item_id)
+    # A shed webhook isn't remembered or recorded, so Sema's retry goes through
+    ticket = admission.admit()
+    if ticket is None:
+        return admission.rejection()
+    webhook_guard.remember(request.headers)
+    if webhook_recorder:
+        webhook_recorder.record(request.data, request.headers)
+
+    item_id = event.payload.item_id
+    # The trace is named after the item, so it opens once verification has parsed it
+    with ticket, tracing.start_trace("webhook", trace_id=item_id, start_ns=pipeline_start):
+        tracing.record_span("verify", pipeline_start, time.perf_counter_ns())
+        _emit("webhook_received", item_id, pipeline_start)
+
+        def on_degraded(stage: str, outcome: StageOutcome) -> None:
+            _emit("error", item_id, pipeline_start, source=stage, message=outcome.error)
+
+        outcomes = stage_scheduler.run(
+            {"event": event, "item_id": item_id, "start": pipeline_start},
+            on_degraded=on_degraded,
+        )
+    if not outcomes["pii"].ok:
+        return {"error": outcomes["pii"].error}, 400
+    return {"ok": True}, 200
 
-    deliverable = event.payload.deliverable
-    enrichment = getattr(deliverable, "enrichment", None) or {}
-    pii_step = enrichment.get("steps", {}).get("pii_detect", {}) if enrichment else {}
 
-    pii_detected = pii_step.get("pii_detected", False)
-    risk_level = pii_step.get("risk_level", "none")
-    entity_count = pii_step.get("entity_count", 0)
-    by_type = pii_step.get("by_type", {})
+@app.route("/classify/batch", methods=["POST"])
+def classify_batch():
+    """Triage a JSONL batch of messages (see triage.py); results stream back as JSONL, in order of completion.
 
-    _emit(
-        "pii_result",
-        pipeline_start,
-        pii_detected=pii_detected,
-        risk_level=risk_level,
-        entity_count=entity_count,
-        by_type=by_type,
+    Needs the API token. The batch holds one admission slot until its stream ends.
+    """
+    denied = _require_token()
+    if denied:
+        return denied
+    try:
+        messages = parse_messages(request.get_data(as_text=True).splitlines())
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    ticket = admission.admit()
+    if ticket is None:
+        return admission.rejection()
+    concurrency = request.args.get("concurrency", DEFAULT_TRIAGE_CONCURRENCY, type=int)
+    results = triage(messages, concurrency=min(max(concurrency, 1), MAX_TRIAGE_CONCURRENCY))
+
+    def stream() -> Iterator[str]:
+        with ticket:
+            for result in results:
+                yield json.dumps(result) + "\n"
+
+    return Response(stream_with_context(stream()), mimetype="application/x-ndjson")
+
+
+def triage(
+    messages: list[TriageMessage], *, concurrency: int = DEFAULT_TRIAGE_CONCURRENCY
+) -> Iterator[dict[str, Any]]:
+    """Batch triage with this pipeline's classifier settings; no events are published."""
+
+    def classify_message(message: TriageMessage) -> dict[str, Any]:
+        decision, response, route_path = _classify(message.text, message.pii_detected)
+        return _classifier_fields(decision, response, route_path, pii_detected=message.pii_detected)
+
+    return run_batch(
+        messages, classify=classify_message, interceptor_fields=_interceptor_fields, concurrency=concurrency
     )
 
+
+def _extract_pii(ctx: Mapping[str, Any]) -> dict[str, Any]:
+    deliverable = ctx["event"].payload.deliverable
+    enrichment = getattr(deliverable, "enrichment", None) or {}
+    pii_step = enrichment.get("steps", {}).get("pii_detect", {}) if enrichment else {}
+
+    result = {
+        "pii_detected": pii_step.get("pii_detected", False),
+        "risk_level": pii_step.get("risk_level", "none"),
+        "entity_count": pii_step.get("entity_count", 0),
+        "by_type": pii_step.get("by_type", {}),
+    }
+    _emit("pii_result", ctx["item_id"], ctx["start"], **result)
+
     content = deliverable.content_summary
     query_text = ""
     if content:
@@ -92,66 +372,157 @@ def handle_webhook():
         query_text = f"{subject}\n{body}".strip() if subject and body else (subject or body)
 
     if not query_text:
-        _emit("error", pipeline_start, message="No query text found in webhook payload")
-        return {"error": "No query text"}, 400
+        raise ValueError("No query text found in webhook payload")
+    return {**result, "query_text": query_text}
 
-    def run_classifier() -> dict[str, Any]:
-        _emit("classifier_started", pipeline_start)
-        decision, response = classify(
-            query_text, pii_detected=pii_detected, openai_client=_openai_client
-        )
-        result = {
-            "agent": decision.agent,
-            "confidence": decision.confidence,
-            "reasoning": decision.reasoning,
-            "did_fallback": decision.did_fallback,
-            "pii_filtered": pii_detected,
-            "response": response,
-        }
-        _emit("classifier_result", pipeline_start, **result)
-        return result
-
-    def run_interceptor() -> dict[str, Any]:
-        _emit("interceptor_started", pipeline_start)
-        signals = detect_clinical_signals(query_text)
-        has_signals = len(signals) > 0
-        result = {
-            "signals": [
-                {"type": s.type, "term": s.term, "context": s.context} for s in signals
-            ],
-            "clinical_alert": has_signals,
-            "routed_to": "decision_support" if has_signals else None,
-            "response": DECISION_SUPPORT_RESPONSE if has_signals else None,
-        }
-        _emit("interceptor_result", pipeline_start, **result)
-        return result
-
-    classifier_result = {}
-    interceptor_result = {}
-
-    with ThreadPoolExecutor(max_workers=2) as pool:
-        futures = {
-            pool.submit(run_classifier): "classifier",
-            pool.submit(run_interceptor): "interceptor",
-        }
-        for future in as_completed(futures):
-            name = futures[future]
-            try:
-                if name == "classifier":
-                    classifier_result = future.result()
-                else:
-                    interceptor_result = future.result()
-            except Exception as e:
-                _emit("error", pipeline_start, source=name, message=str(e))
 
+def _run_classifier(ctx: Mapping[str, Any]) -> dict[str, Any]:
+    _emit("classifier_started", ctx["item_id"], ctx["start"])
+    decision, response, route_path = _classify(ctx["pii"]["query_text"], ctx["pii"]["pii_detected"])
+    return _classifier_result(ctx, decision, response, route_path)
+
+
+def _classify(query: str, pii_detected: bool) -> tuple[ValidatedRouteDecision, str, str]:
+    """classify() with the configured client, cache, local router and docs options."""
+    classify_fn = classification_cache.classify if classification_cache else classify
+    return classify_fn(
+        query,
+        pii_detected=pii_detected,
+        openai_client=_openai_client,
+        local_threshold=_local_router_threshold,
+        speculate_docs=_speculate_docs,
+        fused=_fused_classify,
+        timeout=_classifier_timeout,
+    )
+
+
+def _classifier_fields(
+    decision: ValidatedRouteDecision, response: str, route_path: str, *, pii_detected: bool
+) -> dict[str, Any]:
+    """A classify() result as the `classifier_result` event data."""
+    return {
+        "agent": decision.agent,
+        "confidence": decision.confidence,
+        "reasoning": decision.reasoning,
+        "did_fallback": decision.did_fallback,
+        "pii_filtered": pii_detected,
+        "route_path": route_path,
+        "response": response,
+    }
+
+
+def _classifier_result(
+    ctx: Mapping[str, Any], decision: ValidatedRouteDecision, response: str, route_path: str
+) -> dict[str, Any]:
+    """Publish a classify() result as `classifier_result` and return it as the stage value."""
+    result = _classifier_fields(decision, response, route_path, pii_detected=ctx["pii"]["pii_detected"])
+    _emit("classifier_result", ctx["item_id"], ctx["start"], **result)
+    return result
+
+
+def _body_chunks(ctx: Mapping[str, Any]) -> Iterator[str]:
+    """Subject, then the full body as text: from body_html when present, else the preview."""
+    content = ctx["event"].payload.deliverable.content_summary
+    subject = (content.subject or "") if content else ""
+    if content and content.body_html:
+        body = html_text_chunks(iter_chunks(content.body_html))
+    else:
+        body = iter_chunks((content.body_preview or "") if content else "")
+    return rechunk(itertools.chain([f"{subject}\n"] if subject else [], body))
+
+
+def _scan_full_text(ctx: Mapping[str, Any]) -> tuple[list[ClinicalSignal], dict[str, Any]]:
+    """First hit per term across the body and text attachments, each streamed in chunks."""
+    sources: list[tuple[str, Iterator[str]]] = [("body", _body_chunks(ctx))]
+    skipped: list[str] = []
+    if _sema_client is not None:
+        try:
+            # Lists the attachments now; each one is downloaded as it is scanned
+            with sema_breaker.call():
+                sources += attachment_sources(_sema_client, _attachment_http, ctx["item_id"])
+        except Exception as e:
+            skipped.append(f"attachments: {e}")
+    first: dict[tuple[str, str], ClinicalSignal] = {}
+    scanned: list[str] = []
+    for name, chunks in sources:
+        try:
+            with tracing.span("interceptor.scan", source=name):
+                signals = scan_chunks(chunks, source=name)
+        except Exception as e:
+            skipped.append(f"{name}: {e}")
+            continue
+        scanned.append(name)
+        for s in signals:
+            first.setdefault((s.type, s.term), s)
+    return list(first.values()), {"sources": scanned, "skipped_sources": skipped}
+
+
+def _run_interceptor(ctx: Mapping[str, Any]) -> dict[str, Any]:
+    _emit("interceptor_started", ctx["item_id"], ctx["start"])
+    if _interceptor_full_text:
+        signals, scan_info = _scan_full_text(ctx)
+    else:
+        signals, scan_info = detect_clinical_signals(ctx["pii"]["query_text"]), {}
+    result = {**scan_info, **_interceptor_fields(signals)}
+    _emit("interceptor_result", ctx["item_id"], ctx["start"], **result)
+    return result
+
+
+def _interceptor_fields(signals: list[ClinicalSignal]) -> dict[str, Any]:
+    """Clinical signals as the `interceptor_result` event data."""
+    has_signals = len(signals) > 0
+    return {
+        "signals": [
+            {"type": s.type, "term": s.term, "context": s.context, "start": s.start, "end": s.end, "source": s.source}
+            for s in signals
+        ],
+        "clinical_alert": has_signals,
+        "routed_to": "decision_support" if has_signals else None,
+        "response": DECISION_SUPPORT_RESPONSE if has_signals else None,
+    }
+
+
+def _aggregate(ctx: Mapping[str, Any]) -> None:
+    # A timed-out or failed stage contributes None; the summary shows what did finish
+    trace = tracing.current_trace()
+    # The query is the patient's own words, so it stays out of events unless asked for
+    query = {"query": ctx["pii"]["query_text"]} if _events_include_query else {}
     _emit(
         "aggregated",
-        pipeline_start,
-        classifier=classifier_result,
-        interceptor=interceptor_result,
-        query=query_text,
-        pii_detected=pii_detected,
-        risk_level=risk_level,
+        ctx["item_id"],
+        ctx["start"],
+        classifier=ctx["classifier"] or {},
+        interceptor=ctx["interceptor"] or {},
+        degraded=[name for name in ("classifier", "interceptor") if ctx[name] is None],
+        **query,
+        pii_detected=ctx["pii"]["pii_detected"],
+        risk_level=ctx["pii"]["risk_level"],
+        timings=trace.breakdown() if trace else [],
     )
 
-    return {"ok": True}, 200
+
+def build_scheduler(
+    *,
+    classifier_timeout: float = DEFAULT_CLASSIFIER_TIMEOUT,
+    interceptor_timeout: float = DEFAULT_INTERCEPTOR_TIMEOUT,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+) -> StageScheduler:
+    """The webhook pipeline as a stage DAG. PII extraction and aggregation are cheap and run inline."""
+    return StageScheduler(
+        [
+            Stage("pii", _extract_pii, inline=True),
+            Stage("classifier", _run_classifier, deps=("pii",), timeout=classifier_timeout),
+            Stage("interceptor", _run_interceptor, deps=("pii",), timeout=interceptor_timeout),
+            Stage(
+                "aggregate",
+                _aggregate,
+                deps=("pii", "classifier", "interceptor"),
+                optional=("classifier", "interceptor"),
+                inline=True,
+            ),
+        ],
+        max_concurrency=max_concurrency,
+    )
+
+
+stage_scheduler = build_scheduler()
@@ -0,0 +1,284 @@
+"""Adaptive concurrency limiting driven by upstream rate-limit headers.
+
+Linear and OpenAI both report remaining quota on every response. The
+AdaptiveLimiter reads those headers and adjusts how many calls may be in
+flight, AIMD-style: each window of healthy responses adds one slot, and a
+429 or a nearly exhausted quota halves the limit. When the quota is gone,
+new calls wait until the reset time instead of collecting 429s.
+
+    limiter = AdaptiveLimiter("openai")
+    with limiter.slot():
+        ...  # make the call
+    limiter.observe(response.status_code, response.headers)
+
+Coroutines use `async with limiter.aslot()`, which waits without
+blocking the event loop. Threads and coroutines share the same slots.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import re
+import threading
+import time
+from collections import deque
+from collections.abc import AsyncIterator, Callable, Iterator, Mapping
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+
+import httpx
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+
+
+@dataclass(frozen=True)
+class RateLimitInfo:
+    """Quota state parsed from one response. None means the header was absent."""
+
+    remaining: int | None = None
+    limit: int | None = None
+    reset_after: float | None = None  # seconds until the quota resets
+
+    @property
+    def remaining_fraction(self) -> float | None:
+        if self.remaining is None or not self.limit:
+            return None
+        return self.remaining / self.limit
+
+
+def _int_header(headers: Mapping[str, str], name: str) -> int | None:
+    value = headers.get(name)
+    try:
+        return int(float(value)) if value is not None else None
+    except ValueError:
+        return None
+
+
+def parse_duration(value: str | None) -> float | None:
+    """Parse OpenAI-style durations such as "20ms", "1s", or "6m0s" into seconds."""
+    if not value:
+        return None
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(n) * _DURATION_UNITS[unit] for n, unit in parts)
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Parse a Retry-After header (seconds or HTTP date) into seconds."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _tightest(*infos: RateLimitInfo) -> RateLimitInfo:
+    """Pick the quota closest to exhaustion."""
+    known = [i for i in infos if i.remaining is not None]
+    if not known:
+        return RateLimitInfo()
+    return min(known, key=lambda i: i.remaining_fraction if i.remaining_fraction is not None else 1.0)
+
+
+def parse_openai_headers(headers: Mapping[str, str]) -> RateLimitInfo:
+    """Parse OpenAI's x-ratelimit-* request and token quotas."""
+    return _tightest(
+        *(
+            RateLimitInfo(
+                remaining=_int_header(headers, f"x-ratelimit-remaining-{kind}"),
+                limit=_int_header(headers, f"x-ratelimit-limit-{kind}"),
+                reset_after=parse_duration(headers.get(f"x-ratelimit-reset-{kind}")),
+            )
+            for kind in ("requests", "tokens")
+        )
+    )
+
+
+def parse_linear_headers(headers: Mapping[str, str]) -> RateLimitInfo:
+    """Parse Linear's X-RateLimit-* request and complexity quotas (reset is epoch ms)."""
+    infos = []
+    for kind in ("Requests", "Complexity"):
+        reset_ms = _int_header(headers, f"X-RateLimit-{kind}-Reset")
+        infos.append(
+            RateLimitInfo(
+                remaining=_int_header(headers, f"X-RateLimit-{kind}-Remaining"),
+                limit=_int_header(headers, f"X-RateLimit-{kind}-Limit"),
+                reset_after=max(0.0, reset_ms / 1000 - time.time()) if reset_ms else None,
+            )
+        )
+    return _tightest(*infos)
+
+
+def parse_rate_limit_headers(headers: Mapping[str, str]) -> RateLimitInfo:
+    """Parse whichever provider's rate-limit headers are present."""
+    headers = httpx.Headers(headers)  # case-insensitive lookups
+    if "x-ratelimit-remaining-requests" in headers or "x-ratelimit-remaining-tokens" in headers:
+        return parse_openai_headers(headers)
+    return parse_linear_headers(headers)
+
+
+class AdaptiveLimiter:
+    """AIMD concurrency limiter shared by every call site of one upstream."""
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        initial: int = 4,
+        min_limit: int = 1,
+        max_limit: int = 32,
+        low_water: float = 0.1,
+        decrease_cooldown: float = 1.0,
+    ) -> None:
+        self.name = name
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.low_water = low_water
+        self.decrease_cooldown = decrease_cooldown
+        self._cond = threading.Condition()
+        self._limit = initial
+        self._in_flight = 0
+        self._waiting = 0
+        self._healthy = 0
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        self._last_info = RateLimitInfo()
+        self._throttled = 0
+        self._async_waiters: deque[tuple[asyncio.AbstractEventLoop, asyncio.Future[None]]] = deque()
+
+    def acquire(self) -> None:
+        """Block until a slot is free and the upstream isn't paused."""
+        with self._cond:
+            self._waiting += 1
+            try:
+                while True:
+                    pause = self._paused_until - time.monotonic()
+                    if pause <= 0 and self._in_flight < self._limit:
+                        break
+                    self._cond.wait(timeout=pause if pause > 0 else None)
+            finally:
+                self._waiting -= 1
+            self._in_flight += 1
+
+    def release(self) -> None:
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify()
+            self._wake_async(all_waiters=False)
+
+    def _wake_async(self, *, all_waiters: bool) -> None:
+        """Wake coroutines waiting in aacquire(); they recheck the limit themselves. Needs _cond."""
+        while self._async_waiters:
+            loop, waiter = self._async_waiters.popleft()
+            loop.call_soon_threadsafe(lambda w=waiter: w.done() or w.set_result(None))
+            if not all_waiters:
+                break
+
+    async def aacquire(self) -> None:
+        """acquire() for coroutines: wait for a slot without blocking the event loop."""
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._cond:
+                pause = self._paused_until - time.monotonic()
+                if pause <= 0 and self._in_flight < self._limit:
+                    self._in_flight += 1
+                    return
+                waiter = loop.create_future()
+                self._async_waiters.append((loop, waiter))
+                self._waiting += 1
+            try:
+                await asyncio.wait_for(waiter, timeout=pause if pause > 0 else None)
+            except TimeoutError:
+                pass
+            finally:
+                with self._cond:
+                    self._waiting -= 1
+                    if (loop, waiter) in self._async_waiters:
+                        self._async_waiters.remove((loop, waiter))
+                    elif self._in_flight < self._limit:
+                        # Woken, but maybe leaving (cancelled) without taking the slot: pass the wake-up on
+                        self._wake_async(all_waiters=False)
+
+    @asynccontextmanager
+    async def aslot(self) -> AsyncIterator[None]:
+        await self.aacquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def observe(self, status_code: int, headers: Mapping[str, str]) -> None:
+        """Adjust the limit from one response's status and rate-limit headers."""
+        info = parse_rate_limit_headers(headers)
+        now = time.monotonic()
+        with self._cond:
+            if info.remaining is not None:
+                self._last_info = info
+            exhausted = status_code == 429 or info.remaining == 0
+            fraction = info.remaining_fraction
+            if exhausted or (fraction is not None and fraction < self.low_water):
+                if now - self._last_decrease >= self.decrease_cooldown:
+                    self._limit = max(self.min_limit, self._limit // 2)
+                    self._last_decrease = now
+                self._healthy = 0
+                if exhausted:
+                    self._throttled += 1
+                    wait = parse_retry_after(httpx.Headers(headers).get("retry-after"))
+                    wait = wait if wait is not None else (info.reset_after or 1.0)
+                    self._paused_until = max(self._paused_until, now + wait)
+            elif 200 <= status_code < 300:
+                self._healthy += 1
+                if self._healthy >= self._limit:
+                    self._limit = min(self.max_limit, self._limit + 1)
+                    self._healthy = 0
+            self._cond.notify_all()
+            self._wake_async(all_waiters=True)
+
+    def observe_response(self, response: httpx.Response) -> None:
+        """httpx response event hook."""
+        self.observe(response.status_code, response.headers)
+
+    async def aobserve_response(self, response: httpx.Response) -> None:
+        """httpx.AsyncClient response event hook."""
+        self.observe(response.status_code, response.headers)
+
+    def call(self, send: Callable[[], httpx.Response], *, max_attempts: int = 3) -> httpx.Response:
+        """Send a request under the limiter, waiting out and retrying 429s."""
+        attempt = 1
+        while True:
+            with self.slot():
+                response = send()
+            self.observe(response.status_code, response.headers)
+            if response.status_code != 429 or attempt >= max_attempts:
+                return response
+            attempt += 1
+
+    def snapshot(self) -> dict:
+        """Current limiter state, for the /metrics endpoint."""
+        with self._cond:
+            return {
+                "limit": self._limit,
+                "in_flight": self._in_flight,
+                "waiting": self._waiting,
+                "paused_for": round(max(0.0, self._paused_until - time.monotonic()), 3),
+                "remaining": self._last_info.remaining,
+                "quota": self._last_info.limit,
+                "reset_after": self._last_info.reset_after,
+                "throttled": self._throttled,
+            }
@@ -0,0 +1,112 @@
+"""Replay recorded webhooks through the pipeline with every upstream stubbed.
+
+Record traffic with WEBHOOK_RECORD_PATH=webhooks.jsonl.gz (cli.py passes
+it to pipeline.init), then:
+
+    python replay.py webhooks.jsonl.gz --speed 0 --report run.json
+    python replay.py webhooks.jsonl.gz --speed 0 --compare run.json
+
+OpenAI is a StubOpenAI with --openai-latency-ms of latency; every other
+pipeline setting comes from the environment, as in cli.py. Alongside the
+webhook latencies, the report gives per-stage p50/p99 from each run's
+span timings and counts route paths and partial results.
+
+Usage: python replay.py RECORDING [--speed 0] [--concurrency 16] [--report FILE] [--compare FILE]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import threading
+from collections import Counter
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+import pipeline
+from cli import pipeline_options
+from standins import StubOpenAI
+from webhook_recorder import compare_reports, percentiles, replay
+
+REPLAY_SECRET = "whsec_cmVwbGF5LXNlY3JldC1mb3ItbG9jYWwtcnVucw=="
+
+
+class RunCollector:
+    """Collects the `aggregated` event of every pipeline run from the event hub."""
+
+    def __init__(self) -> None:
+        self._subscription = pipeline.event_hub.subscribe()
+        self.stages: dict[str, list[float]] = {}
+        self.routes: Counter[str] = Counter()
+        self.degraded = 0
+        self.runs = 0
+        self._thread = threading.Thread(target=self._drain, daemon=True)
+        self._thread.start()
+
+    def _drain(self) -> None:
+        while (evt := self._subscription.get(timeout=None)) is not None:
+            if evt.stage != "aggregated":
+                continue
+            self.runs += 1
+            self.degraded += bool(evt.data.get("degraded"))
+            self.routes[evt.data.get("classifier", {}).get("route_path", "none")] += 1
+            for row in evt.data.get("timings", []):
+                self.stages.setdefault(row["name"], []).append(row["ms"])
+
+    def close(self) -> dict:
+        self._subscription.close()
+        self._thread.join()
+        return {
+            "runs": self.runs,
+            "partial": self.degraded,
+            "dropped_events": self._subscription.dropped,
+            "route_paths": dict(self.routes.most_common()),
+            "stage_ms": {name: percentiles(values) for name, values in self.stages.items()},
+        }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("recording", type=Path)
+    parser.add_argument("--speed", type=float, default=0.0, help="1 = recorded pace, N = N times faster, 0 = max")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--limit", type=int, help="replay only the first N webhooks")
+    parser.add_argument("--openai-latency-ms", type=float, default=300)
+    parser.add_argument("--report", type=Path, help="write the JSON report here")
+    parser.add_argument("--compare", type=Path, help="print deltas against an earlier report")
+    args = parser.parse_args()
+
+    load_dotenv()
+    os.environ.pop("WEBHOOK_RECORD_PATH", None)
+    os.environ.pop("EVENT_LOG_PATH", None)
+    stub = StubOpenAI(args.openai_latency_ms / 1000)
+    pipeline.init(webhook_secret=REPLAY_SECRET, openai_api_key="", openai_client=stub, **pipeline_options())
+    client = pipeline.app.test_client()
+
+    runs = RunCollector()
+    report = replay(
+        args.recording,
+        lambda payload, headers: client.post("/webhook", data=payload, headers=headers).status_code,
+        secret=REPLAY_SECRET,
+        speed=args.speed,
+        concurrency=args.concurrency,
+        limit=args.limit,
+    )
+    report["app"] = "swiss-cheese-healthcare"
+    report["pipeline"] = runs.close()
+    report["upstream"] = {"openai_latency_ms": args.openai_latency_ms, "openai_calls": stub.calls}
+
+    print(json.dumps(report, indent=2))
+    if args.report:
+        args.report.write_text(json.dumps(report, indent=2) + "\n")
+    if args.compare:
+        print(f"\nvs {args.compare}:", file=sys.stderr)
+        for line in compare_reports(json.loads(args.compare.read_text()), report):
+            print(f"  {line}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
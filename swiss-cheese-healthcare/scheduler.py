@@ -0,0 +1,201 @@
+"""Shared, long-lived stage scheduler for the webhook pipeline.
+
+The pipeline is declared once as a small DAG of stages. Each request
+runs it with `StageScheduler.run(inputs)`:
+
+    pii ──┬── classifier ──┬── aggregate
+          └── interceptor ─┘
+
+Stages are started as soon as their dependencies finish, on one thread
+pool shared by every request, so the pool size is a global cap on
+concurrent stage work. Each stage has its own timeout, counted from the
+moment it becomes ready (time spent queued behind a saturated pool
+counts). A stage that times out or raises gets a `StageOutcome` with
+status "timeout" or "error" and its `default` value. Stages that list it
+in `optional` still run with that default, so the aggregate can report a
+partial result. Stages that depend on it without marking it optional are
+"skipped".
+
+Python threads can't be killed. A timed-out stage is cancelled if it
+hasn't started yet; otherwise it finishes in the background and its
+result is ignored. It keeps its pool thread until then.
+
+Cheap stages can be `inline`: they run on the calling (request) thread
+and never wait for a pool slot. Every stage runs inside a tracing span
+nested under the caller's active span.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import threading
+import time
+from collections.abc import Callable, Mapping, Sequence
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any
+
+from tracing import span
+
+DEFAULT_MAX_CONCURRENCY = 16
+
+StageFn = Callable[[Mapping[str, Any]], Any]
+
+
+@dataclass(frozen=True)
+class Stage:
+    """One node of the pipeline DAG.
+
+    `fn` receives the run's inputs merged with the values of every stage
+    that has finished so far (degraded stages contribute their default).
+    """
+
+    name: str
+    fn: StageFn
+    deps: tuple[str, ...] = ()
+    optional: tuple[str, ...] = ()
+    timeout: float | None = None
+    default: Any = None
+    inline: bool = False
+
+
+@dataclass
+class StageOutcome:
+    status: str  # "ok", "timeout", "error" or "skipped"
+    value: Any = None
+    error: str | None = None
+    elapsed: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.status == "ok"
+
+
+@dataclass
+class _Running:
+    stage: Stage
+    started: float
+    deadline: float | None
+
+
+class StageScheduler:
+    """Run a stage DAG per request on one shared, bounded thread pool."""
+
+    def __init__(self, stages: Sequence[Stage], *, max_concurrency: int = DEFAULT_MAX_CONCURRENCY) -> None:
+        self.stages = _topological_order(stages)
+        self.max_concurrency = max_concurrency
+        self._pool = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="stage")
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.counts: dict[str, dict[str, int]] = {stage.name: {} for stage in self.stages}
+
+    def run(
+        self,
+        inputs: Mapping[str, Any],
+        *,
+        on_degraded: Callable[[str, StageOutcome], None] | None = None,
+    ) -> dict[str, StageOutcome]:
+        """Run every stage for one request. Never raises on a stage's behalf."""
+        context = dict(inputs)
+        outcomes: dict[str, StageOutcome] = {}
+        running: dict[Future, _Running] = {}
+        waiting = list(self.stages)
+
+        def finish(stage: Stage, outcome: StageOutcome) -> None:
+            outcomes[stage.name] = outcome
+            context[stage.name] = outcome.value if outcome.ok else stage.default
+            with self._lock:
+                counts = self.counts[stage.name]
+                counts[outcome.status] = counts.get(outcome.status, 0) + 1
+            if not outcome.ok and outcome.status != "skipped" and on_degraded:
+                on_degraded(stage.name, outcome)
+
+        while waiting or running:
+            for stage in list(waiting):
+                if not all(dep in outcomes for dep in stage.deps):
+                    continue
+                waiting.remove(stage)
+                if any(not outcomes[dep].ok and dep not in stage.optional for dep in stage.deps):
+                    finish(stage, StageOutcome("skipped", stage.default))
+                    continue
+                now = time.perf_counter()
+                if stage.inline:
+                    finish(stage, self._call(stage, context, now))
+                else:
+                    # Run in a copy of this context so the stage span nests under the caller's
+                    future = self._pool.submit(contextvars.copy_context().run, self._call, stage, dict(context), now)
+                    deadline = now + stage.timeout if stage.timeout is not None else None
+                    running[future] = _Running(stage, now, deadline)
+                    self._track(+1)
+                    future.add_done_callback(lambda _: self._track(-1))
+
+            if not running:
+                continue  # Inline stages may have unblocked others
+            deadlines = [r.deadline for r in running.values() if r.deadline is not None]
+            timeout = max(0.0, min(deadlines) - time.perf_counter()) if deadlines else None
+            done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                finish(running.pop(future).stage, future.result())
+            now = time.perf_counter()
+            for future, entry in list(running.items()):
+                if entry.deadline is not None and now >= entry.deadline:
+                    future.cancel()  # Only effective if the stage hasn't started
+                    del running[future]
+                    message = f"{entry.stage.name} timed out after {entry.stage.timeout:g}s"
+                    finish(entry.stage, StageOutcome("timeout", entry.stage.default, message, now - entry.started))
+        return outcomes
+
+    @staticmethod
+    def _call(stage: Stage, context: Mapping[str, Any], ready_at: float) -> StageOutcome:
+        try:
+            with span(stage.name, queued_ms=round((time.perf_counter() - ready_at) * 1000, 3)):
+                value = stage.fn(context)
+        except Exception as e:
+            return StageOutcome("error", stage.default, str(e) or type(e).__name__, time.perf_counter() - ready_at)
+        return StageOutcome("ok", value, elapsed=time.perf_counter() - ready_at)
+
+    def _track(self, delta: int) -> None:
+        with self._lock:
+            self.in_flight += delta
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "max_concurrency": self.max_concurrency,
+                "in_flight": self.in_flight,
+                "stages": {name: dict(counts) for name, counts in self.counts.items()},
+            }
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _topological_order(stages: Sequence[Stage]) -> list[Stage]:
+    by_name = {stage.name: stage for stage in stages}
+    if len(by_name) != len(stages):
+        raise ValueError("Stage names must be unique")
+    for stage in stages:
+        unknown = set(stage.deps) - by_name.keys()
+        if unknown:
+            raise ValueError(f"Stage {stage.name!r} depends on unknown stage(s): {sorted(unknown)}")
+        if not set(stage.optional) <= set(stage.deps):
+            raise ValueError(f"Stage {stage.name!r} lists optional stages that aren't dependencies")
+
+    ordered: list[Stage] = []
+    state: dict[str, str] = {}
+
+    def visit(stage: Stage) -> None:
+        if state.get(stage.name) == "done":
+            return
+        if state.get(stage.name) == "visiting":
+            raise ValueError(f"Stage graph has a cycle through {stage.name!r}")
+        state[stage.name] = "visiting"
+        for dep in stage.deps:
+            visit(by_name[dep])
+        state[stage.name] = "done"
+        ordered.append(stage)
+
+    for stage in stages:
+        visit(stage)
+    return ordered
@@ -0,0 +1,217 @@
+"""Local stand-ins for Sema and OpenAI, for `cli.py --bench` and the benchmarks.
+
+`LocalSema` mimics the slice of Sema the demo uses. `upload_item()`
+returns a CreateItemResponse right away. Then, after an optional
+processing delay, it delivers a Standard Webhooks-signed ITEM_READY
+webhook that carries synthetic `pii_detect` enrichment. The webhook
+therefore goes through the same guard, signature check and payload
+parsing as a real delivery.
+
+`StubOpenAI` answers chat.completions.create() after a configurable
+latency: JSON routing decisions from a keyword heuristic (with the canned
+answer too, when a fused call asks for one), and a canned docs answer
+for everything else. `AsyncStubOpenAI` does the same for
+the asyncio pipeline, awaiting instead of sleeping.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import random
+import re
+import secrets
+import threading
+import time
+import uuid
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import BinaryIO
+
+from sema_sdk.types import CreateItemResponse
+
+Deliver = Callable[[bytes, dict[str, str]], int]
+
+# Presidio-style entity types, matched crudely; good enough to exercise the PII path
+_PII_PATTERNS = {
+    "DATE_TIME": re.compile(r"\b(?:DOB\s*)?\d{1,2}/\d{1,2}/\d{2,4}\b"),
+    "PHONE_NUMBER": re.compile(r"\b\(?\d{3}\)?[-. ]\d{3}[-. ]\d{4}\b"),
+    "EMAIL_ADDRESS": re.compile(r"\b[\w.+-]+@[\w-]+\.[\w.]+\b"),
+    "PERSON": re.compile(r"\b(?:for|patient|Dr\.|Mr\.|Mrs\.|Ms\.)\s+([A-Z][a-z]+ [A-Z][a-z]+)\b"),
+}
+
+
+def new_webhook_secret() -> str:
+    return "whsec_" + base64.b64encode(secrets.token_bytes(24)).decode()
+
+
+def sign_webhook(secret: str, payload: bytes) -> dict[str, str]:
+    """Standard Webhooks headers for payload, as Sema signs deliveries."""
+    webhook_id, timestamp = f"msg_{uuid.uuid4().hex}", str(int(time.time()))
+    key = base64.b64decode(secret.removeprefix("whsec_"))
+    signed = f"{webhook_id}.{timestamp}.".encode() + payload
+    signature = base64.b64encode(hmac.new(key, signed, hashlib.sha256).digest()).decode()
+    return {"webhook-id": webhook_id, "webhook-timestamp": timestamp, "webhook-signature": f"v1,{signature}"}
+
+
+def synthetic_pii_detect(text: str) -> dict:
+    """A pii_detect enrichment step shaped like Sema's."""
+    by_type = {name: len(pattern.findall(text)) for name, pattern in _PII_PATTERNS.items()}
+    by_type = {name: count for name, count in by_type.items() if count}
+    entity_count = sum(by_type.values())
+    risk_level = "none" if not by_type else "high" if len(by_type) > 1 else "medium"
+    return {"pii_detected": bool(by_type), "risk_level": risk_level, "entity_count": entity_count, "by_type": by_type}
+
+
+def item_ready_payload(item_id: str, inbox_id: str, subject: str, body: str, pii_step: dict) -> bytes:
+    return json.dumps(
+        {
+            "schema_version": "1",
+            "tenant_id": "local",
+            "inbox_id": inbox_id,
+            "item_id": item_id,
+            "inbound_channel": "api",
+            "event_type": "ITEM_READY",
+            "occurred_at": datetime.now(timezone.utc).isoformat(),
+            "payload_mode": "full",
+            "deliverable": {
+                "raw_ref": f"local://{item_id}",
+                "content_summary": {"subject": subject, "body_preview": body},
+                "enrichment": {"steps": {"pii_detect": pii_step}},
+            },
+        }
+    ).encode()
+
+
+class LocalSema:
+    """Accepts uploads and delivers signed ITEM_READY webhooks through `deliver`."""
+
+    def __init__(
+        self,
+        webhook_secret: str,
+        deliver: Deliver,
+        *,
+        inbox_id: str = "local-inbox",
+        processing_delay: float = 0.0,
+        max_deliveries: int = 16,
+    ) -> None:
+        self.webhook_secret = webhook_secret
+        self.deliver = deliver
+        self.inbox_id = inbox_id
+        self.processing_delay = processing_delay
+        self._pool = ThreadPoolExecutor(max_workers=max_deliveries, thread_name_prefix="local-sema")
+        self._lock = threading.Lock()
+        self._items: dict[str, str] = {}  # dedupe key -> item id
+        self.failed_deliveries = 0
+
+    def upload_item(
+        self,
+        inbox_id: str,
+        file: bytes | BinaryIO,
+        *,
+        sender_address: str,
+        subject: str | None = None,
+        content_type: str | None = None,
+        **_: object,
+    ) -> CreateItemResponse:
+        raw = file if isinstance(file, bytes) else file.read()
+        dedupe_key = hashlib.sha256(raw).hexdigest()
+        with self._lock:
+            existing = self._items.get(dedupe_key)
+            item_id = existing or f"item_{uuid.uuid4().hex}"
+            self._items[dedupe_key] = item_id
+        if existing is None:
+            self._pool.submit(self._process, item_id, subject or "", raw.decode("utf-8", errors="replace"))
+        return CreateItemResponse(
+            id=item_id,
+            inbox_id=inbox_id,
+            inbound_channel="api",
+            status="processing",
+            content_type=content_type or "application/octet-stream",
+            size_bytes=len(raw),
+            dedupe_key=dedupe_key,
+            is_duplicate=existing is not None,
+            created_at=datetime.now(timezone.utc),
+        )
+
+    def _process(self, item_id: str, subject: str, body: str) -> None:
+        if self.processing_delay:
+            time.sleep(self.processing_delay)
+        payload = item_ready_payload(item_id, self.inbox_id, subject, body, synthetic_pii_detect(body))
+        if self.deliver(payload, sign_webhook(self.webhook_secret, payload)) >= 300:
+            with self._lock:
+                self.failed_deliveries += 1
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=True)
+
+
+_ROUTE_KEYWORDS = [
+    ("billing", re.compile(r"\b(?:bill|billing|charge[ds]?|refund|copay|balance|pay|payment|claim)\b", re.I)),
+    ("receptionist", re.compile(r"\b(?:schedule|reschedule|book|cancel|appointment|follow-up|visit)\b", re.I)),
+]
+
+
+_DOCS_ANSWER = "The clinic is open 8am-6pm on weekdays; book online or call the front desk."
+
+
+def keyword_route(query: str) -> str:
+    """Billing or scheduling keywords pick those agents; everything else is general."""
+    for agent, pattern in _ROUTE_KEYWORDS:
+        if pattern.search(query):
+            return agent
+    return "general"
+
+
+class StubOpenAI:
+    """chat.completions.create() after `latency` seconds (±jitter), no network."""
+
+    def __init__(
+        self,
+        latency: float = 0.3,
+        *,
+        jitter: float = 0.25,
+        route: Callable[[str], str] = keyword_route,
+        seed: int = 7,
+    ) -> None:
+        self.latency = latency
+        self.jitter = jitter
+        self.route = route
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, **kwargs):
+        time.sleep(self._next_delay())
+        return self._completion(kwargs)
+
+    def _next_delay(self) -> float:
+        with self._lock:
+            self.calls += 1
+            return self.latency * self._rng.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def _completion(self, kwargs: dict):
+        query = kwargs["messages"][-1]["content"]
+        if kwargs.get("response_format", {}).get("type") == "json_object":
+            agent = self.route(query)
+            decision = {"agent": agent, "confidence": 0.9, "reasoning": "stub"}
+            if '"answer"' in kwargs["messages"][0]["content"]:  # A fused classify-and-answer call
+                decision["answer"] = _DOCS_ANSWER if agent == "general" else None
+            content = json.dumps(decision)
+        else:
+            content = _DOCS_ANSWER
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+class AsyncStubOpenAI(StubOpenAI):
+    """StubOpenAI for AsyncOpenAI callers: the latency is an asyncio.sleep, not a blocked thread."""
+
+    async def _create(self, **kwargs):
+        await asyncio.sleep(self._next_delay())
+        return self._completion(kwargs)
@@ -0,0 +1,6 @@
+"""Pytest configuration: make the demo modules importable."""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
@@ -0,0 +1,347 @@
+"""Tests for classifier registry/prompt memoization."""
+
+import asyncio
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import agents
+from breaker import CircuitBreaker
+
+
+class StubOpenAI:
+    """Returns a fixed routing decision and records the prompts it was sent."""
+
+    def __init__(self, agent: str, confidence: float = 0.9, **extra) -> None:
+        self.content = json.dumps({"agent": agent, "confidence": confidence, "reasoning": "stub", **extra})
+        self.calls: list[list[dict]] = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, **kwargs):
+        self.calls.append(kwargs["messages"])
+        message = SimpleNamespace(content=self.content)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache():
+    agents.invalidate_agent_cache()
+    yield
+    agents.invalidate_agent_cache()
+
+
+def test_setup_is_memoized_per_pii_mode():
+    full = agents.classifier_setup(False)
+    filtered = agents.classifier_setup(True)
+
+    assert agents.classifier_setup(False) is full
+    assert agents.classifier_setup(True) is filtered
+    assert full.default_agent == "general"
+    assert filtered.default_agent == "receptionist"
+    assert set(filtered.registry.routable_names()) == {"receptionist", "billing"}
+    assert "**general**" not in filtered.system_prompt
+
+
+def test_in_place_edit_is_picked_up(monkeypatch):
+    before = agents.classifier_setup(False)
+    general = next(cfg for cfg in agents.AGENT_CONFIGS if cfg["name"] == "general")
+    monkeypatch.setitem(general, "description", "Answers questions about parking.")
+
+    after = agents.classifier_setup(False)
+    assert after.config_version != before.config_version
+    assert "parking" in after.system_prompt
+
+
+def test_reassigned_configs_are_picked_up(monkeypatch):
+    before = agents.classifier_setup(True)
+    configs = [dict(cfg) for cfg in agents.AGENT_CONFIGS]
+    configs[2]["handles_pii"] = False  # billing
+    monkeypatch.setattr(agents, "AGENT_CONFIGS", configs)
+
+    after = agents.classifier_setup(True)
+    assert after.config_version != before.config_version
+    assert set(after.registry.routable_names()) == {"receptionist"}
+
+
+def test_classify_sends_memoized_prompt():
+    client = StubOpenAI("billing")
+    decision, response, path = agents.classify("Why was I charged twice?", pii_detected=True, openai_client=client)
+    agents.classify("Refund please", pii_detected=True, openai_client=client)
+
+    assert decision.agent == "billing"
+    assert path == "llm"
+    assert response == agents.MOCK_RESPONSES["billing"]
+    prompts = [messages[0]["content"] for messages in client.calls]
+    assert prompts == [agents.classifier_setup(True).system_prompt] * 2
+
+
+def test_classify_falls_back_for_agents_outside_the_registry():
+    client = StubOpenAI("general")
+    decision, _, _ = agents.classify("Jane Smith wants to book", pii_detected=True, openai_client=client)
+    assert decision.agent == "receptionist"
+    assert decision.did_fallback
+
+
+def test_confident_local_route_skips_the_llm():
+    client = StubOpenAI("general")
+    decision, response, path = agents.classify(
+        "I was charged twice for my visit, please refund", pii_detected=False, openai_client=client,
+        local_threshold=0.5,
+    )
+    assert path == "local"
+    assert decision.agent == "billing"
+    assert response == agents.MOCK_RESPONSES["billing"]
+    assert client.calls == []
+
+
+def test_unsure_local_route_falls_back_to_llm():
+    client = StubOpenAI("receptionist")
+    decision, _, path = agents.classify(
+        "Quantum entanglement?", pii_detected=True, openai_client=client, local_threshold=0.99
+    )
+    assert path == "llm"
+    assert decision.agent == "receptionist"
+    assert len(client.calls) == 1
+
+
+def test_fused_call_routes_and_answers_at_once():
+    client = StubOpenAI("general", answer="We open at 7:30am.")
+    before = agents.fused_stats.snapshot()
+
+    decision, response, path = agents.classify(
+        "When do you open?", pii_detected=False, openai_client=client, fused=True
+    )
+
+    assert (decision.agent, response, path) == ("general", "We open at 7:30am.", "fused")
+    assert len(client.calls) == 1
+    system = client.calls[0][0]["content"]
+    assert system.startswith(agents.classifier_setup(False).system_prompt)
+    assert '"answer"' in system and "## Office Hours" in system
+    after = agents.fused_stats.snapshot()
+    assert (after["calls"], after["answered"]) == (before["calls"] + 1, before["answered"] + 1)
+
+
+def test_fused_general_route_without_answer_falls_back_to_docs_call():
+    client = StubOpenAI("general", answer=None)
+    before = agents.fused_stats.snapshot()["missing"]
+
+    decision, _, path = agents.classify("When do you open?", pii_detected=False, openai_client=client, fused=True)
+
+    assert (decision.agent, path) == ("general", "fused")
+    assert len(client.calls) == 2  # The fused call, then the docs answer
+    assert agents.fused_stats.snapshot()["missing"] == before + 1
+
+
+def test_fused_route_is_still_validated():
+    client = StubOpenAI("decision_support", answer="Take two aspirin.")
+
+    decision, response, _ = agents.classify(
+        "Should I stop my meds?", pii_detected=False, openai_client=client, fused=True
+    )
+
+    assert decision.agent == "general"
+    assert decision.did_fallback
+    assert response != "Take two aspirin."  # Only a general pick's own answer is used
+    assert len(client.calls) == 2
+    client = StubOpenAI("billing", answer="Ignored.")
+    _, response, _ = agents.classify("Refund my copay", pii_detected=False, openai_client=client, fused=True)
+    assert response == agents.MOCK_RESPONSES["billing"]
+
+
+def test_pii_queries_are_never_fused():
+    client = StubOpenAI("billing")
+
+    _, _, path = agents.classify("Refund Jane Smith", pii_detected=True, openai_client=client, fused=True)
+
+    assert path == "llm"
+    assert client.calls[0][0]["content"] == agents.classifier_setup(True).system_prompt
+
+
+class SlowStubOpenAI:
+    """Routing calls return `agent`; docs calls return an answer. Each takes `delay` seconds."""
+
+    def __init__(self, agent: str, delay: float = 0.1) -> None:
+        self.agent = agent
+        self.delay = delay
+        self.docs_calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, **kwargs):
+        time.sleep(self.delay)
+        return self._completion(kwargs)
+
+    def _completion(self, kwargs):
+        if "response_format" in kwargs:
+            content = json.dumps({"agent": self.agent, "confidence": 0.9, "reasoning": "stub"})
+        else:
+            self.docs_calls += 1
+            content = "We are open 8am-6pm."
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+def test_speculative_docs_answer_overlaps_routing():
+    client = SlowStubOpenAI("general")
+    before = agents.speculation_stats.snapshot()
+    start = time.perf_counter()
+    decision, response, _ = agents.classify(
+        "What are your hours?", pii_detected=False, openai_client=client, speculate_docs=True
+    )
+    elapsed = time.perf_counter() - start
+
+    assert decision.agent == "general"
+    assert response == "We are open 8am-6pm."
+    assert elapsed < 0.18  # Two 0.1s calls in parallel, not in series
+    assert agents.speculation_stats.snapshot()["used"] == before["used"] + 1
+
+
+def test_speculative_answer_is_discarded_for_other_routes():
+    client = SlowStubOpenAI("billing")
+    before = agents.speculation_stats.snapshot()
+    decision, response, _ = agents.classify(
+        "Why was I charged?", pii_detected=False, openai_client=client, speculate_docs=True
+    )
+
+    assert decision.agent == "billing"
+    assert response == agents.MOCK_RESPONSES["billing"]
+    after = agents.speculation_stats.snapshot()
+    assert after["wasted"] + after["cancelled"] == before["wasted"] + before["cancelled"] + 1
+
+
+class HungDocsStubOpenAI(SlowStubOpenAI):
+    """SlowStubOpenAI whose docs calls block until `release` is set."""
+
+    def __init__(self, agent: str) -> None:
+        super().__init__(agent, delay=0)
+        self.release = threading.Event()
+
+    def _create(self, **kwargs):
+        if "response_format" not in kwargs:
+            self.release.wait(5)
+        return self._completion(kwargs)
+
+
+def test_speculative_wait_is_bounded_by_the_classifier_budget():
+    client = HungDocsStubOpenAI("general")
+    before = agents.speculation_stats.snapshot()
+
+    try:
+        with pytest.raises(TimeoutError):
+            agents.classify(
+                "What are your hours?", pii_detected=False, openai_client=client, speculate_docs=True, timeout=0.2
+            )
+    finally:
+        client.release.set()
+
+    after = agents.speculation_stats.snapshot()
+    assert after["used"] == before["used"]
+    assert after["wasted"] + after["cancelled"] == before["wasted"] + before["cancelled"] + 1
+
+
+def test_pii_queries_never_speculate():
+    client = SlowStubOpenAI("receptionist", delay=0)
+    before = agents.speculation_stats.snapshot()["started"]
+    agents.classify("Book Jane Smith", pii_detected=True, openai_client=client, speculate_docs=True)
+    assert client.docs_calls == 0
+    assert agents.speculation_stats.snapshot()["started"] == before
+
+
+class AsyncSlowStubOpenAI(SlowStubOpenAI):
+    """SlowStubOpenAI for aclassify: the delay is awaited."""
+
+    async def _create(self, **kwargs):
+        await asyncio.sleep(self.delay)
+        return self._completion(kwargs)
+
+
+def test_aclassify_overlaps_speculative_answer_with_routing():
+    client = AsyncSlowStubOpenAI("general")
+    start = time.perf_counter()
+    decision, response, route_path = asyncio.run(
+        agents.aclassify("What are your hours?", pii_detected=False, openai_client=client, speculate_docs=True)
+    )
+
+    assert (decision.agent, response, route_path) == ("general", "We are open 8am-6pm.", "llm")
+    assert time.perf_counter() - start < 0.18
+
+
+def test_aclassify_cancels_speculative_answer_for_other_routes():
+    client = AsyncSlowStubOpenAI("billing", delay=0.05)
+    before = agents.speculation_stats.snapshot()
+
+    async def classify_then_linger():
+        result = await agents.aclassify(
+            "Why was I charged?", pii_detected=False, openai_client=client, speculate_docs=True
+        )
+        await asyncio.sleep(0.1)  # Long enough for an uncancelled docs call to finish
+        return result
+
+    decision, response, _ = asyncio.run(classify_then_linger())
+
+    assert client.docs_calls == 0
+    assert decision.agent == "billing"
+    assert response == agents.MOCK_RESPONSES["billing"]
+    after = agents.speculation_stats.snapshot()
+    assert after["wasted"] + after["cancelled"] == before["wasted"] + before["cancelled"] + 1
+
+
+class DownOpenAI:
+    """Every call fails, like an unreachable API."""
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, **kwargs):
+        self.calls += 1
+        raise ConnectionError("OpenAI unreachable")
+
+
+@pytest.fixture
+def openai_breaker(monkeypatch):
+    breaker = CircuitBreaker("openai", failure_threshold=2, reset_timeout=60)
+    monkeypatch.setattr(agents, "openai_breaker", breaker)
+    return breaker
+
+
+def test_open_breaker_routes_locally_without_calling_openai(openai_breaker):
+    client = DownOpenAI()
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            agents.classify("What are your hours?", pii_detected=False, openai_client=client)
+
+    general = agents.classify("What are your office hours?", pii_detected=False, openai_client=client)
+    billing = agents.classify("I was charged twice for my copay", pii_detected=False, openai_client=client)
+
+    assert client.calls == 2
+    assert (general[0].agent, general[1], general[2]) == ("general", agents.DOCS_UNAVAILABLE_RESPONSE, "degraded")
+    assert (billing[0].agent, billing[1], billing[2]) == ("billing", agents.MOCK_RESPONSES["billing"], "degraded")
+
+
+def test_open_breaker_skips_the_docs_answer_after_a_local_route(openai_breaker):
+    for _ in range(2):
+        openai_breaker.allow()
+        openai_breaker.record_failure()
+
+    decision, response, route_path = agents.classify(
+        "What are your office hours?", pii_detected=False, openai_client=DownOpenAI(), local_threshold=0.0
+    )
+
+    assert (decision.agent, response, route_path) == ("general", agents.DOCS_UNAVAILABLE_RESPONSE, "degraded")
+
+
+def test_aclassify_degrades_while_the_breaker_is_open(openai_breaker):
+    for _ in range(2):
+        openai_breaker.allow()
+        openai_breaker.record_failure()
+    client = AsyncSlowStubOpenAI("general", delay=0)
+
+    decision, response, route_path = asyncio.run(
+        agents.aclassify("Why was I charged twice?", pii_detected=True, openai_client=client, speculate_docs=True)
+    )
+
+    assert route_path == "degraded"
+    assert decision.agent in {"billing", "receptionist"}
+    assert client.docs_calls == 0
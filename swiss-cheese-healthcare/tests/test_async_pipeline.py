@@ -0,0 +1,153 @@
+"""The asyncio pipeline over ASGI: same events as pipeline.py, one coroutine per webhook."""
+
+import asyncio
+import time
+
+import httpx
+import pytest
+from sema_sdk import WebhookVerifier
+
+import agents
+import async_pipeline
+import pipeline
+from admission import AdmissionController
+from events import EventHub
+from ratelimit import AdaptiveLimiter
+from standins import AsyncStubOpenAI, sign_webhook
+from test_pipeline import SECRET, drain, webhook_payload
+
+
+@pytest.fixture
+def hub(monkeypatch):
+    agents.invalidate_agent_cache()
+    hub = EventHub()
+    monkeypatch.setattr(pipeline, "event_hub", hub)
+    monkeypatch.setattr(pipeline, "_verifier", WebhookVerifier(secret=SECRET))
+    monkeypatch.setattr(pipeline, "_local_router_threshold", None)
+    monkeypatch.setattr(pipeline, "classification_cache", None)
+    monkeypatch.setattr(pipeline, "admission", AdmissionController())
+    monkeypatch.setattr(async_pipeline, "_classifier_timeout", 0.2)
+    monkeypatch.setattr(async_pipeline, "_interceptor_timeout", 0.2)
+    monkeypatch.setattr(async_pipeline, "stage_stats", async_pipeline.StageStats())
+    monkeypatch.setattr(agents, "openai_limiter", AdaptiveLimiter("test", initial=64, max_limit=64))
+    return hub
+
+
+def use_openai(monkeypatch, latency: float, agent: str = "billing") -> AsyncStubOpenAI:
+    stub = AsyncStubOpenAI(latency, jitter=0, route=lambda query: agent)
+    monkeypatch.setattr(async_pipeline, "_openai_client", stub)
+    return stub
+
+
+async def post_all(payloads: list[bytes]) -> list[httpx.Response]:
+    transport = httpx.ASGITransport(app=async_pipeline.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        return await asyncio.gather(
+            *(client.post("/webhook", content=p, headers=sign_webhook(SECRET, p)) for p in payloads)
+        )
+
+
+def post(payload: bytes) -> httpx.Response:
+    return asyncio.run(post_all([payload]))[0]
+
+
+def test_webhook_runs_every_stage(hub, monkeypatch):
+    use_openai(monkeypatch, 0.0)
+
+    response = post(webhook_payload("item_1", "I was charged twice", "and I take warfarin"))
+
+    assert response.status_code == 200
+    assert response.json() == {"ok": True}
+    events = drain(hub, "item_1")
+    assert events[0].stage == "webhook_received"
+    assert events[-1].stage == "aggregated"
+    assert {e.stage for e in events} >= {"pii_result", "classifier_result", "interceptor_result"}
+    summary = events[-1].data
+    assert summary["classifier"]["agent"] == "billing"
+    assert summary["interceptor"]["clinical_alert"] is True
+    assert summary["degraded"] == []
+    timings = [(row["name"], row["depth"]) for row in summary["timings"]]
+    assert timings[:2] == [("verify", 0), ("pii", 0)]
+    assert ("openai.route", 1) in timings and ("interceptor", 0) in timings
+
+
+def test_classifier_timeout_gives_partial_aggregate(hub, monkeypatch):
+    use_openai(monkeypatch, 1.0)
+
+    start = time.perf_counter()
+    response = post(webhook_payload("item_2", "Refund my copay", "I take warfarin"))
+
+    assert time.perf_counter() - start < 0.8
+    assert response.status_code == 200
+    events = drain(hub, "item_2")
+    errors = [e.data for e in events if e.stage == "error"]
+    assert errors == [{"source": "classifier", "message": "classifier timed out after 0.2s"}]
+    summary = events[-1].data
+    assert summary["degraded"] == ["classifier"]
+    assert summary["classifier"] == {}
+    assert summary["interceptor"]["clinical_alert"] is True
+
+
+def test_missing_query_text_is_rejected(hub, monkeypatch):
+    use_openai(monkeypatch, 0.0)
+
+    response = post(webhook_payload("item_3", ""))
+
+    assert response.status_code == 400
+    assert response.json() == {"error": "No query text found in webhook payload"}
+    assert [e.stage for e in drain(hub, "item_3")] == ["webhook_received", "pii_result", "error"]
+
+
+def test_bad_signature_and_unknown_routes(hub, monkeypatch):
+    use_openai(monkeypatch, 0.0)
+    payload = webhook_payload("item_4", "Hi")
+
+    async def requests():
+        transport = httpx.ASGITransport(app=async_pipeline.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            headers = {**sign_webhook(SECRET, payload), "webhook-signature": "v1,bm9wZQ=="}
+            return (
+                await client.post("/webhook", content=payload, headers=headers),
+                await client.get("/webhook"),
+                await client.get("/nope"),
+                await client.get("/health"),
+                await client.get("/metrics"),
+            )
+
+    forged, wrong_method, missing, health, metrics = asyncio.run(requests())
+
+    assert forged.status_code == 400
+    assert drain(hub, "item_4") == []
+    assert (wrong_method.status_code, missing.status_code) == (405, 404)
+    assert health.json()["status"] == "ok"
+    assert set(health.json()["breakers"]) == {"openai", "sema"}
+    stages = metrics.json()["stages"]
+    assert (stages["in_flight"], stages["peak_in_flight"]) == (0, 0)
+
+
+def test_concurrent_webhooks_are_all_in_flight_at_once(hub, monkeypatch):
+    stub = use_openai(monkeypatch, 0.1)
+    payloads = [webhook_payload(f"item_c{i}", "Refund my copay") for i in range(50)]
+
+    start = time.perf_counter()
+    responses = asyncio.run(post_all(payloads))
+
+    assert time.perf_counter() - start < 0.5  # 50 x 0.1s in series would take 5s
+    assert [r.status_code for r in responses] == [200] * 50
+    assert stub.calls == 50
+    snapshot = async_pipeline.stage_stats.snapshot()
+    assert snapshot["peak_in_flight"] == 50
+    assert snapshot["counts"]["classifier"] == {"ok": 50}
+
+
+def test_webhooks_over_the_admission_limit_are_shed(hub, monkeypatch):
+    use_openai(monkeypatch, 0.1)
+    monkeypatch.setattr(pipeline, "admission", AdmissionController(max_in_flight=10))
+    payloads = [webhook_payload(f"item_s{i}", "Refund my copay") for i in range(20)]
+
+    responses = asyncio.run(post_all(payloads))
+
+    statuses = sorted(r.status_code for r in responses)
+    assert statuses == [200] * 10 + [503] * 10
+    assert all(r.headers["retry-after"] == "1" for r in responses if r.status_code == 503)
+    assert async_pipeline.stage_stats.snapshot()["peak_in_flight"] == 10
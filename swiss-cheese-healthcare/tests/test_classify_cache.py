@@ -0,0 +1,105 @@
+"""Tests for the classification/response cache."""
+
+import pytest
+
+import agents
+from classify_cache import ClassificationCache, cache_key, normalize_query
+from test_agents import StubOpenAI, openai_breaker  # noqa: F401 (fixture)
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture(autouse=True)
+def fresh_agents():
+    agents.invalidate_agent_cache()
+    yield
+    agents.invalidate_agent_cache()
+
+
+def test_normalization_folds_case_punctuation_whitespace():
+    assert normalize_query("  How do I BOOK an appointment?! ") == normalize_query("how do i book an appointment")
+    assert cache_key("Book it", pii_detected=True) != cache_key("Book it", pii_detected=False)
+
+
+def test_repeated_query_is_served_from_cache():
+    cache = ClassificationCache()
+    client = StubOpenAI("billing")
+
+    first = cache.classify("Why was I charged twice?", pii_detected=True, openai_client=client)
+    second = cache.classify("why was i charged TWICE", pii_detected=True, openai_client=client)
+
+    assert first[2] == "llm"
+    assert second == (first[0], first[1], "cache")
+    assert len(client.calls) == 1
+    assert cache.snapshot()["hits"] == 1
+
+
+def test_entries_expire_and_lru_is_bounded():
+    clock = FakeClock()
+    cache = ClassificationCache(max_entries=2, ttl=10, clock=clock)
+    client = StubOpenAI("billing")
+    for query in ("refund one", "refund two", "refund three"):
+        cache.classify(query, pii_detected=True, openai_client=client)
+    assert len(cache) == 2
+
+    cache.classify("refund one", pii_detected=True, openai_client=client)  # Evicted: miss
+    assert len(client.calls) == 4
+    clock.now = 11
+    cache.classify("refund one", pii_detected=True, openai_client=client)  # Expired: miss
+    assert len(client.calls) == 5
+
+
+def test_config_change_is_a_different_key(monkeypatch):
+    cache = ClassificationCache()
+    client = StubOpenAI("billing")
+    cache.classify("Refund please", pii_detected=True, openai_client=client)
+
+    # Edited in place: the config hash still changes, so the cached route isn't served
+    billing = next(cfg for cfg in agents.AGENT_CONFIGS if cfg["name"] == "billing")
+    monkeypatch.setitem(billing, "description", "Payments only.")
+
+    _, _, path = cache.classify("Refund please", pii_detected=True, openai_client=client)
+    assert path == "llm"
+
+
+def test_hit_that_no_longer_validates_is_reclassified(monkeypatch):
+    cache = ClassificationCache()
+    client = StubOpenAI("billing")
+    cache.classify("Refund please", pii_detected=True, openai_client=client)
+
+    # Same key, but billing is no longer routable in the current registry
+    monkeypatch.setattr(agents, "revalidate_route", lambda decision, pii_detected: False)
+    monkeypatch.setattr("classify_cache.revalidate_route", agents.revalidate_route)
+    _, _, path = cache.classify("Refund please", pii_detected=True, openai_client=client)
+
+    assert path == "llm"
+    assert cache.snapshot()["stale"] == 1
+
+
+def test_revalidate_route_checks_the_current_registry():
+    client = StubOpenAI("billing")
+    decision, _, _ = agents.classify("Refund", pii_detected=True, openai_client=client)
+    assert agents.revalidate_route(decision, pii_detected=True)
+    general, _, _ = agents.classify("Hours?", pii_detected=False, openai_client=StubOpenAI("general"))
+    assert not agents.revalidate_route(general, pii_detected=True)
+
+
+def test_degraded_results_are_not_cached(openai_breaker):
+    for _ in range(openai_breaker.failure_threshold):
+        openai_breaker.allow()
+        openai_breaker.record_failure()
+    cache = ClassificationCache()
+    client = StubOpenAI("billing")
+
+    degraded = cache.classify("Why was I charged twice?", pii_detected=True, openai_client=client)
+    openai_breaker.record_success()  # OpenAI is back
+    recovered = cache.classify("Why was I charged twice?", pii_detected=True, openai_client=client)
+
+    assert (degraded[2], recovered[2]) == ("degraded", "llm")
+    assert len(client.calls) == 1
@@ -0,0 +1,83 @@
+"""Tests for the heading-aware clinic docs index."""
+
+import pytest
+
+import agents
+from docs_index import SectionIndex, estimate_tokens
+
+FILLER = "Patients are welcome to ask the front desk about this at any time. " * 20
+
+HANDBOOK = f"""# Clinic Handbook
+
+Welcome to the clinic.
+
+## Parking
+
+The garage on Elm Street is free for patients. {FILLER}
+
+## Prescription Refills
+
+Refills take 48 hours through the portal. {FILLER}
+
+### Controlled Substances
+
+Refills of controlled substances need an office visit.
+
+## Lab Results
+
+Lab results are posted to the portal within 3 days. {FILLER}
+"""
+
+
+@pytest.fixture
+def index():
+    return SectionIndex(HANDBOOK)
+
+
+def test_splits_on_level_two_headings_only(index):
+    assert index.preamble == "# Clinic Handbook\n\nWelcome to the clinic."
+    assert [s.heading for s in index.sections] == ["Parking", "Prescription Refills", "Lab Results"]
+    assert "### Controlled Substances" in index.sections[1].text
+
+
+def test_best_section_within_budget(index):
+    budget = estimate_tokens(index.preamble) + index.sections[1].tokens + 10
+
+    docs, headings = index.select("How long does a prescription refill take?", budget)
+
+    assert headings == ["Prescription Refills"]
+    assert docs.startswith("# Clinic Handbook")
+    assert "controlled substances" in docs
+    assert "Elm Street" not in docs and "Lab results" not in docs
+
+
+def test_sections_keep_document_order(index):
+    query = "Is there parking, and when are lab results ready?"
+    assert index.select(query, index.tokens) == (HANDBOOK, [])  # Fits the budget: the whole document
+
+    docs, headings = index.select(query, index.tokens - 1)
+
+    assert headings == ["Parking", "Lab Results"]
+    assert docs.index("Elm Street") < docs.index("Lab results are posted")
+
+
+def test_best_section_is_kept_even_over_budget(index):
+    _, headings = index.select("parking garage", 1)
+
+    assert headings == ["Parking"]
+
+
+def test_no_matching_section_falls_back_to_full_document(index):
+    assert index.select("What is the meaning of it all?", 50) == (HANDBOOK, [])
+
+
+def test_docs_prompt_uses_the_budget(monkeypatch):
+    agents._load_clinic_docs()
+    monkeypatch.setattr(agents, "_docs_token_budget", 100)
+
+    prompt = agents._docs_messages("Do you take Cigna insurance?")[0]["content"]
+
+    assert "Cigna" in prompt
+    assert "Office Hours" not in prompt
+    monkeypatch.setattr(agents, "_docs_token_budget", 10_000)
+    assert agents._CLINIC_DOCS in agents._docs_messages("Do you take Cigna insurance?")[0]["content"]
@@ -0,0 +1,148 @@
+"""Tests for the cross-process SQLite event log, and the pipeline under gunicorn workers."""
+
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import httpx
+import pytest
+
+from event_log import LogEventHub
+from standins import item_ready_payload, new_webhook_secret, sign_webhook
+from webhook_recorder import read_recording
+
+APP_DIR = Path(__file__).parent.parent
+
+
+def drain(subscription, count: int, timeout: float = 10.0) -> list:
+    events = []
+    deadline = time.monotonic() + timeout
+    while len(events) < count and time.monotonic() < deadline:
+        evt = subscription.get(timeout=0.1)
+        if evt is not None:
+            events.append(evt)
+    return events
+
+
+def test_events_published_by_one_hub_reach_another(tmp_path):
+    publisher, follower = LogEventHub(tmp_path / "events.db"), LogEventHub(tmp_path / "events.db")
+    try:
+        with follower.subscribe("item_a") as events:
+            publisher.publish("webhook_received", "item_a", elapsed=0.1)
+            publisher.publish("webhook_received", "item_b")
+            publisher.publish("aggregated", "item_a", degraded=[], query="hi")
+            received = drain(events, 2)
+        assert [(e.stage, e.item_id) for e in received] == [("webhook_received", "item_a"), ("aggregated", "item_a")]
+        assert received[0].elapsed == 0.1
+        assert received[1].data == {"degraded": [], "query": "hi"}
+        assert received[0].seq < received[1].seq
+    finally:
+        publisher.close()
+        follower.close()
+
+
+def test_first_subscriber_backfills_earlier_events(tmp_path):
+    publisher = LogEventHub(tmp_path / "events.db")
+    publisher.publish("webhook_received", "item_a")
+    publisher.publish("aggregated", "item_a")
+    follower = LogEventHub(tmp_path / "events.db", backfill=1)
+    try:
+        with follower.subscribe("item_a") as events:
+            assert [e.stage for e in drain(events, 1)] == ["aggregated"]
+    finally:
+        publisher.close()
+        follower.close()
+
+
+def _publish_from_process(path: str, worker: int, count: int) -> None:
+    hub = LogEventHub(path)
+    for i in range(count):
+        hub.publish("tick", f"item_{worker}", i=i)
+    hub.close()
+
+
+def test_processes_share_one_order(tmp_path):
+    path = str(tmp_path / "events.db")
+    follower = LogEventHub(path, subscriber_buffer=1000)
+    context = multiprocessing.get_context("spawn")
+    try:
+        with follower.subscribe() as events:
+            workers = [context.Process(target=_publish_from_process, args=(path, w, 200)) for w in range(4)]
+            for process in workers:
+                process.start()
+            for process in workers:
+                process.join()
+            received = drain(events, 800)
+    finally:
+        follower.close()
+
+    assert len(received) == 800
+    assert [e.seq for e in received] == sorted(e.seq for e in received)
+    for w in range(4):
+        assert [e.data["i"] for e in received if e.item_id == f"item_{w}"] == list(range(200))
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_gunicorn_workers_share_the_event_log(tmp_path):
+    pytest.importorskip("gunicorn")
+    secret = new_webhook_secret()
+    log_path = tmp_path / "events.db"
+    record_path = tmp_path / "webhooks.jsonl.gz"
+    port = free_port()
+    env = {
+        **os.environ,
+        "SEMA_WEBHOOK_SECRET": secret,
+        "EVENT_LOG_PATH": str(log_path),
+        "OPENAI_STUB_LATENCY_MS": "50",
+        "LOCAL_ROUTER_THRESHOLD": "off",
+        "CLASSIFY_CACHE_SIZE": "0",
+        "WEBHOOK_RECORD_PATH": str(record_path),  # Every worker appends to the same recording
+    }
+    command = [sys.executable, "-m", "gunicorn", "wsgi:app", "--workers", "4", "--worker-class", "gthread"]
+    command += ["--threads", "8", "--bind", f"127.0.0.1:{port}", "--log-level", "warning"]
+    server = subprocess.Popen(command, cwd=APP_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    follower = LogEventHub(log_path, subscriber_buffer=4000)
+    try:
+        base = f"http://127.0.0.1:{port}"
+        for _ in range(100):
+            try:
+                httpx.get(f"{base}/health", timeout=1).raise_for_status()
+                break
+            except httpx.HTTPError:
+                time.sleep(0.1)
+
+        payloads = [
+            item_ready_payload(f"item_{i}", "inbox", "Refund my copay", "I was charged twice", {})
+            for i in range(200)
+        ]
+        with follower.subscribe() as events, httpx.Client(base_url=base, timeout=10) as client:
+
+            def post(payload: bytes) -> int:
+                return client.post("/webhook", content=payload, headers=sign_webhook(secret, payload)).status_code
+
+            with ThreadPoolExecutor(max_workers=32) as pool:
+                statuses = list(pool.map(post, payloads))
+            aggregated: set[str] = set()
+            deadline = time.monotonic() + 30  # Bounds the wait on a slow machine; not a timing assertion
+            while len(aggregated) < 200 and time.monotonic() < deadline:
+                evt = events.get(timeout=0.1)
+                if evt is not None and evt.stage == "aggregated":
+                    aggregated.add(evt.item_id)
+    finally:
+        follower.close()
+        server.terminate()
+        server.wait(timeout=10)
+
+    assert statuses == [200] * 200
+    assert aggregated == {f"item_{i}" for i in range(200)}
+    assert len(list(read_recording(record_path))) == 200
@@ -0,0 +1,125 @@
+import json
+import threading
+import time
+
+import pytest
+
+import pipeline
+from events import EventHub
+
+
+def test_subscribers_only_see_their_item():
+    hub = EventHub()
+    with hub.subscribe("item_a") as a, hub.subscribe("item_b") as b, hub.subscribe() as everything:
+        hub.publish("webhook_received", "item_a")
+        hub.publish("webhook_received", "item_b")
+        hub.publish("aggregated", "item_a")
+
+        assert [(e.item_id, e.stage) for e in (a.get(0), a.get(0))] == [
+            ("item_a", "webhook_received"),
+            ("item_a", "aggregated"),
+        ]
+        assert a.get(0) is None
+        assert b.get(0).item_id == "item_b"
+        assert [everything.get(0).seq for _ in range(3)] == [1, 2, 3]
+
+
+def test_late_subscriber_replays_buffer():
+    hub = EventHub()
+    hub.publish("webhook_received", "item_a")
+    hub.publish("pii_result", "item_a", pii_detected=False)
+
+    with hub.subscribe("item_a") as events:
+        assert [events.get(0).stage, events.get(0).stage] == ["webhook_received", "pii_result"]
+        hub.publish("aggregated", "item_a")
+        assert events.get(0).stage == "aggregated"
+
+    with hub.subscribe("item_a", after_seq=2) as resumed:
+        assert resumed.get(0).stage == "aggregated"
+
+
+def test_slow_subscriber_drops_oldest_without_blocking_publish():
+    hub = EventHub(subscriber_buffer=3)
+    with hub.subscribe("item_a") as events:
+        start = time.perf_counter()
+        for i in range(1000):
+            hub.publish("tick", "item_a", i=i)
+        assert time.perf_counter() - start < 1.0
+
+        assert [events.get(0).data["i"] for _ in range(3)] == [997, 998, 999]
+        assert events.dropped == 997
+    assert hub.snapshot()["dropped"] == 997
+
+
+def test_buffers_are_bounded():
+    hub = EventHub(buffer_size=2, max_items=2)
+    for item in ("a", "b", "c"):
+        for stage in ("one", "two", "three"):
+            hub.publish(stage, item)
+
+    assert hub.snapshot()["buffered_items"] == 2
+    with hub.subscribe("a") as evicted, hub.subscribe("c") as kept:
+        assert evicted.get(0) is None
+        assert [kept.get(0).stage, kept.get(0).stage] == ["two", "three"]
+
+
+def test_close_wakes_waiting_reader():
+    hub = EventHub()
+    events = hub.subscribe("item_a")
+    threading.Timer(0.05, events.close).start()
+    assert events.get(timeout=5) is None
+    assert hub.snapshot()["subscribers"] == 0
+
+
+TOKEN = "test-token"
+AUTH = {"Authorization": f"Bearer {TOKEN}"}
+
+
+@pytest.fixture
+def hub(monkeypatch):
+    hub = EventHub()
+    monkeypatch.setattr(pipeline, "event_hub", hub)
+    monkeypatch.setattr(pipeline, "_api_token", TOKEN)
+    return hub
+
+
+def _frames(body: str) -> list[dict]:
+    return [
+        json.loads(line[len("data: "):])
+        for line in body.splitlines()
+        if line.startswith("data: ")
+    ]
+
+
+def test_sse_item_stream_ends_after_aggregated(hub):
+    hub.publish("webhook_received", "item_a")
+    hub.publish("webhook_received", "item_b")
+    threading.Timer(0.05, lambda: hub.publish("aggregated", "item_a", query="hi")).start()
+
+    response = pipeline.app.test_client().get("/events/item_a", headers=AUTH)
+
+    assert response.mimetype == "text/event-stream"
+    frames = _frames(response.get_data(as_text=True))
+    assert [(f["item_id"], f["stage"]) for f in frames] == [
+        ("item_a", "webhook_received"),
+        ("item_a", "aggregated"),
+    ]
+    assert frames[-1]["data"] == {"query": "hi"}
+
+
+def test_sse_resumes_from_last_event_id(hub):
+    first = hub.publish("webhook_received", "item_a")
+    hub.publish("aggregated", "item_a")
+
+    response = pipeline.app.test_client().get("/events/item_a", headers={**AUTH, "Last-Event-ID": str(first.seq)})
+
+    assert [f["stage"] for f in _frames(response.get_data(as_text=True))] == ["aggregated"]
+
+
+def test_sse_needs_the_api_token(hub, monkeypatch):
+    client = pipeline.app.test_client()
+
+    assert client.get("/events").status_code == 401
+    assert client.get("/events/item_a", headers={"Authorization": "Bearer nope"}).status_code == 401
+    monkeypatch.setattr(pipeline, "_api_token", None)
+    assert client.get("/events/item_a", headers=AUTH).status_code == 404  # No token configured: SSE is off
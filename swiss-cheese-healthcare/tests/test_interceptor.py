@@ -0,0 +1,124 @@
+"""Tests for the Aho-Corasick clinical signal interceptor."""
+
+import random
+import re
+
+from interceptor import (
+    SIGNAL_PATTERNS,
+    SignalMatcher,
+    SignalStream,
+    detect_clinical_signals,
+    find_clinical_signals,
+    iter_chunks,
+    scan_chunks,
+)
+
+DEMO_QUERY = (
+    "Schedule a follow-up for Jane Smith, DOB 04/12/1978. She mentioned during her last visit "
+    "that she's been skipping her Lisinopril and has been having chest pain."
+)
+
+
+def regex_first_hits(text: str) -> list[tuple[str, str, str]]:
+    """The original per-term regex scan, restricted to word-boundary hits."""
+    hits = []
+    for signal_type, terms in SIGNAL_PATTERNS.items():
+        for term in terms:
+            match = re.search(rf"\b{re.escape(term)}\b", text, re.IGNORECASE)
+            if match:
+                context = text[max(0, match.start() - 30) : match.end() + 30].strip()
+                hits.append((signal_type, term, context))
+    return hits
+
+
+def test_demo_query_matches_original_output():
+    signals = detect_clinical_signals(DEMO_QUERY)
+    assert [(s.type, s.term, s.context) for s in signals] == regex_first_hits(DEMO_QUERY)
+    assert {s.term for s in signals} == {"chest pain", "Lisinopril", "skipping"}
+
+
+def test_safe_query_has_no_signals():
+    assert detect_clinical_signals("How do I book an appointment?") == []
+
+
+def test_spans_point_at_the_original_text():
+    text = "Patient STOPPED TAKING Warfarin; dizziness since."
+    for signal in find_clinical_signals(text):
+        assert text[signal.start : signal.end].lower() == signal.term.lower()
+
+
+def test_find_reports_every_occurrence_in_text_order():
+    text = "Headache Monday, nausea, then another headache and more headaches."
+    signals = find_clinical_signals(text)
+    assert [s.term for s in signals] == ["headache", "nausea", "headache", "headache"]
+    assert [s.start for s in signals] == sorted(s.start for s in signals)
+    # detect_clinical_signals keeps only the first hit per term
+    assert [s.start for s in detect_clinical_signals(text)] == [0, 17]
+
+
+def test_terms_match_on_word_boundaries_only():
+    assert detect_clinical_signals("noncardiac workup, insulinoma, prestroke") == []
+    assert [s.term for s in detect_clinical_signals("non-cardiac")] == ["cardiac"]
+
+
+def test_plurals_punctuation_and_curly_apostrophes():
+    text = "Strokes in family. She can’t afford meds and is non-adherent."
+    assert {s.term for s in detect_clinical_signals(text)} == {"stroke", "can't afford", "non-adherent"}
+
+
+def test_overlapping_terms_are_all_reported():
+    matcher = SignalMatcher([("a", "missed doses"), ("b", "doses"), ("c", "missed doses of insulin")])
+    matches = list(matcher.iter_matches("She missed doses of insulin twice"))
+    assert sorted(matcher.terms[p] for p, _, _ in matches) == ["doses", "missed doses", "missed doses of insulin"]
+
+
+def test_fail_links_recover_partial_matches():
+    matcher = SignalMatcher([("x", "not taking"), ("y", "taking insulin")])
+    matches = [(matcher.terms[p], s, e) for p, s, e in matcher.iter_matches("not not taking insulin")]
+    assert matches == [("not taking", 4, 14), ("taking insulin", 8, 22)]
+
+
+def random_chunks(text: str, rng: random.Random, max_size: int) -> list[str]:
+    chunks, pos = [], 0
+    while pos < len(text):
+        size = rng.randint(1, max_size)
+        chunks.append(text[pos : pos + size])
+        pos += size
+    return chunks
+
+
+def test_streaming_matches_a_single_pass_for_any_chunking():
+    rng = random.Random(3)
+    words = ["chest", "pain", "shortness", "of", "breath", "Warfarin", "headaches", "stopped", "taking",
+             "noncardiac", "cardiac", "can’t", "afford", "missed", "doses", "the", ",", "\n", "x" * 300]
+    for _ in range(300):
+        text = " ".join(rng.choice(words) for _ in range(rng.randint(0, 60)))
+        chunks = random_chunks(text, rng, 40)
+        assert scan_chunks(chunks, first_only=False) == find_clinical_signals(text)
+        assert scan_chunks(chunks) == detect_clinical_signals(text)
+
+
+def test_terms_split_across_chunk_boundaries_keep_their_context():
+    text = DEMO_QUERY
+    split = text.index("chest pain") + 3  # "che" | "st pain..."
+    signals = scan_chunks([text[:split], text[split:]], first_only=False)
+    assert signals == find_clinical_signals(text)
+    chest = next(s for s in signals if s.term == "chest pain")
+    assert chest.context == text[chest.start - 30 : chest.end + 30].strip()
+
+
+def test_stream_memory_does_not_grow_with_input():
+    stream = SignalStream(first_only=True, source="notes.txt")
+    filler = "Routine follow-up, nothing to report. " * 2000
+    peak = 0
+    for i, chunk in enumerate(iter_chunks(filler * 50, 4096)):
+        stream.feed(chunk)
+        if i == 300:
+            stream.feed("Patient stopped taking Warfarin last week. ")
+        peak = max(peak, len(stream._buf))
+    signals = stream.close()
+
+    assert peak < 4096 + 200
+    assert stream.chars > 3_000_000
+    assert [(s.term, s.source) for s in signals] == [("Warfarin", "notes.txt"), ("stopped taking", "notes.txt")]
+    assert "Patient stopped taking Warfarin" in signals[1].context
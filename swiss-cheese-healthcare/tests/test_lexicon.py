@@ -0,0 +1,97 @@
+"""Tests for the compiled, mmapped clinical lexicon."""
+
+import os
+
+import pytest
+
+import interceptor
+from lexicon import LexiconError, ReloadingLexicon, load_artifact, load_lexicon, read_vocabulary
+
+VOCAB = "# anticoagulants\nApixaban\ncondition\tatrial fibrillation\nMetformin\nsymptom\tjoint pain\n"
+
+
+@pytest.fixture
+def vocab_file(tmp_path):
+    path = tmp_path / "vocab.txt"
+    path.write_text(VOCAB)
+    return path
+
+
+def test_read_vocabulary_parses_types_and_comments(vocab_file):
+    assert read_vocabulary(vocab_file) == [
+        ("medication", "Apixaban"),
+        ("condition", "atrial fibrillation"),
+        ("medication", "Metformin"),
+        ("symptom", "joint pain"),
+    ]
+
+
+def test_mapped_matcher_matches_like_compiled_one(vocab_file, tmp_path):
+    matcher = load_lexicon(vocab_file, cache_dir=tmp_path / "cache")
+    text = "Started Apixaban for atrial fibrillation; stopped taking Metformin, joint pains, chest pain"
+
+    hits = [(matcher.types[p], matcher.terms[p], s, e) for p, s, e in matcher.iter_matches(text)]
+
+    assert ("medication", "Apixaban", 8, 16) in hits
+    assert ("condition", "atrial fibrillation", 21, 40) in hits
+    assert ("symptom", "joint pain", 68, 79) in hits
+    assert ("symptom", "chest pain", 81, 91) in hits  # Built-in terms are kept
+    # Metformin is built in and in the file; it is compiled once
+    assert [term for _, term, _, _ in hits].count("Metformin") == 1
+
+
+def test_artifact_is_reused_until_the_file_changes(vocab_file, tmp_path, capsys):
+    cache = tmp_path / "cache"
+    load_lexicon(vocab_file, cache_dir=cache)
+    first = list(cache.iterdir())
+    load_lexicon(vocab_file, cache_dir=cache)
+    assert capsys.readouterr().out.count("Compiled") == 1
+    assert list(cache.iterdir()) == first
+
+    vocab_file.write_text(VOCAB + "Rivaroxaban\n")
+    load_lexicon(vocab_file, cache_dir=cache)
+    assert len(list(cache.iterdir())) == 1
+    assert list(cache.iterdir()) != first
+
+
+def test_load_artifact_rejects_other_files(tmp_path):
+    bogus = tmp_path / "bogus.clx"
+    bogus.write_bytes(b"not an artifact at all")
+    with pytest.raises(LexiconError):
+        load_artifact(bogus)
+
+
+def test_reload_swaps_matcher_and_keeps_old_one_usable(vocab_file, tmp_path):
+    lexicon = ReloadingLexicon(vocab_file, cache_dir=tmp_path / "cache")
+    old = lexicon.matcher
+    assert not lexicon.reload_if_changed()
+
+    vocab_file.write_text(VOCAB + "Rivaroxaban\n")
+    os.utime(vocab_file, ns=(0, 1))  # Guarantee a new mtime on coarse-grained filesystems
+    assert lexicon.reload_if_changed()
+
+    assert lexicon.matcher is not old
+    assert [old.terms[p] for p, _, _ in old.iter_matches("Apixaban, Rivaroxaban")] == ["Apixaban"]
+    new_hits = [lexicon.matcher.terms[p] for p, _, _ in lexicon.matcher.iter_matches("Apixaban, Rivaroxaban")]
+    assert new_hits == ["Apixaban", "Rivaroxaban"]
+
+
+def test_interceptor_uses_installed_lexicon(vocab_file, tmp_path):
+    interceptor.use_lexicon(ReloadingLexicon(vocab_file, cache_dir=tmp_path / "cache"))
+    try:
+        signals = interceptor.detect_clinical_signals("On Apixaban and skipping doses")
+        # Pattern order: built-in terms first, then the file
+        assert [(s.type, s.term) for s in signals] == [("risk_signal", "skipping"), ("medication", "Apixaban")]
+    finally:
+        interceptor.use_lexicon(None)
+    assert [s.term for s in interceptor.detect_clinical_signals("On Apixaban")] == []
+
+
+def test_stop_ends_the_watcher_thread(vocab_file, tmp_path):
+    lexicon = ReloadingLexicon(vocab_file, cache_dir=tmp_path / "cache", poll_interval=0.01).start()
+    watcher = lexicon._watcher
+    assert watcher.is_alive()
+
+    lexicon.stop()
+
+    assert not watcher.is_alive()
@@ -0,0 +1,59 @@
+"""Tests for the local TF-IDF + softmax router."""
+
+import pytest
+
+import agents
+from local_router import LocalRouter, training_examples
+
+ALL = {"general", "receptionist", "billing"}
+PII_SAFE = {"receptionist", "billing"}
+
+
+@pytest.fixture(scope="module")
+def router():
+    return LocalRouter(training_examples(agents.AGENT_CONFIGS))
+
+
+def test_trains_only_on_routable_agents(router):
+    assert router.labels == sorted(ALL)
+
+
+@pytest.mark.parametrize(
+    ("query", "agent"),
+    [
+        ("How do I book an appointment?", "general"),
+        ("What time do you open on weekdays?", "general"),
+        ("I need to reschedule my appointment with Dr. Lee", "receptionist"),
+        ("I think I was overcharged on my bill", "billing"),
+    ],
+)
+def test_obvious_queries_route_confidently(router, query, agent):
+    assert router.route(query, ALL)[0] == agent
+    assert router.route(query, ALL)[1] >= 0.8
+
+
+def test_probabilities_sum_to_one(router):
+    assert sum(router.predict_proba("Where is the clinic?").values()) == pytest.approx(1.0)
+
+
+def test_pii_mask_does_not_renormalize(router):
+    query = "How do I book an appointment?"
+    agent, confidence = router.route(query, PII_SAFE)
+    assert agent in PII_SAFE
+    assert confidence < 0.5  # Most of the mass is on the excluded general agent
+    assert confidence == pytest.approx(router.predict_proba(query)[agent])
+
+
+def test_unknown_vocabulary_gives_no_route(router):
+    assert router.route("Zxqv plorf", ALL) is None
+    assert router.route("How do I book an appointment?", set()) is None
+
+
+def test_local_router_is_retrained_when_configs_change(monkeypatch):
+    agents.invalidate_agent_cache()
+    before = agents.local_router()
+    assert agents.local_router() is before
+    configs = [dict(cfg, routable=cfg["routable"] and cfg["name"] != "billing") for cfg in agents.AGENT_CONFIGS]
+    monkeypatch.setattr(agents, "AGENT_CONFIGS", configs)
+    assert agents.local_router().labels == ["general", "receptionist"]
+    agents.invalidate_agent_cache()
@@ -0,0 +1,68 @@
+"""Tests for chunked message text: HTML body and streamed text attachments."""
+
+from datetime import datetime, timezone
+
+import httpx
+from sema_sdk.types import Attachment, AttachmentList
+
+from interceptor import iter_chunks
+from message_text import attachment_sources, html_text_chunks, rechunk
+
+
+def attachment(filename: str, content_type: str) -> Attachment:
+    return Attachment(
+        id=filename,
+        filename=filename,
+        content_type=content_type,
+        size_bytes=0,
+        download_url=f"https://files.test/{filename}?sig=x",
+        created_at=datetime.now(timezone.utc),
+    )
+
+
+class StubSema:
+    def __init__(self, *attachments: Attachment) -> None:
+        self.attachments = list(attachments)
+
+    def get_item_attachments(self, item_id: str) -> AttachmentList:
+        return AttachmentList(attachments=self.attachments)
+
+
+def test_html_split_inside_tags_and_entities():
+    html = "<html><head><style>p { chest: pain }</style></head><body><p>Ran out of</p><p>Metformin &amp; insulin</p></body>"
+    text = "".join(html_text_chunks(iter_chunks(html, 7)))
+    assert "chest" not in text
+    assert text.split() == ["Ran", "out", "of", "Metformin", "&", "insulin"]
+
+
+def test_rechunk_gives_fixed_size_chunks():
+    assert list(rechunk(["ab", "cdefg", "", "h", "ijklmnop"], 4)) == ["abcd", "efgh", "ijkl", "mnop"]
+    assert list(rechunk(["abcdef"], 4)) == ["abcd", "ef"]
+
+
+def test_text_attachments_stream_and_others_are_skipped():
+    body = "Patient reports dizziness. ".encode() * 10_000 + "Café note".encode()
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request.url.path)
+        return httpx.Response(200, content=body)
+
+    http = httpx.Client(transport=httpx.MockTransport(handler))
+    sema = StubSema(attachment("notes.txt", "text/plain; charset=utf-8"), attachment("scan.pdf", "application/pdf"))
+
+    sources = list(attachment_sources(sema, http, "item_1", chunk_chars=1000))
+    assert [name for name, _ in sources] == ["notes.txt"]
+    assert requests == []  # Downloads start when the chunks are read
+
+    chunks = list(sources[0][1])
+    assert {len(c) for c in chunks[:-1]} == {1000}
+    assert "".join(chunks).encode() == body
+
+
+def test_attachment_text_stops_at_max_bytes():
+    http = httpx.Client(transport=httpx.MockTransport(lambda request: httpx.Response(200, content=b"x" * 10_000)))
+    sema = StubSema(attachment("big.log", "text/plain"))
+
+    (_, chunks), = attachment_sources(sema, http, "item_1", chunk_chars=1000, max_bytes=3000)
+    assert sum(len(c) for c in chunks) == 3000
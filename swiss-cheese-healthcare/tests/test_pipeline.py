@@ -0,0 +1,221 @@
+"""End-to-end webhook tests: signed payload in, item-scoped events out."""
+
+import io
+import json
+import time
+
+import httpx
+import pytest
+from sema_sdk import WebhookVerifier
+
+import agents
+import pipeline
+from admission import AdmissionController
+from breaker import CircuitBreaker
+from events import EventHub
+from standins import LocalSema, item_ready_payload, new_webhook_secret, sign_webhook
+from standins import StubOpenAI as KeywordStubOpenAI
+from test_agents import SlowStubOpenAI, StubOpenAI
+from test_message_text import StubSema, attachment
+from webhook_recorder import WebhookRecorder, read_recording, replay
+
+SECRET = new_webhook_secret()
+
+
+def webhook_payload(item_id: str, subject: str, body: str = "", pii_detected: bool = False) -> bytes:
+    return item_ready_payload(item_id, "inbox", subject, body, {"pii_detected": pii_detected})
+
+
+@pytest.fixture
+def hub(monkeypatch):
+    agents.invalidate_agent_cache()
+    hub = EventHub()
+    monkeypatch.setattr(pipeline, "event_hub", hub)
+    monkeypatch.setattr(pipeline, "_verifier", WebhookVerifier(secret=SECRET))
+    monkeypatch.setattr(pipeline, "_local_router_threshold", None)
+    monkeypatch.setattr(pipeline, "classification_cache", None)
+    monkeypatch.setattr(pipeline, "admission", AdmissionController())
+    monkeypatch.setattr(agents, "openai_breaker", CircuitBreaker("openai"))
+    monkeypatch.setattr(pipeline, "sema_breaker", CircuitBreaker("sema"))
+    scheduler = pipeline.build_scheduler(classifier_timeout=0.2, interceptor_timeout=0.2)
+    monkeypatch.setattr(pipeline, "stage_scheduler", scheduler)
+    yield hub
+    scheduler.shutdown()
+
+
+def post(payload: bytes):
+    return pipeline.app.test_client().post("/webhook", data=payload, headers=sign_webhook(SECRET, payload))
+
+
+def drain(hub: EventHub, item_id: str) -> list:
+    with hub.subscribe(item_id) as events:
+        return list(iter(lambda: events.get(0), None))
+
+
+def test_webhook_runs_every_stage(hub, monkeypatch):
+    monkeypatch.setattr(pipeline, "_openai_client", StubOpenAI("billing"))
+
+    response = post(webhook_payload("item_1", "I was charged twice", "and I take warfarin"))
+
+    assert response.status_code == 200
+    events = drain(hub, "item_1")
+    assert events[0].stage == "webhook_received"
+    assert events[-1].stage == "aggregated"
+    assert {e.stage for e in events} >= {"pii_result", "classifier_result", "interceptor_result"}
+    summary = events[-1].data
+    assert summary["classifier"]["agent"] == "billing"
+    assert summary["interceptor"]["clinical_alert"] is True
+    assert summary["degraded"] == []
+    assert "query" not in summary  # PHI stays out of events unless EVENTS_INCLUDE_QUERY is set
+    timings = [(row["name"], row["depth"]) for row in summary["timings"]]
+    assert timings[:2] == [("verify", 0), ("pii", 0)]
+    assert ("openai.route", 1) in timings and ("interceptor", 0) in timings
+
+
+def test_classifier_timeout_gives_partial_aggregate(hub, monkeypatch):
+    monkeypatch.setattr(pipeline, "_openai_client", SlowStubOpenAI("billing", delay=1.0))
+
+    start = time.perf_counter()
+    response = post(webhook_payload("item_2", "Refund my copay", "I take warfarin"))
+
+    assert time.perf_counter() - start < 0.8
+    assert response.status_code == 200
+    events = drain(hub, "item_2")
+    errors = [e.data for e in events if e.stage == "error"]
+    assert errors == [{"source": "classifier", "message": "classifier timed out after 0.2s"}]
+    summary = events[-1].data
+    assert summary["degraded"] == ["classifier"]
+    assert summary["classifier"] == {}
+    assert summary["interceptor"]["clinical_alert"] is True
+
+
+def test_missing_query_text_is_rejected(hub, monkeypatch):
+    monkeypatch.setattr(pipeline, "_openai_client", StubOpenAI("general"))
+
+    response = post(webhook_payload("item_3", ""))
+
+    assert response.status_code == 400
+    assert response.get_json() == {"error": "No query text found in webhook payload"}
+    stages = [e.stage for e in drain(hub, "item_3")]
+    assert stages == ["webhook_received", "pii_result", "error"]
+
+
+def test_local_sema_delivers_signed_webhooks_with_pii(hub, monkeypatch):
+    monkeypatch.setattr(pipeline, "_openai_client", KeywordStubOpenAI(latency=0.0))
+    client = pipeline.app.test_client()
+    sema = LocalSema(SECRET, lambda payload, headers: client.post("/webhook", data=payload, headers=headers).status_code)
+    query = "Schedule a follow-up for Jane Smith, DOB 04/12/1978"
+
+    item = sema.upload_item(sema.inbox_id, io.BytesIO(query.encode()), sender_address="a@b.c", subject=query)
+    duplicate = sema.upload_item(sema.inbox_id, query.encode(), sender_address="a@b.c", subject=query)
+    sema.close()
+
+    assert duplicate.is_duplicate and duplicate.id == item.id
+    events = drain(hub, item.id)
+    pii = next(e.data for e in events if e.stage == "pii_result")
+    assert pii == {"pii_detected": True, "risk_level": "high", "entity_count": 2, "by_type": {"DATE_TIME": 1, "PERSON": 1}}
+    summary = events[-1].data
+    assert summary["classifier"]["agent"] == "receptionist"
+    assert sema.failed_deliveries == 0
+    assert [e.stage for e in events].count("aggregated") == 1
+
+
+def test_recorded_webhooks_replay_through_pipeline(hub, monkeypatch, tmp_path):
+    monkeypatch.setattr(pipeline, "_openai_client", StubOpenAI("billing"))
+    monkeypatch.setattr(pipeline, "webhook_recorder", WebhookRecorder(tmp_path / "webhooks.jsonl.gz"))
+    forged = webhook_payload("item_forged", "Refund my copay")
+    post(webhook_payload("item_4", "Refund my copay"))
+    pipeline.app.test_client().post("/webhook", data=forged, headers=sign_webhook(new_webhook_secret(), forged))
+    pipeline.webhook_recorder.close()
+
+    entries = list(read_recording(tmp_path / "webhooks.jsonl.gz"))
+    assert [json.loads(e["payload"])["item_id"] for e in entries] == ["item_4"]
+
+    monkeypatch.setattr(pipeline, "webhook_recorder", None)
+    client = pipeline.app.test_client()
+    report = replay(
+        tmp_path / "webhooks.jsonl.gz",
+        lambda payload, headers: client.post("/webhook", data=payload, headers=headers).status_code,
+        secret=SECRET,
+    )
+    assert report["status"] == {"200": 1}
+    assert [e.stage for e in drain(hub, "item_4")].count("aggregated") == 2
+
+
+def test_full_text_interceptor_scans_whole_body_and_attachments(hub, monkeypatch):
+    monkeypatch.setattr(pipeline, "_openai_client", StubOpenAI("general"))
+    monkeypatch.setattr(pipeline, "_interceptor_full_text", True)
+    monkeypatch.setattr(pipeline, "_sema_client", StubSema(attachment("history.txt", "text/plain")))
+    history = b"Family history: " + b"unremarkable. " * 20_000 + b"Prior stroke in 2019."
+    monkeypatch.setattr(
+        pipeline,
+        "_attachment_http",
+        httpx.Client(transport=httpx.MockTransport(lambda request: httpx.Response(200, content=history))),
+    )
+    payload = json.loads(webhook_payload("item_5", "Question about my visit", "Short preview"))
+    payload["deliverable"]["content_summary"]["body_html"] = (
+        "<p>Short preview</p>" + "<p>More details follow.</p>" * 5_000 + "<p>I ran out of Metoprolol.</p>"
+    )
+
+    response = post(json.dumps(payload).encode())
+
+    assert response.status_code == 200
+    interceptor = drain(hub, "item_5")[-1].data["interceptor"]
+    assert interceptor["sources"] == ["body", "history.txt"]
+    found = {(s["term"], s["source"]) for s in interceptor["signals"]}
+    assert found == {("Metoprolol", "body"), ("ran out of", "body"), ("stroke", "history.txt")}
+    stroke = next(s for s in interceptor["signals"] if s["term"] == "stroke")
+    assert stroke["context"] == "markable. unremarkable. Prior stroke in 2019."
+
+
+def test_preview_only_interceptor_ignores_the_rest_of_the_body(hub, monkeypatch):
+    monkeypatch.setattr(pipeline, "_openai_client", StubOpenAI("general"))
+    payload = json.loads(webhook_payload("item_6", "Question about my visit", "Short preview"))
+    payload["deliverable"]["content_summary"]["body_html"] = "<p>Short preview</p><p>I ran out of Metoprolol.</p>"
+
+    post(json.dumps(payload).encode())
+
+    assert drain(hub, "item_6")[-1].data["interceptor"]["signals"] == []
+
+
+def test_saturated_pipeline_sheds_webhooks(hub, monkeypatch):
+    monkeypatch.setattr(pipeline, "_openai_client", StubOpenAI("billing"))
+    monkeypatch.setattr(pipeline, "admission", AdmissionController(max_in_flight=1))
+    held = pipeline.admission.admit()
+
+    payload = webhook_payload("item_shed", "I was charged twice")
+    headers = sign_webhook(SECRET, payload)
+    client = pipeline.app.test_client()
+    shed = client.post("/webhook", data=payload, headers=headers)
+    assert drain(hub, "item_shed") == []
+    held.done()
+    # The shed attempt wasn't remembered, so a retry with the same signature is handled
+    admitted = client.post("/webhook", data=payload, headers=headers)
+
+    assert shed.status_code == 503
+    assert shed.headers["Retry-After"] == "1"
+    assert admitted.status_code == 200
+    metrics = pipeline.app.test_client().get("/metrics").get_json()["admission"]
+    assert (metrics["admitted"], metrics["rejected"], metrics["in_flight"]) == (2, 1, 0)
+
+
+def test_open_breakers_degrade_the_webhook_and_health(hub, monkeypatch):
+    monkeypatch.setattr(pipeline, "_openai_client", StubOpenAI("billing"))
+    monkeypatch.setattr(pipeline, "_interceptor_full_text", True)
+    monkeypatch.setattr(pipeline, "_sema_client", StubSema(attachment("history.txt", "text/plain")))
+    for breaker in (agents.openai_breaker, pipeline.sema_breaker):
+        for _ in range(breaker.failure_threshold):
+            breaker.allow()
+            breaker.record_failure()
+
+    response = post(webhook_payload("item_down", "I was charged twice for my copay"))
+
+    assert response.status_code == 200
+    aggregated = drain(hub, "item_down")[-1].data
+    assert aggregated["classifier"]["route_path"] == "degraded"
+    assert aggregated["classifier"]["agent"] == "billing"
+    assert aggregated["interceptor"]["sources"] == ["body"]
+    assert aggregated["interceptor"]["skipped_sources"][0].startswith("attachments: sema circuit is open")
+    health = pipeline.app.test_client().get("/health").get_json()
+    assert health["status"] == "degraded"
+    assert {name: b["state"] for name, b in health["breakers"].items()} == {"openai": "open", "sema": "open"}
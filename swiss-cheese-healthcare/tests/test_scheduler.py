@@ -0,0 +1,102 @@
+import threading
+import time
+
+import pytest
+
+from scheduler import Stage, StageScheduler
+
+
+def sleeper(seconds, value=None):
+    def fn(ctx):
+        time.sleep(seconds)
+        return value
+    return fn
+
+
+def test_parallel_stages_overlap_and_feed_dependents():
+    scheduler = StageScheduler(
+        [
+            Stage("join", lambda ctx: ctx["a"] + ctx["b"] + ctx["x"], deps=("a", "b"), inline=True),
+            Stage("a", sleeper(0.1, 1)),
+            Stage("b", sleeper(0.1, 2)),
+        ]
+    )
+    start = time.perf_counter()
+    outcomes = scheduler.run({"x": 10})
+
+    assert time.perf_counter() - start < 0.18
+    assert outcomes["join"].value == 13
+    assert all(outcome.ok for outcome in outcomes.values())
+
+
+def test_timeout_gives_partial_result():
+    degraded = []
+    scheduler = StageScheduler(
+        [
+            Stage("slow", sleeper(1.0, "late"), timeout=0.05, default="fallback"),
+            Stage("fast", sleeper(0.0, "done")),
+            Stage("needs_slow", lambda ctx: "ran", deps=("slow",)),
+            Stage("join", lambda ctx: (ctx["slow"], ctx["fast"]), deps=("slow", "fast"), optional=("slow",)),
+        ]
+    )
+    start = time.perf_counter()
+    outcomes = scheduler.run({}, on_degraded=lambda name, outcome: degraded.append((name, outcome.status)))
+
+    assert time.perf_counter() - start < 0.5
+    assert outcomes["slow"].status == "timeout"
+    assert outcomes["slow"].error == "slow timed out after 0.05s"
+    assert outcomes["needs_slow"].status == "skipped"
+    assert outcomes["join"].value == ("fallback", "done")
+    assert degraded == [("slow", "timeout")]
+    assert scheduler.snapshot()["stages"]["slow"] == {"timeout": 1}
+
+
+def test_stage_errors_are_contained():
+    def boom(ctx):
+        raise RuntimeError("upstream down")
+
+    scheduler = StageScheduler(
+        [Stage("boom", boom), Stage("join", lambda ctx: ctx["boom"], deps=("boom",), optional=("boom",))]
+    )
+    outcomes = scheduler.run({})
+
+    assert outcomes["boom"].status == "error"
+    assert outcomes["boom"].error == "upstream down"
+    assert outcomes["join"].ok and outcomes["join"].value is None
+
+
+def test_pool_caps_concurrency_across_runs():
+    lock = threading.Lock()
+    active = peak = 0
+
+    def work(ctx):
+        nonlocal active, peak
+        with lock:
+            active += 1
+            peak = max(peak, active)
+        time.sleep(0.05)
+        with lock:
+            active -= 1
+
+    scheduler = StageScheduler([Stage("a", work), Stage("b", work)], max_concurrency=3)
+    runs = [threading.Thread(target=scheduler.run, args=({},)) for _ in range(6)]
+    for t in runs:
+        t.start()
+    for t in runs:
+        t.join()
+
+    assert peak == 3
+    assert scheduler.snapshot()["stages"]["a"] == {"ok": 6}
+
+
+@pytest.mark.parametrize(
+    "stages, message",
+    [
+        ([Stage("a", sleeper(0), deps=("b",))], "unknown"),
+        ([Stage("a", sleeper(0), deps=("b",)), Stage("b", sleeper(0), deps=("a",))], "cycle"),
+        ([Stage("a", sleeper(0), optional=("b",))], "optional"),
+    ],
+)
+def test_invalid_graphs_are_rejected(stages, message):
+    with pytest.raises(ValueError, match=message):
+        StageScheduler(stages)
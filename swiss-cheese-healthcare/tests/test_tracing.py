@@ -0,0 +1,87 @@
+import contextvars
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import tracing
+
+
+@pytest.fixture(autouse=True)
+def no_export():
+    yield
+    tracing.configure(None)
+
+
+def in_pool():
+    with tracing.span("pool"):
+        pass
+
+
+def test_spans_nest_across_copied_contexts():
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        with tracing.start_trace("webhook", trace_id="item_1") as root:
+            with tracing.span("classifier"):
+                with tracing.span("openai.route", model="stub"):
+                    time.sleep(0.01)
+            pool.submit(contextvars.copy_context().run, in_pool).result()
+            pool.submit(in_pool).result()  # Without the copied context there is no active trace
+            with tracing.span("interceptor"):
+                pass
+            trace = tracing.current_trace()
+            rows = trace.breakdown()
+
+    assert [(r["name"], r["depth"]) for r in rows] == [
+        ("classifier", 0),
+        ("openai.route", 1),
+        ("pool", 0),
+        ("interceptor", 0),
+    ]
+    route = next(s for s in trace.spans if s.name == "openai.route")
+    assert route.duration_ms >= 10
+    assert route.attrs == {"model": "stub"}
+    pool_span = next(s for s in trace.spans if s.name == "pool")
+    assert pool_span.parent_id == root.span_id
+    assert pool_span.thread_id != root.thread_id
+    assert root.end_ns is not None and tracing.current_span() is None
+
+
+def test_span_outside_a_trace_is_a_no_op():
+    with tracing.span("orphan") as s:
+        assert s is None
+
+
+def test_record_span_and_errors():
+    with tracing.start_trace("webhook", trace_id="item_2", start_ns=time.perf_counter_ns() - 5_000_000):
+        tracing.record_span("verify", 0, 2_000_000)
+        with pytest.raises(ValueError), tracing.span("boom"):
+            raise ValueError("bad")
+        trace = tracing.current_trace()
+
+    verify, boom = trace.spans[1:]
+    assert verify.duration_ms == 2.0
+    assert boom.attrs == {"error": "ValueError"}
+    assert trace.spans[0].duration_ms >= 5
+
+
+def test_trace_file_is_appendable_trace_event_json(tmp_path):
+    path = tmp_path / "traces" / "pipeline.json"
+    for item in ("item_a", "item_b"):
+        tracing.configure(path)  # Reopening keeps the existing header
+        with tracing.start_trace("webhook", trace_id=item), tracing.span("classifier"):
+            pass
+
+    text = path.read_text()
+    assert text.startswith("[\n") and text.count("[\n") == 1
+    events = json.loads(text.rstrip().rstrip(",") + "]")
+    assert [(e["name"], e["args"]["trace_id"]) for e in events] == [
+        ("classifier", "item_a"),
+        ("webhook", "item_a"),
+        ("classifier", "item_b"),
+        ("webhook", "item_b"),
+    ]
+    classifier, webhook = events[:2]
+    assert classifier["ph"] == "X"
+    assert classifier["args"]["parent_id"] == webhook["args"]["span_id"]
+    assert webhook["ts"] <= classifier["ts"] and classifier["dur"] <= webhook["dur"]
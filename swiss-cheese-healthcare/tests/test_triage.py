@@ -0,0 +1,159 @@
+"""Tests for batch triage: one-pass interceptor, bounded classifier concurrency, checkpoints."""
+
+import json
+import threading
+import time
+
+import pytest
+
+import agents
+import pipeline
+from admission import AdmissionController
+from interceptor import detect_clinical_signals, detect_clinical_signals_batch
+from standins import StubOpenAI as KeywordStubOpenAI
+from triage import TriageMessage, parse_messages, read_checkpoint, run_batch
+
+TEXTS = [
+    "I was charged twice for my visit",
+    "Skipping my Lisinopril and having chest pain",
+    "chest",  # With the next text, "chest pain" would span two messages
+    "pain in my wallet after the bill, also chest pain again",
+    "",
+]
+
+
+def test_batch_scan_matches_one_scan_per_text():
+    batch = detect_clinical_signals_batch(TEXTS)
+
+    assert batch == [detect_clinical_signals(text) for text in TEXTS]
+    assert batch[2] == []
+    assert [s.term for s in batch[1]] == [s.term for s in detect_clinical_signals(TEXTS[1])]
+    assert TEXTS[3][batch[3][0].start : batch[3][0].end] == "chest pain"
+
+
+def test_parse_messages_defaults_and_errors():
+    lines = [
+        '{"id": "a", "subject": "Refill", "body": "out of pills", "pii_detected": false}',
+        "",
+        '{"text": "When are you open?"}',
+    ]
+
+    assert parse_messages(lines) == [
+        TriageMessage("a", "Refill\nout of pills", pii_detected=False),
+        TriageMessage("3", "When are you open?", pii_detected=True),
+    ]
+    with pytest.raises(ValueError, match="line 2: invalid JSON"):
+        parse_messages(['{"text": "x"}', "{oops"])
+    with pytest.raises(ValueError, match="line 1: no text"):
+        parse_messages(['{"id": "a"}'])
+    with pytest.raises(ValueError, match="duplicate id 'a'"):
+        parse_messages(['{"id": "a", "text": "x"}', '{"id": "a", "text": "y"}'])
+
+
+def test_checkpoint_drops_a_partial_last_line(tmp_path):
+    out = tmp_path / "triage.jsonl"
+    assert read_checkpoint(out) == set()
+    out.write_text('{"id": "a"}\n{"id": "b"}\n{"id": "c", "interc')
+
+    assert read_checkpoint(out) == {"a", "b"}
+    assert out.read_text() == '{"id": "a"}\n{"id": "b"}\n'
+
+
+def test_batch_runs_bounded_and_yields_in_completion_order():
+    messages = [TriageMessage(str(i), f"message {i}") for i in range(12)]
+    in_flight = peak = 0
+    lock = threading.Lock()
+
+    def classify(message):
+        nonlocal in_flight, peak
+        with lock:
+            in_flight += 1
+            peak = max(peak, in_flight)
+        time.sleep(0.05 if message.id == "0" else 0.01)
+        with lock:
+            in_flight -= 1
+        if message.id == "5":
+            raise RuntimeError("upstream down")
+        return {"agent": "general"}
+
+    results = list(run_batch(messages, classify=classify, interceptor_fields=lambda s: {"n": len(s)}, concurrency=3))
+
+    assert peak == 3
+    assert sorted(r["id"] for r in results) == sorted(m.id for m in messages)
+    assert [r["id"] for r in results].index("0") > 0  # The slow first message finishes later
+    failed = next(r for r in results if r["id"] == "5")
+    assert failed["classifier"] is None and failed["degraded"] == ["classifier"]
+    assert failed["error"] == "upstream down"
+
+
+def test_closing_the_batch_early_cancels_the_rest():
+    started = []
+
+    def classify(message):
+        started.append(message.id)
+        return {}
+
+    messages = [TriageMessage(str(i), "x") for i in range(50)]
+    results = run_batch(messages, classify=classify, interceptor_fields=lambda s: {}, concurrency=2)
+    next(results)
+    results.close()
+
+    assert len(started) < 50
+
+
+AUTH = {"Authorization": "Bearer test-token"}
+
+
+@pytest.fixture
+def stub_pipeline(monkeypatch):
+    agents.invalidate_agent_cache()
+    monkeypatch.setattr(pipeline, "_openai_client", KeywordStubOpenAI(0.01, jitter=0))
+    monkeypatch.setattr(pipeline, "_local_router_threshold", None)
+    monkeypatch.setattr(pipeline, "classification_cache", None)
+    monkeypatch.setattr(pipeline, "admission", AdmissionController())
+    monkeypatch.setattr(pipeline, "_api_token", "test-token")
+    yield
+    agents.invalidate_agent_cache()
+
+
+def test_batch_endpoint_streams_jsonl(stub_pipeline):
+    body = "\n".join(
+        json.dumps(m)
+        for m in [
+            {"id": "bill", "text": "I was charged twice for my copay", "pii_detected": False},
+            {"id": "alert", "text": "Book a visit, I stopped my warfarin and have chest pain"},
+        ]
+    )
+
+    response = pipeline.app.test_client().post("/classify/batch?concurrency=2", data=body, headers=AUTH)
+
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    results = {r["id"]: r for r in map(json.loads, response.get_data(as_text=True).splitlines())}
+    assert results["bill"]["classifier"]["agent"] == "billing"
+    assert results["bill"]["interceptor"]["clinical_alert"] is False
+    assert results["alert"]["classifier"]["pii_filtered"] is True
+    assert results["alert"]["interceptor"]["routed_to"] == "decision_support"
+
+
+def test_batch_endpoint_rejects_bad_input(stub_pipeline):
+    response = pipeline.app.test_client().post("/classify/batch", data='{"id": 1}', headers=AUTH)
+
+    assert response.status_code == 400
+    assert "no text" in response.get_json()["error"]
+
+
+def test_batch_endpoint_needs_the_token_and_an_admission_slot(stub_pipeline, monkeypatch):
+    client = pipeline.app.test_client()
+    body = '{"id": "a", "text": "When are you open?"}'
+
+    assert client.post("/classify/batch", data=body).status_code == 401
+    monkeypatch.setattr(pipeline, "admission", AdmissionController(max_in_flight=1))
+    held = pipeline.admission.admit()
+    assert client.post("/classify/batch", data=body, headers=AUTH).status_code == 503
+    held.done()
+
+    response = client.post("/classify/batch", data=body, headers=AUTH)
+    assert response.status_code == 200
+    response.get_data()
+    assert pipeline.admission.snapshot()["in_flight"] == 0
@@ -0,0 +1,204 @@
+"""Monotonic span tracing for the webhook pipeline.
+
+Spans are timed with `time.perf_counter_ns()`, so durations are immune
+to wall-clock adjustments. Each webhook opens a trace, and every stage,
+plus each OpenAI call inside `agents.classify`, is a span nested under
+whichever span was active where it started:
+
+    with start_trace("webhook", trace_id=item_id):
+        with span("classifier"):
+            with span("openai.route", model="gpt-4o-mini"):
+                ...
+
+The active span lives in a ContextVar. Work handed to another thread
+keeps its parent only when submitted through `contextvars.copy_context().run`,
+as the stage scheduler and the speculative docs pool do.
+
+With a TRACE_FILE configured, each finished span is appended as one line
+in the Chrome trace-event format ("X" complete events, timestamps in
+microseconds). The file starts with `[` and each line ends with a comma.
+The format allows the closing bracket to be omitted, so the file stays
+appendable across runs and loads as-is in Perfetto (ui.perfetto.dev) or
+chrome://tracing.
+"""
+
+from __future__ import annotations
+
+import itertools
+import json
+import os
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: int
+    parent_id: int | None
+    start_ns: int
+    end_ns: int | None = None
+    thread_id: int = 0
+    attrs: dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def duration_ms(self) -> float | None:
+        return None if self.end_ns is None else (self.end_ns - self.start_ns) / 1e6
+
+    def to_trace_event(self) -> dict:
+        return {
+            "name": self.name,
+            "cat": "pipeline",
+            "ph": "X",
+            "ts": self.start_ns / 1000,
+            "dur": (self.end_ns - self.start_ns) / 1000,
+            "pid": os.getpid(),
+            "tid": self.thread_id,
+            "args": {"trace_id": self.trace_id, "span_id": self.span_id, "parent_id": self.parent_id, **self.attrs},
+        }
+
+
+class Trace:
+    """All spans recorded under one trace id, finished or not."""
+
+    def __init__(self, trace_id: str) -> None:
+        self.trace_id = trace_id
+        self._lock = threading.Lock()
+        self.spans: list[Span] = []
+
+    def _add(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def breakdown(self) -> list[dict]:
+        """Finished spans below the root, in start order, each with its nesting depth."""
+        with self._lock:
+            if not self.spans:
+                return []
+            root = self.spans[0].span_id
+            spans = [s for s in self.spans if s.end_ns is not None]
+        children: dict[int | None, list[Span]] = {}
+        for s in sorted(spans, key=lambda s: s.start_ns):
+            children.setdefault(s.parent_id, []).append(s)
+
+        rows: list[dict] = []
+
+        def walk(parent: int | None, depth: int) -> None:
+            for s in children.get(parent, ()):
+                rows.append({"name": s.name, "ms": round(s.duration_ms, 3), "depth": depth})
+                walk(s.span_id, depth + 1)
+
+        walk(root, 0)
+        return rows
+
+
+class TraceFileExporter:
+    """Append finished spans to a trace-event JSON file, one event per line."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            if f.tell() == 0:
+                f.write("[\n")
+
+    def export(self, span: Span) -> None:
+        line = json.dumps(span.to_trace_event(), default=str) + ",\n"
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line)
+
+
+_exporter: TraceFileExporter | None = None
+_span_ids = itertools.count(1)
+_active: ContextVar[tuple[Trace, Span] | None] = ContextVar("active_span", default=None)
+
+
+def configure(trace_file: str | Path | None) -> None:
+    """Export finished spans to trace_file; None turns export off."""
+    global _exporter
+    _exporter = TraceFileExporter(Path(trace_file)) if trace_file else None
+
+
+def current_trace() -> Trace | None:
+    active = _active.get()
+    return active[0] if active else None
+
+
+def current_span() -> Span | None:
+    active = _active.get()
+    return active[1] if active else None
+
+
+def _new_span(trace: Trace, name: str, parent: Span | None, start_ns: int, attrs: dict[str, Any]) -> Span:
+    s = Span(
+        name=name,
+        trace_id=trace.trace_id,
+        span_id=next(_span_ids),
+        parent_id=parent.span_id if parent else None,
+        start_ns=start_ns,
+        thread_id=threading.get_native_id(),
+        attrs=attrs,
+    )
+    trace._add(s)
+    return s
+
+
+@contextmanager
+def _open_span(
+    trace: Trace, name: str, parent: Span | None, attrs: dict[str, Any], start_ns: int | None = None
+) -> Iterator[Span]:
+    s = _new_span(trace, name, parent, time.perf_counter_ns() if start_ns is None else start_ns, attrs)
+    token = _active.set((trace, s))
+    try:
+        yield s
+    except BaseException as e:
+        s.attrs["error"] = type(e).__name__
+        raise
+    finally:
+        s.end_ns = time.perf_counter_ns()
+        _active.reset(token)
+        if _exporter is not None:
+            _exporter.export(s)
+
+
+@contextmanager
+def start_trace(name: str, *, trace_id: str, start_ns: int | None = None, **attrs: Any) -> Iterator[Span]:
+    """Open a new trace with a root span, independent of any active one.
+
+    start_ns backdates the root span, for work timed before the trace id
+    was known (see `record_span`).
+    """
+    with _open_span(Trace(trace_id), name, None, attrs, start_ns) as root:
+        yield root
+
+
+def record_span(name: str, start_ns: int, end_ns: int, **attrs: Any) -> None:
+    """Add an already-finished child of the active span."""
+    active = _active.get()
+    if active is None:
+        return
+    trace, parent = active
+    s = _new_span(trace, name, parent, start_ns, attrs)
+    s.end_ns = end_ns
+    if _exporter is not None:
+        _exporter.export(s)
+
+
+@contextmanager
+def span(name: str, **attrs: Any) -> Iterator[Span | None]:
+    """A child of the active span. Does nothing outside a trace."""
+    active = _active.get()
+    if active is None:
+        yield None
+        return
+    trace, parent = active
+    with _open_span(trace, name, parent, attrs) as s:
+        yield s
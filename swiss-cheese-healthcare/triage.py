@@ -0,0 +1,135 @@
+"""Batch triage: a backlog of messages through the interceptor and classifier, without Sema.
+
+Input is JSONL, one message per line:
+
+    {"id": "msg-1", "subject": "Refill", "body": "I'm out of Lisinopril", "pii_detected": true}
+
+`text` may replace subject and body. `id` defaults to the line number.
+Historical messages carry no Sema enrichment, so `pii_detected`
+defaults to true and the classifier only sees PII-safe agents unless a
+message says otherwise.
+
+The interceptor scans the whole batch in one pass of the automaton
+(interceptor.detect_clinical_signals_batch). The classifier then runs
+with at most `concurrency` messages in flight, and results come out in
+order of completion: one JSON object per message, with the
+`classifier` and `interceptor` fields of the `aggregated` event.
+
+The output file is the checkpoint. Each result is written and flushed
+as it completes; a resumed run reads the ids already there and skips
+those messages (read_checkpoint).
+"""
+
+from __future__ import annotations
+
+import json
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from interceptor import ClinicalSignal, detect_clinical_signals_batch
+
+DEFAULT_CONCURRENCY = 8
+MAX_CONCURRENCY = 64
+
+
+@dataclass(frozen=True)
+class TriageMessage:
+    id: str
+    text: str
+    pii_detected: bool = True
+
+
+def parse_messages(lines: Iterable[str]) -> list[TriageMessage]:
+    """Messages from JSONL lines. Raises ValueError naming the first bad line."""
+    messages = []
+    seen: set[str] = set()
+    for line_no, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"line {line_no}: invalid JSON ({e.msg})") from None
+        if not isinstance(record, dict):
+            raise ValueError(f"line {line_no}: expected a JSON object")
+        subject, body = record.get("subject") or "", record.get("body") or ""
+        text = record.get("text") or (f"{subject}\n{body}".strip() if subject and body else (subject or body))
+        if not isinstance(text, str) or not text:
+            raise ValueError(f"line {line_no}: no text, subject or body")
+        message_id = str(record.get("id", line_no))
+        if message_id in seen:
+            raise ValueError(f"line {line_no}: duplicate id {message_id!r}")
+        seen.add(message_id)
+        messages.append(TriageMessage(message_id, text, bool(record.get("pii_detected", True))))
+    return messages
+
+
+def read_checkpoint(path: Path) -> set[str]:
+    """Ids of the results already in an output file.
+
+    A line cut short by an interrupted write is truncated away, so the
+    resumed run appends after the last complete result.
+    """
+    if not path.exists():
+        return set()
+    done: set[str] = set()
+    good = 0
+    with path.open("rb+") as f:
+        for line in f:
+            try:
+                done.add(json.loads(line)["id"])
+            except (ValueError, KeyError, TypeError):
+                break
+            if not line.endswith(b"\n"):
+                break
+            good += len(line)
+        else:
+            return done
+        f.truncate(good)
+    return done
+
+
+def run_batch(
+    messages: list[TriageMessage],
+    *,
+    classify: Callable[[TriageMessage], dict[str, Any]],
+    interceptor_fields: Callable[[list[ClinicalSignal]], dict[str, Any]],
+    concurrency: int = DEFAULT_CONCURRENCY,
+) -> Iterator[dict[str, Any]]:
+    """Yield one result per message, in order of completion.
+
+    A message whose classification raises gets `classifier: null`,
+    `degraded: ["classifier"]` and the error; the batch continues.
+    Closing the iterator early cancels the messages not yet started.
+    """
+    interceptor = {
+        m.id: interceptor_fields(signals)
+        for m, signals in zip(messages, detect_clinical_signals_batch([m.text for m in messages]))
+    }
+    todo = iter(messages)
+    pending: dict[Future, TriageMessage] = {}
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="triage") as pool:
+        try:
+            for message in todo:
+                pending[pool.submit(classify, message)] = message
+                if len(pending) >= concurrency:
+                    break
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    message = pending.pop(future)
+                    result = {"id": message.id, "interceptor": interceptor[message.id], "degraded": []}
+                    try:
+                        result["classifier"] = future.result()
+                    except Exception as e:
+                        result.update(classifier=None, degraded=["classifier"], error=str(e))
+                    yield result
+                    following = next(todo, None)
+                    if following is not None:
+                        pending[pool.submit(classify, following)] = following
+        finally:
+            for future in pending:
+                future.cancel()
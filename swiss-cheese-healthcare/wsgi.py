@@ -0,0 +1,44 @@
+"""WSGI entry point: the webhook pipeline under a multi-worker server.
+
+    EVENT_LOG_PATH=events.db gunicorn -w 4 -k gthread --threads 16 -b 127.0.0.1:5050 wsgi:app
+
+Each worker initializes the pipeline from the environment, like cli.py.
+With EVENT_LOG_PATH set, all workers publish to one SQLite event log
+(event_log.py). The CLI (`python cli.py --workers 4`), and SSE clients
+connected to any worker, follow every worker's events.
+
+OPENAI_STUB_LATENCY_MS replaces OpenAI with standins.StubOpenAI. It is
+for load tests only.
+"""
+
+from __future__ import annotations
+
+import os
+
+from dotenv import load_dotenv
+from sema_sdk import SemaClient
+
+import pipeline
+from cli import pipeline_options
+from standins import StubOpenAI
+
+load_dotenv()
+
+_stub_latency_ms = os.environ.get("OPENAI_STUB_LATENCY_MS")
+pipeline.init(
+    webhook_secret=os.environ["SEMA_WEBHOOK_SECRET"],
+    openai_api_key=os.environ.get("OPENAI_API_KEY", ""),
+    api_token=os.environ.get("PIPELINE_API_TOKEN"),
+    sema_client=(
+        SemaClient(
+            api_key=os.environ["SEMA_API_KEY"],
+            base_url=os.environ.get("SEMA_BASE_URL", "https://dev-api.withsema.com"),
+        )
+        if os.environ.get("SEMA_API_KEY")
+        else None
+    ),
+    openai_client=StubOpenAI(float(_stub_latency_ms) / 1000) if _stub_latency_ms else None,
+    **pipeline_options(),
+)
+
+app = pipeline.app